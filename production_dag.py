@@ -27,7 +27,6 @@ from airflow.operators.python import PythonOperator
 from airflow.providers.http.operators.http import SimpleHttpOperator
 from airflow.models import Variable
 from airflow.utils.trigger_rule import TriggerRule
-import requests
 import httpx
 import psycopg2
 from psycopg2 import sql
@@ -58,7 +57,11 @@ default_args = {
 
 # Create a connection wrapper to standardize database operations and error handling
 class DatabaseConnectionManager:
-    """Manages database connections with proper error handling."""
+    """Manages database connections with proper error handling.
+
+    Connections are checked out of the shared pool for the database
+    (src/etl/pool.py) rather than opened for every block.
+    """
 
     def __init__(self, conn_params: Dict[str, Any]):
         """
@@ -67,14 +70,18 @@ class DatabaseConnectionManager:
         Args:
             conn_params: Dictionary with database connection parameters
         """
+        # Imported when the task runs, so parsing the DAG does not need src.etl
+        from src.etl.pool import get_pool
+
         self.conn_params = conn_params
+        self.pool = get_pool(conn_params)
         self.conn = None
         self.cursor = None
 
     def __enter__(self):
-        """Context manager entry point - establishes connection."""
+        """Context manager entry point - checks a connection out of the pool."""
         try:
-            self.conn = psycopg2.connect(**self.conn_params)
+            self.conn = self.pool.getconn()
             self.cursor = self.conn.cursor(cursor_factory=RealDictCursor)
             return self.cursor
         except psycopg2.Error as e:
@@ -82,7 +89,9 @@ class DatabaseConnectionManager:
             raise
 
     def __exit__(self, exc_type, exc_val, exc_tb):
-        """Context manager exit point - closes connection."""
+        """Context manager exit point - returns the connection to the pool."""
+        from src.etl.pool import describe
+
         if self.cursor:
             self.cursor.close()
         if self.conn:
@@ -90,7 +99,9 @@ class DatabaseConnectionManager:
                 self.conn.commit()
             else:
                 self.conn.rollback()
-            self.conn.close()
+            self.pool.putconn(self.conn)
+            self.conn = None
+        logger.debug(f"Connection {describe(self.pool.stats())}")
 
         # Log any exceptions that occurred
         if exc_type is not None:
@@ -147,108 +158,6 @@ dag = DAG(
 )
 
 
-# Function to get Metabase auth token
-def get_metabase_token() -> str:
-    """
-    Get authentication token from Metabase API.
-
-    Returns:
-        str: The authentication token
-
-    Raises:
-        Exception: If authentication fails
-    """
-    try:
-        logger.info("Attempting to authenticate with Metabase")
-        session_url = f"{METABASE_URL}/api/session"
-        response = requests.post(
-            session_url,
-            json={"username": METABASE_USERNAME, "password": METABASE_PASSWORD},
-            timeout=30,  # Add timeout
-        )
-
-        response.raise_for_status()
-        token = response.json().get("id")
-
-        if not token:
-            raise ValueError("Authentication succeeded but no token was returned")
-
-        logger.info("Successfully authenticated with Metabase")
-        return token
-    except requests.exceptions.RequestException as e:
-        logger.error(f"Metabase authentication request error: {e}")
-        raise
-    except (KeyError, json.JSONDecodeError) as e:
-        logger.error(f"Invalid response from Metabase API: {e}")
-        raise
-    except Exception as e:
-        logger.error(f"Unexpected error in Metabase authentication: {e}")
-        logger.error(traceback.format_exc())
-        raise
-
-
-# Function to refresh a Metabase dashboard
-def refresh_metabase_dashboard(dashboard_id: str, **kwargs) -> str:
-    """
-    Trigger a refresh of a specific Metabase dashboard.
-
-    Args:
-        dashboard_id: The ID of the dashboard to refresh
-
-    Returns:
-        str: A summary of the refresh operation
-
-    Raises:
-        Exception: If the refresh operation fails
-    """
-    try:
-        logger.info(f"Refreshing Metabase dashboard {dashboard_id}")
-
-        # Get auth token
-        token = get_metabase_token()
-
-        # Refresh dashboard cards
-        dashboard_url = f"{METABASE_URL}/api/dashboard/{dashboard_id}/cards"
-        headers = {"X-Metabase-Session": token}
-
-        # Get dashboard cards
-        response = requests.get(dashboard_url, headers=headers, timeout=30)
-        response.raise_for_status()
-
-        dashboard_cards = response.json()
-        logger.info(f"Found {len(dashboard_cards)} cards in dashboard {dashboard_id}")
-
-        # Refresh each card
-        success_count = 0
-        error_count = 0
-        for card in dashboard_cards:
-            card_id = card["card"]["id"]
-            try:
-                logger.info(f"Refreshing card {card_id}")
-
-                refresh_url = f"{METABASE_URL}/api/card/{card_id}/query"
-                refresh_response = requests.post(
-                    refresh_url, headers=headers, timeout=60
-                )
-                refresh_response.raise_for_status()
-                success_count += 1
-            except requests.exceptions.RequestException as e:
-                logger.warning(f"Failed to refresh card {card_id}: {e}")
-                error_count += 1
-
-        refresh_summary = f"Dashboard {dashboard_id} refresh complete: {success_count} cards succeeded, {error_count} cards failed"
-        logger.info(refresh_summary)
-        return refresh_summary
-
-    except requests.exceptions.RequestException as e:
-        logger.error(f"HTTP error refreshing dashboard {dashboard_id}: {e}")
-        raise
-    except Exception as e:
-        logger.error(f"Error refreshing dashboard {dashboard_id}: {e}")
-        logger.error(traceback.format_exc())
-        raise
-
-
 # Function to extract data from Supabase
 def extract_data_from_supabase(**kwargs) -> Dict[str, Any]:
     """
@@ -270,7 +179,7 @@ def extract_data_from_supabase(**kwargs) -> Dict[str, Any]:
             {"name": "products", "endpoint": "olist.products"},
             {"name": "customers", "endpoint": "olist.customers"},
             {"name": "sellers", "endpoint": "olist.sellers"},
-            {"name": "reviews", "endpoint": "olist.reviews"},
+            {"name": "order_reviews", "endpoint": "olist.order_reviews"},
         ]
 
         tables_processed = 0
@@ -375,7 +284,12 @@ extract_task = PythonOperator(
 # Create a task for running dbt models
 dbt_run_task = BashOperator(
     task_id="dbt_run",
-    bash_command=f"cd {DBT_PROJECT_DIR} && dbt run --profiles-dir=./profiles",
+    # dbt test overwrites target/run_results.json; keep this run's results for
+    # the dashboard refresh plan
+    bash_command=(
+        f"cd {DBT_PROJECT_DIR} && dbt run --profiles-dir=./profiles "
+        "&& cp target/run_results.json target/run_results_run.json"
+    ),
     dag=dag,
 )
 
@@ -386,29 +300,80 @@ dbt_test_task = BashOperator(
     dag=dag,
 )
 
-# Create a task for refreshing product dashboard
-refresh_product_dashboard_task = PythonOperator(
-    task_id="refresh_product_dashboard",
-    python_callable=refresh_metabase_dashboard,
-    op_kwargs={"dashboard_id": PRODUCT_DASHBOARD_ID},
-    provide_context=True,
+# Refresh the Metabase dashboards. Only cards whose dbt models'
+# fingerprints changed since they were last warmed are executed
+# (src/etl/metabase_warm.py), with one refresh task mapped per dashboard that
+# has such cards.
+METABASE_ENV = {
+    "METABASE_URL": METABASE_URL,
+    "METABASE_USERNAME": METABASE_USERNAME,
+    "METABASE_PASSWORD": METABASE_PASSWORD,
+}
+DASHBOARD_IDS = [PRODUCT_DASHBOARD_ID, CUSTOMER_DASHBOARD_ID]
+DASHBOARD_REFRESH_PLAN = f"{DBT_PROJECT_DIR}/target/dashboard_refresh_plan.json"
+
+# Create a task mapping dashboard cards to dbt models
+plan_dashboard_refresh_task = BashOperator(
+    task_id="plan_dashboard_refresh",
+    bash_command=(
+        "cd /opt/airflow && python -m src.etl.metabase_warm plan "
+        f"--dashboard-id {' '.join(str(i) for i in DASHBOARD_IDS)} "
+        f"--manifest {DBT_PROJECT_DIR}/target/manifest.json "
+        f"--run-results {DBT_PROJECT_DIR}/target/run_results_run.json "
+        f"--out {DASHBOARD_REFRESH_PLAN}"
+    ),
+    env=METABASE_ENV,
+    append_env=True,
     dag=dag,
 )
 
-# Create a task for refreshing customer dashboard
-refresh_customer_dashboard_task = PythonOperator(
-    task_id="refresh_customer_dashboard",
-    python_callable=refresh_metabase_dashboard,
-    op_kwargs={"dashboard_id": CUSTOMER_DASHBOARD_ID},
-    provide_context=True,
+
+def dashboards_to_refresh(**kwargs) -> List[str]:
+    """
+    Build one refresh command per dashboard with cards to refresh.
+
+    Returns:
+        List[str]: The refresh commands, one per dashboard
+    """
+    with open(DASHBOARD_REFRESH_PLAN) as f:
+        plan = json.load(f)
+
+    commands = []
+    for dashboard_id, cards in plan["dashboards"].items():
+        refresh = [card_id for card_id, card in cards.items() if card["refresh"]]
+        logger.info(
+            f"Dashboard {dashboard_id}: {len(refresh)} of {len(cards)} cards to refresh"
+        )
+        if refresh:
+            commands.append(
+                "cd /opt/airflow && python -m src.etl.metabase_warm warm "
+                f"--dashboard-id {dashboard_id} --plan {DASHBOARD_REFRESH_PLAN}"
+            )
+    return commands
+
+
+# Create a task picking the dashboards to refresh
+select_dashboards_task = PythonOperator(
+    task_id="select_dashboards",
+    python_callable=dashboards_to_refresh,
     dag=dag,
 )
 
+# Create a task for refreshing each selected dashboard's cards
+refresh_dashboard_task = BashOperator.partial(
+    task_id="refresh_dashboard",
+    env=METABASE_ENV,
+    append_env=True,
+    dag=dag,
+).expand(bash_command=select_dashboards_task.output)
+
 # Create a task to log the success of the entire pipeline
 success_task = BashOperator(
     task_id="pipeline_success",
     bash_command='echo "Pipeline completed successfully at $(date)"',
-    trigger_rule=TriggerRule.ALL_SUCCESS,
+    # Runs unless an upstream task failed; refresh_dashboard is skipped when no
+    # dashboard has cards to refresh
+    trigger_rule=TriggerRule.NONE_FAILED,
     dag=dag,
 )
 
@@ -416,8 +381,9 @@ success_task = BashOperator(
 extract_task >> dbt_run_task >> dbt_test_task
 (
     dbt_test_task
-    >> refresh_product_dashboard_task
-    >> refresh_customer_dashboard_task
+    >> plan_dashboard_refresh_task
+    >> select_dashboards_task
+    >> refresh_dashboard_task
     >> success_task
 )
 
@@ -434,6 +400,7 @@ failure_task = BashOperator(
     extract_task,
     dbt_run_task,
     dbt_test_task,
-    refresh_product_dashboard_task,
-    refresh_customer_dashboard_task,
+    plan_dashboard_refresh_task,
+    select_dashboards_task,
+    refresh_dashboard_task,
 ] >> failure_task
@@ -22,6 +22,7 @@ DEFAULT_CONFIG = {
     "supabase_key": "your_supabase_key",
     "product_dashboard_id": "1",  # Replace with actual Product dashboard ID
     "customer_dashboard_id": "2",  # Replace with actual Customer dashboard ID
+    "seller_dashboard_id": "3",  # Replace with actual Seller dashboard ID
 }
 
 
@@ -4,7 +4,7 @@ Ecommerce Analytics Pipeline DAG
 This DAG orchestrates the entire analytics workflow:
 1. Extracts data from Supabase
 2. Runs dbt models in the correct order
-3. Refreshes Metabase dashboards
+3. Warms the Metabase dashboards' query cache
 
 This is a production-ready implementation with proper error handling,
 logging, and retry mechanisms.
@@ -14,6 +14,7 @@ Last Modified: March 18, 2025
 Repository: https://github.com/dasdatasensei/supabase_ecommerce_analytics.git
 """
 
+import functools
 import os
 from datetime import datetime, timedelta
 
@@ -22,8 +23,8 @@ from airflow.operators.bash import BashOperator
 from airflow.operators.python import PythonOperator
 from airflow.providers.http.operators.http import SimpleHttpOperator
 from airflow.models import Variable
+from airflow.exceptions import AirflowException
 from airflow.utils.trigger_rule import TriggerRule
-import requests
 import json
 import logging
 import traceback
@@ -54,6 +55,26 @@ try:
     SUPABASE_KEY = Variable.get("supabase_key")
     PRODUCT_DASHBOARD_ID = Variable.get("product_dashboard_id")
     CUSTOMER_DASHBOARD_ID = Variable.get("customer_dashboard_id")
+    SELLER_DASHBOARD_ID = Variable.get("seller_dashboard_id", default_var=None)
+    # Source tables extracted at once, and batches buffered per table
+    EXTRACT_CONCURRENCY = int(Variable.get("extract_concurrency", default_var=3))
+    EXTRACT_QUEUE_SIZE = int(Variable.get("extract_queue_size", default_var=4))
+    # Profile the Python tasks and the dashboard refresh (src/etl/profiling.py);
+    # unset falls back to the workers' ETL_PROFILE / ETL_PROFILE_DIR
+    ETL_PROFILE = Variable.get("etl_profile", default_var=None)
+    ETL_PROFILE_DIR = Variable.get("etl_profile_dir", default_var=None)
+    # Every dashboard to keep fresh; defaults to the three analytics dashboards
+    DASHBOARD_IDS = Variable.get(
+        "metabase_dashboard_ids", default_var=None, deserialize_json=True
+    ) or [
+        dashboard_id
+        for dashboard_id in (
+            PRODUCT_DASHBOARD_ID,
+            CUSTOMER_DASHBOARD_ID,
+            SELLER_DASHBOARD_ID,
+        )
+        if dashboard_id
+    ]
 except Exception as e:
     logger.error(f"Error loading environment variables: {e}")
     raise
@@ -96,228 +117,110 @@ dag = DAG(
 )
 
 
-# Function to get Metabase auth token
-def get_metabase_token():
+def profiled_task(python_callable):
     """
-    Get authentication token from Metabase API.
+    Run a task callable under the profiler when the etl_profile Variable (or
+    ETL_PROFILE) is on. The profiler is imported when the task runs, like the
+    other src.etl modules.
     """
-    try:
-        session_url = f"{METABASE_URL}/api/session"
-        response = requests.post(
-            session_url,
-            json={"username": METABASE_USERNAME, "password": METABASE_PASSWORD},
-        )
 
-        response.raise_for_status()  # Raise exception for non-200 responses
-        return response.json()["id"]
-    except requests.exceptions.RequestException as e:
-        logger.error(f"Metabase authentication error: {e}")
-        raise
-    except (KeyError, json.JSONDecodeError) as e:
-        logger.error(f"Invalid response from Metabase API: {e}")
-        raise
-    except Exception as e:
-        logger.error(f"Unexpected error in Metabase authentication: {e}")
-        logger.error(traceback.format_exc())
-        raise
+    @functools.wraps(python_callable)
+    def wrapper(**kwargs):
+        from src.etl.profiling import profile
+
+        with profile(
+            python_callable.__name__, enabled=ETL_PROFILE, output_dir=ETL_PROFILE_DIR
+        ):
+            return python_callable(**kwargs)
 
+    return wrapper
 
-# Function to refresh a Metabase dashboard
-def refresh_metabase_dashboard(dashboard_id, **kwargs):
+
+def capture_statements(action):
     """
-    Trigger a refresh of a specific Metabase dashboard.
+    Task callback snapshotting pg_stat_statements when a task starts and
+    storing the statements it ran when it ends (src/etl/statements.py), under
+    the DAG run's run_id and the task_id. Capture never fails the task.
     """
-    try:
-        logger.info(f"Refreshing Metabase dashboard {dashboard_id}")
-
-        # Get auth token
-        token = get_metabase_token()
-
-        # Refresh dashboard cards
-        dashboard_url = f"{METABASE_URL}/api/dashboard/{dashboard_id}/cards"
-        headers = {"X-Metabase-Session": token}
-
-        # Get dashboard cards
-        response = requests.get(dashboard_url, headers=headers)
-        response.raise_for_status()  # Raise exception for non-200 responses
-
-        dashboard_cards = response.json()
-        logger.info(f"Found {len(dashboard_cards)} cards in dashboard {dashboard_id}")
-
-        # Refresh each card
-        success_count = 0
-        error_count = 0
-        for card in dashboard_cards:
-            card_id = card["card"]["id"]
-            try:
-                logger.info(f"Refreshing card {card_id}")
-
-                refresh_url = f"{METABASE_URL}/api/card/{card_id}/query"
-                refresh_response = requests.post(refresh_url, headers=headers)
-                refresh_response.raise_for_status()
-                success_count += 1
-            except requests.exceptions.RequestException as e:
-                logger.warning(f"Failed to refresh card {card_id}: {e}")
-                error_count += 1
-
-        refresh_summary = f"Dashboard {dashboard_id} refresh complete: {success_count} cards succeeded, {error_count} cards failed"
-        logger.info(refresh_summary)
-        return refresh_summary
-
-    except requests.exceptions.RequestException as e:
-        logger.error(f"HTTP error refreshing dashboard {dashboard_id}: {e}")
-        raise
-    except Exception as e:
-        logger.error(f"Error refreshing dashboard {dashboard_id}: {e}")
-        logger.error(traceback.format_exc())
-        raise
+
+    def callback(context):
+        from src.etl.statements import capture
+
+        capture(
+            action,
+            SUPABASE_DB_PARAMS,
+            context["run_id"],
+            context["task_instance"].task_id,
+        )
+
+    return callback
+
+
+# Callbacks of the tasks whose SQL is measured; report with
+# python -m src.etl.statements report --run-id <run_id> [--compare <run_id>]
+STATEMENT_CAPTURE = {
+    "on_execute_callback": capture_statements("begin"),
+    "on_success_callback": capture_statements("end"),
+    "on_retry_callback": capture_statements("end"),
+    "on_failure_callback": capture_statements("end"),
+}
 
 
 # Function to extract data from Supabase
 def extract_data_from_supabase(**kwargs):
     """
     Extract data from Supabase PostgreSQL database and store in staging tables.
+
+    Tables are copied by src/etl/extract.py. Up to EXTRACT_CONCURRENCY tables
+    are in flight at once, each with its read and write overlapped through a
+    bounded queue, on connections from the shared pools (src/etl/pool.py).
+    A table that fails does not stop the others. Copies are written under the
+    bulk-load profile (src/etl/bulk_load.py) unless BULK_LOAD_PROFILE is 0.
+
+    Each copied table is recorded under the DAG run's run_id, in the same
+    transaction as the copy. If any table fails, the task fails after the
+    others are copied, and the Airflow retry only extracts the failed tables.
     """
+    from src.etl.bulk_load import format_bytes
+    from src.etl.extract import ExtractionEngine, summarize
+    from src.etl.pool import describe
+
     try:
         logger.info("Starting data extraction from Supabase PostgreSQL database")
 
-        # List of tables to extract with schema prefix
-        tables = [
-            {"name": "orders", "endpoint": "olist.orders"},
-            {"name": "order_items", "endpoint": "olist.order_items"},
-            {"name": "products", "endpoint": "olist.products"},
-            {"name": "customers", "endpoint": "olist.customers"},
-            {"name": "sellers", "endpoint": "olist.sellers"},
-            {"name": "reviews", "endpoint": "olist.reviews"},
+        report = ExtractionEngine(
+            SUPABASE_DB_PARAMS,
+            concurrency=EXTRACT_CONCURRENCY,
+            queue_size=EXTRACT_QUEUE_SIZE,
+            run_id=kwargs["run_id"],
+        ).run()
+
+        for stats in report["pools"]:
+            logger.info(f"Connection {describe(stats)}")
+        logger.info(
+            f"Extraction wrote {report['rows_per_second']:,.0f} rows/s and "
+            f"{format_bytes(report['wal_bytes'])} of WAL "
+            f"(bulk-load profile {'on' if report['bulk_load'] else 'off'})"
+        )
+        extraction_summary = summarize(report)
+        logger.info(extraction_summary)
+        failed = [
+            name
+            for name, result in report["tables"].items()
+            if result["status"] == "error"
         ]
-
-        # Connect to source and target databases
-        try:
-            # Connect to Supabase PostgreSQL database for both source and target
-            conn_source = psycopg2.connect(**SUPABASE_DB_PARAMS)
-            conn_source.autocommit = False
-
-            conn = psycopg2.connect(**SUPABASE_DB_PARAMS)
-            conn.autocommit = False  # Use transactions
-            cursor = conn.cursor()
-
-            # Create raw schema if it doesn't exist
-            cursor.execute("CREATE SCHEMA IF NOT EXISTS raw;")
-            conn.commit()
-
-            tables_processed = 0
-            tables_failed = 0
-            rows_processed = 0
-
-            for table_info in tables:
-                table = table_info["name"]
-                endpoint = table_info["endpoint"]
-
-                logger.info(f"Extracting data from {table} table")
-
-                # Define the target schema and table
-                target_schema = "raw"
-                target_table = f"olist_{table}"
-
-                try:
-                    # Open a new cursor for each query
-                    cursor_source = conn_source.cursor()
-
-                    # Execute the query to fetch data
-                    query = f"SELECT * FROM {endpoint}"
-                    cursor_source.execute(query)
-
-                    # Fetch all data
-                    data = cursor_source.fetchall()
-
-                    # Get column names
-                    column_names = [desc[0] for desc in cursor_source.description]
-
-                    # Create a list of dictionaries with column names as keys
-                    result_data = []
-                    for row in data:
-                        result_dict = {}
-                        for i, value in enumerate(row):
-                            result_dict[column_names[i]] = value
-                        result_data.append(result_dict)
-
-                    # Close the source cursor
-                    cursor_source.close()
-
-                    # Create a response-like object
-                    response = type("obj", (object,), {"data": result_data})
-
-                    # Create the target table (will be dynamically based on data schema)
-                    if response.data and len(response.data) > 0:
-                        # Get column names from first row
-                        columns = response.data[0].keys()
-
-                        # Start a transaction
-                        try:
-                            # Drop table if exists
-                            cursor.execute(
-                                f"DROP TABLE IF EXISTS {target_schema}.{target_table};"
-                            )
-
-                            # Create table with appropriate columns
-                            create_table_sql = (
-                                f"CREATE TABLE {target_schema}.{target_table} ("
-                            )
-                            for col in columns:
-                                create_table_sql += f'"{col}" TEXT,'
-                            create_table_sql = create_table_sql.rstrip(",") + ");"
-                            cursor.execute(create_table_sql)
-
-                            # Insert data in batches
-                            batch_size = 1000
-                            batches = [
-                                response.data[i : i + batch_size]
-                                for i in range(0, len(response.data), batch_size)
-                            ]
-
-                            for batch in batches:
-                                for row in batch:
-                                    placeholders = ",".join(["%s"] * len(row))
-                                    columns_sql = ",".join(
-                                        [f'"{col}"' for col in row.keys()]
-                                    )
-                                    insert_sql = f"INSERT INTO {target_schema}.{target_table} ({columns_sql}) VALUES ({placeholders})"
-                                    cursor.execute(insert_sql, list(row.values()))
-
-                            # Commit the transaction
-                            conn.commit()
-                            rows_processed += len(response.data)
-                            tables_processed += 1
-                            logger.info(
-                                f"Successfully extracted {len(response.data)} rows from {table} to {target_schema}.{target_table}"
-                            )
-                        except Exception as e:
-                            conn.rollback()
-                            logger.error(
-                                f"Database error while processing {table}: {e}"
-                            )
-                            tables_failed += 1
-                            raise
-                    else:
-                        logger.info(f"No data found in {table}")
-                        tables_processed += 1
-                except Exception as e:
-                    logger.error(f"Error extracting data from {table}: {e}")
-                    tables_failed += 1
-
-            # Close database connections
-            cursor.close()
-            conn.close()
-            conn_source.close()
-
-            extraction_summary = f"Data extraction complete: {tables_processed} tables succeeded, {tables_failed} tables failed, {rows_processed} total rows processed"
-            logger.info(extraction_summary)
-            return extraction_summary
-
-        except psycopg2.Error as e:
-            logger.error(f"Database connection error: {e}")
-            raise
-
+        if failed:
+            # Fail the try so Airflow retries; the retry skips the copied tables
+            raise AirflowException(
+                f"Extraction failed for {', '.join(failed)}: {extraction_summary}"
+            )
+        return extraction_summary
+
+    except AirflowException:
+        raise
+    except psycopg2.Error as e:
+        logger.error(f"Database connection error: {e}")
+        raise
     except Exception as e:
         logger.error(f"Error extracting data: {e}")
         logger.error(traceback.format_exc())
@@ -327,73 +230,182 @@ def extract_data_from_supabase(**kwargs):
 # Task 1: Extract data from Supabase
 extract_data_task = PythonOperator(
     task_id="extract_data_from_supabase",
-    python_callable=extract_data_from_supabase,
+    python_callable=profiled_task(extract_data_from_supabase),
     dag=dag,
     retries=3,
     retry_delay=timedelta(minutes=2),
+    **STATEMENT_CAPTURE,
 )
 
+# Recency metrics in the marts are computed as of the day the run covers up to
+# (see macros/as_of_date.sql), so reruns and backfills reproduce the same
+# segments. dag_run.conf as_of_date overrides it.
+AS_OF_DATE = "{{ (dag_run.conf or {}).get('as_of_date') or (data_interval_end | ds) }}"
+DBT_AS_OF_VARS = f'--vars "{{as_of_date: {AS_OF_DATE}}}"'
+
 # Task 2: Run dbt staging models
 run_dbt_staging = BashOperator(
     task_id="run_dbt_staging",
-    bash_command=f"cd {DBT_PROJECT_DIR} && dbt run --models tag:staging",
+    bash_command=(
+        f"cd {DBT_PROJECT_DIR} && dbt run --models tag:staging "
+        "&& cp target/run_results.json target/run_results_staging.json"
+    ),
     dag=dag,
     retries=2,
     retry_delay=timedelta(minutes=1),
+    **STATEMENT_CAPTURE,
 )
 
 # Task 3: Run dbt intermediate models
 run_dbt_intermediate = BashOperator(
     task_id="run_dbt_intermediate",
-    bash_command=f"cd {DBT_PROJECT_DIR} && dbt run --models tag:intermediate",
+    bash_command=(
+        f"cd {DBT_PROJECT_DIR} && dbt run --models tag:intermediate {DBT_AS_OF_VARS} "
+        "&& cp target/run_results.json target/run_results_intermediate.json"
+    ),
     dag=dag,
     retries=2,
     retry_delay=timedelta(minutes=1),
+    **STATEMENT_CAPTURE,
 )
 
 # Task 4: Run dbt mart models
 run_dbt_marts = BashOperator(
     task_id="run_dbt_marts",
-    bash_command=f"cd {DBT_PROJECT_DIR} && dbt run --models tag:marts",
+    # Each dbt run overwrites target/run_results.json; keep this run's results
+    # for the tasks that need to know which models changed
+    bash_command=(
+        f"cd {DBT_PROJECT_DIR} && dbt run --models tag:marts {DBT_AS_OF_VARS} "
+        "&& cp target/run_results.json target/run_results_marts.json"
+    ),
     dag=dag,
     retries=2,
     retry_delay=timedelta(minutes=1),
+    **STATEMENT_CAPTURE,
 )
 
 # Task 5: Run dbt tests
+# Column-level schema tests run in one scan per model (src/etl/dbt_tests.py);
+# everything else still runs through dbt test. The singular tests only check
+# orders loaded or changed since their last passing run, except on
+# FULL_TEST_WEEKDAY or when the run is triggered with {"dbt_test_mode": "full"}.
+FULL_TEST_WEEKDAY = 6  # Sunday
+DBT_TEST_MODE = (
+    "{{ (dag_run.conf or {}).get('dbt_test_mode') or ('full' if logical_date.weekday() == "
+    + str(FULL_TEST_WEEKDAY)
+    + " else 'incremental') }}"
+)
 run_dbt_tests = BashOperator(
     task_id="run_dbt_tests",
-    bash_command=f"cd {DBT_PROJECT_DIR} && dbt test",
+    bash_command=(
+        f"cd /opt/airflow && python -m src.etl.dbt_tests "
+        f"--project-dir {DBT_PROJECT_DIR} --with-dbt-test "
+        f'--vars "{{test_mode: {DBT_TEST_MODE}}}"'
+    ),
     dag=dag,
     retries=1,
     retry_delay=timedelta(minutes=1),
+    **STATEMENT_CAPTURE,
 )
 
-# Task 6: Refresh Product Analytics Dashboard
-refresh_product_dashboard = PythonOperator(
-    task_id="refresh_product_dashboard",
-    python_callable=refresh_metabase_dashboard,
-    op_kwargs={"dashboard_id": PRODUCT_DASHBOARD_ID},
+# Task 5b: Export the marts to month-partitioned Parquet for notebooks and
+# other columnar readers; only months that changed are rewritten
+export_marts = BashOperator(
+    task_id="export_marts",
+    bash_command="cd /opt/airflow && python -m src.etl.export",
+    dag=dag,
+    retries=2,
+    retry_delay=timedelta(minutes=1),
+)
+
+# Tasks 6 and 7: Refresh the Metabase dashboards. Each card is mapped to the
+# dbt models it reads, and only cards whose models' fingerprints
+# changed since they were last warmed are executed to warm Metabase's query
+# cache (src/etl/metabase_warm.py). The fingerprints are computed on the DB_*
+# database the workers' environment points at. One refresh task is mapped per dashboard that
+# has such cards, so dashboards are added through the metabase_dashboard_ids
+# Variable rather than new tasks.
+METABASE_ENV = {
+    "METABASE_URL": METABASE_URL,
+    "METABASE_USERNAME": METABASE_USERNAME,
+    "METABASE_PASSWORD": METABASE_PASSWORD,
+    **{
+        name: value
+        for name, value in (
+            ("ETL_PROFILE", ETL_PROFILE),
+            ("ETL_PROFILE_DIR", ETL_PROFILE_DIR),
+        )
+        if value is not None
+    },
+}
+DASHBOARD_REFRESH_PLAN = f"{DBT_PROJECT_DIR}/target/dashboard_refresh_plan.json"
+
+# Task 6: Map dashboard cards to dbt models and pick the cards to refresh
+plan_dashboard_refresh = BashOperator(
+    task_id="plan_dashboard_refresh",
+    bash_command=(
+        "cd /opt/airflow && python -m src.etl.metabase_warm plan "
+        f"--dashboard-id {' '.join(str(i) for i in DASHBOARD_IDS)} "
+        f"--manifest {DBT_PROJECT_DIR}/target/manifest.json "
+        "--run-results "
+        + " ".join(
+            f"{DBT_PROJECT_DIR}/target/run_results_{layer}.json"
+            for layer in ("staging", "intermediate", "marts")
+        )
+        + f" --out {DASHBOARD_REFRESH_PLAN}"
+    ),
+    env=METABASE_ENV,
+    append_env=True,
+    dag=dag,
+    retries=2,
+    retry_delay=timedelta(minutes=1),
+)
+
+
+def dashboards_to_refresh(**kwargs):
+    """
+    Build one refresh command per dashboard with cards to refresh.
+    """
+    with open(DASHBOARD_REFRESH_PLAN) as f:
+        plan = json.load(f)
+
+    commands = []
+    for dashboard_id, cards in plan["dashboards"].items():
+        refresh = [card_id for card_id, card in cards.items() if card["refresh"]]
+        logger.info(
+            f"Dashboard {dashboard_id}: {len(refresh)} of {len(cards)} cards to refresh"
+        )
+        if refresh:
+            commands.append(
+                "cd /opt/airflow && python -m src.etl.metabase_warm warm "
+                f"--dashboard-id {dashboard_id} --plan {DASHBOARD_REFRESH_PLAN}"
+            )
+    return commands
+
+
+select_dashboards = PythonOperator(
+    task_id="select_dashboards",
+    python_callable=profiled_task(dashboards_to_refresh),
     dag=dag,
-    retries=3,
-    retry_delay=timedelta(minutes=2),
 )
 
-# Task 7: Refresh Customer Analytics Dashboard
-refresh_customer_dashboard = PythonOperator(
-    task_id="refresh_customer_dashboard",
-    python_callable=refresh_metabase_dashboard,
-    op_kwargs={"dashboard_id": CUSTOMER_DASHBOARD_ID},
+# Task 7: Refresh each selected dashboard's cards
+refresh_dashboard = BashOperator.partial(
+    task_id="refresh_dashboard",
+    env=METABASE_ENV,
+    append_env=True,
     dag=dag,
     retries=3,
     retry_delay=timedelta(minutes=2),
-)
+).expand(bash_command=select_dashboards.output)
 
 # Task 8: Success notification task
 success_notification = BashOperator(
     task_id="success_notification",
     bash_command='echo "The ecommerce analytics pipeline completed successfully on $(date)"',
-    trigger_rule=TriggerRule.ALL_SUCCESS,  # Only runs if all upstream tasks succeed
+    # Runs unless an upstream task failed; refresh_dashboard is skipped when no
+    # dashboard has cards to refresh
+    trigger_rule=TriggerRule.NONE_FAILED,
     dag=dag,
 )
 
@@ -405,5 +417,11 @@ success_notification = BashOperator(
     >> run_dbt_marts
     >> run_dbt_tests
 )
-run_dbt_tests >> refresh_product_dashboard >> success_notification
-run_dbt_tests >> refresh_customer_dashboard >> success_notification
+(
+    run_dbt_tests
+    >> plan_dashboard_refresh
+    >> select_dashboards
+    >> refresh_dashboard
+    >> success_notification
+)
+run_dbt_marts >> export_marts >> success_notification
@@ -0,0 +1,47 @@
+/*
+Recency metrics relative to a pipeline as-of date instead of now().
+
+The as-of date comes from the `as_of_date` var (the DAG passes the run's date)
+and defaults to the date the dbt invocation started, so every model in a run
+agrees on it and a rerun for the same date produces the same segments.
+
+Incremental models only rewrite rows with new orders, so their stored recency
+goes stale as the as-of date moves on. refresh_recency_segments() is run as a
+post-hook of those models: it recomputes the days-since columns and the
+recency segment in place, without redoing any aggregation, on every row not
+yet computed for the current as-of date (tracked in `segmented_as_of`). Each
+row is therefore written once per as-of date, not once per run.
+*/
+
+{% macro as_of_date() -%}
+    '{{ var("as_of_date", none) or run_started_at.strftime("%Y-%m-%d") }}'::date
+{%- endmacro %}
+
+{% macro days_since(column) -%}
+    ({{ as_of_date() }} - ({{ column }})::date)
+{%- endmacro %}
+
+{% macro recency_segment(days_column) -%}
+    case
+        when {{ days_column }} is null then 'no_orders'
+        {%- for threshold in var('recency_thresholds') %}
+        when {{ days_column }} <= {{ threshold }} then 'active_{{ threshold }}d'
+        {%- endfor %}
+        else 'inactive'
+    end
+{%- endmacro %}
+
+{% macro refresh_recency_segments(last_order_column='last_order_date', first_order_column='first_order_date', segment=true) %}
+    {% if is_incremental() %}
+        update {{ this }}
+        set days_since_last_order = {{ days_since(last_order_column) }},
+            {%- if first_order_column %}
+            days_since_first_order = {{ days_since(first_order_column) }},
+            {%- endif %}
+            {%- if segment %}
+            recency_segment = {{ recency_segment(days_since(last_order_column)) }},
+            {%- endif %}
+            segmented_as_of = {{ as_of_date() }}
+        where segmented_as_of is distinct from {{ as_of_date() }}
+    {% endif %}
+{% endmacro %}
@@ -0,0 +1,238 @@
+/*
+Delta-merged aggregate state.
+
+Models that keep running totals per entity store only decomposable state
+(sums, counts, sums of squares, minimums and maximums) and derive averages
+and deviations when they are read. An incremental run aggregates the changed
+rows only, and the delta_merge strategy folds that delta into the stored row
+with INSERT ... ON CONFLICT DO UPDATE, so its cost follows the changed rows
+rather than the history of the entities they touch:
+
+    config(
+        materialized='incremental',
+        incremental_strategy='delta_merge',
+        unique_key='seller_id',
+        delta_merge={'min': ['first_order_at'], 'max': ['last_order_at']}
+    )
+
+Columns other than the unique key are added up unless they are listed under
+`min` or `max`, or under `replace` (overwritten by the new value). The delta
+must hold at most one row per key.
+
+Input rows can change after they were merged: an order is delivered,
+canceled or reviewed after it was first counted. The model therefore keeps a
+copy of the input rows it merged in <model>__merged. delta_rows() selects the
+input rows loaded since (by `_loaded_at`, see macros/staging_incremental.sql)
+with `sign` +1, and the copies merged before of the same keys with `sign` -1.
+Aggregations weight every row by `sign`, so the delta subtracts the previous
+contribution of a changed order and adds the current one. The
+record_merged_rows() post-hook then replaces those copies:
+
+    with order_sellers as (
+        {{ delta_rows(ref('int_order_sellers')) }}
+    )
+
+    post_hook="{{ record_merged_rows(ref('int_order_sellers')) }}"
+
+Minimums and maximums cannot be retracted by a delta, so the
+recompute_bounds() post-hook, run after record_merged_rows(), recomputes them
+from the copies for the keys the run changed:
+
+    post_hook="{{ recompute_bounds('seller_id', {'first_order_at': 'min(purchased_at)'}) }}"
+
+An entity whose every row was retracted is left with zero counts for the
+model to delete.
+
+Sums treat nulls as sum() does: null + x is x, and the sum stays null only
+while no non-null value has been seen.
+
+full_refresh_differences() compares the stored state with the same
+aggregation over the full history, for singular tests that guard the
+equivalence of incremental runs and a full refresh.
+*/
+
+{% macro merged_rows_relation() %}
+    {{ return(this.incorporate(path={'identifier': this.identifier ~ '__merged'})) }}
+{% endmacro %}
+
+{#
+    The rows to aggregate for the delta of an incremental run, with `sign`:
+    the rows of `rows` (a relation, or the SQL of a query) loaded since the
+    last merge, and the rows merged before for the same values of `key`.
+    Every row of `rows` on a full refresh.
+#}
+{% macro delta_rows(rows, key='order_id') %}
+    {%- set rows = '(' ~ rows ~ ')' if rows is string else rows -%}
+    {%- if is_incremental() %}
+        {%- set merged = merged_rows_relation() -%}
+        {%- if execute and load_relation(merged) is none -%}
+            {{ exceptions.raise_compiler_error(merged ~ " does not exist; rebuild " ~ this ~ " with --full-refresh") }}
+        {%- endif %}
+        with loaded_rows as (
+
+            select *
+            from {{ rows }} as source_rows
+            where _loaded_at > (select coalesce(max(_loaded_at), '-infinity'::timestamptz) from {{ merged }})
+
+        )
+
+        select 1 as sign, * from loaded_rows
+        union all
+        select -1 as sign, * from {{ merged }}
+        where {{ key }} in (select {{ key }} from loaded_rows)
+    {%- else %}
+        select 1 as sign, * from {{ rows }} as source_rows
+    {%- endif %}
+{% endmacro %}
+
+{#
+    Post-hook of the models that aggregate delta_rows(rows, key): replaces
+    the stored copies of the rows merged by the run (all of them on a full
+    refresh). The watermark is read once, before the old copies are deleted.
+#}
+{% macro record_merged_rows(rows, key='order_id') %}
+    {%- set rows = '(' ~ rows ~ ')' if rows is string else rows -%}
+    {%- set merged = merged_rows_relation() -%}
+    {%- if is_incremental() and load_relation(merged) is not none %}
+        with watermark as (
+
+            select coalesce(max(_loaded_at), '-infinity'::timestamptz) as loaded_at
+            from {{ merged }}
+
+        ),
+
+        loaded_rows as (
+
+            select *
+            from {{ rows }} as source_rows
+            where _loaded_at > (select loaded_at from watermark)
+
+        ),
+
+        replaced_rows as (
+
+            delete from {{ merged }}
+            where {{ key }} in (select {{ key }} from loaded_rows)
+
+        )
+
+        insert into {{ merged }}
+        select * from loaded_rows
+    {%- else %}
+        drop table if exists {{ merged }};
+        create table {{ merged }} as
+        select * from {{ rows }} as source_rows;
+        create index {{ merged.identifier }}_{{ key }}_idx on {{ merged }} ({{ key }});
+        create index {{ merged.identifier }}_loaded_at_idx on {{ merged }} (_loaded_at)
+    {%- endif %}
+{% endmacro %}
+
+{#
+    Post-hook of the models that aggregate delta_rows(): sets the `bounds`
+    columns (column name to an aggregate over the merged rows) of the keys
+    the run changed from the rows merged for them, so that a retracted row
+    no longer bounds them. Runs after record_merged_rows(), in the model's
+    transaction, so now() is the run's `_loaded_at`. A full refresh computes
+    the bounds from every row already.
+#}
+{% macro recompute_bounds(key, bounds) %}
+    {%- set merged = merged_rows_relation() -%}
+    {%- if is_incremental() %}
+        create index if not exists {{ merged.identifier }}_{{ key }}_idx on {{ merged }} ({{ key }});
+
+        update {{ this }} as current_state
+        set
+        {%- for column in bounds %}
+            {{ column }} = merged_bounds.{{ column }}{{ "," if not loop.last }}
+        {%- endfor %}
+        from (
+
+            select
+                {{ key }},
+            {%- for column, aggregate in bounds.items() %}
+                {{ aggregate }} as {{ column }}{{ "," if not loop.last }}
+            {%- endfor %}
+            from {{ merged }}
+            where {{ key }} in (select {{ key }} from {{ this }} where _loaded_at = now())
+            group by {{ key }}
+
+        ) as merged_bounds
+        where current_state.{{ key }} = merged_bounds.{{ key }}
+    {%- else %}
+        select 1
+    {%- endif %}
+{% endmacro %}
+
+{% macro get_incremental_delta_merge_sql(arg_dict) %}
+    {%- set target_relation = arg_dict['target_relation'] -%}
+    {%- set unique_key = arg_dict['unique_key'] -%}
+    {%- if not unique_key -%}
+        {{ exceptions.raise_compiler_error("The delta_merge strategy needs a unique_key") }}
+    {%- endif -%}
+    {%- set key_columns = [unique_key] if unique_key is string else unique_key -%}
+    {%- set rules = config.get('delta_merge', {}) -%}
+    {%- for rule in rules if rule not in ('min', 'max', 'replace') -%}
+        {{ exceptions.raise_compiler_error("Unknown delta_merge rule '" ~ rule ~ "' (expected min, max or replace)") }}
+    {%- endfor -%}
+    {%- set column_names = arg_dict['dest_columns'] | map(attribute='name') | list -%}
+
+    -- ON CONFLICT needs a unique index on the key
+    create unique index if not exists {{ target_relation.identifier }}_delta_merge_key_idx
+        on {{ target_relation }} ({{ key_columns | join(', ') }});
+
+    insert into {{ target_relation }} as current_state ({{ get_quoted_csv(column_names) }})
+    select {{ get_quoted_csv(column_names) }}
+    from {{ arg_dict['temp_relation'] }}
+    on conflict ({{ key_columns | join(', ') }}) do update set
+    {%- for column in column_names if column not in key_columns %}
+        {% set quoted = adapter.quote(column) -%}
+        {{ quoted }} =
+        {%- if column in rules.get('min', []) %} least(current_state.{{ quoted }}, excluded.{{ quoted }})
+        {%- elif column in rules.get('max', []) %} greatest(current_state.{{ quoted }}, excluded.{{ quoted }})
+        {%- elif column in rules.get('replace', []) %} excluded.{{ quoted }}
+        {%- else %} coalesce(current_state.{{ quoted }} + excluded.{{ quoted }}, current_state.{{ quoted }}, excluded.{{ quoted }})
+        {%- endif %}{{ "," if not loop.last }}
+    {%- endfor %}
+{% endmacro %}
+
+{#
+    Rows that differ between a delta-merged model and the same aggregation
+    over the full history (full_refresh_sql, with the model's columns in the
+    model's order, less the `exclude` ones); empty when incremental runs and
+    a full refresh agree.
+#}
+{% macro full_refresh_differences(model, full_refresh_sql, exclude=[]) %}
+    {%- set column_names = adapter.get_columns_in_relation(model) | map(attribute='name') | reject('in', exclude) | list if execute else [] %}
+    with stored_state as (
+
+        select {{ column_names | join(', ') if column_names else '*' }}
+        from {{ model }}
+
+    ),
+
+    full_refresh as (
+
+        {{ full_refresh_sql }}
+
+    ),
+
+    stored_only as (
+
+        select * from stored_state
+        except all
+        select * from full_refresh
+
+    ),
+
+    full_refresh_only as (
+
+        select * from full_refresh
+        except all
+        select * from stored_state
+
+    )
+
+    select 'stored_state' as found_in, * from stored_only
+    union all
+    select 'full_refresh' as found_in, * from full_refresh_only
+{% endmacro %}
@@ -0,0 +1,224 @@
+/*
+Decomposable order totals per seller and per product.
+
+The aggregations behind int_seller_order_totals and int_product_order_totals
+(see macros/delta_merge.sql), over one row per order and seller or product:
+order_sellers() builds the rows of the int_order_sellers bridge, and
+order_products() those the product totals aggregate. The models run them
+over the orders an incremental run picks up, and the singular tests over the
+full history to check that the stored rows match a full refresh.
+
+Every row counts `sign` times (see delta_rows()): 1 on a full refresh, and on
+an incremental run +1 for the current version of a changed order and -1 for
+the version merged before. Sums are 0 rather than null when no row has a
+value, so retracting the last value leaves the same state as never having
+had one.
+
+Float measures are summed as numeric, so the totals do not depend on how the
+rows were split across runs.
+*/
+
+{#
+    The int_order_sellers rows of the given orders: one per order and seller,
+    from the order's items, its staging row and its int_orders_with_items row
+    (for the review).
+#}
+{% macro order_sellers(orders, order_items, orders_with_items) %}
+    with seller_items as (
+
+        select
+            order_id,
+            seller_id,
+            count(*) as item_count,
+            sum(price_amount) as item_revenue,
+            sum(shipping_amount) as freight_amount,
+            sum(total_amount) as total_amount
+        from {{ order_items }}
+        group by 1, 2
+
+    )
+
+    select
+        -- keys
+        i.order_id,
+        i.seller_id,
+        o.customer_id,
+
+        -- timestamps
+        o.purchased_at,
+        date_trunc('month', o.purchased_at) as purchase_month,
+
+        -- item totals
+        i.item_count,
+        i.item_revenue,
+        i.freight_amount,
+        i.total_amount,
+
+        -- status flags
+        o.order_status,
+        o.is_delivered,
+        o.is_delivered_on_time,
+        o.is_delivered and not o.is_delivered_on_time as is_delivered_late,
+        o.order_status = 'canceled' as is_canceled,
+
+        -- delivery times
+        o.delivery_time_days,
+        o.delivery_variance_days,
+
+        -- review data
+        r.review_score,
+        r.review_score is not null as has_review,
+        coalesce(r.is_positive_review, false) as is_positive_review,
+        coalesce(r.is_negative_review, false) as is_negative_review,
+        coalesce(r.has_review_comment, false) as has_review_comment
+
+    from seller_items i
+    inner join {{ orders }} o
+        on i.order_id = o.order_id
+    left join {{ orders_with_items }} r
+        on i.order_id = r.order_id
+{% endmacro %}
+
+{#
+    One row per order and product: the product's items in the order,
+    pre-aggregated, with the order's review and delivery attributes from its
+    int_orders_with_items row (and its `_loaded_at`, which a filter on this
+    query can use the index of).
+#}
+{% macro order_products(order_items, orders_with_items) %}
+    select
+        -- keys
+        oi.order_id,
+        oi.product_id,
+
+        -- item totals
+        count(*) as item_count,
+        sum(oi.order_item_id) as order_item_id_sum,
+        sum(oi.price_amount) as price_sum,
+        sum(oi.price_amount * oi.price_amount) as price_sum_squares,
+        count(oi.price_amount) as price_count,
+        min(oi.price_amount) as min_price,
+        max(oi.price_amount) as max_price,
+        sum(oi.shipping_amount) as shipping_sum,
+        count(oi.shipping_amount) as shipping_count,
+        sum(oi.total_amount) as total_sum,
+
+        -- order attributes
+        o.purchased_at,
+        o.review_score,
+        o.is_positive_review,
+        o.is_negative_review,
+        o.has_review_comment,
+        o.delivery_time_days,
+        o.delivery_variance_days,
+        o.is_delivered_on_time,
+        o._loaded_at
+
+    from {{ order_items }} oi
+    inner join {{ orders_with_items }} o
+        on oi.order_id = o.order_id
+    group by
+        oi.order_id,
+        oi.product_id,
+        o.purchased_at,
+        o.review_score,
+        o.is_positive_review,
+        o.is_negative_review,
+        o.has_review_comment,
+        o.delivery_time_days,
+        o.delivery_variance_days,
+        o.is_delivered_on_time,
+        o._loaded_at
+{% endmacro %}
+
+{#
+    The months each product was ordered in, one row per order and product,
+    with the `_loaded_at` of the order's int_orders_with_items row: what
+    int_product_monthly_sketches records to find the months a changed order
+    was sketched in.
+#}
+{% macro order_product_months(order_items, orders_with_items) %}
+    select distinct
+        oi.order_id,
+        oi.product_id,
+        date_trunc('month', o.purchased_at) as purchase_month,
+        o._loaded_at
+    from {{ order_items }} oi
+    inner join {{ orders_with_items }} o
+        on oi.order_id = o.order_id
+{% endmacro %}
+
+{% macro seller_order_totals(order_sellers, sign='1') %}
+    select
+        seller_id,
+
+        -- order counts (one order_sellers row per order and seller)
+        sum({{ sign }}) as total_orders,
+        sum(case when order_status = 'delivered' then {{ sign }} else 0 end) as delivered_orders,
+        sum(case when order_status = 'canceled' then {{ sign }} else 0 end) as canceled_orders,
+
+        -- financial totals
+        coalesce(sum({{ sign }} * item_count), 0) as items_sold,
+        coalesce(sum({{ sign }} * item_revenue), 0) as total_gmv,
+        coalesce(sum({{ sign }} * freight_amount), 0) as total_shipping_collected,
+
+        -- review totals
+        coalesce(sum({{ sign }} * review_score), 0) as review_score_sum,
+        sum(case when review_score is not null then {{ sign }} else 0 end) as review_count,
+        sum(case when is_positive_review then {{ sign }} else 0 end) as positive_reviews,
+        sum(case when is_negative_review then {{ sign }} else 0 end) as negative_reviews,
+
+        -- delivery totals
+        coalesce(sum({{ sign }} * delivery_time_days::numeric), 0) as delivery_time_days_sum,
+        sum(case when delivery_time_days is not null then {{ sign }} else 0 end) as delivery_time_days_count,
+        sum(case when is_delivered_on_time then {{ sign }} else 0 end) as on_time_deliveries,
+        sum(case when not is_delivered_on_time then {{ sign }} else 0 end) as late_deliveries,
+
+        -- timestamps (see recompute_bounds() for retracted rows)
+        min(purchased_at) as first_order_at,
+        max(purchased_at) as last_order_at
+
+    from {{ order_sellers }}
+    group by seller_id
+{% endmacro %}
+
+{% macro product_order_totals(order_products, sign='1') %}
+    select
+        product_id,
+
+        -- order counts (one order_products row per order and product)
+        sum({{ sign }}) as total_orders,
+        coalesce(sum({{ sign }} * order_item_id_sum), 0) as total_items_sold,
+
+        -- price totals
+        coalesce(sum({{ sign }} * price_sum), 0) as total_revenue,
+        coalesce(sum({{ sign }} * price_sum_squares), 0) as price_sum_squares,
+        sum({{ sign }} * price_count)::bigint as price_count,
+        min(min_price) as min_price,
+        max(max_price) as max_price,
+        coalesce(sum({{ sign }} * shipping_sum), 0) as total_shipping_revenue,
+        sum({{ sign }} * shipping_count)::bigint as shipping_count,
+        coalesce(sum({{ sign }} * total_sum), 0) as total_gmv,
+
+        -- review totals (per item, as the product metrics have always been)
+        coalesce(sum({{ sign }} * item_count * review_score), 0) as review_score_sum,
+        sum(case when review_score is not null then {{ sign }} * item_count else 0 end)::bigint as review_count,
+        sum(case when is_positive_review then {{ sign }} * item_count else 0 end)::bigint as positive_reviews,
+        sum(case when is_negative_review then {{ sign }} * item_count else 0 end)::bigint as negative_reviews,
+        sum(case when has_review_comment then {{ sign }} * item_count else 0 end)::bigint as reviews_with_comments,
+
+        -- delivery totals
+        coalesce(sum({{ sign }} * item_count * delivery_time_days::numeric), 0) as delivery_time_days_sum,
+        sum(case when delivery_time_days is not null then {{ sign }} * item_count else 0 end)::bigint as delivery_time_days_count,
+        coalesce(sum({{ sign }} * item_count * delivery_variance_days::numeric), 0) as delivery_variance_days_sum,
+        sum(case when delivery_variance_days is not null then {{ sign }} * item_count else 0 end)::bigint as delivery_variance_days_count,
+        sum(case when is_delivered_on_time then {{ sign }} * item_count else 0 end)::bigint as on_time_deliveries,
+        sum(case when not is_delivered_on_time then {{ sign }} * item_count else 0 end)::bigint as late_deliveries,
+
+        -- timestamps (see recompute_bounds() for retracted rows)
+        min(purchased_at) as first_ordered_at,
+        max(purchased_at) as last_ordered_at
+
+    from {{ order_products }}
+    group by product_id
+{% endmacro %}
@@ -0,0 +1,230 @@
+/*
+Mergeable sketches for incremental distinct counts and percentiles.
+
+Distinct counts and percentiles cannot be added up across incremental runs,
+so models keep a sketch of them per entity and month. A sketch cannot take
+an order back out, so an incremental run re-sketches in full the months of
+the orders it picks up (new or changed, see delta_rows() in
+macros/delta_merge.sql), which keeps the rescan to a month per entity.
+Entity totals merge the monthly sketches, and the count or percentile is
+read off the merge:
+
+    {{ hll_sketch('customer_id') }}                      -- aggregate: text -> sketch
+    {{ hll_union('current.customers_hll', 'new.customers_hll') }}
+    {{ hll_count(hll_union_agg('customers_hll')) }}      -- approximate count(distinct)
+
+    {{ quantile_sketch('delivery_time_days') }}          -- aggregate: float -> sketch
+    {{ quantile(quantile_union_agg('delivery_days_sketch'), 0.9) }}
+
+Merging is exact: the merge of two sketches is the sketch of the combined
+rows, whatever the order and grouping of the merges. The sketches are plain
+SQL functions (created by the on-run-start hook in the target schema), so
+they need no extension on a stock Postgres 14+.
+
+HyperLogLog (hll_*), after HyperLogLog++: an int[] of registers from the
+64-bit hashtextextended hash, each register index * 64 + rank. Up to 8,192
+entries a sketch is sparse, with 2^25 fine-grained registers, and counts
+come from linear counting over them: exact in practice for the few thousand
+customers of a seller (collisions are rare at 2^25). Beyond that it folds
+into 2^14 dense registers (stored negated), with a relative standard error
+of 1.04 / sqrt(2^14) = 0.81%; linear counting is used up to 40,960 values.
+Ranks use the full hash, so there is no large-range correction.
+
+Quantiles (quantile_*): a DDSketch, i.e. a histogram of logarithmic bins
+with gamma = (1 + a) / (1 - a) for a = 1% relative accuracy, stored as a
+bigint[] of the non-empty bins, each (bin + 32768) << 40 | count.
+quantile(sketch, q) returns the rank-ceil(q * n) value (the same value as
+percentile_disc(q)) within 1% relative error. Values <= 1e-9 count as 0, so
+it is meant for non-negative measures such as durations.
+*/
+
+{% macro create_sketch_functions(schema=target.schema) %}
+    create schema if not exists {{ schema }};
+
+    -- plpgsql, unlike a nested SQL function, keeps its query plans between calls
+    create or replace function {{ schema }}.hll_compact(registers integer[]) returns integer[]
+    language plpgsql immutable parallel safe as $$
+    begin
+        if coalesce(cardinality(registers), 0) < 2 then
+            return coalesce(registers, '{}');
+        end if;
+
+        if not (
+            select coalesce(bool_or(r < 0) or count(distinct r >> 6) > 8192, false)
+            from unnest(registers) as r
+        ) then
+            -- sparse: the index is in the high bits, so the max per index is
+            -- the max rank
+            return array(
+                select max(r) from unnest(registers) as r group by r >> 6 order by 1
+            );
+        end if;
+
+        -- dense: the top 14 index bits are the register, and the rank
+        -- continues into the 11 index bits below them
+        return array(
+            select -max(dense_register)
+            from (
+                select case
+                    when r < 0 then -r
+                    else ((r >> 17) << 6) | case
+                        when (r >> 6) & 2047 > 0
+                        then position(B'1' in ((r >> 6) & 2047)::bit(11))
+                        else 11 + (r & 63)
+                    end
+                end as dense_register
+                from unnest(registers) as r
+            ) as dense_entries
+            group by dense_register >> 6
+            order by 1
+        );
+    end
+    $$;
+
+    create or replace function {{ schema }}.hll_sketch(vals text[]) returns integer[]
+    language sql immutable parallel safe as $$
+        select {{ schema }}.hll_compact(array_agg(
+            (substring(h from 1 for 25)::integer << 6)
+            | coalesce(nullif(position(B'1' in substring(h from 26)), 0), 40)
+        ))
+        from (
+            select hashtextextended(v, 0)::bit(64) as h
+            from unnest(vals) as v
+            where v is not null
+        ) as hashed
+    $$;
+
+    create or replace function {{ schema }}.hll_union(a integer[], b integer[]) returns integer[]
+    language sql immutable parallel safe as $$
+        select {{ schema }}.hll_compact(coalesce(a, '{}') || coalesce(b, '{}'))
+    $$;
+
+    -- The merge aggregates concatenate the sketches and compact them once at
+    -- the end, which suits merging the few monthly sketches of an entity
+    create or replace aggregate {{ schema }}.hll_union_agg(integer[]) (
+        sfunc = array_cat,
+        stype = integer[],
+        combinefunc = array_cat,
+        finalfunc = {{ schema }}.hll_compact,
+        initcond = '{}',
+        parallel = safe
+    );
+
+    create or replace function {{ schema }}.hll_cardinality(sketch integer[]) returns bigint
+    language sql immutable parallel safe as $$
+        select round(case
+            -- sparse: linear counting over the 2^25 fine-grained registers
+            when not is_dense then 33554432 * ln(33554432::float8 / (33554432 - registers))
+            when raw_estimate <= 2.5 * 16384 and registers < 16384
+            then 16384 * ln(16384::float8 / (16384 - registers))
+            else raw_estimate
+        end)::bigint
+        from (
+            select
+                bool_or(r < 0) as is_dense,
+                count(r) as registers,
+                0.7213 / (1 + 1.079 / 16384) * 16384 * 16384
+                    / (16384 - count(r) + coalesce(sum(power(2::float8, -(-r & 63))), 0)) as raw_estimate
+            from unnest(coalesce(sketch, '{}')) as r
+        ) as registers
+    $$;
+
+    create or replace function {{ schema }}.quantile_sketch(vals double precision[]) returns bigint[]
+    language sql immutable parallel safe as $$
+        select coalesce(array_agg((bin::bigint << 40) | n order by bin), '{}')
+        from (
+            -- bin k + 32768 holds (gamma^(k-1), gamma^k]; bin 0 holds the zeros
+            select
+                case
+                    when v > 1e-9 then ceil(ln(v) / ln(1.01::float8 / 0.99))::integer + 32768
+                    else 0
+                end as bin,
+                count(*) as n
+            from unnest(vals) as v
+            where v is not null
+            group by 1
+        ) as bins
+    $$;
+
+    create or replace function {{ schema }}.quantile_compact(bins bigint[]) returns bigint[]
+    language sql immutable parallel safe as $$
+        select coalesce(array_agg(bin | n order by bin), '{}')
+        from (
+            select b >> 40 << 40 as bin, sum(b & 1099511627775)::bigint as n
+            from unnest(bins) as b
+            group by 1
+        ) as merged
+    $$;
+
+    create or replace function {{ schema }}.quantile_union(a bigint[], b bigint[]) returns bigint[]
+    language sql immutable parallel safe as $$
+        select {{ schema }}.quantile_compact(coalesce(a, '{}') || coalesce(b, '{}'))
+    $$;
+
+    create or replace aggregate {{ schema }}.quantile_union_agg(bigint[]) (
+        sfunc = array_cat,
+        stype = bigint[],
+        combinefunc = array_cat,
+        finalfunc = {{ schema }}.quantile_compact,
+        initcond = '{}',
+        parallel = safe
+    );
+
+    create or replace function {{ schema }}.quantile_value(sketch bigint[], q double precision)
+    returns double precision
+    language sql immutable parallel safe as $$
+        select case
+            when bin = 0 then 0
+            -- the point of (gamma^(k-1), gamma^k] with relative error <= 1%
+            else 0.99 * power(1.01::float8 / 0.99, bin - 32768)
+        end
+        from (
+            select
+                b >> 40 as bin,
+                sum(b & 1099511627775) over (order by b) as running_count,
+                sum(b & 1099511627775) over () as total_count
+            from unnest(sketch) as b
+        ) as bins
+        where running_count >= greatest(ceil(q * total_count), 1)
+        order by bin
+        limit 1
+    $$;
+{% endmacro %}
+
+{% macro install_sketch_functions() %}
+    {% if execute and flags.WHICH in ('run', 'build') %}
+        {{ create_sketch_functions() }}
+    {% endif %}
+{% endmacro %}
+
+{% macro hll_sketch(expression) -%}
+    {{ target.schema }}.hll_sketch(array_agg(({{ expression }})::text))
+{%- endmacro %}
+
+{% macro hll_union(a, b) -%}
+    {{ target.schema }}.hll_union({{ a }}, {{ b }})
+{%- endmacro %}
+
+{% macro hll_union_agg(sketch) -%}
+    {{ target.schema }}.hll_union_agg({{ sketch }})
+{%- endmacro %}
+
+{% macro hll_count(sketch) -%}
+    {{ target.schema }}.hll_cardinality({{ sketch }})
+{%- endmacro %}
+
+{% macro quantile_sketch(expression) -%}
+    {{ target.schema }}.quantile_sketch(array_agg(({{ expression }})::double precision))
+{%- endmacro %}
+
+{% macro quantile_union(a, b) -%}
+    {{ target.schema }}.quantile_union({{ a }}, {{ b }})
+{%- endmacro %}
+
+{% macro quantile_union_agg(sketch) -%}
+    {{ target.schema }}.quantile_union_agg({{ sketch }})
+{%- endmacro %}
+
+{% macro quantile(sketch, q) -%}
+    {{ target.schema }}.quantile_value({{ sketch }}, {{ q }})
+{%- endmacro %}
@@ -0,0 +1,88 @@
+/*
+Incremental staging models.
+
+Staging models are tables keyed on the source's natural ids, so downstream
+models read typed, indexed rows instead of re-running every cast and derived
+column of a view. Each row records in `_source_hash` a 64-bit hash of the
+source row it was built from (hash_record_extended, Postgres 14+, which hashes
+the values without rendering the row as text). An incremental run only
+rebuilds the keys that have a source row whose hash is not in the model yet
+(new or changed rows), and replaces them by unique_key:
+
+    select * from {{ source('olist', 'orders') }}
+    {{ changed_source_rows(source('olist', 'orders'), ['order_id']) }}
+
+and a post-hook deletes the rows whose key is gone from the source:
+
+    "{{ delete_removed_source_rows(source('olist', 'orders'), {'order_id': 'order_id'}) }}"
+
+Models that tests check incrementally, or whose changes downstream models
+pick up, also record in `_loaded_at` when a row was last (re)built, i.e. when
+its source row was added or changed (see macros/test_watermarks.sql). A
+downstream incremental model records `_loaded_at` as well and reprocesses
+the rows loaded since its own latest one:
+
+    where _loaded_at > {{ loaded_at_watermark() }}
+
+so an order delivered, canceled or reviewed after it was first loaded
+reaches the models built from it, not only new orders.
+
+The loader replaces source tables wholesale, so physical markers such as xmin
+change on every reload even when the content does not; content hashes only
+change with the content.
+*/
+
+{% macro source_row_hash(alias) -%}
+    hash_record_extended({{ alias }}, 0)
+{%- endmacro %}
+
+{#
+    Order-independent fingerprint of a group of source rows, for models that
+    keep one row per group (e.g. the geolocation dedupe): the sum of the row
+    hashes, which needs no sort.
+#}
+{% macro source_rows_fingerprint(alias) -%}
+    sum({{ source_row_hash(alias) }})
+{%- endmacro %}
+
+{% macro changed_source_rows(relation, key_columns) -%}
+    {%- if is_incremental() %}
+    where ({{ key_columns | join(', ') }}) in (
+        select {{ key_columns | join(', ') }}
+        from {{ relation }} as changed_row
+        where not exists (
+            select 1
+            from {{ this }} as current_row
+            where current_row._source_hash = {{ source_row_hash('changed_row') }}
+        )
+    )
+    {%- endif %}
+{%- endmacro %}
+
+{#
+    The latest `_loaded_at` of the model being built, i.e. when its last run
+    started, so inputs loaded after it are the ones it has not seen yet.
+    -infinity while the model has no `_loaded_at` column (built before it
+    had one): that run reprocesses every row and adds the column.
+#}
+{% macro loaded_at_watermark() -%}
+    {%- set column_names = adapter.get_columns_in_relation(this) | map(attribute='name') | list if execute else [] -%}
+    {%- if '_loaded_at' in column_names -%}
+        (select coalesce(max(_loaded_at), '-infinity'::timestamptz) from {{ this }})
+    {%- else -%}
+        '-infinity'::timestamptz
+    {%- endif -%}
+{%- endmacro %}
+
+{% macro delete_removed_source_rows(relation, keys) -%}
+    delete from {{ this }} as model_row
+    where not exists (
+        select 1
+        from {{ relation }} as source_row
+        where
+        {%- for source_column, model_column in keys.items() %}
+            {% if not loop.first %}and {% endif -%}
+            source_row.{{ source_column }} = model_row.{{ model_column }}
+        {%- endfor %}
+    )
+{%- endmacro %}
@@ -0,0 +1,96 @@
+/*
+Watermarks for the incremental singular tests.
+
+Singular tests listed in the `watermarked_tests` var can restrict themselves to
+the staging rows loaded or changed since the last successful run of that test:
+
+    where {{ changed_since_watermark('order_data_quality') }}
+
+The staging models in `watermarked_models` record in `_loaded_at` when a row
+was last rebuilt, which happens when its source row is new or its content
+changed (see macros/staging_incremental.sql). An order delivered after
+purchase, or items and payments that arrive late, are therefore checked again.
+
+With `--vars '{test_mode: incremental}'` the filter compares against the stored
+watermark; in the default full mode, or before a test first passed, every row
+is checked. Rows without `_loaded_at` (built before the column existed) are
+always checked. Rows deleted from a source are only caught by full runs.
+
+on-run-start records the latest `_loaded_at` of those models as the pending
+watermark of each test, and on-run-end promotes it to the watermark of the
+tests that passed, so rows loaded while the tests run are checked next time.
+*/
+
+{% macro test_watermark_table() -%}
+    {{ target.schema }}.dbt_test_watermarks
+{%- endmacro %}
+
+{% macro test_watermark(test_name) -%}
+    {%- if var('test_mode', 'full') == 'incremental' -%}
+        (select max(watermark)
+         from {{ test_watermark_table() }}
+         where test_name = '{{ test_name }}')
+    {%- else -%}
+        '-infinity'::timestamptz
+    {%- endif -%}
+{%- endmacro %}
+
+{% macro changed_since_watermark(test_name, column='_loaded_at') -%}
+    coalesce({{ column }} > {{ test_watermark(test_name) }}, true)
+{%- endmacro %}
+
+{% macro start_test_watermarks() %}
+    {% if execute and flags.WHICH in ('test', 'build') %}
+        create table if not exists {{ test_watermark_table() }} (
+            test_name text primary key,
+            watermark timestamptz,
+            pending_watermark timestamptz,
+            last_mode text,
+            last_passed_at timestamptz
+        );
+        {# ref() cannot be used in hooks, so look the relations up in the graph #}
+        {% set relations = [] %}
+        {% for model_name in var('watermarked_models', []) %}
+            {% set node = graph.nodes.values()
+                | selectattr('resource_type', 'equalto', 'model')
+                | selectattr('name', 'equalto', model_name)
+                | first %}
+            {% set relation = adapter.get_relation(
+                database=node.database,
+                schema=node.schema,
+                identifier=node.alias) if node else none %}
+            {% if relation is not none %}
+                {% do relations.append(relation) %}
+            {% endif %}
+        {% endfor %}
+        {% if relations and relations | length == var('watermarked_models') | length %}
+            {% for test_name in var('watermarked_tests', []) %}
+                insert into {{ test_watermark_table() }} (test_name, pending_watermark)
+                select '{{ test_name }}', greatest(
+                    {%- for relation in relations %}
+                    (select max(_loaded_at) from {{ relation }}){% if not loop.last %},{% endif %}
+                    {%- endfor %}
+                )
+                on conflict (test_name) do update
+                set pending_watermark = excluded.pending_watermark;
+            {% endfor %}
+        {% endif %}
+    {% endif %}
+{% endmacro %}
+
+{% macro finish_test_watermarks(results) %}
+    {% if execute and flags.WHICH in ('test', 'build') %}
+        {% for result in results %}
+            {% if result.node is defined
+                and result.node.resource_type == 'test'
+                and result.node.name in var('watermarked_tests', [])
+                and result.status == 'pass' %}
+                update {{ test_watermark_table() }}
+                set watermark = pending_watermark,
+                    last_mode = '{{ var("test_mode", "full") }}',
+                    last_passed_at = now()
+                where test_name = '{{ result.node.name }}';
+            {% endif %}
+        {% endfor %}
+    {% endif %}
+{% endmacro %}
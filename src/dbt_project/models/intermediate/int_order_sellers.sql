@@ -0,0 +1,60 @@
+{{
+    config(
+        materialized='incremental',
+        unique_key='order_id',
+        on_schema_change='sync_all_columns',
+        post_hook=[
+            "CREATE INDEX IF NOT EXISTS {{ this.name }}_order_id_seller_id_idx ON {{ this }} (order_id, seller_id)",
+            "CREATE INDEX IF NOT EXISTS {{ this.name }}_seller_id_idx ON {{ this }} (seller_id)",
+            "CREATE INDEX IF NOT EXISTS {{ this.name }}_purchased_at_idx ON {{ this }} (purchased_at)",
+            "CREATE INDEX IF NOT EXISTS {{ this.name }}_loaded_at_idx ON {{ this }} (_loaded_at)"
+        ]
+    )
+}}
+
+-- One row per (order_id, seller_id): the items a seller shipped in an order,
+-- pre-aggregated, with the order-level attributes copied once. Seller models
+-- sum these rows instead of joining items to orders and undoing the fan-out
+-- of multi-item orders with count(distinct ...).
+
+with orders_with_items as (
+
+    select * from {{ ref('int_orders_with_items') }}
+    {% if is_incremental() %}
+    -- Only fetch the orders rebuilt since last run: new orders, and orders
+    -- with a changed status, delivery, item or review. Their rows replace
+    -- all of the order's previous rows (unique_key), sellers included
+    where _loaded_at > {{ loaded_at_watermark() }}
+    {% endif %}
+
+),
+
+orders as (
+
+    select * from {{ ref('stg_olist__orders') }}
+    {% if is_incremental() %}
+    where order_id in (select order_id from orders_with_items)
+    {% endif %}
+
+),
+
+order_items as (
+
+    select * from {{ ref('stg_olist__order_items') }}
+    {% if is_incremental() %}
+    where order_id in (select order_id from orders_with_items)
+    {% endif %}
+
+),
+
+order_sellers as (
+
+    {{ order_sellers('orders', 'order_items', 'orders_with_items') }}
+
+)
+
+select
+    *,
+    -- change tracking
+    now() as _loaded_at
+from order_sellers
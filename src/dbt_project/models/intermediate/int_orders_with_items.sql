@@ -8,17 +8,32 @@
             "CREATE INDEX IF NOT EXISTS {{ this.name }}_customer_id_idx ON {{ this }} (customer_id)",
             "CREATE INDEX IF NOT EXISTS {{ this.name }}_purchased_at_idx ON {{ this }} (purchased_at)",
             "CREATE INDEX IF NOT EXISTS {{ this.name }}_order_status_idx ON {{ this }} (order_status)",
-            "CREATE INDEX IF NOT EXISTS {{ this.name }}_is_delivered_idx ON {{ this }} (is_delivered)"
+            "CREATE INDEX IF NOT EXISTS {{ this.name }}_is_delivered_idx ON {{ this }} (is_delivered)",
+            "CREATE INDEX IF NOT EXISTS {{ this.name }}_loaded_at_idx ON {{ this }} (_loaded_at)"
         ]
     )
 }}
 
+{% if is_incremental() %}
+{% set watermark = loaded_at_watermark() %}
+{% endif %}
+
 with orders as (
 
     select * from {{ ref('stg_olist__orders') }}
     {% if is_incremental() %}
-    -- Only fetch new orders since last run
-    where purchased_at > (select coalesce(max(purchased_at), '2000-01-01'::timestamp) from {{ this }})
+    -- Rebuild the orders with a row loaded (new or changed) since the last
+    -- run: new orders, and orders since delivered, canceled or reviewed
+    -- (see macros/staging_incremental.sql)
+    where order_id in (
+        select order_id from {{ ref('stg_olist__orders') }} where _loaded_at > {{ watermark }}
+        union
+        select order_id from {{ ref('stg_olist__order_items') }} where _loaded_at > {{ watermark }}
+        union
+        select order_id from {{ ref('stg_olist__order_payments') }} where _loaded_at > {{ watermark }}
+        union
+        select order_id from {{ ref('stg_olist__order_reviews') }} where _loaded_at > {{ watermark }}
+    )
     {% endif %}
 
 ),
@@ -27,7 +42,7 @@ order_items as (
 
     select * from {{ ref('stg_olist__order_items') }}
     {% if is_incremental() %}
-    -- Only include order items for new orders
+    -- Only include order items of the rebuilt orders
     where order_id in (select order_id from orders)
     {% endif %}
 
@@ -37,7 +52,7 @@ order_payments as (
 
     select * from {{ ref('stg_olist__order_payments') }}
     {% if is_incremental() %}
-    -- Only include payments for new orders
+    -- Only include payments of the rebuilt orders
     where order_id in (select order_id from orders)
     {% endif %}
 
@@ -47,7 +62,7 @@ order_reviews as (
 
     select * from {{ ref('stg_olist__order_reviews') }}
     {% if is_incremental() %}
-    -- Only include reviews for new orders
+    -- Only include reviews of the rebuilt orders
     where order_id in (select order_id from orders)
     {% endif %}
 
@@ -178,7 +193,10 @@ final as (
         o.order_status = 'processing' as is_processing,
         o.order_status = 'created' as is_created,
         o.order_status = 'approved' as is_approved,
-        o.is_delivered_on_time
+        o.is_delivered_on_time,
+
+        -- change tracking
+        now() as _loaded_at
 
     from orders o
     left join order_items_agg i
@@ -0,0 +1,64 @@
+{{
+    config(
+        materialized='incremental',
+        unique_key=['product_id', 'purchase_month'],
+        on_schema_change='sync_all_columns',
+        post_hook=[
+            "{{ record_merged_rows(order_product_months(ref('stg_olist__order_items'), ref('int_orders_with_items'))) }}",
+            "DELETE FROM {{ this }} WHERE item_count = 0",
+            "CREATE INDEX IF NOT EXISTS {{ this.name }}_product_id_purchase_month_idx ON {{ this }} (product_id, purchase_month)",
+            "CREATE INDEX IF NOT EXISTS {{ this.name }}_last_order_at_idx ON {{ this }} (last_order_at)"
+        ]
+    )
+}}
+
+-- Mergeable state of each product's distinct customers and sellers per month
+-- (see macros/sketches.sql). Sketches cannot take back an order, so an
+-- incremental run re-sketches the months of the orders loaded (new or
+-- changed) since the last run in full: the months their items are in now,
+-- and those they were in when last sketched (see delta_rows()).
+
+with orders as (
+
+    select * from {{ ref('stg_olist__orders') }}
+
+),
+
+order_items as (
+
+    select * from {{ ref('stg_olist__order_items') }}
+
+),
+
+order_product_months as (
+
+    {{ delta_rows(order_product_months(ref('stg_olist__order_items'), ref('int_orders_with_items'))) }}
+
+),
+
+changed_months as (
+
+    select distinct product_id, purchase_month
+    from order_product_months
+
+)
+
+-- A month whose last item left it has no rows; the post-hook deletes it
+select
+    m.product_id,
+    m.purchase_month,
+    count(oi.order_id) as item_count,
+    max(o.purchased_at) as last_order_at,
+    {{ hll_sketch('o.customer_id') }} as customers_hll,
+    {{ hll_sketch('oi.seller_id') }} as sellers_hll,
+    -- change tracking
+    now() as _loaded_at
+from changed_months m
+left join (
+    order_items oi
+    inner join orders o
+        on oi.order_id = o.order_id
+)
+    on oi.product_id = m.product_id
+    and date_trunc('month', o.purchased_at) = m.purchase_month
+group by 1, 2
@@ -0,0 +1,43 @@
+{{
+    config(
+        materialized='incremental',
+        incremental_strategy='delta_merge',
+        unique_key='product_id',
+        delta_merge={
+            'min': ['min_price', 'first_ordered_at'],
+            'max': ['max_price', 'last_ordered_at'],
+            'replace': ['_loaded_at']
+        },
+        on_schema_change='sync_all_columns',
+        post_hook=[
+            "{{ record_merged_rows(order_products(ref('stg_olist__order_items'), ref('int_orders_with_items'))) }}",
+            "{{ recompute_bounds('product_id', {'min_price': 'min(min_price)', 'max_price': 'max(max_price)', 'first_ordered_at': 'min(purchased_at)', 'last_ordered_at': 'max(purchased_at)'}) }}",
+            "DELETE FROM {{ this }} WHERE total_orders = 0",
+            "CREATE INDEX IF NOT EXISTS {{ this.name }}_loaded_at_idx ON {{ this }} (_loaded_at)"
+        ]
+    )
+}}
+
+-- Running order totals per product. An incremental run takes the items of
+-- the orders loaded (new or changed) since the last run, and adds their
+-- current contribution less the one merged before to the stored totals (see
+-- macros/delta_merge.sql); int_product_performance derives its averages and
+-- price deviation from these totals.
+
+with order_products as (
+
+    {{ delta_rows(order_products(ref('stg_olist__order_items'), ref('int_orders_with_items'))) }}
+
+),
+
+totals as (
+
+    {{ product_order_totals('order_products', sign='sign') }}
+
+)
+
+select
+    *,
+    -- change tracking
+    now() as _loaded_at
+from totals
@@ -2,7 +2,10 @@
     config(
         materialized='incremental',
         unique_key='product_id',
-        on_schema_change='sync_all_columns'
+        on_schema_change='sync_all_columns',
+        post_hook=[
+            "{{ refresh_recency_segments('last_ordered_at', 'first_ordered_at', segment=false) }}"
+        ]
     )
 }}
 
@@ -18,31 +21,18 @@ categories as (
 
 ),
 
-orders_with_items as (
+product_totals as (
 
-    select * from {{ ref('int_orders_with_items') }}
-    {% if is_incremental() %}
-    -- Only fetch new orders or updated orders since last run
-    where purchased_at > (select coalesce(max(last_ordered_at), '2000-01-01'::timestamp) from {{ this }})
-    {% endif %}
-
-),
-
-order_items as (
-
-    select * from {{ ref('stg_olist__order_items') }}
-    {% if is_incremental() %}
-    -- Only include order items for new orders
-    where order_id in (select order_id from orders_with_items)
-    {% endif %}
+    select * from {{ ref('int_product_order_totals') }}
 
 ),
 
 modified_products as (
     {% if is_incremental() %}
-    -- Get products with new orders
-    select distinct oi.product_id
-    from order_items oi
+    -- Get products whose totals took new or changed orders since last run
+    select product_id
+    from product_totals
+    where _loaded_at > {{ loaded_at_watermark() }}
     {% else %}
     -- For full refresh, include all products
     select distinct product_id
@@ -50,8 +40,27 @@ modified_products as (
     {% endif %}
 ),
 
+product_sketches as (
+
+    -- distinct counts merged from the monthly sketches (approximate, see
+    -- macros/sketches.sql)
+    select
+        product_id,
+        {{ hll_count(hll_union_agg('customers_hll')) }} as unique_customers,
+        {{ hll_count(hll_union_agg('sellers_hll')) }} as unique_sellers,
+        count(*) as active_months
+    from {{ ref('int_product_monthly_sketches') }}
+    {% if is_incremental() %}
+    where product_id in (select product_id from modified_products)
+    {% endif %}
+    group by 1
+
+),
+
 product_orders as (
 
+    -- averages and the price deviation derived from the running totals, so
+    -- an incremental run reads one totals row per modified product
     select
         -- product keys and attributes
         p.product_id,
@@ -69,55 +78,62 @@ product_orders as (
         p.is_missing_dimensions,
 
         -- order counts
-        count(distinct oi.order_id) as total_orders,
-        count(distinct o.customer_id) as unique_customers,
-        count(distinct oi.seller_id) as unique_sellers,
+        coalesce(t.total_orders, 0) as total_orders,
+        coalesce(ps.unique_customers, 0) as unique_customers,
+        coalesce(ps.unique_sellers, 0) as unique_sellers,
 
         -- financial metrics
-        sum(oi.price_amount) as total_revenue,
-        sum(oi.shipping_amount) as total_shipping_revenue,
-        sum(oi.total_amount) as total_gmv,
-        min(oi.price_amount) as min_price,
-        max(oi.price_amount) as max_price,
-        stddev(oi.price_amount) as price_variance,
-        avg(oi.price_amount) as avg_price,
-        avg(oi.shipping_amount) as avg_shipping_fee,
+        t.total_revenue,
+        t.total_shipping_revenue,
+        t.total_gmv,
+        t.min_price,
+        t.max_price,
+        -- sample standard deviation, as stddev() computes it
+        case
+            when t.price_count > 1
+            then sqrt(
+                (t.price_count * t.price_sum_squares - t.total_revenue * t.total_revenue)
+                / (t.price_count * (t.price_count - 1))
+            )
+        end as price_variance,
+        t.total_revenue / nullif(t.price_count, 0) as avg_price,
+        t.total_shipping_revenue / nullif(t.shipping_count, 0) as avg_shipping_fee,
 
         -- review metrics
-        avg(o.review_score) as avg_review_score,
-        count(case when o.is_positive_review then 1 end) as positive_reviews,
-        count(case when o.is_negative_review then 1 end) as negative_reviews,
-        count(case when o.has_review_comment then 1 end) as reviews_with_comments,
-        count(case when o.review_score is not null then 1 end) as review_count,
+        t.review_score_sum / nullif(t.review_count, 0) as avg_review_score,
+        coalesce(t.positive_reviews, 0) as positive_reviews,
+        coalesce(t.negative_reviews, 0) as negative_reviews,
+        coalesce(t.reviews_with_comments, 0) as reviews_with_comments,
+        coalesce(t.review_count, 0) as review_count,
 
         -- delivery metrics
-        avg(o.delivery_time_days) as avg_delivery_time_days,
-        avg(o.delivery_variance_days) as avg_delivery_variance_days,
-        sum(case when o.is_delivered_on_time then 1 else 0 end) as on_time_deliveries,
-        sum(case when not o.is_delivered_on_time then 1 else 0 end) as late_deliveries,
+        (t.delivery_time_days_sum / nullif(t.delivery_time_days_count, 0))::double precision as avg_delivery_time_days,
+        (t.delivery_variance_days_sum / nullif(t.delivery_variance_days_count, 0))::double precision as avg_delivery_variance_days,
+        coalesce(t.on_time_deliveries, 0) as on_time_deliveries,
+        coalesce(t.late_deliveries, 0) as late_deliveries,
 
         -- timestamps
-        min(o.purchased_at) as first_ordered_at,
-        max(o.purchased_at) as last_ordered_at,
+        t.first_ordered_at,
+        t.last_ordered_at,
 
         -- calculated fields
-        count(distinct date_trunc('month', o.purchased_at)) as active_months,
-        date_part('day', now() - min(o.purchased_at)) as days_since_first_order,
-        date_part('day', now() - max(o.purchased_at)) as days_since_last_order,
-        date_part('day', max(o.purchased_at) - min(o.purchased_at)) as product_lifetime_days,
-        sum(oi.order_item_id) as total_items_sold
+        coalesce(ps.active_months, 0) as active_months,
+        {{ days_since('t.first_ordered_at') }} as days_since_first_order,
+        {{ days_since('t.last_ordered_at') }} as days_since_last_order,
+        {{ as_of_date() }} as segmented_as_of,
+        date_part('day', t.last_ordered_at - t.first_ordered_at) as product_lifetime_days,
+        t.total_items_sold
 
     from products p
     left join categories c
         on p.category_id = c.category_id
-    left join order_items oi
-        on p.product_id = oi.product_id
-    left join orders_with_items o
-        on oi.order_id = o.order_id
+    left join product_totals t
+        on p.product_id = t.product_id
+    left join product_sketches ps
+        on p.product_id = ps.product_id
     {% if is_incremental() %}
     where p.product_id in (select product_id from modified_products)
     {% endif %}
-    group by 1, 2, 3, 4, 5, 6, 7, 8, 9, 10, 11, 12, 13
 
 ),
 
@@ -165,7 +181,10 @@ final as (
             when volume_cm3 >= 50000 then 'large'
             when volume_cm3 >= 10000 then 'medium'
             else 'small'
-        end as size_segment
+        end as size_segment,
+
+        -- change tracking
+        now() as _loaded_at
 
     from product_orders
 
@@ -0,0 +1,54 @@
+{{
+    config(
+        materialized='incremental',
+        unique_key=['seller_id', 'purchase_month'],
+        on_schema_change='sync_all_columns',
+        post_hook=[
+            "{{ record_merged_rows('select order_id, seller_id, purchase_month, _loaded_at from ' ~ ref('int_order_sellers')) }}",
+            "DELETE FROM {{ this }} WHERE order_count = 0",
+            "CREATE INDEX IF NOT EXISTS {{ this.name }}_seller_id_purchase_month_idx ON {{ this }} (seller_id, purchase_month)",
+            "CREATE INDEX IF NOT EXISTS {{ this.name }}_last_order_at_idx ON {{ this }} (last_order_at)"
+        ]
+    )
+}}
+
+-- Mergeable state of each seller's distinct customers and delivery times per
+-- month (see macros/sketches.sql). Sketches cannot take back an order, so an
+-- incremental run re-sketches the months of the orders loaded (new or
+-- changed) since the last run in full: the months their bridge rows are in
+-- now, and those they were in when last sketched (see delta_rows()).
+
+with order_sellers as (
+
+    select * from {{ ref('int_order_sellers') }}
+
+),
+
+order_seller_months as (
+
+    {{ delta_rows('select order_id, seller_id, purchase_month, _loaded_at from ' ~ ref('int_order_sellers')) }}
+
+),
+
+changed_months as (
+
+    select distinct seller_id, purchase_month
+    from order_seller_months
+
+)
+
+-- A month whose last order left it has no rows; the post-hook deletes it
+select
+    m.seller_id,
+    m.purchase_month,
+    count(os.order_id) as order_count,
+    max(os.purchased_at) as last_order_at,
+    {{ hll_sketch('os.customer_id') }} as customers_hll,
+    {{ quantile_sketch('os.delivery_time_days') }} as delivery_days_sketch,
+    -- change tracking
+    now() as _loaded_at
+from changed_months m
+left join order_sellers os
+    on os.seller_id = m.seller_id
+    and os.purchase_month = m.purchase_month
+group by 1, 2
@@ -0,0 +1,43 @@
+{{
+    config(
+        materialized='incremental',
+        incremental_strategy='delta_merge',
+        unique_key='seller_id',
+        delta_merge={
+            'min': ['first_order_at'],
+            'max': ['last_order_at'],
+            'replace': ['_loaded_at']
+        },
+        on_schema_change='sync_all_columns',
+        post_hook=[
+            "{{ record_merged_rows(ref('int_order_sellers')) }}",
+            "{{ recompute_bounds('seller_id', {'first_order_at': 'min(purchased_at)', 'last_order_at': 'max(purchased_at)'}) }}",
+            "DELETE FROM {{ this }} WHERE total_orders = 0",
+            "CREATE INDEX IF NOT EXISTS {{ this.name }}_loaded_at_idx ON {{ this }} (_loaded_at)"
+        ]
+    )
+}}
+
+-- Running order totals per seller. An incremental run takes the bridge rows
+-- of the orders loaded (new or changed) since the last run, and adds their
+-- current contribution less the one merged before to the stored totals (see
+-- macros/delta_merge.sql); int_seller_performance derives its averages and
+-- rates from these totals.
+
+with order_sellers as (
+
+    {{ delta_rows(ref('int_order_sellers')) }}
+
+),
+
+totals as (
+
+    {{ seller_order_totals('order_sellers', sign='sign') }}
+
+)
+
+select
+    *,
+    -- change tracking
+    now() as _loaded_at
+from totals
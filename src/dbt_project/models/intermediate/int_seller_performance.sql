@@ -12,31 +12,18 @@ with sellers as (
 
 ),
 
-orders_with_items as (
+seller_totals as (
 
-    select * from {{ ref('int_orders_with_items') }}
-    {% if is_incremental() %}
-    -- Only fetch new orders or updated orders since last run
-    where purchased_at > (select coalesce(max(last_order_at), '2000-01-01'::timestamp) from {{ this }})
-    {% endif %}
-
-),
-
-order_items as (
-
-    select * from {{ ref('stg_olist__order_items') }}
-    {% if is_incremental() %}
-    -- Only process order items for updated orders
-    where order_id in (select order_id from orders_with_items)
-    {% endif %}
+    select * from {{ ref('int_seller_order_totals') }}
 
 ),
 
 modified_sellers as (
     {% if is_incremental() %}
-    -- Get sellers who have new/updated orders
-    select distinct oi.seller_id
-    from order_items oi
+    -- Get sellers whose totals took new or changed orders since last run
+    select seller_id
+    from seller_totals
+    where _loaded_at > {{ loaded_at_watermark() }}
     {% else %}
     -- For full refresh, include all sellers
     select distinct seller_id
@@ -44,8 +31,28 @@ modified_sellers as (
     {% endif %}
 ),
 
+seller_sketches as (
+
+    -- distinct counts and percentiles merged from the monthly sketches
+    -- (approximate, see macros/sketches.sql)
+    select
+        seller_id,
+        {{ hll_count(hll_union_agg('customers_hll')) }} as unique_customers,
+        {{ quantile(quantile_union_agg('delivery_days_sketch'), 0.5) }} as delivery_time_p50_days,
+        {{ quantile(quantile_union_agg('delivery_days_sketch'), 0.9) }} as delivery_time_p90_days,
+        count(*) as active_months
+    from {{ ref('int_seller_monthly_sketches') }}
+    {% if is_incremental() %}
+    where seller_id in (select seller_id from modified_sellers)
+    {% endif %}
+    group by 1
+
+),
+
 seller_orders as (
 
+    -- averages and rates derived from the running totals, so an incremental
+    -- run reads one totals row per modified seller rather than its history
     select
         -- seller keys
         s.seller_id,
@@ -54,45 +61,46 @@ seller_orders as (
         s.state_normalized,
 
         -- order counts
-        count(distinct o.order_id) as total_orders,
-        sum(case when o.order_status = 'delivered' then 1 else 0 end) as delivered_orders,
-        sum(case when o.order_status = 'canceled' then 1 else 0 end) as canceled_orders,
+        coalesce(t.total_orders, 0) as total_orders,
+        coalesce(t.delivered_orders, 0) as delivered_orders,
+        coalesce(t.canceled_orders, 0) as canceled_orders,
 
         -- customers
-        count(distinct o.customer_id) as unique_customers,
+        coalesce(ss.unique_customers, 0) as unique_customers,
 
         -- financial metrics
-        sum(oi.price_amount) as total_gmv,
-        avg(oi.price_amount) as avg_order_item_value,
-        sum(oi.shipping_amount) as total_shipping_collected,
+        t.total_gmv,
+        t.total_gmv / nullif(t.items_sold, 0) as avg_order_item_value,
+        t.total_shipping_collected,
 
         -- review metrics
-        avg(o.review_score) as avg_review_score,
-        count(case when o.is_positive_review then 1 end) as positive_reviews,
-        count(case when o.is_negative_review then 1 end) as negative_reviews,
+        t.review_score_sum / nullif(t.review_count, 0) as avg_review_score,
+        coalesce(t.positive_reviews, 0) as positive_reviews,
+        coalesce(t.negative_reviews, 0) as negative_reviews,
 
         -- delivery metrics
-        avg(o.delivery_time_days) as avg_delivery_time_days,
-        sum(case when o.is_delivered_on_time then 1 else 0 end) as on_time_deliveries,
-        sum(case when not o.is_delivered_on_time then 1 else 0 end) as late_deliveries,
+        (t.delivery_time_days_sum / nullif(t.delivery_time_days_count, 0))::double precision as avg_delivery_time_days,
+        ss.delivery_time_p50_days,
+        ss.delivery_time_p90_days,
+        coalesce(t.on_time_deliveries, 0) as on_time_deliveries,
+        coalesce(t.late_deliveries, 0) as late_deliveries,
 
         -- timestamps
-        min(o.purchased_at) as first_order_at,
-        max(o.purchased_at) as last_order_at,
+        t.first_order_at,
+        t.last_order_at,
 
         -- calculated fields
-        count(distinct date_trunc('month', o.purchased_at)) as active_months,
-        date_part('day', max(o.purchased_at) - min(o.purchased_at)) as seller_lifetime_days
+        coalesce(ss.active_months, 0) as active_months,
+        date_part('day', t.last_order_at - t.first_order_at) as seller_lifetime_days
 
     from sellers s
-    left join order_items oi
-        on s.seller_id = oi.seller_id
-    left join orders_with_items o
-        on oi.order_id = o.order_id
+    left join seller_totals t
+        on s.seller_id = t.seller_id
+    left join seller_sketches ss
+        on s.seller_id = ss.seller_id
     {% if is_incremental() %}
     where s.seller_id in (select seller_id from modified_sellers)
     {% endif %}
-    group by 1, 2, 3, 4
 
 ),
 
@@ -133,7 +141,10 @@ final as (
             when cast(((on_time_deliveries::decimal / nullif(total_orders, 0)) * 100) as numeric(10,2)) >= 85 then 'good'
             when cast(((on_time_deliveries::decimal / nullif(total_orders, 0)) * 100) as numeric(10,2)) >= 70 then 'average'
             else 'poor'
-        end as delivery_segment
+        end as delivery_segment,
+
+        -- change tracking
+        now() as _loaded_at
 
     from seller_orders
 
@@ -4,6 +4,7 @@
         unique_key='customer_id',
         on_schema_change='sync_all_columns',
         post_hook=[
+            "{{ refresh_recency_segments() }}",
             "CREATE INDEX IF NOT EXISTS {{ this.name }}_customer_id_idx ON {{ this }} (customer_id)",
             "CREATE INDEX IF NOT EXISTS {{ this.name }}_customer_state_idx ON {{ this }} (customer_state)",
             "CREATE INDEX IF NOT EXISTS {{ this.name }}_customer_city_idx ON {{ this }} (customer_city)",
@@ -143,8 +144,9 @@ final as (
         o.last_order_date,
         coalesce(o.average_delivery_time_days, 0) as average_delivery_time_days,
         coalesce(o.average_delivery_variance_days, 0) as average_delivery_variance_days,
-        date_part('day', now() - o.first_order_date) as days_since_first_order,
-        date_part('day', now() - o.last_order_date) as days_since_last_order,
+        {{ days_since('o.first_order_date') }} as days_since_first_order,
+        {{ days_since('o.last_order_date') }} as days_since_last_order,
+        {{ as_of_date() }} as segmented_as_of,
 
         -- activity metrics
         coalesce(o.active_months, 0) as active_months,
@@ -155,14 +157,7 @@ final as (
             else false
         end as is_repeat_customer,
 
-        case
-            when o.last_order_date is null then 'no_orders'
-            when date_part('day', now() - o.last_order_date) <= 30 then 'active_30d'
-            when date_part('day', now() - o.last_order_date) <= 90 then 'active_90d'
-            when date_part('day', now() - o.last_order_date) <= 180 then 'active_180d'
-            when date_part('day', now() - o.last_order_date) <= 365 then 'active_365d'
-            else 'inactive'
-        end as recency_segment,
+        {{ recency_segment(days_since('o.last_order_date')) }} as recency_segment,
 
         case
             when o.total_orders >= 4 then 'high'
@@ -42,7 +42,7 @@ customer_segments as (
             else 0
         end as is_promoter,
         case
-            when last_order_at >= (current_date - interval '3 months') then 1
+            when last_order_at >= ({{ as_of_date() }} - interval '3 months') then 1
             else 0
         end as is_active
 
@@ -4,6 +4,7 @@
         unique_key='category_name',
         on_schema_change='sync_all_columns',
         post_hook=[
+            "{{ refresh_recency_segments('last_ordered_at', none) }}",
             "CREATE INDEX IF NOT EXISTS {{ this.name }}_category_name_idx ON {{ this }} (category_name)",
             "CREATE INDEX IF NOT EXISTS {{ this.name }}_total_orders_idx ON {{ this }} (total_orders)",
             "CREATE INDEX IF NOT EXISTS {{ this.name }}_total_revenue_idx ON {{ this }} (total_revenue)",
@@ -90,14 +91,9 @@ category_stats as (
         end as rating_segment,
 
         -- recency metrics
-        date_part('day', now() - last_ordered_at) as days_since_last_order,
-
-        case
-            when date_part('day', now() - last_ordered_at) <= 30 then 'active_30d'
-            when date_part('day', now() - last_ordered_at) <= 90 then 'active_90d'
-            when date_part('day', now() - last_ordered_at) <= 180 then 'active_180d'
-            else 'inactive'
-        end as recency_segment
+        {{ days_since('last_ordered_at') }} as days_since_last_order,
+        {{ recency_segment(days_since('last_ordered_at')) }} as recency_segment,
+        {{ as_of_date() }} as segmented_as_of
 
     from category_metrics
 
@@ -1,10 +1,11 @@
--- depends_on: {{ ref('int_orders_with_items') }}
+-- depends_on: {{ ref('int_seller_order_totals') }}
 {{
     config(
         materialized='incremental',
         unique_key='seller_id',
         on_schema_change='sync_all_columns',
         post_hook=[
+            "{{ refresh_recency_segments() }}",
             "CREATE INDEX IF NOT EXISTS {{ this.name }}_seller_id_idx ON {{ this }} (seller_id)",
             "CREATE INDEX IF NOT EXISTS {{ this.name }}_seller_state_idx ON {{ this }} (seller_state)",
             "CREATE INDEX IF NOT EXISTS {{ this.name }}_total_orders_idx ON {{ this }} (total_orders)",
@@ -22,29 +23,26 @@ with sellers as (
 
 ),
 
-order_items as (
+order_sellers as (
 
-    select * from {{ ref('stg_olist__order_items') }}
-
-),
-
-orders as (
-
-    select * from {{ ref('stg_olist__orders') }}
-    {% if is_incremental() %}
-    -- Only process orders newer than the latest order in the existing table
-    where purchased_at > (select coalesce(max(last_order_date), '2000-01-01'::timestamp) from {{ this }})
-    {% endif %}
+    select * from {{ ref('int_order_sellers') }}
 
 ),
 
 modified_sellers as (
     {% if is_incremental() %}
-    -- Get seller_ids with new order activity
-    select distinct oi.seller_id
-    from order_items oi
-    inner join orders o
-        on oi.order_id = o.order_id
+    -- Get seller_ids whose orders were loaded (new or changed) since last
+    -- run: the seller totals also take a delta for the sellers a changed
+    -- order no longer has, which the bridge has no rows left for
+    select seller_id
+    from {{ ref('int_seller_order_totals') }}
+    where _loaded_at > {{ loaded_at_watermark() }}
+    union
+    -- and sellers whose last order left them (their totals row is deleted)
+    select seller_id
+    from {{ this }}
+    where total_orders > 0
+        and seller_id not in (select seller_id from {{ ref('int_seller_order_totals') }})
     {% else %}
     -- For full refresh, include all sellers
     select distinct seller_id
@@ -54,51 +52,71 @@ modified_sellers as (
 
 seller_orders as (
 
+    -- order_sellers has one row per order and seller, so order counts are
+    -- plain sums; an incremental run re-aggregates modified sellers in full
     select
-        oi.seller_id,
+        seller_id,
 
         -- order statistics
-        count(distinct oi.order_id) as total_orders,
-        sum(o.is_delivered::int) as delivered_orders,
-        sum((o.order_status = 'canceled')::int) as canceled_orders,
-        sum(o.is_delivered_on_time::int) as on_time_deliveries,
-        sum(case when not o.is_delivered_on_time and o.is_delivered then 1 else 0 end) as late_deliveries,
+        count(*) as total_orders,
+        sum(is_delivered::int) as delivered_orders,
+        sum(is_canceled::int) as canceled_orders,
+        sum(is_delivered_on_time::int) as on_time_deliveries,
+        sum(is_delivered_late::int) as late_deliveries,
 
         -- product metrics
-        count(distinct oi.product_id) as unique_products_sold,
-        count(oi.order_item_id) as total_items_sold,
+        sum(item_count) as total_items_sold,
 
         -- monetary values
-        sum(oi.price_amount) as total_revenue,
-        sum(oi.shipping_amount) as total_shipping_revenue,
-        sum(oi.total_amount) as total_gmv,
-        avg(oi.price_amount) as average_item_price,
-        avg(oi.shipping_amount) as average_shipping_fee,
-
-        -- customer metrics
-        count(distinct o.customer_id) as unique_customers,
+        sum(item_revenue) as total_revenue,
+        sum(freight_amount) as total_shipping_revenue,
+        sum(total_amount) as total_gmv,
+        sum(item_revenue) / nullif(sum(item_count), 0) as average_item_price,
+        sum(freight_amount) / nullif(sum(item_count), 0) as average_shipping_fee,
 
         -- review metrics
-        avg(r.review_score) as average_review_score,
-        count(distinct case when r.review_score is not null then o.order_id end) as orders_with_reviews,
-        count(distinct case when r.is_positive_review then o.order_id end) as positive_reviews,
-        count(distinct case when r.is_negative_review then o.order_id end) as negative_reviews,
-        count(distinct case when r.has_review_comment then o.order_id end) as reviews_with_comments,
+        avg(review_score) as average_review_score,
+        sum(has_review::int) as orders_with_reviews,
+        sum(is_positive_review::int) as positive_reviews,
+        sum(is_negative_review::int) as negative_reviews,
+        sum(has_review_comment::int) as reviews_with_comments,
 
         -- date/time metrics
-        min(o.purchased_at) as first_order_date,
-        max(o.purchased_at) as last_order_date,
-        avg(o.delivery_time_days) as average_delivery_time_days,
-        avg(o.delivery_variance_days) as average_delivery_variance_days,
+        min(purchased_at) as first_order_date,
+        max(purchased_at) as last_order_date,
+        avg(delivery_time_days) as average_delivery_time_days,
+        avg(delivery_variance_days) as average_delivery_variance_days
 
-        -- activity metrics
-        count(distinct date_trunc('month', o.purchased_at)) as active_months
+    from order_sellers
+    where seller_id in (select seller_id from modified_sellers)
+    group by 1
+
+),
+
+seller_sketches as (
 
-    from order_items oi
-    inner join orders o
-        on oi.order_id = o.order_id
-    left join {{ ref('int_orders_with_items') }} r
-        on oi.order_id = r.order_id
+    -- distinct counts and percentiles merged from the monthly sketches
+    -- (approximate, see macros/sketches.sql)
+    select
+        seller_id,
+        {{ hll_count(hll_union_agg('customers_hll')) }} as unique_customers,
+        {{ quantile(quantile_union_agg('delivery_days_sketch'), 0.5) }} as delivery_time_p50_days,
+        {{ quantile(quantile_union_agg('delivery_days_sketch'), 0.9) }} as delivery_time_p90_days,
+        count(*) as active_months
+    from {{ ref('int_seller_monthly_sketches') }}
+    where seller_id in (select seller_id from modified_sellers)
+    group by 1
+
+),
+
+seller_products as (
+
+    -- distinct products need the items themselves, but not the orders
+    select
+        seller_id,
+        count(distinct product_id) as unique_products_sold
+    from {{ ref('stg_olist__order_items') }}
+    where seller_id in (select seller_id from modified_sellers)
     group by 1
 
 ),
@@ -107,11 +125,13 @@ seller_locations as (
 
     select
         s.seller_id,
-        s.seller_city,
-        s.seller_state,
-        s.geolocation_lat,
-        s.geolocation_lng
+        s.city as seller_city,
+        s.state as seller_state,
+        g.latitude as geolocation_lat,
+        g.longitude as geolocation_lng
     from sellers s
+    left join {{ ref('stg_olist__geolocation') }} g
+        on s.zip_code_prefix = g.zip_code_prefix
 
 ),
 
@@ -133,7 +153,7 @@ final as (
         coalesce(o.late_deliveries, 0) as late_deliveries,
 
         -- product metrics
-        coalesce(o.unique_products_sold, 0) as unique_products_sold,
+        coalesce(p.unique_products_sold, 0) as unique_products_sold,
         coalesce(o.total_items_sold, 0) as total_items_sold,
 
         -- monetary values
@@ -144,7 +164,7 @@ final as (
         coalesce(o.average_shipping_fee, 0) as average_shipping_fee,
 
         -- customer metrics
-        coalesce(o.unique_customers, 0) as unique_customers,
+        coalesce(ss.unique_customers, 0) as unique_customers,
 
         -- review metrics
         o.average_review_score,
@@ -158,21 +178,17 @@ final as (
         o.last_order_date,
         coalesce(o.average_delivery_time_days, 0) as average_delivery_time_days,
         coalesce(o.average_delivery_variance_days, 0) as average_delivery_variance_days,
-        date_part('day', now() - o.first_order_date) as days_since_first_order,
-        date_part('day', now() - o.last_order_date) as days_since_last_order,
+        ss.delivery_time_p50_days,
+        ss.delivery_time_p90_days,
+        {{ days_since('o.first_order_date') }} as days_since_first_order,
+        {{ days_since('o.last_order_date') }} as days_since_last_order,
+        {{ as_of_date() }} as segmented_as_of,
 
         -- activity metrics
-        coalesce(o.active_months, 0) as active_months,
+        coalesce(ss.active_months, 0) as active_months,
 
         -- calculated metrics
-        case
-            when o.last_order_date is null then 'no_orders'
-            when date_part('day', now() - o.last_order_date) <= 30 then 'active_30d'
-            when date_part('day', now() - o.last_order_date) <= 90 then 'active_90d'
-            when date_part('day', now() - o.last_order_date) <= 180 then 'active_180d'
-            when date_part('day', now() - o.last_order_date) <= 365 then 'active_365d'
-            else 'inactive'
-        end as recency_segment,
+        {{ recency_segment(days_since('o.last_order_date')) }} as recency_segment,
 
         case
             when o.total_orders >= 50 then 'high_volume'
@@ -204,11 +220,18 @@ final as (
             when o.positive_reviews > 0 and o.orders_with_reviews > 0
             then round((o.positive_reviews::decimal / nullif(o.orders_with_reviews, 0)) * 100, 2)
             else 0
-        end as positive_review_rate
+        end as positive_review_rate,
+
+        -- change tracking
+        now() as _loaded_at
 
     from seller_locations l
     left join seller_orders o
         on l.seller_id = o.seller_id
+    left join seller_products p
+        on l.seller_id = p.seller_id
+    left join seller_sketches ss
+        on l.seller_id = ss.seller_id
     {% if is_incremental() %}
     where l.seller_id in (select seller_id from modified_sellers)
     {% endif %}
@@ -1,6 +1,23 @@
+{{
+    config(
+        materialized='incremental',
+        unique_key='customer_id',
+        on_schema_change='sync_all_columns',
+        post_hook=[
+            "{{ delete_removed_source_rows(source('olist', 'customers'), {'customer_id': 'customer_id'}) }}",
+            "CREATE INDEX IF NOT EXISTS {{ this.name }}_customer_id_idx ON {{ this }} (customer_id)",
+            "CREATE INDEX IF NOT EXISTS {{ this.name }}_source_hash_idx ON {{ this }} (_source_hash)"
+        ]
+    )
+}}
+
 with source as (
 
-    select * from {{ source('olist', 'customers') }}
+    select
+        *,
+        {{ source_row_hash('source_row') }} as _source_hash
+    from {{ source('olist', 'customers') }} as source_row
+    {{ changed_source_rows(source('olist', 'customers'), ['customer_id']) }}
 
 ),
 
@@ -18,7 +35,10 @@ renamed as (
 
         -- standardized location fields
         initcap(customer_city) as city_normalized,
-        upper(customer_state) as state_normalized
+        upper(customer_state) as state_normalized,
+
+        -- change tracking
+        _source_hash
 
     from source
 
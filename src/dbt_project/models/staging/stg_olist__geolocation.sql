@@ -1,9 +1,44 @@
+{{
+    config(
+        materialized='incremental',
+        unique_key='zip_code_prefix',
+        on_schema_change='sync_all_columns',
+        post_hook=[
+            "{{ delete_removed_source_rows(source('olist', 'geolocation'), {'geolocation_zip_code_prefix': 'zip_code_prefix'}) }}",
+            "CREATE INDEX IF NOT EXISTS {{ this.name }}_zip_code_prefix_idx ON {{ this }} (zip_code_prefix)"
+        ]
+    )
+}}
+
 with source as (
 
     select * from {{ source('olist', 'geolocation') }}
 
 ),
 
+fingerprints as (
+    -- One fingerprint of all source rows per zip code; an incremental run
+    -- only deduplicates the zip codes whose fingerprint changed
+    select
+        geolocation_zip_code_prefix as zip_code_prefix,
+        {{ source_rows_fingerprint('source') }} as _source_hash
+    from source
+    group by geolocation_zip_code_prefix
+
+),
+
+changed_zip_codes as (
+
+    select fingerprints.*
+    from fingerprints
+    {% if is_incremental() %}
+    left join {{ this }} as current_rows
+        on current_rows.zip_code_prefix = fingerprints.zip_code_prefix
+    where current_rows._source_hash is distinct from fingerprints._source_hash
+    {% endif %}
+
+),
+
 renamed as (
 
     select
@@ -21,6 +56,9 @@ renamed as (
         upper(geolocation_state) as state_normalized
 
     from source
+    {% if is_incremental() %}
+    where geolocation_zip_code_prefix in (select zip_code_prefix from changed_zip_codes)
+    {% endif %}
 
 ),
 
@@ -36,4 +74,12 @@ deduplicated as (
         longitude
 )
 
-select * from deduplicated
\ No newline at end of file
+select
+    deduplicated.*,
+
+    -- change tracking
+    changed_zip_codes._source_hash
+
+from deduplicated
+inner join changed_zip_codes
+    on changed_zip_codes.zip_code_prefix = deduplicated.zip_code_prefix
@@ -1,6 +1,26 @@
+{{
+    config(
+        materialized='incremental',
+        unique_key=['order_id', 'order_item_id'],
+        on_schema_change='sync_all_columns',
+        post_hook=[
+            "{{ delete_removed_source_rows(source('olist', 'order_items'), {'order_id': 'order_id', 'order_item_id': 'order_item_id'}) }}",
+            "CREATE INDEX IF NOT EXISTS {{ this.name }}_key_idx ON {{ this }} (order_id, order_item_id)",
+            "CREATE INDEX IF NOT EXISTS {{ this.name }}_product_id_idx ON {{ this }} (product_id)",
+            "CREATE INDEX IF NOT EXISTS {{ this.name }}_seller_id_idx ON {{ this }} (seller_id)",
+            "CREATE INDEX IF NOT EXISTS {{ this.name }}_source_hash_idx ON {{ this }} (_source_hash)",
+            "CREATE INDEX IF NOT EXISTS {{ this.name }}_loaded_at_idx ON {{ this }} (_loaded_at)"
+        ]
+    )
+}}
+
 with source as (
 
-    select * from {{ source('olist', 'order_items') }}
+    select
+        *,
+        {{ source_row_hash('source_row') }} as _source_hash
+    from {{ source('olist', 'order_items') }} as source_row
+    {{ changed_source_rows(source('olist', 'order_items'), ['order_id', 'order_item_id']) }}
 
 ),
 
@@ -31,7 +51,11 @@ renamed as (
         case
             when freight_value::decimal(10,2) = 0 then true
             else false
-        end as is_free_shipping
+        end as is_free_shipping,
+
+        -- change tracking
+        _source_hash,
+        now() as _loaded_at
 
     from source
 
@@ -1,6 +1,24 @@
+{{
+    config(
+        materialized='incremental',
+        unique_key=['order_id', 'payment_sequential'],
+        on_schema_change='sync_all_columns',
+        post_hook=[
+            "{{ delete_removed_source_rows(source('olist', 'order_payments'), {'order_id': 'order_id', 'payment_sequential': 'payment_sequential'}) }}",
+            "CREATE INDEX IF NOT EXISTS {{ this.name }}_key_idx ON {{ this }} (order_id, payment_sequential)",
+            "CREATE INDEX IF NOT EXISTS {{ this.name }}_source_hash_idx ON {{ this }} (_source_hash)",
+            "CREATE INDEX IF NOT EXISTS {{ this.name }}_loaded_at_idx ON {{ this }} (_loaded_at)"
+        ]
+    )
+}}
+
 with source as (
 
-    select * from {{ source('olist', 'order_payments') }}
+    select
+        *,
+        {{ source_row_hash('source_row') }} as _source_hash
+    from {{ source('olist', 'order_payments') }} as source_row
+    {{ changed_source_rows(source('olist', 'order_payments'), ['order_id', 'payment_sequential']) }}
 
 ),
 
@@ -43,7 +61,11 @@ renamed as (
             else false
         end as is_boleto,
 
-        payment_value::decimal(10,2) / nullif(payment_installments, 0) as installment_amount
+        payment_value::decimal(10,2) / nullif(payment_installments, 0) as installment_amount,
+
+        -- change tracking
+        _source_hash,
+        now() as _loaded_at
 
     from source
 
@@ -1,6 +1,25 @@
+{{
+    config(
+        materialized='incremental',
+        unique_key=['review_id', 'order_id'],
+        on_schema_change='sync_all_columns',
+        post_hook=[
+            "{{ delete_removed_source_rows(source('olist', 'order_reviews'), {'review_id': 'review_id', 'order_id': 'order_id'}) }}",
+            "CREATE INDEX IF NOT EXISTS {{ this.name }}_key_idx ON {{ this }} (review_id, order_id)",
+            "CREATE INDEX IF NOT EXISTS {{ this.name }}_order_id_idx ON {{ this }} (order_id)",
+            "CREATE INDEX IF NOT EXISTS {{ this.name }}_source_hash_idx ON {{ this }} (_source_hash)",
+            "CREATE INDEX IF NOT EXISTS {{ this.name }}_loaded_at_idx ON {{ this }} (_loaded_at)"
+        ]
+    )
+}}
+
 with source as (
 
-    select * from {{ source('olist', 'order_reviews') }}
+    select
+        *,
+        {{ source_row_hash('source_row') }} as _source_hash
+    from {{ source('olist', 'order_reviews') }} as source_row
+    {{ changed_source_rows(source('olist', 'order_reviews'), ['review_id', 'order_id']) }}
 
 ),
 
@@ -35,7 +54,11 @@ renamed as (
             else false
         end as has_review_comment,
 
-        extract(epoch from (review_answer_timestamp::timestamp - review_creation_date::timestamp))/3600.0 as response_time_hours
+        extract(epoch from (review_answer_timestamp::timestamp - review_creation_date::timestamp))/3600.0 as response_time_hours,
+
+        -- change tracking
+        _source_hash,
+        now() as _loaded_at
 
     from source
 
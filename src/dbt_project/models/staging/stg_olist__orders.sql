@@ -1,6 +1,26 @@
+{{
+    config(
+        materialized='incremental',
+        unique_key='order_id',
+        on_schema_change='sync_all_columns',
+        post_hook=[
+            "{{ delete_removed_source_rows(source('olist', 'orders'), {'order_id': 'order_id'}) }}",
+            "CREATE INDEX IF NOT EXISTS {{ this.name }}_order_id_idx ON {{ this }} (order_id)",
+            "CREATE INDEX IF NOT EXISTS {{ this.name }}_customer_id_idx ON {{ this }} (customer_id)",
+            "CREATE INDEX IF NOT EXISTS {{ this.name }}_purchased_at_idx ON {{ this }} (purchased_at)",
+            "CREATE INDEX IF NOT EXISTS {{ this.name }}_source_hash_idx ON {{ this }} (_source_hash)",
+            "CREATE INDEX IF NOT EXISTS {{ this.name }}_loaded_at_idx ON {{ this }} (_loaded_at)"
+        ]
+    )
+}}
+
 with source as (
 
-    select * from {{ source('olist', 'orders') }}
+    select
+        *,
+        {{ source_row_hash('source_row') }} as _source_hash
+    from {{ source('olist', 'orders') }} as source_row
+    {{ changed_source_rows(source('olist', 'orders'), ['order_id']) }}
 
 ),
 
@@ -36,7 +56,11 @@ renamed as (
         case
             when order_delivered_customer_date is not null then true
             else false
-        end as is_delivered
+        end as is_delivered,
+
+        -- change tracking
+        _source_hash,
+        now() as _loaded_at
 
     from source
 
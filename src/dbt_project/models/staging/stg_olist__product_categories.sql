@@ -1,6 +1,23 @@
+{{
+    config(
+        materialized='incremental',
+        unique_key='category_id',
+        on_schema_change='sync_all_columns',
+        post_hook=[
+            "{{ delete_removed_source_rows(source('olist', 'product_categories'), {'product_category_name': 'category_id'}) }}",
+            "CREATE INDEX IF NOT EXISTS {{ this.name }}_category_id_idx ON {{ this }} (category_id)",
+            "CREATE INDEX IF NOT EXISTS {{ this.name }}_source_hash_idx ON {{ this }} (_source_hash)"
+        ]
+    )
+}}
+
 with source as (
 
-    select * from {{ source('olist', 'product_categories') }}
+    select
+        *,
+        {{ source_row_hash('source_row') }} as _source_hash
+    from {{ source('olist', 'product_categories') }} as source_row
+    {{ changed_source_rows(source('olist', 'product_categories'), ['product_category_name']) }}
 
 ),
 
@@ -12,7 +29,10 @@ renamed as (
 
         -- attributes
         product_category_name_english as category_name_english,
-        product_category_name as category_name_portuguese
+        product_category_name as category_name_portuguese,
+
+        -- change tracking
+        _source_hash
 
     from source
 
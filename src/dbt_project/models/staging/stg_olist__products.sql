@@ -1,6 +1,24 @@
+{{
+    config(
+        materialized='incremental',
+        unique_key='product_id',
+        on_schema_change='sync_all_columns',
+        post_hook=[
+            "{{ delete_removed_source_rows(source('olist', 'products'), {'product_id': 'product_id'}) }}",
+            "CREATE INDEX IF NOT EXISTS {{ this.name }}_product_id_idx ON {{ this }} (product_id)",
+            "CREATE INDEX IF NOT EXISTS {{ this.name }}_category_id_idx ON {{ this }} (category_id)",
+            "CREATE INDEX IF NOT EXISTS {{ this.name }}_source_hash_idx ON {{ this }} (_source_hash)"
+        ]
+    )
+}}
+
 with source as (
 
-    select * from {{ source('olist', 'products') }}
+    select
+        *,
+        {{ source_row_hash('source_row') }} as _source_hash
+    from {{ source('olist', 'products') }} as source_row
+    {{ changed_source_rows(source('olist', 'products'), ['product_id']) }}
 
 ),
 
@@ -36,7 +54,10 @@ renamed as (
                 or product_width_cm is null
             then true
             else false
-        end as is_missing_dimensions
+        end as is_missing_dimensions,
+
+        -- change tracking
+        _source_hash
 
     from source
 
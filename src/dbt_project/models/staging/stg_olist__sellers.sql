@@ -1,6 +1,23 @@
+{{
+    config(
+        materialized='incremental',
+        unique_key='seller_id',
+        on_schema_change='sync_all_columns',
+        post_hook=[
+            "{{ delete_removed_source_rows(source('olist', 'sellers'), {'seller_id': 'seller_id'}) }}",
+            "CREATE INDEX IF NOT EXISTS {{ this.name }}_seller_id_idx ON {{ this }} (seller_id)",
+            "CREATE INDEX IF NOT EXISTS {{ this.name }}_source_hash_idx ON {{ this }} (_source_hash)"
+        ]
+    )
+}}
+
 with source as (
 
-    select * from {{ source('olist', 'sellers') }}
+    select
+        *,
+        {{ source_row_hash('source_row') }} as _source_hash
+    from {{ source('olist', 'sellers') }} as source_row
+    {{ changed_source_rows(source('olist', 'sellers'), ['seller_id']) }}
 
 ),
 
@@ -17,7 +34,10 @@ renamed as (
 
         -- standardized location fields
         initcap(seller_city) as city_normalized,
-        upper(seller_state) as state_normalized
+        upper(seller_state) as state_normalized,
+
+        -- change tracking
+        _source_hash
 
     from source
 
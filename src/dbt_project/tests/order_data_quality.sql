@@ -1,19 +1,23 @@
 -- This test ensures that order dates are logical and consistent
--- It checks that order_purchase_timestamp is always before order_delivered_customer_date
--- and that order_approved_at is always after order_purchase_timestamp
+-- It checks that purchased_at is always before delivered_at
+-- and that approved_at is always after purchased_at
+-- In incremental mode only orders loaded or changed since the last passing run are checked
 
 SELECT
     order_id,
-    order_purchase_timestamp,
-    order_approved_at,
-    order_delivered_customer_date
+    purchased_at,
+    approved_at,
+    delivered_at
 FROM {{ ref('stg_olist__orders') }}
 WHERE
-    -- Test for orders that have delivery dates before purchase (illogical)
-    (order_delivered_customer_date IS NOT NULL AND order_purchase_timestamp > order_delivered_customer_date)
+    {{ changed_since_watermark('order_data_quality') }}
+    AND (
+        -- Test for orders that have delivery dates before purchase (illogical)
+        (delivered_at IS NOT NULL AND purchased_at > delivered_at)
 
-    -- Test for orders that have approval dates before purchase (illogical)
-    OR (order_approved_at IS NOT NULL AND order_purchase_timestamp > order_approved_at)
+        -- Test for orders that have approval dates before purchase (illogical)
+        OR (approved_at IS NOT NULL AND purchased_at > approved_at)
 
-    -- Test for future order dates (beyond current date)
-    OR order_purchase_timestamp > CURRENT_DATE
\ No newline at end of file
+        -- Test for future order dates (beyond current date)
+        OR purchased_at > CURRENT_DATE
+    )
@@ -0,0 +1,14 @@
+-- The delta-merged product totals must equal the totals of a full refresh,
+-- i.e. the same aggregation over every order item (see macros/delta_merge.sql)
+-- Returns the rows found on one side only
+
+{% set order_products_sql = order_products(
+    ref('stg_olist__order_items'),
+    ref('int_orders_with_items')
+) %}
+
+{{ full_refresh_differences(
+    ref('int_product_order_totals'),
+    product_order_totals('(' ~ order_products_sql ~ ') as order_products'),
+    exclude=['_loaded_at']
+) }}
@@ -1,20 +1,38 @@
 -- This test ensures that revenue data is consistent
--- It verifies that the sum of order items price matches the order total price
+-- It verifies that the sum of order items (price plus freight) matches the payments
 -- and checks for any negative prices which would be invalid
+-- In incremental mode only orders whose order, items or payments were loaded or
+-- changed since the last passing run are checked
 
-WITH order_totals AS (
+WITH checked_orders AS (
+    SELECT order_id
+    FROM {{ ref('stg_olist__orders') }}
+    WHERE {{ changed_since_watermark('revenue_data_integrity') }}
+    UNION
+    SELECT order_id
+    FROM {{ ref('stg_olist__order_items') }}
+    WHERE {{ changed_since_watermark('revenue_data_integrity') }}
+    UNION
+    SELECT order_id
+    FROM {{ ref('stg_olist__order_payments') }}
+    WHERE {{ changed_since_watermark('revenue_data_integrity') }}
+),
+
+order_totals AS (
     SELECT
         order_id,
-        SUM(price) AS calculated_total_price
+        SUM(total_amount) AS calculated_total_price
     FROM {{ ref('stg_olist__order_items') }}
+    WHERE order_id IN (SELECT order_id FROM checked_orders)
     GROUP BY order_id
 ),
 
 payment_totals AS (
     SELECT
         order_id,
-        SUM(payment_value) AS payment_total
+        SUM(payment_amount) AS payment_total
     FROM {{ ref('stg_olist__order_payments') }}
+    WHERE order_id IN (SELECT order_id FROM checked_orders)
     GROUP BY order_id
 )
 
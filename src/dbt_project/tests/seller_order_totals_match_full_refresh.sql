@@ -0,0 +1,17 @@
+-- The delta-merged seller totals must equal the totals of a full refresh,
+-- i.e. the same aggregation over every order (see macros/delta_merge.sql).
+-- The order x seller rows are rebuilt from their inputs rather than read from
+-- int_order_sellers, so a bridge that missed a change fails the test too
+-- Returns the rows found on one side only
+
+{% set order_sellers_sql = order_sellers(
+    ref('stg_olist__orders'),
+    ref('stg_olist__order_items'),
+    ref('int_orders_with_items')
+) %}
+
+{{ full_refresh_differences(
+    ref('int_seller_order_totals'),
+    seller_order_totals('(' ~ order_sellers_sql ~ ') as order_sellers'),
+    exclude=['_loaded_at']
+) }}
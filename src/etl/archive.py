@@ -0,0 +1,126 @@
+"""
+Raw source files read straight out of the Kaggle zip archive.
+
+The Kaggle download is kept as the zip archive it arrives in instead of being
+unzipped into the raw data directory. Its CSV members are streamed out of the
+archive into the hash and the CSV parser, so the dataset is never written to
+disk a second time and never read back from an uncompressed copy:
+
+    source = raw_source(RAW_DATA_DIR, "olist_orders_dataset.csv")
+    with source.open("rb") as f:
+        ...
+
+An archive member offers the parts of the pathlib.Path interface the manifest
+and the landing stage use (name, exists(), stat() and open()). Loose CSV files
+in the directory are used for the files the archive does not have, e.g. for
+generated datasets.
+"""
+
+import functools
+import time
+import zipfile
+from contextlib import contextmanager
+from pathlib import Path, PurePosixPath
+from types import SimpleNamespace
+
+# Name of the archive the Kaggle CLI downloads for olistbr/brazilian-ecommerce
+ARCHIVE_FILE = "brazilian-ecommerce.zip"
+
+
+class ArchiveMember:
+    """A file inside a zip archive, read without extracting it."""
+
+    def __init__(self, archive_path, info):
+        """
+        Initialize the member.
+
+        Args:
+            archive_path: Zip archive holding the file
+            info: zipfile.ZipInfo of the member
+        """
+        self.archive_path = Path(archive_path)
+        self.info = info
+
+    @property
+    def name(self):
+        """File name of the member, without the directories inside the archive."""
+        return PurePosixPath(self.info.filename).name
+
+    def exists(self):
+        return self.archive_path.exists()
+
+    def stat(self):
+        """
+        Size and modification time of the member, in the os.stat_result
+        fields the manifest and the landing stage compare.
+        """
+        modified = time.mktime(self.info.date_time + (0, 0, -1))
+        return SimpleNamespace(
+            st_size=self.info.file_size, st_mtime_ns=int(modified * 1e9)
+        )
+
+    @contextmanager
+    def open(self, mode="rb"):
+        """Stream the decompressed contents of the member."""
+        if mode != "rb":
+            raise ValueError(f"Archive members can only be opened 'rb', not {mode!r}")
+        with zipfile.ZipFile(self.archive_path) as archive:
+            with archive.open(self.info) as member:
+                yield member
+
+    def __str__(self):
+        return f"{self.archive_path}:{self.info.filename}"
+
+    def __repr__(self):
+        return f"ArchiveMember({str(self)!r})"
+
+
+@functools.lru_cache(maxsize=8)
+def _read_members(archive_path, size, mtime_ns):
+    with zipfile.ZipFile(archive_path) as archive:
+        return {
+            PurePosixPath(info.filename).name: info
+            for info in archive.infolist()
+            if not info.is_dir()
+        }
+
+
+def archive_members(archive_path):
+    """
+    List the files in a zip archive.
+
+    The central directory is only read again when the archive changes.
+
+    Returns:
+        dict: file name -> ArchiveMember
+    """
+    archive_path = Path(archive_path)
+    stat = archive_path.stat()
+    members = _read_members(str(archive_path), stat.st_size, stat.st_mtime_ns)
+    return {name: ArchiveMember(archive_path, info) for name, info in members.items()}
+
+
+def raw_source(data_dir, file_name, archive=None):
+    """
+    Locate a raw file, preferring the archive over a loose copy.
+
+    Args:
+        data_dir: Raw data directory
+        file_name: File name of the source, e.g. "olist_orders_dataset.csv"
+        archive: Zip archive to read; defaults to the Kaggle archive in data_dir
+
+    Returns:
+        ArchiveMember or Path: The member if the archive has the file, else the
+            path of the file in data_dir (which may not exist)
+    """
+    archive = Path(archive) if archive else Path(data_dir) / ARCHIVE_FILE
+    if archive.exists():
+        member = archive_members(archive).get(file_name)
+        if member is not None:
+            return member
+    return Path(data_dir) / file_name
+
+
+def as_source(path):
+    """Return archive members as they are and anything else as a Path."""
+    return path if isinstance(path, ArchiveMember) else Path(path)
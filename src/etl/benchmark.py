@@ -0,0 +1,683 @@
+"""
+Offline benchmark suite for the analytics pipeline.
+
+Runs each pipeline stage against a throwaway database on a local Postgres
+server and records the timings as a JSON baseline:
+
+1. load     - every Olist CSV is landed as Parquet and loaded by
+              OlistDataLoader (both timed per table), once without and once
+              with the bulk-load profile, recording rows/s and WAL bytes
+2. extract  - extract_data_from_supabase copies the source tables to raw,
+              and the extraction engine runs without and with the bulk-load
+              profile
+3. dbt      - a full run, the dbt tests (plain `dbt test` and the
+              consolidated runner), then an incremental run after the most
+              recent days of orders (held back from the initial load) are
+              appended
+4. queries  - every dashboard query in src/analytics/
+
+The throwaway database is created on the server given by the BENCHMARK_DB_*
+environment variables (falling back to DB_*) and dropped afterwards. Input
+data comes from --data-dir or is generated with OlistDataGenerator.
+
+Usage:
+    python -m src.etl.benchmark run --scale 1 --output benchmarks/baseline.json
+    python -m src.etl.benchmark compare benchmarks/baseline.json current.json
+"""
+
+import argparse
+import contextlib
+import importlib.util
+import json
+import logging
+import os
+import platform
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+
+import psycopg2
+from psycopg2 import sql
+
+from src.etl.config import OLIST_DATASETS
+from src.etl.landing import ParquetLanding
+from src.etl.utils import ANALYTICS_DIR, load_dashboard_queries
+
+logger = logging.getLogger(__name__)
+
+DBT_PROJECT_DIR = Path("src/dbt_project")
+DAG_PATH = Path("src/dags/ecommerce_analytics_pipeline.py")
+RESULTS_DIR = Path("benchmarks/results")
+
+STAGES = ["load", "extract", "dbt", "queries"]
+
+# Source schema used by the loader, the extraction task and dbt sources
+SOURCE_SCHEMA = "olist"
+
+# Order tables whose most recent rows are held back for the incremental build
+HOLDBACK_TABLES = ["order_items", "order_payments", "order_reviews"]
+
+# Airflow Variables the DAG module reads at import time
+DAG_VARIABLES = [
+    "metabase_url",
+    "metabase_username",
+    "metabase_password",
+    "supabase_key",
+    "product_dashboard_id",
+    "customer_dashboard_id",
+]
+
+
+def get_server_params():
+    """Connection parameters of the Postgres server used for benchmarks."""
+
+    def _env(name, default=None):
+        return os.getenv(f"BENCHMARK_{name}", os.getenv(name, default))
+
+    return {
+        "host": _env("DB_HOST", "localhost"),
+        "port": int(_env("DB_PORT", 5432)),
+        "user": _env("DB_USER", "postgres"),
+        "password": _env("DB_PASSWORD", "postgres"),
+        "database": _env("DB_MAINTENANCE_NAME", "postgres"),
+    }
+
+
+@contextlib.contextmanager
+def _patched_environ(values):
+    """Temporarily set environment variables."""
+    previous = {key: os.environ.get(key) for key in values}
+    os.environ.update({key: str(value) for key, value in values.items()})
+    try:
+        yield
+    finally:
+        for key, value in previous.items():
+            if value is None:
+                os.environ.pop(key, None)
+            else:
+                os.environ[key] = value
+
+
+class PipelineBenchmark:
+    """Benchmarks the pipeline stages against a throwaway Postgres database."""
+
+    def __init__(
+        self,
+        data_dir,
+        server_params=None,
+        repeat=3,
+        holdback_days=7,
+        statement_timeout_s=300,
+        dbt_project_dir=DBT_PROJECT_DIR,
+        analytics_dir=ANALYTICS_DIR,
+        keep_database=False,
+    ):
+        """
+        Initialize the benchmark.
+
+        Args:
+            data_dir: Directory with the nine Olist CSV files
+            server_params: Postgres server connection parameters
+            repeat: Number of timed runs per dashboard query (median is kept)
+            holdback_days: Days of most recent orders appended before the
+                incremental dbt build
+            statement_timeout_s: Timeout for each dashboard query
+            dbt_project_dir: dbt project to build
+            analytics_dir: Directory with the dashboard query files
+            keep_database: Keep the throwaway database for inspection
+        """
+        self.data_dir = Path(data_dir)
+        self.server_params = server_params or get_server_params()
+        self.repeat = repeat
+        self.holdback_days = holdback_days
+        self.statement_timeout_s = statement_timeout_s
+        self.dbt_project_dir = Path(dbt_project_dir)
+        self.analytics_dir = Path(analytics_dir)
+        self.keep_database = keep_database
+
+        self.database = f"olist_benchmark_{os.getpid()}_{int(time.time())}"
+        self.db_params = {**self.server_params, "database": self.database}
+        self.work_dir = None
+        self.results = {}
+
+    # ------------------------------------------------------------------
+    # Helpers
+    # ------------------------------------------------------------------
+
+    @contextlib.contextmanager
+    def _timed(self, key, **extra):
+        """Record the wall time and outcome of a block under a result key."""
+        result = {"status": "ok", **extra}
+        start = time.perf_counter()
+        try:
+            yield result
+        except Exception as e:
+            result["status"] = "error"
+            result["error"] = str(e).strip().splitlines()[0] if str(e) else repr(e)
+            logger.warning(f"Benchmark step {key} failed: {e}")
+        finally:
+            result["seconds"] = round(time.perf_counter() - start, 4)
+            if result["status"] == "ok" and result.get("rows") and result["seconds"]:
+                result["rows_per_second"] = round(result["rows"] / result["seconds"], 1)
+            self.results[key] = result
+
+    def _skip(self, key, reason):
+        logger.info(f"Skipping {key}: {reason}")
+        self.results[key] = {"status": "skipped", "reason": reason}
+
+    def _connect(self):
+        return psycopg2.connect(**self.db_params)
+
+    def _execute(self, statements):
+        with self._connect() as conn, conn.cursor() as cursor:
+            for statement in statements:
+                cursor.execute(statement)
+        conn.close()
+
+    def _pipeline_env(self):
+        """Environment that points the loader, DAG and dbt at the benchmark DB."""
+        env = {
+            "DB_HOST": self.db_params["host"],
+            "DB_PORT": self.db_params["port"],
+            "DB_USER": self.db_params["user"],
+            "DB_PASSWORD": self.db_params["password"],
+            "DB_NAME": self.database,
+            "DB_SCHEMA": SOURCE_SCHEMA,
+            "DBT_PROFILES_DIR": str((self.dbt_project_dir / "profiles").resolve()),
+            "SUPABASE_URL": os.getenv("SUPABASE_URL", "http://localhost:8000"),
+            "SUPABASE_SERVICE_KEY": os.getenv("SUPABASE_SERVICE_KEY", "benchmark"),
+        }
+        for name in DAG_VARIABLES:
+            env.setdefault(f"AIRFLOW_VAR_{name.upper()}", "benchmark")
+        return env
+
+    def _create_database(self):
+        conn = psycopg2.connect(**self.server_params)
+        conn.autocommit = True
+        with conn.cursor() as cursor:
+            cursor.execute(
+                sql.SQL("CREATE DATABASE {} ENCODING 'UTF8' TEMPLATE template0").format(
+                    sql.Identifier(self.database)
+                )
+            )
+            cursor.execute("SELECT version()")
+            self.server_version = cursor.fetchone()[0]
+        conn.close()
+        logger.info(f"Created benchmark database {self.database}")
+
+    def _drop_database(self):
+        conn = psycopg2.connect(**self.server_params)
+        conn.autocommit = True
+        with conn.cursor() as cursor:
+            cursor.execute(
+                sql.SQL("DROP DATABASE IF EXISTS {} WITH (FORCE)").format(
+                    sql.Identifier(self.database)
+                )
+            )
+        conn.close()
+        logger.info(f"Dropped benchmark database {self.database}")
+
+    # ------------------------------------------------------------------
+    # Stages
+    # ------------------------------------------------------------------
+
+    def bench_load(self):
+        """
+        Time the Parquet landing and OlistDataLoader.load_csv_to_table for
+        every Olist file. Each file is loaded without the bulk-load profile
+        (load_without_bulk_profile.<table>), then with it (load.<table>).
+        """
+        # The loader logs to logs/etl.log as soon as it is imported
+        os.makedirs("logs", exist_ok=True)
+        from src.etl.loader import OlistDataLoader
+
+        loader = OlistDataLoader()
+        loader.dataset_path = self.data_dir
+        loader.landing = ParquetLanding(self.work_dir / "landing")
+        if not loader.connect_to_db():
+            raise RuntimeError("Loader could not connect to the benchmark database")
+
+        try:
+            for dataset in OLIST_DATASETS:
+                key = f"load.{dataset['table']}"
+                csv_path = self.data_dir / dataset["file"]
+                if not csv_path.exists():
+                    self._skip(key, f"{csv_path} not found")
+                    continue
+                with self._timed(f"landing.{dataset['table']}") as result:
+                    loader.landing.land(csv_path, dataset["table"])
+                    result["rows"] = loader.landing.cache[dataset["table"]]["rows"]
+                for bulk_load, step in (
+                    (False, f"load_without_bulk_profile.{dataset['table']}"),
+                    (True, key),
+                ):
+                    loader.bulk_load = bulk_load
+                    with self._timed(step) as result:
+                        if not loader.load_csv_to_table(csv_path, dataset["table"]):
+                            raise RuntimeError(f"Loading {dataset['file']} failed")
+                        result["rows"] = self._count(SOURCE_SCHEMA, dataset["table"])
+                        result["wal_bytes"] = loader.load_stats[dataset["table"]][
+                            "wal_bytes"
+                        ]
+        finally:
+            loader.close_connection()
+
+    def _count(self, schema, table):
+        with self._connect() as conn, conn.cursor() as cursor:
+            cursor.execute(
+                sql.SQL("SELECT count(*) FROM {}.{}").format(
+                    sql.Identifier(schema), sql.Identifier(table)
+                )
+            )
+            count = cursor.fetchone()[0]
+        conn.close()
+        return count
+
+    def hold_back_recent_orders(self):
+        """
+        Move the most recent orders (and their children) out of the source
+        tables so they can be appended before the incremental dbt build.
+        """
+        cutoff = (
+            "(SELECT max(order_purchase_timestamp::timestamp) "
+            f"- interval '{int(self.holdback_days)} days' FROM {SOURCE_SCHEMA}.orders)"
+        )
+        statements = [
+            "CREATE SCHEMA IF NOT EXISTS benchmark_holdback",
+            f"""CREATE TABLE benchmark_holdback.orders AS
+                SELECT * FROM {SOURCE_SCHEMA}.orders
+                WHERE order_purchase_timestamp::timestamp > {cutoff}""",
+        ]
+        for table in HOLDBACK_TABLES:
+            statements += [
+                f"""CREATE TABLE benchmark_holdback.{table} AS
+                    SELECT * FROM {SOURCE_SCHEMA}.{table}
+                    WHERE order_id IN (SELECT order_id FROM benchmark_holdback.orders)""",
+                f"""DELETE FROM {SOURCE_SCHEMA}.{table}
+                    WHERE order_id IN (SELECT order_id FROM benchmark_holdback.orders)""",
+            ]
+        statements.append(
+            f"""DELETE FROM {SOURCE_SCHEMA}.orders
+                WHERE order_id IN (SELECT order_id FROM benchmark_holdback.orders)"""
+        )
+        self._execute(statements)
+        self.results["holdback.orders"] = {
+            "status": "ok",
+            "rows": self._count("benchmark_holdback", "orders"),
+        }
+
+    def append_held_back_orders(self):
+        """Append the held back orders to the source tables."""
+        self._execute(
+            [
+                f"INSERT INTO {SOURCE_SCHEMA}.{table} SELECT * FROM benchmark_holdback.{table}"
+                for table in ["orders"] + HOLDBACK_TABLES
+            ]
+        )
+
+    def bench_extract(self):
+        """
+        Time the extraction engine without and with the bulk-load profile,
+        then extract_data_from_supabase from the production DAG.
+        """
+        from src.etl.extract import ExtractionEngine
+
+        for bulk_load in (False, True):
+            step = f"extract.bulk_profile_{'on' if bulk_load else 'off'}"
+            with self._timed(step) as result:
+                report = ExtractionEngine(self.db_params, bulk_load=bulk_load).run()
+                if report["tables_failed"]:
+                    raise RuntimeError(f"{report['tables_failed']} tables failed")
+                result["rows"] = report["rows_processed"]
+                result["wal_bytes"] = report["wal_bytes"]
+
+        key = "extract.extract_data_from_supabase"
+        try:
+            spec = importlib.util.spec_from_file_location("benchmark_dag", DAG_PATH)
+            dag_module = importlib.util.module_from_spec(spec)
+            spec.loader.exec_module(dag_module)
+        except ImportError as e:
+            self._skip(key, f"DAG module cannot be imported: {e}")
+            return
+
+        dag_module.SUPABASE_DB_PARAMS.update(self.db_params)
+        with self._timed(key) as result:
+            result["summary"] = str(dag_module.extract_data_from_supabase())
+
+    def _dbt(self, label, *args):
+        """Run a dbt command and record total and per-model timings."""
+        target_path = self.work_dir / f"target_{label}"
+        command = [
+            self.dbt_executable,
+            *args,
+            "--project-dir",
+            str(self.dbt_project_dir),
+            "--profiles-dir",
+            str(self.dbt_project_dir / "profiles"),
+            "--target-path",
+            str(target_path),
+        ]
+        with self._timed(f"dbt.{label}") as result:
+            completed = subprocess.run(command, capture_output=True, text=True)
+            result["returncode"] = completed.returncode
+            run_results = target_path / "run_results.json"
+            if run_results.exists():
+                nodes = json.loads(run_results.read_text())["results"]
+                statuses = [node["status"] for node in nodes]
+                result["nodes"] = {s: statuses.count(s) for s in set(statuses)}
+                for node in nodes:
+                    self.results[f"dbt.{label}.{node['unique_id']}"] = {
+                        "status": "ok"
+                        if node["status"] in ("success", "pass")
+                        else "error",
+                        "seconds": round(node["execution_time"], 4),
+                    }
+            if completed.returncode != 0:
+                result["status"] = "error"
+                result["error"] = completed.stdout.strip().splitlines()[-1:]
+
+    def bench_dbt(self, incremental=True):
+        """Time a full dbt run, the tests and an incremental run on appended orders."""
+        self.dbt_executable = shutil.which("dbt")
+        if not self.dbt_executable:
+            self._skip("dbt.full", "dbt executable not found")
+            return
+
+        if not (self.dbt_project_dir / "dbt_packages").exists():
+            deps = subprocess.run(
+                [
+                    self.dbt_executable,
+                    "deps",
+                    "--project-dir",
+                    str(self.dbt_project_dir),
+                ],
+                capture_output=True,
+                text=True,
+            )
+            if deps.returncode != 0:
+                self._skip("dbt.full", "dbt deps failed")
+                return
+
+        self._dbt("full", "run", "--full-refresh")
+        self.bench_dbt_tests()
+        if incremental and self.results.get("holdback.orders", {}).get("rows"):
+            self.append_held_back_orders()
+            self._dbt("incremental", "run")
+        elif incremental:
+            self._skip("dbt.incremental", "no held back orders to append")
+
+    def bench_dbt_tests(self):
+        """
+        Time the run_dbt_tests task before and after test consolidation:
+        plain `dbt test` against the consolidated runner plus `dbt test`
+        for the remaining tests.
+        """
+        self._dbt("test", "test")
+        with self._timed("dbt.test_consolidated") as result:
+            completed = subprocess.run(
+                [
+                    sys.executable,
+                    "-m",
+                    "src.etl.dbt_tests",
+                    "--project-dir",
+                    str(self.dbt_project_dir),
+                    "--target-path",
+                    str(self.work_dir / "target_test_consolidated"),
+                    "--with-dbt-test",
+                ],
+                capture_output=True,
+                text=True,
+            )
+            result["returncode"] = completed.returncode
+            if completed.returncode != 0:
+                result["status"] = "error"
+                result["error"] = completed.stdout.strip().splitlines()[-1:]
+
+    def bench_queries(self):
+        """Time every dashboard query; the median of repeated runs is kept."""
+        conn = self._connect()
+        with conn.cursor() as cursor:
+            cursor.execute(
+                f"SET statement_timeout = '{int(self.statement_timeout_s)}s'"
+            )
+        conn.commit()
+
+        for query in load_dashboard_queries(self.analytics_dir):
+            key = f"query.{query['key']}"
+            timings = []
+            try:
+                for _ in range(self.repeat):
+                    start = time.perf_counter()
+                    with conn.cursor() as cursor:
+                        cursor.execute(query["sql"])
+                        rows = cursor.rowcount
+                    timings.append(time.perf_counter() - start)
+                    conn.rollback()
+                self.results[key] = {
+                    "status": "ok",
+                    "seconds": round(statistics.median(timings), 4),
+                    "rows": rows,
+                    "title": query["title"],
+                }
+            except psycopg2.Error as e:
+                conn.rollback()
+                self.results[key] = {
+                    "status": "error",
+                    "seconds": round(sum(timings), 4),
+                    "error": str(e).strip().splitlines()[0],
+                    "title": query["title"],
+                }
+        conn.close()
+
+    # ------------------------------------------------------------------
+    # Driver
+    # ------------------------------------------------------------------
+
+    def run(self, stages=STAGES):
+        """
+        Run the selected stages and return the benchmark report.
+
+        Args:
+            stages: Stages to run, in pipeline order
+
+        Returns:
+            dict: Report with run metadata and per-step results
+        """
+        print(f"\n=== Running pipeline benchmark ({', '.join(stages)}) ===")
+        self.server_version = None
+        self._create_database()
+        self.work_dir = Path(tempfile.mkdtemp(prefix="olist_benchmark_"))
+        try:
+            with _patched_environ(self._pipeline_env()):
+                if "load" in stages:
+                    print("  ◦ Loading source tables...")
+                    self.bench_load()
+                    if "dbt" in stages and self.holdback_days:
+                        self.hold_back_recent_orders()
+                if "extract" in stages:
+                    print("  ◦ Extracting to raw schema...")
+                    self.bench_extract()
+                if "dbt" in stages:
+                    print("  ◦ Building dbt models (full and incremental)...")
+                    self.bench_dbt()
+                if "queries" in stages:
+                    print("  ◦ Running dashboard queries...")
+                    self.bench_queries()
+        finally:
+            shutil.rmtree(self.work_dir, ignore_errors=True)
+            if not self.keep_database:
+                self._drop_database()
+
+        print("✓ Benchmark complete")
+        return {
+            "created_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            "git_commit": _git_commit(),
+            "python": platform.python_version(),
+            "postgres": self.server_version,
+            "data_dir": str(self.data_dir),
+            "repeat": self.repeat,
+            "holdback_days": self.holdback_days,
+            "stages": list(stages),
+            "results": dict(sorted(self.results.items())),
+        }
+
+
+def _git_commit():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare_results(baseline, current, tolerance=0.10, min_seconds=0.05):
+    """
+    Compare two benchmark reports.
+
+    A step regresses when it got slower by more than `tolerance` (relative)
+    and by more than `min_seconds` (absolute, to ignore timer noise), or when
+    it succeeded in the baseline but fails in the current run.
+
+    Args:
+        baseline: Baseline report
+        current: Report to check against the baseline
+        tolerance: Allowed relative slowdown, e.g. 0.10 for 10%
+        min_seconds: Slowdowns below this many seconds are never flagged
+
+    Returns:
+        list[dict]: One row per step with timings, change and verdict
+    """
+    rows = []
+    base_results = baseline["results"]
+    current_results = current["results"]
+    for key in sorted(set(base_results) | set(current_results)):
+        base = base_results.get(key, {})
+        cur = current_results.get(key, {})
+        row = {
+            "key": key,
+            "baseline": base.get("seconds"),
+            "current": cur.get("seconds"),
+            "change": None,
+            "verdict": "ok",
+        }
+        if not cur:
+            row["verdict"] = "missing"
+        elif not base:
+            row["verdict"] = "new"
+        elif base.get("status") == "ok" and cur.get("status") == "error":
+            row["verdict"] = "regression"
+        elif base.get("status") != "ok" or cur.get("status") != "ok":
+            row["verdict"] = cur.get("status", "n/a")
+        elif base.get("seconds") and cur.get("seconds") is not None:
+            row["change"] = cur["seconds"] / base["seconds"] - 1
+            slower_by = cur["seconds"] - base["seconds"]
+            if row["change"] > tolerance and slower_by > min_seconds:
+                row["verdict"] = "regression"
+            elif row["change"] < -tolerance and -slower_by > min_seconds:
+                row["verdict"] = "improvement"
+        rows.append(row)
+    return rows
+
+
+def _format_seconds(value):
+    return "-" if value is None else f"{value:.3f}s"
+
+
+def print_comparison(rows, show_all=False):
+    """Print the comparison table; unchanged steps only with show_all."""
+    print(f"{'step':<70} {'baseline':>10} {'current':>10} {'change':>8}  verdict")
+    for row in rows:
+        if not show_all and row["verdict"] in ("ok", "skipped"):
+            continue
+        change = "-" if row["change"] is None else f"{row['change']:+.1%}"
+        print(
+            f"{row['key']:<70} {_format_seconds(row['baseline']):>10} "
+            f"{_format_seconds(row['current']):>10} {change:>8}  {row['verdict']}"
+        )
+    regressions = [row for row in rows if row["verdict"] == "regression"]
+    print(f"\n{len(regressions)} regression(s) across {len(rows)} steps")
+    return regressions
+
+
+def _run_command(args):
+    data_dir = args.data_dir
+    generated_dir = None
+    if data_dir is None:
+        from src.etl.generator import OlistDataGenerator
+
+        generated_dir = tempfile.mkdtemp(prefix="olist_synthetic_")
+        OlistDataGenerator(scale=args.scale, output_dir=generated_dir).generate()
+        data_dir = generated_dir
+
+    try:
+        report = PipelineBenchmark(
+            data_dir=data_dir,
+            repeat=args.repeat,
+            holdback_days=args.holdback_days,
+            keep_database=args.keep_database,
+        ).run(stages=[s for s in STAGES if s in args.stages])
+    finally:
+        if generated_dir:
+            shutil.rmtree(generated_dir, ignore_errors=True)
+
+    report["scale"] = args.scale if args.data_dir is None else None
+    output = args.output or RESULTS_DIR / (
+        f"benchmark_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
+    )
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_text(json.dumps(report, indent=2) + "\n")
+    print(f"✓ Results saved to: {output}")
+    return 0
+
+
+def _compare_command(args):
+    baseline = json.loads(args.baseline.read_text())
+    current = json.loads(args.current.read_text())
+    rows = compare_results(baseline, current, args.tolerance, args.min_seconds)
+    regressions = print_comparison(rows, show_all=args.all)
+    return 1 if regressions else 0
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Offline pipeline benchmarks")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    run = subparsers.add_parser("run", help="Run the benchmark suite")
+    run.add_argument("--data-dir", type=Path, default=None)
+    run.add_argument(
+        "--scale", type=float, default=1.0, help="Synthetic data scale factor"
+    )
+    run.add_argument("--stages", nargs="+", choices=STAGES, default=STAGES)
+    run.add_argument("--repeat", type=int, default=3)
+    run.add_argument("--holdback-days", type=int, default=7)
+    run.add_argument("--keep-database", action="store_true")
+    run.add_argument("--output", type=Path, default=None)
+    run.set_defaults(func=_run_command)
+
+    compare = subparsers.add_parser("compare", help="Compare two result files")
+    compare.add_argument("baseline", type=Path)
+    compare.add_argument("current", type=Path)
+    compare.add_argument("--tolerance", type=float, default=0.10)
+    compare.add_argument("--min-seconds", type=float, default=0.05)
+    compare.add_argument("--all", action="store_true", help="Show unchanged steps")
+    compare.set_defaults(func=_compare_command)
+
+    args = parser.parse_args(argv)
+    return args.func(args)
+
+
+if __name__ == "__main__":
+    logging.basicConfig(
+        level=logging.INFO,
+        format="%(asctime)s - %(name)s - %(levelname)s - %(message)s",
+    )
+    sys.exit(main())
@@ -0,0 +1,189 @@
+"""
+Bulk-load profile for tables that are rebuilt wholesale.
+
+OlistDataLoader replaces the source tables and ExtractionEngine replaces the
+raw.olist_* copies. Under the bulk-load profile, a load:
+
+1. turns synchronous_commit off for its session, so commits do not wait for
+   the WAL to be flushed
+2. drops the table's secondary indexes, keeping their definitions, and
+   writes the rows into an UNLOGGED table, which writes no WAL for them
+3. recreates the indexes once the rows are in (one sort per index instead of
+   an index insert per row)
+4. switches the table back to LOGGED if it has to survive a crash
+5. runs ANALYZE, so the planner sees the new row counts and distributions
+
+Unlogged tables are emptied after a crash and are not replicated. The raw
+copies can be rebuilt from their source, so they stay unlogged; the source
+tables that dbt reads are set LOGGED again, which writes each of them to the
+WAL once, in bulk.
+
+Every load reports its rows, rows per second and the WAL bytes written while
+it ran, with or without the profile, so the two can be compared. WAL is
+measured server-wide, so it includes anything written concurrently.
+
+The profile is on unless BULK_LOAD_PROFILE is set to 0/false.
+
+Usage:
+    bulk = BulkLoad(conn, "olist", "orders")
+    try:
+        bulk.start()
+        ...  # create the table with bulk.unlogged, or call bulk.prepare()
+        stats = bulk.finish(rows)
+        conn.commit()
+    finally:
+        bulk.close()
+"""
+
+import logging
+import os
+import time
+
+logger = logging.getLogger(__name__)
+
+# Whether loads use the bulk-load profile by default
+BULK_LOAD_PROFILE = os.getenv("BULK_LOAD_PROFILE", "1").lower() not in (
+    "0",
+    "false",
+    "no",
+)
+
+
+def wal_lsn(cursor):
+    """The server's current WAL write position."""
+    cursor.execute("SELECT pg_current_wal_lsn()::text")
+    return cursor.fetchone()[0]
+
+
+def wal_bytes_since(cursor, lsn):
+    """WAL bytes the server has written since a position from wal_lsn()."""
+    cursor.execute("SELECT pg_wal_lsn_diff(pg_current_wal_lsn(), %s)", (lsn,))
+    return int(cursor.fetchone()[0])
+
+
+def format_bytes(size):
+    """A byte count in human-readable units."""
+    for unit in ("B", "kB", "MB", "GB"):
+        if abs(size) < 1024 or unit == "GB":
+            return f"{size:.0f} {unit}" if unit == "B" else f"{size:.1f} {unit}"
+        size /= 1024
+
+
+def describe(stats):
+    """One-line summary of a load's statistics."""
+    return (
+        f"{stats['rows']:,} rows in {stats['seconds']}s "
+        f"({stats['rows_per_second']:,.0f} rows/s, "
+        f"{format_bytes(stats['wal_bytes'])} WAL, "
+        f"bulk-load profile {'on' if stats['bulk_load'] else 'off'})"
+    )
+
+
+class BulkLoad:
+    """Runs one table's load under the bulk-load profile, or just measures it."""
+
+    def __init__(self, conn, schema, table, enabled=BULK_LOAD_PROFILE, durable=True):
+        """
+        Initialize the load. Nothing is executed until start().
+
+        Args:
+            conn: psycopg2 (DB-API) connection the rows are written through
+            schema: Schema of the table
+            table: Table being loaded
+            enabled: Apply the profile; if False the load is only measured
+            durable: Set the table LOGGED again when the load finishes
+        """
+        self.conn = conn
+        self.schema = schema
+        self.table = table
+        self.enabled = enabled
+        self.durable = durable
+        self.indexes = []
+        self._start_lsn = None
+        self._start_time = None
+
+    @property
+    def relation(self):
+        return f"{self.schema}.{self.table}"
+
+    @property
+    def unlogged(self):
+        """Keyword to put before TABLE in the load's CREATE TABLE."""
+        return "UNLOGGED " if self.enabled else ""
+
+    def start(self):
+        """
+        Start the load: record the WAL position, turn off synchronous commit
+        and drop the table's secondary indexes (recreated by finish()).
+        """
+        with self.conn.cursor() as cursor:
+            self._start_lsn = wal_lsn(cursor)
+            self._start_time = time.perf_counter()
+            if not self.enabled:
+                return
+            cursor.execute("SET synchronous_commit TO off")
+            # Indexes backing constraints go with their constraints
+            cursor.execute(
+                """
+                SELECT c.relname, pg_get_indexdef(i.indexrelid)
+                FROM pg_index i
+                JOIN pg_class c ON c.oid = i.indexrelid
+                WHERE i.indrelid = to_regclass(%s)
+                  AND NOT EXISTS (
+                      SELECT 1 FROM pg_constraint WHERE conindid = i.indexrelid
+                  )
+                ORDER BY c.relname
+                """,
+                (self.relation,),
+            )
+            self.indexes = cursor.fetchall()
+            for name, _ in self.indexes:
+                cursor.execute(f'DROP INDEX IF EXISTS {self.schema}."{name}"')
+
+    def prepare(self):
+        """Switch a table created by someone else (e.g. pandas) to UNLOGGED."""
+        if self.enabled:
+            with self.conn.cursor() as cursor:
+                cursor.execute(f"ALTER TABLE {self.relation} SET UNLOGGED")
+
+    def finish(self, rows):
+        """
+        Finish the load: recreate the indexes, set the table LOGGED if it is
+        durable and ANALYZE it. The caller commits.
+
+        Args:
+            rows: Rows loaded
+
+        Returns:
+            dict: rows, seconds, rows_per_second, wal_bytes, indexes rebuilt
+                and whether the profile was applied
+        """
+        with self.conn.cursor() as cursor:
+            if self.enabled:
+                for _, definition in self.indexes:
+                    cursor.execute(definition)
+                if self.durable:
+                    cursor.execute(f"ALTER TABLE {self.relation} SET LOGGED")
+                cursor.execute(f"ANALYZE {self.relation}")
+            seconds = time.perf_counter() - self._start_time
+            wal_bytes = wal_bytes_since(cursor, self._start_lsn)
+        stats = {
+            "rows": rows,
+            "seconds": round(seconds, 3),
+            "rows_per_second": round(rows / seconds, 1) if seconds else 0.0,
+            "wal_bytes": wal_bytes,
+            "indexes_rebuilt": len(self.indexes) if self.enabled else 0,
+            "bulk_load": self.enabled,
+        }
+        logger.info(f"Loaded {self.relation}: {describe(stats)}")
+        return stats
+
+    def close(self):
+        """Roll back anything uncommitted and restore synchronous commit."""
+        if self.conn.closed:
+            return
+        self.conn.rollback()
+        if self.enabled:
+            with self.conn.cursor() as cursor:
+                cursor.execute("RESET synchronous_commit")
+            self.conn.commit()
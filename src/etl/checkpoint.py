@@ -0,0 +1,152 @@
+"""
+Chunk-level checkpoints for resumable table loads.
+
+OlistDataLoader writes a table in chunks and commits each chunk together with
+a checkpoint row in a control table, holding the hash of the source file, the
+next chunk to load and the rows committed so far. A chunk and its checkpoint
+therefore commit or roll back together.
+
+When a load is interrupted (a dropped connection, a killed worker), the next
+load of the same file resumes at the first uncommitted chunk instead of
+replacing the table again:
+
+    start = resume_offset(conn, schema, "geolocation", sha256, chunks)
+    for i, chunk in enumerate(chunks[start:], start):
+        ...  # insert the chunk
+        record_chunk(conn, schema, "geolocation", sha256, i + 1, rows)
+        conn.commit()
+    clear_checkpoint(conn, schema, "geolocation")
+
+A checkpoint is only used if the source hash still matches and the table
+still holds exactly the rows it says were committed. Bulk loads write into
+UNLOGGED tables, which are emptied after a server crash, so after a crash the
+table is loaded from the start.
+"""
+
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Control table (in the loader's schema) holding the checkpoints
+CHECKPOINT_TABLE = "etl_load_checkpoints"
+
+
+def ensure_checkpoint_table(conn, schema):
+    """Create the checkpoint control table if it does not exist."""
+    with conn.cursor() as cursor:
+        cursor.execute(
+            f"""
+            CREATE TABLE IF NOT EXISTS {schema}.{CHECKPOINT_TABLE} (
+                table_name TEXT PRIMARY KEY,
+                sha256 TEXT NOT NULL,
+                chunk_offset INTEGER NOT NULL,
+                rows_committed BIGINT NOT NULL,
+                updated_at TIMESTAMPTZ NOT NULL DEFAULT now()
+            )
+            """
+        )
+
+
+def get_checkpoints(conn, schema):
+    """
+    Read the checkpoints of the unfinished loads.
+
+    Returns:
+        dict: table_name -> {"sha256", "chunk_offset", "rows_committed"}
+    """
+    with conn.cursor() as cursor:
+        cursor.execute(
+            f"SELECT table_name, sha256, chunk_offset, rows_committed "
+            f"FROM {schema}.{CHECKPOINT_TABLE}"
+        )
+        return {
+            table_name: {
+                "sha256": sha256,
+                "chunk_offset": chunk_offset,
+                "rows_committed": rows_committed,
+            }
+            for table_name, sha256, chunk_offset, rows_committed in cursor.fetchall()
+        }
+
+
+def record_chunk(conn, schema, table_name, sha256, chunk_offset, rows_committed):
+    """
+    Upsert a table's checkpoint after a chunk, in the chunk's transaction.
+    The caller commits.
+
+    Args:
+        conn: psycopg2 (DB-API) connection the chunk was written through
+        schema: Schema of the table
+        table_name: Table being loaded
+        sha256: Hash of the source file
+        chunk_offset: Index of the next chunk to load
+        rows_committed: Rows in the table once this chunk commits
+    """
+    with conn.cursor() as cursor:
+        cursor.execute(
+            f"""
+            INSERT INTO {schema}.{CHECKPOINT_TABLE}
+                (table_name, sha256, chunk_offset, rows_committed, updated_at)
+            VALUES (%s, %s, %s, %s, now())
+            ON CONFLICT (table_name) DO UPDATE SET
+                sha256 = EXCLUDED.sha256,
+                chunk_offset = EXCLUDED.chunk_offset,
+                rows_committed = EXCLUDED.rows_committed,
+                updated_at = EXCLUDED.updated_at
+            """,
+            (table_name, sha256, chunk_offset, rows_committed),
+        )
+
+
+def clear_checkpoint(conn, schema, table_name):
+    """Delete a table's checkpoint once its load is complete. The caller commits."""
+    with conn.cursor() as cursor:
+        cursor.execute(
+            f"DELETE FROM {schema}.{CHECKPOINT_TABLE} WHERE table_name = %s",
+            (table_name,),
+        )
+
+
+def resume_offset(conn, schema, table_name, sha256, chunks):
+    """
+    Find the first chunk of a load that is not committed yet.
+
+    Args:
+        conn: psycopg2 (DB-API) connection
+        schema: Schema of the table
+        table_name: Table being loaded
+        sha256: Hash of the source file being loaded
+        chunks: The chunks (DataFrames) the load writes, in order
+
+    Returns:
+        int: Index of the first chunk to load; 0 if the load starts over
+    """
+    checkpoint = get_checkpoints(conn, schema).get(table_name)
+    if checkpoint is None:
+        return 0
+    offset = checkpoint["chunk_offset"]
+    if checkpoint["sha256"] != sha256:
+        logger.info(f"Source of {schema}.{table_name} changed, loading from start")
+        return 0
+    expected = sum(len(chunk) for chunk in chunks[:offset])
+    with conn.cursor() as cursor:
+        cursor.execute("SELECT to_regclass(%s)", (f"{schema}.{table_name}",))
+        if cursor.fetchone()[0] is None:
+            committed = None
+        else:
+            cursor.execute(f"SELECT count(*) FROM {schema}.{table_name}")
+            committed = cursor.fetchone()[0]
+    if offset > len(chunks) or not (
+        expected == checkpoint["rows_committed"] == committed
+    ):
+        logger.warning(
+            f"Checkpoint of {schema}.{table_name} does not match the table "
+            f"({committed} rows, {checkpoint['rows_committed']} committed), "
+            f"loading from start"
+        )
+        return 0
+    logger.info(
+        f"Resuming {schema}.{table_name} at chunk {offset}/{len(chunks)} "
+        f"({committed:,} rows committed)"
+    )
+    return offset
@@ -0,0 +1,140 @@
+"""
+Configuration shared by the ETL modules.
+
+Keeps the catalogue of Olist source files in one place so the loader, the
+synthetic data generator and the benchmark tooling agree on file names,
+table names and column layouts.
+"""
+
+from pathlib import Path
+
+# Default location of the raw Olist CSV files
+RAW_DATA_DIR = Path("src/data/raw")
+
+# Parquet copies of the raw files, written by the landing stage
+LANDING_DATA_DIR = Path("src/data/landing")
+
+# Columnar (Parquet) exports of the dbt marts, written after the marts are built
+MART_EXPORT_DIR = Path("src/data/exports/marts")
+
+# On-disk tier of the dashboard query result cache
+QUERY_CACHE_DIR = Path("src/data/cache/queries")
+
+# Default location for generated (synthetic) datasets
+SYNTHETIC_DATA_DIR = Path("src/data/synthetic")
+
+# Olist CSV files and the tables they are loaded into. The column lists match
+# the Kaggle release (including its "lenght" typos) and models/staging/source.yml.
+OLIST_DATASETS = [
+    {
+        "file": "olist_customers_dataset.csv",
+        "table": "customers",
+        "columns": [
+            "customer_id",
+            "customer_unique_id",
+            "customer_zip_code_prefix",
+            "customer_city",
+            "customer_state",
+        ],
+    },
+    {
+        "file": "olist_geolocation_dataset.csv",
+        "table": "geolocation",
+        "columns": [
+            "geolocation_zip_code_prefix",
+            "geolocation_lat",
+            "geolocation_lng",
+            "geolocation_city",
+            "geolocation_state",
+        ],
+    },
+    {
+        "file": "olist_order_items_dataset.csv",
+        "table": "order_items",
+        "columns": [
+            "order_id",
+            "order_item_id",
+            "product_id",
+            "seller_id",
+            "shipping_limit_date",
+            "price",
+            "freight_value",
+        ],
+    },
+    {
+        "file": "olist_order_payments_dataset.csv",
+        "table": "order_payments",
+        "columns": [
+            "order_id",
+            "payment_sequential",
+            "payment_type",
+            "payment_installments",
+            "payment_value",
+        ],
+    },
+    {
+        "file": "olist_order_reviews_dataset.csv",
+        "table": "order_reviews",
+        "columns": [
+            "review_id",
+            "order_id",
+            "review_score",
+            "review_comment_title",
+            "review_comment_message",
+            "review_creation_date",
+            "review_answer_timestamp",
+        ],
+    },
+    {
+        "file": "olist_orders_dataset.csv",
+        "table": "orders",
+        "columns": [
+            "order_id",
+            "customer_id",
+            "order_status",
+            "order_purchase_timestamp",
+            "order_approved_at",
+            "order_delivered_carrier_date",
+            "order_delivered_customer_date",
+            "order_estimated_delivery_date",
+        ],
+    },
+    {
+        "file": "olist_products_dataset.csv",
+        "table": "products",
+        "columns": [
+            "product_id",
+            "product_category_name",
+            "product_name_lenght",
+            "product_description_lenght",
+            "product_photos_qty",
+            "product_weight_g",
+            "product_length_cm",
+            "product_height_cm",
+            "product_width_cm",
+        ],
+    },
+    {
+        "file": "olist_sellers_dataset.csv",
+        "table": "sellers",
+        "columns": [
+            "seller_id",
+            "seller_zip_code_prefix",
+            "seller_city",
+            "seller_state",
+        ],
+    },
+    {
+        "file": "product_category_name_translation.csv",
+        "table": "product_categories",
+        "columns": ["product_category_name", "product_category_name_english"],
+    },
+]
+
+
+def get_dataset(table_name):
+    """Return the dataset entry for a table name."""
+    for dataset in OLIST_DATASETS:
+        if dataset["table"] == table_name:
+            return dataset
+    raise KeyError(f"Unknown Olist table: {table_name}")
@@ -0,0 +1,478 @@
+"""
+Consolidated runner for the column-level dbt schema tests.
+
+`dbt test` compiles every generic test into its own query, so a model with
+thirty column tests is scanned thirty times. This runner reads the tests from
+dbt's manifest.json, groups them by the model they are attached to and
+evaluates all of a model's checks in a single scan, one aggregate FILTER
+clause per test:
+
+    not_null             count(*) FILTER (WHERE col IS NULL)
+    unique               count(col) - count(DISTINCT col)
+    accepted_values      count(DISTINCT col) FILTER (WHERE col NOT IN (...))
+    relationships        count(*) FILTER (WHERE col IS NOT NULL AND parent IS NULL)
+                         with a LEFT JOIN to the distinct parent keys
+    expression_is_true   count(*) FILTER (WHERE NOT (col expression))
+    not_empty_string     count(*) FILTER (WHERE trim(col) = '')
+
+Failure counts match what `dbt test` reports, except for unique, which counts
+the surplus duplicate rows rather than the duplicated values (pass/fail is the
+same). Model-level expression_is_true checks that use an aggregate, such as
+"count(*) > 0", are evaluated once over the whole model.
+
+Results are written in dbt's run_results.json format. Every other test
+(singular tests, equal_rowcount, ...) is left to `dbt test` with
+DBT_TEST_EXCLUDE as its --exclude argument.
+
+Usage:
+    # consolidated tests only (needs an up to date target/manifest.json)
+    python -m src.etl.dbt_tests --project-dir src/dbt_project
+    # `dbt test` for everything else, then the consolidated tests
+    python -m src.etl.dbt_tests --project-dir src/dbt_project --with-dbt-test
+"""
+
+import argparse
+import json
+import logging
+import os
+import re
+import subprocess
+import sys
+import time
+from collections import defaultdict
+from datetime import datetime, timezone
+from pathlib import Path
+
+import psycopg2
+
+logger = logging.getLogger(__name__)
+
+DBT_PROJECT_DIR = Path("src/dbt_project")
+
+# (namespace, name) of the generic tests evaluated by this runner
+CONSOLIDATED_TESTS = {
+    (None, "not_null"),
+    (None, "unique"),
+    (None, "accepted_values"),
+    (None, "relationships"),
+    ("dbt_utils", "expression_is_true"),
+    ("dbt_utils", "not_empty_string"),
+}
+
+# `dbt test --exclude` selector for the tests handled here
+DBT_TEST_EXCLUDE = " ".join(
+    sorted(f"test_name:{name}" for _, name in CONSOLIDATED_TESTS)
+)
+
+RESULTS_FILE = "consolidated_run_results.json"
+
+_AGGREGATE_CALL = re.compile(r"\b(count|sum|avg|min|max|bool_and|bool_or)\s*\(", re.I)
+_THRESHOLD = re.compile(r"^\s*(>=|<=|!=|==|=|>|<)\s*(\d+)\s*$")
+
+
+def _quote_literal(value):
+    return "'" + str(value).replace("'", "''") + "'"
+
+
+def _threshold_met(failures, condition):
+    """Evaluate a dbt warn_if/error_if condition such as "!= 0" or ">10"."""
+    match = _THRESHOLD.match(condition or "!= 0")
+    if not match:
+        raise ValueError(f"Unsupported test threshold: {condition}")
+    op, limit = match.group(1), int(match.group(2))
+    return {
+        ">=": failures >= limit,
+        "<=": failures <= limit,
+        "!=": failures != limit,
+        "==": failures == limit,
+        "=": failures == limit,
+        ">": failures > limit,
+        "<": failures < limit,
+    }[op]
+
+
+def _relation(manifest, unique_id):
+    """Fully qualified relation of a model, seed, snapshot or source."""
+    node = manifest["nodes"].get(unique_id) or manifest["sources"][unique_id]
+    return node["relation_name"]
+
+
+def collect_tests(manifest, models=None):
+    """
+    Group the consolidated generic tests by the node they are attached to.
+
+    Args:
+        manifest: Parsed dbt manifest.json
+        models: Optional model names to restrict the run to
+
+    Returns:
+        dict: attached node unique_id -> list of test nodes
+    """
+    tests = defaultdict(list)
+    for node in manifest["nodes"].values():
+        if node["resource_type"] != "test" or not node.get("test_metadata"):
+            continue
+        metadata = node["test_metadata"]
+        if (metadata.get("namespace"), metadata["name"]) not in CONSOLIDATED_TESTS:
+            continue
+        if not node["config"].get("enabled", True) or not node.get("attached_node"):
+            continue
+        attached = node["attached_node"]
+        if models and attached.split(".")[-1] not in models:
+            continue
+        tests[attached].append(node)
+    return dict(sorted(tests.items()))
+
+
+def build_check(test_node, manifest, index):
+    """
+    Translate one generic test into an aggregate failure expression.
+
+    Args:
+        test_node: Test node from the manifest
+        manifest: Parsed dbt manifest.json
+        index: Position of the test in its model's query (for join aliases)
+
+    Returns:
+        tuple[str, str or None]: Aggregate expression counting failures and
+            an optional LEFT JOIN clause it needs
+    """
+    metadata = test_node["test_metadata"]
+    kwargs = metadata.get("kwargs", {})
+    name = metadata["name"]
+    column = kwargs.get("column_name") or test_node.get("column_name")
+    where = test_node["config"].get("where")
+    scope = f"({where}) AND " if where else ""
+
+    if name == "not_null":
+        return f"count(*) FILTER (WHERE {scope}({column}) IS NULL)", None
+
+    if name == "unique":
+        if where:
+            return (
+                f"count({column}) FILTER (WHERE {where}) "
+                f"- count(DISTINCT {column}) FILTER (WHERE {where})"
+            ), None
+        return f"count({column}) - count(DISTINCT {column})", None
+
+    if name == "accepted_values":
+        quote = kwargs.get("quote", True)
+        values = ", ".join(
+            _quote_literal(value) if quote else str(value) for value in kwargs["values"]
+        )
+        return (
+            f"count(DISTINCT {column}) FILTER "
+            f"(WHERE {scope}({column}) NOT IN ({values}))"
+        ), None
+
+    if name == "relationships":
+        attached = test_node["attached_node"]
+        parents = [n for n in test_node["depends_on"]["nodes"] if n != attached]
+        parent = _relation(manifest, parents[0] if parents else attached)
+        alias = f"dbt_parent_{index}"
+        join = (
+            f"LEFT JOIN (SELECT DISTINCT {kwargs['field']} AS parent_key "
+            f"FROM {parent}) AS {alias} ON ({column}) = {alias}.parent_key"
+        )
+        return (
+            f"count(*) FILTER (WHERE {scope}({column}) IS NOT NULL "
+            f"AND {alias}.parent_key IS NULL)"
+        ), join
+
+    if name == "expression_is_true":
+        expression = kwargs["expression"]
+        if not column and _AGGREGATE_CALL.search(expression):
+            return f"CASE WHEN ({expression}) THEN 0 ELSE 1 END", None
+        return (
+            f"count(*) FILTER (WHERE {scope}NOT ({column or ''} {expression}))",
+            None,
+        )
+
+    if name == "not_empty_string":
+        value = f"trim({column})" if kwargs.get("trim_whitespace", True) else column
+        return f"count(*) FILTER (WHERE {scope}{value} = '')", None
+
+    raise ValueError(f"Unsupported test: {name}")
+
+
+def build_model_query(relation, checks):
+    """
+    Build the single-scan query for one model.
+
+    Args:
+        relation: Fully qualified relation of the model
+        checks: (expression, join) pairs from build_check
+
+    Returns:
+        str: SELECT returning one failure count column per check
+    """
+    columns = ",\n    ".join(
+        f'{expression} AS "test_{i}"' for i, (expression, _) in enumerate(checks)
+    )
+    joins = "\n".join(join for _, join in checks if join)
+    return f"SELECT\n    {columns}\nFROM {relation}\n{joins}".rstrip()
+
+
+class ConsolidatedTestRunner:
+    """Runs the column-level schema tests with one scan per model."""
+
+    def __init__(self, manifest_path, db_params=None):
+        """
+        Initialize the runner.
+
+        Args:
+            manifest_path: Path to dbt's target/manifest.json
+            db_params: psycopg2 connection parameters (DB_* env vars if omitted)
+        """
+        self.manifest = json.loads(Path(manifest_path).read_text())
+        self.db_params = db_params or {
+            "host": os.getenv("DB_HOST", "localhost"),
+            "port": int(os.getenv("DB_PORT", 5432)),
+            "user": os.getenv("DB_USER", "postgres"),
+            "password": os.getenv("DB_PASSWORD", "postgres"),
+            "database": os.getenv("DB_NAME", "postgres"),
+        }
+
+    def _result(self, test_node, status, failures, execution_time, message=None):
+        return {
+            "status": status,
+            "timing": [],
+            "thread_id": "consolidated",
+            "execution_time": round(execution_time, 4),
+            "adapter_response": {},
+            "message": message,
+            "failures": failures,
+            "unique_id": test_node["unique_id"],
+        }
+
+    def _evaluate(self, test_node, failures, execution_time):
+        """Turn a failure count into a dbt test status."""
+        config = test_node["config"]
+        severity = str(config.get("severity", "ERROR")).upper()
+        error_if = config.get("error_if", "!= 0")
+        warn_if = config.get("warn_if", "!= 0")
+        if severity == "ERROR" and _threshold_met(failures, error_if):
+            status, condition = "fail", error_if
+        elif _threshold_met(failures, warn_if):
+            status, condition = "warn", warn_if
+        else:
+            return self._result(test_node, "pass", failures, execution_time)
+        plural = "s" if failures != 1 else ""
+        message = (
+            f"Got {failures} result{plural}, configured to {status} if {condition}"
+        )
+        return self._result(test_node, status, failures, execution_time, message)
+
+    def _run_batch(self, conn, relation, tests, checks):
+        start = time.perf_counter()
+        with conn.cursor() as cursor:
+            cursor.execute(build_model_query(relation, checks))
+            counts = cursor.fetchone()
+        conn.rollback()
+        # The scan is shared, so its time is split evenly across the tests
+        elapsed = (time.perf_counter() - start) / len(tests)
+        return [
+            self._evaluate(test, int(failures), elapsed)
+            for test, failures in zip(tests, counts)
+        ]
+
+    def _explain(self, conn, relation, check):
+        """Plan a single check without running it; return the error, if any."""
+        try:
+            with conn.cursor() as cursor:
+                cursor.execute("EXPLAIN " + build_model_query(relation, [check]))
+            conn.rollback()
+            return None
+        except psycopg2.Error as e:
+            conn.rollback()
+            return str(e).strip().splitlines()[0]
+
+    def _run_model(self, conn, relation, tests):
+        """
+        Run one model's checks in a single query.
+
+        If the query fails, each check is planned with EXPLAIN so broken
+        checks (missing columns, invalid expressions) are reported as errors
+        and the remaining checks still run in one scan.
+        """
+        checks = [build_check(test, self.manifest, i) for i, test in enumerate(tests)]
+        try:
+            return self._run_batch(conn, relation, tests, checks)
+        except psycopg2.Error as e:
+            conn.rollback()
+            logger.warning(
+                f"Consolidated query for {relation} failed, checking its tests "
+                f"individually: {str(e).strip().splitlines()[0]}"
+            )
+
+        results = {}
+        valid = []
+        for i, (test, check) in enumerate(zip(tests, checks)):
+            error = self._explain(conn, relation, check)
+            if error:
+                results[i] = self._result(test, "error", None, 0.0, error)
+            else:
+                valid.append(i)
+
+        if valid:
+            try:
+                batch = self._run_batch(
+                    conn,
+                    relation,
+                    [tests[i] for i in valid],
+                    [checks[i] for i in valid],
+                )
+            except psycopg2.Error:
+                conn.rollback()
+                batch = [
+                    self._run_single(conn, relation, tests[i], checks[i]) for i in valid
+                ]
+            results.update(zip(valid, batch))
+        return [results[i] for i in range(len(tests))]
+
+    def _run_single(self, conn, relation, test, check):
+        start = time.perf_counter()
+        try:
+            with conn.cursor() as cursor:
+                cursor.execute(build_model_query(relation, [check]))
+                failures = int(cursor.fetchone()[0])
+            conn.rollback()
+        except psycopg2.Error as e:
+            conn.rollback()
+            return self._result(
+                test,
+                "error",
+                None,
+                time.perf_counter() - start,
+                str(e).strip().splitlines()[0],
+            )
+        return self._evaluate(test, failures, time.perf_counter() - start)
+
+    def run(self, models=None):
+        """
+        Run the consolidated tests.
+
+        Args:
+            models: Optional model names to restrict the run to
+
+        Returns:
+            dict: Results in dbt's run_results.json format
+        """
+        start = time.perf_counter()
+        grouped = collect_tests(self.manifest, models)
+        results = []
+        conn = psycopg2.connect(**self.db_params)
+        try:
+            for attached, tests in grouped.items():
+                relation = _relation(self.manifest, attached)
+                model_results = self._run_model(conn, relation, tests)
+                results.extend(model_results)
+                failed = sum(r["status"] in ("fail", "error") for r in model_results)
+                print(
+                    f"  {'✓' if not failed else '❌'} {attached.split('.')[-1]}: "
+                    f"{len(tests)} tests in one scan"
+                    + (f", {failed} failed" if failed else "")
+                )
+        finally:
+            conn.close()
+
+        return {
+            "metadata": {
+                "dbt_schema_version": "https://schemas.getdbt.com/dbt/run-results/v4.json",
+                "generated_at": datetime.now(timezone.utc).isoformat(),
+                "invocation_id": None,
+                "env": {},
+            },
+            "results": results,
+            "elapsed_time": round(time.perf_counter() - start, 4),
+            "args": {"which": "consolidated_test", "models": models},
+        }
+
+
+def summarize(run_results):
+    """Count results by status, like dbt's closing summary line."""
+    statuses = [result["status"] for result in run_results["results"]]
+    return {
+        status: statuses.count(status) for status in ("pass", "warn", "fail", "error")
+    }
+
+
+def _dbt(project_dir, target_dir, *args):
+    """Run a dbt command against the project and return its exit code."""
+    command = ["dbt", *args, "--project-dir", str(project_dir)]
+    if target_dir is not None:
+        command += ["--target-path", str(target_dir)]
+    return subprocess.run(command).returncode
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Run dbt schema tests in one scan per model"
+    )
+    parser.add_argument("--project-dir", type=Path, default=DBT_PROJECT_DIR)
+    parser.add_argument(
+        "--target-path", type=Path, default=None, help="dbt target directory"
+    )
+    parser.add_argument("--output", type=Path, default=None)
+    parser.add_argument("--models", nargs="+", default=None)
+    parser.add_argument(
+        "--vars",
+        default=None,
+        help="dbt vars passed to dbt test, e.g. '{test_mode: full}'",
+    )
+    parser.add_argument(
+        "--with-dbt-test",
+        action="store_true",
+        help="Run the remaining tests with dbt test first (this also parses the project)",
+    )
+    args = parser.parse_args(argv)
+
+    target_dir = args.target_path or args.project_dir / "target"
+    output = args.output or target_dir / RESULTS_FILE
+
+    failed = False
+    if args.with_dbt_test:
+        # dbt test also writes a fresh manifest.json for the consolidated run
+        print("\n=== Running remaining tests with dbt ===")
+        select = ["--select", *args.models] if args.models else []
+        exclude = ["--exclude", *DBT_TEST_EXCLUDE.split()]
+        dbt_vars = ["--vars", args.vars] if args.vars else []
+        failed = bool(
+            _dbt(
+                args.project_dir,
+                args.target_path,
+                "test",
+                *select,
+                *exclude,
+                *dbt_vars,
+            )
+        )
+        if not (target_dir / "manifest.json").exists():
+            print("❌ dbt did not write a manifest")
+            return 1
+
+    print("\n=== Running consolidated schema tests ===")
+    run_results = ConsolidatedTestRunner(target_dir / "manifest.json").run(
+        models=args.models
+    )
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_text(json.dumps(run_results, indent=2) + "\n")
+
+    counts = summarize(run_results)
+    print(
+        f"\nDone. PASS={counts['pass']} WARN={counts['warn']} ERROR={counts['error']} "
+        f"FAIL={counts['fail']} TOTAL={len(run_results['results'])} "
+        f"in {run_results['elapsed_time']:.2f}s"
+    )
+    print(f"✓ Results saved to: {output}")
+    if counts["fail"] or counts["error"]:
+        failed = True
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    logging.basicConfig(
+        level=logging.INFO,
+        format="%(asctime)s - %(name)s - %(levelname)s - %(message)s",
+    )
+    sys.exit(main())
@@ -0,0 +1,440 @@
+"""
+Embedded DuckDB engine for the dashboard queries.
+
+Runs the query files in src/analytics/ against the Parquet snapshots of the
+marts written by src.etl.export, so heavy reports can be computed locally
+instead of competing with the OLTP workload on the primary Postgres. Each
+exported mart is exposed as a view with the same schema-qualified name it has
+in Postgres (e.g. olist_marts.mart_seller_analytics), so the query files run
+unchanged apart from a small dialect shim (see translate()).
+
+The `compare` command runs every query on both engines and reports whether
+the results match, which is how the shim is kept honest.
+
+Usage:
+    python -m src.etl.duckdb_engine run --queries seller_analytics_dashboard_queries:1.2
+    python -m src.etl.duckdb_engine compare
+"""
+
+import argparse
+import datetime
+import logging
+import math
+import os
+import re
+import sys
+import time
+from decimal import Decimal
+from pathlib import Path
+
+from src.etl.config import MART_EXPORT_DIR
+from src.etl.export import DATA_FILE, STATE_FILE
+from src.etl.utils import ANALYTICS_DIR, load_dashboard_queries
+
+logger = logging.getLogger(__name__)
+
+# Postgres to_char() format tokens and their strftime equivalents, longest
+# first. Month and Day are blank-padded to nine characters in Postgres.
+TO_CHAR_TOKENS = [
+    ("FMMonth", "%B", None),
+    ("FMDay", "%A", None),
+    ("Month", "%B", 9),
+    ("Day", "%A", 9),
+    ("YYYY", "%Y", None),
+    ("HH24", "%H", None),
+    ("Mon", "%b", None),
+    ("Dy", "%a", None),
+    ("YY", "%y", None),
+    ("MM", "%m", None),
+    ("DD", "%d", None),
+    ("HH", "%I", None),
+    ("MI", "%M", None),
+    ("SS", "%S", None),
+]
+
+# to_char(<column or simple call>, '<format>')
+_TO_CHAR = re.compile(
+    r"\bto_char\(\s*([\w.]+(?:\([^()]*\))?)\s*,\s*'([^']*)'\s*\)", re.IGNORECASE
+)
+
+# Casts to numeric/decimal without a precision. DuckDB reads these as
+# DECIMAL(18,3), which rounds to three places before round(..., 2) does.
+_UNSIZED_DECIMAL_CAST = re.compile(
+    r"::\s*(?:numeric|decimal)\b(?!\s*\()", re.IGNORECASE
+)
+
+
+def _to_char_expression(expression, pg_format):
+    """Build a strftime() expression equivalent to a Postgres to_char()."""
+    parts = []
+    literal = ""
+    position = 0
+    while position < len(pg_format):
+        for token, directive, pad in TO_CHAR_TOKENS:
+            if pg_format.startswith(token, position):
+                if pad:
+                    if literal:
+                        parts.append(f"strftime({expression}, '{literal}')")
+                        literal = ""
+                    parts.append(
+                        f"rpad(strftime({expression}, '{directive}'), {pad}, ' ')"
+                    )
+                else:
+                    literal += directive
+                position += len(token)
+                break
+        else:
+            character = pg_format[position]
+            literal += "%%" if character == "%" else character
+            position += 1
+    if literal or not parts:
+        parts.append(f"strftime({expression}, '{literal}')")
+    return " || ".join(parts)
+
+
+def translate(sql):
+    """
+    Rewrite the Postgres-only constructs of a dashboard query for DuckDB.
+
+    DuckDB already accepts the rest of the Postgres syntax used in
+    src/analytics/ (::casts, date_trunc, date_part, FILTER, LATERAL unnest
+    WITH ORDINALITY, window functions), so only two rewrites are needed:
+
+    - to_char(ts, 'format') becomes strftime() with the format translated
+    - unsized ::numeric / ::decimal casts become ::DOUBLE
+
+    Args:
+        sql: Query text in the Postgres dialect
+
+    Returns:
+        str: Query text for DuckDB
+    """
+    sql = _TO_CHAR.sub(
+        lambda match: _to_char_expression(match.group(1), match.group(2)), sql
+    )
+    return _UNSIZED_DECIMAL_CAST.sub("::DOUBLE", sql)
+
+
+class DuckDBQueryEngine:
+    """Runs dashboard queries in DuckDB over the Parquet exports of the marts."""
+
+    def __init__(self, export_dir=MART_EXPORT_DIR, schema=None, threads=None):
+        """
+        Initialize the engine.
+
+        Args:
+            export_dir: Directory written by src.etl.export
+            schema: Schema name the queries use for the marts
+                (<DB_SCHEMA>_marts if omitted)
+            threads: DuckDB worker threads (all cores if omitted)
+        """
+        self.export_dir = Path(export_dir)
+        self.schema = schema or f"{os.getenv('DB_SCHEMA', 'olist')}_marts"
+        self.threads = threads
+        self.conn = None
+
+    def mart_sources(self):
+        """
+        Parquet scan of every exported mart.
+
+        Returns:
+            dict: Mart name -> DuckDB table function reading its files
+        """
+        sources = {}
+        if not self.export_dir.exists():
+            return sources
+        for mart_dir in sorted(p for p in self.export_dir.iterdir() if p.is_dir()):
+            if (mart_dir / DATA_FILE).exists():
+                sources[mart_dir.name] = f"read_parquet('{mart_dir / DATA_FILE}')"
+            elif any(mart_dir.glob(f"month=*/{DATA_FILE}")):
+                # The month directory is a partition key, not a mart column
+                sources[mart_dir.name] = (
+                    f"(SELECT * EXCLUDE (month) FROM read_parquet("
+                    f"'{mart_dir}/month=*/{DATA_FILE}', hive_partitioning = true))"
+                )
+        return sources
+
+    def connect(self):
+        """Open an in-memory database with a view per exported mart."""
+        try:
+            import duckdb
+        except ImportError as e:
+            raise ImportError(
+                "The DuckDB engine needs the duckdb package: pip install duckdb"
+            ) from e
+
+        if not (self.export_dir / STATE_FILE).exists():
+            raise FileNotFoundError(
+                f"No mart export in {self.export_dir}; run python -m src.etl.export first"
+            )
+
+        self.conn = duckdb.connect(":memory:")
+        # Postgres treats NULL as larger than any value: last in ascending,
+        # first in descending order. DuckDB puts NULLs last in both.
+        self.conn.execute("SET default_null_order = 'nulls_last_on_asc_first_on_desc'")
+        if self.threads:
+            self.conn.execute(f"SET threads = {int(self.threads)}")
+        self.conn.execute(f'CREATE SCHEMA IF NOT EXISTS "{self.schema}"')
+        for mart, source in self.mart_sources().items():
+            self.conn.execute(
+                f'CREATE VIEW "{self.schema}"."{mart}" AS SELECT * FROM {source}'
+            )
+        return self.conn
+
+    def execute(self, sql):
+        """
+        Run one Postgres-dialect query.
+
+        Returns:
+            tuple: (column names, list of row tuples)
+        """
+        if self.conn is None:
+            self.connect()
+        result = self.conn.execute(translate(sql))
+        columns = [column[0] for column in result.description]
+        return columns, result.fetchall()
+
+    def close(self):
+        if self.conn is not None:
+            self.conn.close()
+            self.conn = None
+
+
+def _normalize(value):
+    """Map equivalent Postgres and DuckDB result values onto one type."""
+    if isinstance(value, (Decimal, float)):
+        return float(value)
+    if isinstance(value, datetime.datetime):
+        if value.tzinfo is not None:
+            value = value.astimezone(datetime.timezone.utc).replace(tzinfo=None)
+        return value
+    if isinstance(value, datetime.date):
+        return datetime.datetime.combine(value, datetime.time())
+    if isinstance(value, (list, tuple)):
+        return tuple(_normalize(item) for item in value)
+    return value
+
+
+def _values_match(left, right, abs_tol=0.01, rel_tol=1e-6):
+    """
+    Compare two normalized values.
+
+    Postgres computes the ratios in the queries in exact numeric while the
+    shim uses DOUBLE, so values rounded to two places can differ by one unit
+    in the last place when the exact value ends in 5.
+    """
+    if isinstance(left, float) or isinstance(right, float):
+        if left is None or right is None:
+            return left is right
+        return math.isclose(
+            float(left), float(right), rel_tol=rel_tol, abs_tol=abs_tol + 1e-9
+        )
+    if isinstance(left, tuple) and isinstance(right, tuple):
+        return len(left) == len(right) and all(
+            _values_match(a, b, abs_tol, rel_tol) for a, b in zip(left, right)
+        )
+    return left == right
+
+
+def _sort_key(row):
+    return tuple(
+        (0, "")
+        if value is None
+        else (1, f"{value:.2f}")
+        if isinstance(value, float)
+        else (1, str(value))
+        for value in row
+    )
+
+
+def results_match(expected_rows, actual_rows):
+    """
+    Whether two query results are equivalent.
+
+    Rows are compared in order first; if that fails they are compared as
+    multisets, since rows that tie on the ORDER BY keys may come back in a
+    different order.
+    """
+    expected = [_normalize(tuple(row)) for row in expected_rows]
+    actual = [_normalize(tuple(row)) for row in actual_rows]
+    if len(expected) != len(actual):
+        return False
+
+    def rows_match(left, right):
+        return all(_values_match(a, b) for a, b in zip(left, right))
+
+    if all(rows_match(a, b) for a, b in zip(expected, actual)):
+        return True
+    expected.sort(key=_sort_key)
+    actual.sort(key=_sort_key)
+    return all(rows_match(a, b) for a, b in zip(expected, actual))
+
+
+# Trailing LIMIT of a query
+_TRAILING_LIMIT = re.compile(r"\s+LIMIT\s+\d+\s*$", re.IGNORECASE)
+
+
+def _fetch_postgres(pg_conn, sql):
+    try:
+        with pg_conn.cursor() as cursor:
+            cursor.execute(sql)
+            return cursor.fetchall()
+    finally:
+        pg_conn.rollback()
+
+
+def compare_with_postgres(engine, pg_conn, queries):
+    """
+    Run each query on Postgres and DuckDB and compare the results.
+
+    Args:
+        engine: DuckDBQueryEngine
+        pg_conn: psycopg2 connection to the database the marts were exported from
+        queries: Entries from load_dashboard_queries()
+
+    Returns:
+        list[dict]: One entry per query with "key", "title", "status"
+            (match, tie, mismatch, duckdb_error or postgres_error), timings
+            in seconds and an "error" message where relevant. "tie" means the
+            results only differ because rows tying on the ORDER BY keys were
+            cut differently by a LIMIT; the results without it match.
+    """
+    import psycopg2
+
+    report = []
+    for query in queries:
+        entry = {"key": query["key"], "title": query["title"]}
+        report.append(entry)
+        start = time.perf_counter()
+        try:
+            pg_rows = _fetch_postgres(pg_conn, query["sql"])
+        except psycopg2.Error as e:
+            entry.update(status="postgres_error", error=str(e).strip().splitlines()[0])
+            continue
+        finally:
+            entry["postgres_seconds"] = round(time.perf_counter() - start, 4)
+
+        start = time.perf_counter()
+        try:
+            _, duck_rows = engine.execute(query["sql"])
+        except Exception as e:  # duckdb.Error subclasses vary between versions
+            entry.update(status="duckdb_error", error=str(e).strip().splitlines()[0])
+            continue
+        finally:
+            entry["duckdb_seconds"] = round(time.perf_counter() - start, 4)
+
+        entry["rows"] = len(pg_rows)
+        if results_match(pg_rows, duck_rows):
+            entry["status"] = "match"
+        elif _TRAILING_LIMIT.search(query["sql"]) and results_match(
+            _fetch_postgres(pg_conn, _TRAILING_LIMIT.sub("", query["sql"])),
+            engine.execute(_TRAILING_LIMIT.sub("", query["sql"]))[1],
+        ):
+            entry["status"] = "tie"
+        else:
+            entry["status"] = "mismatch"
+    return report
+
+
+def _select(queries, keys):
+    if not keys:
+        return queries
+    return [q for q in queries if q["key"] in keys or q["file"] in keys]
+
+
+def _run_command(args):
+    engine = DuckDBQueryEngine(
+        args.export_dir, schema=args.schema, threads=args.threads
+    )
+    queries = _select(load_dashboard_queries(args.analytics_dir), args.queries)
+    print(f"\n=== Running {len(queries)} queries in DuckDB over {args.export_dir} ===")
+    failed = False
+    for query in queries:
+        start = time.perf_counter()
+        try:
+            _, rows = engine.execute(query["sql"])
+        except Exception as e:
+            failed = True
+            print(f"❌ {query['key']}: {str(e).strip().splitlines()[0]}")
+            continue
+        print(
+            f"✓ {query['key']}: {len(rows)} rows in "
+            f"{time.perf_counter() - start:.3f}s  {query['title']}"
+        )
+    engine.close()
+    return 1 if failed else 0
+
+
+def _compare_command(args):
+    import psycopg2
+
+    engine = DuckDBQueryEngine(
+        args.export_dir, schema=args.schema, threads=args.threads
+    )
+    engine.connect()
+    pg_conn = psycopg2.connect(
+        host=os.getenv("DB_HOST", "localhost"),
+        port=int(os.getenv("DB_PORT", 5432)),
+        user=os.getenv("DB_USER", "postgres"),
+        password=os.getenv("DB_PASSWORD", "postgres"),
+        database=os.getenv("DB_NAME", "postgres"),
+    )
+    queries = _select(load_dashboard_queries(args.analytics_dir), args.queries)
+    print(f"\n=== Comparing {len(queries)} queries: Postgres vs DuckDB ===")
+    try:
+        report = compare_with_postgres(engine, pg_conn, queries)
+    finally:
+        pg_conn.close()
+        engine.close()
+
+    symbols = {"match": "✓", "tie": "✓", "postgres_error": "◦"}
+    for entry in report:
+        detail = entry.get("error") or (
+            f"{entry['rows']} rows, postgres {entry['postgres_seconds']:.3f}s, "
+            f"duckdb {entry['duckdb_seconds']:.3f}s"
+        )
+        print(
+            f"{symbols.get(entry['status'], '❌')} {entry['key']} "
+            f"[{entry['status']}] {detail}"
+        )
+    failed = [e for e in report if e["status"] in ("mismatch", "duckdb_error")]
+    print(
+        f"\n{sum(e['status'] in ('match', 'tie') for e in report)} match, "
+        f"{len(failed)} differ, "
+        f"{sum(e['status'] == 'postgres_error' for e in report)} fail in Postgres"
+    )
+    return 1 if failed else 0
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Run the dashboard queries in DuckDB over the exported marts"
+    )
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    for name, help_text in (
+        ("run", "Run queries in DuckDB"),
+        ("compare", "Check DuckDB results against Postgres"),
+    ):
+        sub = subparsers.add_parser(name, help=help_text)
+        sub.add_argument("--export-dir", type=Path, default=MART_EXPORT_DIR)
+        sub.add_argument("--analytics-dir", type=Path, default=ANALYTICS_DIR)
+        sub.add_argument("--schema", default=None)
+        sub.add_argument("--threads", type=int, default=None)
+        sub.add_argument(
+            "--queries",
+            nargs="+",
+            default=None,
+            help="Query keys (file_stem:number) or file names; all if omitted",
+        )
+    args = parser.parse_args(argv)
+    if args.command == "run":
+        return _run_command(args)
+    return _compare_command(args)
+
+
+if __name__ == "__main__":
+    logging.basicConfig(
+        level=logging.INFO,
+        format="%(asctime)s - %(name)s - %(levelname)s - %(message)s",
+    )
+    sys.exit(main())
@@ -0,0 +1,438 @@
+"""
+Columnar export of the dbt marts.
+
+Writes every table of the marts schema to zstd-compressed Parquet, partitioned
+by month in Hive layout so Parquet readers (pyarrow.dataset, DuckDB, Spark)
+prune both columns and months:
+
+    <export_dir>/orders/month=2018-01/data.parquet
+    <export_dir>/orders/month=__HIVE_DEFAULT_PARTITION__/data.parquet   (NULL)
+    <export_dir>/mart_seller_analytics/data.parquet                     (unpartitioned)
+
+Marts are partitioned on the column in MART_PARTITION_COLUMNS, a date that does
+not change once a row exists, so incremental dbt runs touch as few months as
+possible. Marts without one are written as a single file.
+
+The Arrow schema is derived from the Postgres column types, not from the data,
+so empty or all-NULL partitions have the same schema as the rest. Numeric
+columns are exported as float64.
+
+Exports are incremental per partition. The row count and an order-independent
+checksum of every month are computed in Postgres, and only months whose
+fingerprint differs from the one recorded in _export_state.json are re-read and
+rewritten. Months that no longer exist are removed. When a mart's columns
+change, the whole mart is rewritten.
+
+Usage:
+    python -m src.etl.export --export-dir src/data/exports/marts
+"""
+
+import argparse
+import json
+import logging
+import os
+import shutil
+import sys
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+
+import psycopg2
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from src.etl.config import MART_EXPORT_DIR
+
+logger = logging.getLogger(__name__)
+
+STATE_FILE = "_export_state.json"
+DATA_FILE = "data.parquet"
+
+# Directory name Hive-style readers map back to a NULL partition value
+NULL_PARTITION = "__HIVE_DEFAULT_PARTITION__"
+
+# Month partition column of each mart; marts not listed are not partitioned
+MART_PARTITION_COLUMNS = {
+    "orders": "purchased_at",
+    "customers": "first_order_date",
+    "sellers": "first_order_date",
+    "products": "first_ordered_at",
+    "product_categories": "first_ordered_at",
+    "mart_customer_analytics": "first_order_date",
+}
+
+# Postgres data types (information_schema) and the Arrow types they export to
+PG_ARROW_TYPES = {
+    "smallint": pa.int16(),
+    "integer": pa.int32(),
+    "bigint": pa.int64(),
+    "real": pa.float32(),
+    "double precision": pa.float64(),
+    "numeric": pa.float64(),
+    "boolean": pa.bool_(),
+    "text": pa.string(),
+    "character varying": pa.string(),
+    "character": pa.string(),
+    "date": pa.date32(),
+    "timestamp without time zone": pa.timestamp("us"),
+    "timestamp with time zone": pa.timestamp("us", tz="UTC"),
+}
+
+# Types that are converted in the query rather than by the driver; anything
+# not in PG_ARROW_TYPES is exported as text
+PG_EXPORT_CASTS = {"numeric": "double precision"}
+
+
+def _quote_ident(name):
+    return '"' + name.replace('"', '""') + '"'
+
+
+def arrow_schema(columns):
+    """
+    Build the export schema of a mart.
+
+    Args:
+        columns: (column_name, data_type) pairs from information_schema
+
+    Returns:
+        pyarrow.Schema: Schema used for every partition of the mart
+    """
+    return pa.schema(
+        [
+            (name, PG_ARROW_TYPES.get(data_type, pa.string()))
+            for name, data_type in columns
+        ]
+    )
+
+
+def select_list(columns):
+    """SELECT list converting each column to its exported type."""
+    expressions = []
+    for name, data_type in columns:
+        column = _quote_ident(name)
+        if data_type in PG_EXPORT_CASTS:
+            column = f"{column}::{PG_EXPORT_CASTS[data_type]} AS {column}"
+        elif data_type not in PG_ARROW_TYPES:
+            column = f"{column}::text AS {column}"
+        expressions.append(column)
+    return ", ".join(expressions)
+
+
+def partition_filter(partition_column, partition):
+    """
+    WHERE clause and parameters selecting one month of a mart.
+
+    A range predicate is used instead of date_trunc() so an index on the
+    partition column can be used.
+    """
+    column = _quote_ident(partition_column)
+    if partition is None:
+        return f"{column} IS NULL", ()
+    month_start = f"{partition}-01"
+    return (
+        f"{column} >= %s::date AND {column} < %s::date + interval '1 month'",
+        (month_start, month_start),
+    )
+
+
+class MartExporter:
+    """Exports the dbt marts to month-partitioned Parquet files."""
+
+    def __init__(
+        self,
+        export_dir=MART_EXPORT_DIR,
+        schema=None,
+        db_params=None,
+        partition_columns=None,
+        compression="zstd",
+        batch_size=50_000,
+    ):
+        """
+        Initialize the exporter.
+
+        Args:
+            export_dir: Directory for the Parquet files and the export state
+            schema: Schema holding the marts (<DB_SCHEMA>_marts if omitted)
+            db_params: psycopg2 connection parameters (DB_* env vars if omitted)
+            partition_columns: Mart -> partition column (MART_PARTITION_COLUMNS
+                if omitted)
+            compression: Parquet compression codec
+            batch_size: Rows fetched from Postgres per Parquet row group
+        """
+        self.export_dir = Path(export_dir)
+        self.schema = schema or f"{os.getenv('DB_SCHEMA', 'olist')}_marts"
+        self.db_params = db_params or {
+            "host": os.getenv("DB_HOST", "localhost"),
+            "port": int(os.getenv("DB_PORT", 5432)),
+            "user": os.getenv("DB_USER", "postgres"),
+            "password": os.getenv("DB_PASSWORD", "postgres"),
+            "database": os.getenv("DB_NAME", "postgres"),
+        }
+        self.partition_columns = (
+            MART_PARTITION_COLUMNS if partition_columns is None else partition_columns
+        )
+        self.compression = compression
+        self.batch_size = batch_size
+        self.state_path = self.export_dir / STATE_FILE
+        self.state = self._load_state()
+
+    def _load_state(self):
+        if self.state_path.exists():
+            try:
+                return json.loads(self.state_path.read_text())
+            except ValueError as e:
+                logger.warning(
+                    f"Ignoring unreadable export state {self.state_path}: {e}"
+                )
+        return {}
+
+    def _save_state(self):
+        self.export_dir.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.state_path.with_suffix(".tmp")
+        tmp_path.write_text(json.dumps(self.state, indent=2, sort_keys=True) + "\n")
+        os.replace(tmp_path, self.state_path)
+
+    def partition_dir(self, mart, partition):
+        """Directory of one partition of a mart."""
+        if partition is None:
+            return self.export_dir / mart / f"month={NULL_PARTITION}"
+        return self.export_dir / mart / f"month={partition}"
+
+    def partition_path(self, mart, partition_column, partition):
+        """Parquet file holding one partition (or all) of a mart."""
+        if partition_column is None:
+            return self.export_dir / mart / DATA_FILE
+        return self.partition_dir(mart, partition) / DATA_FILE
+
+    def list_marts(self, conn):
+        """Tables in the marts schema."""
+        with conn.cursor() as cursor:
+            cursor.execute(
+                "SELECT table_name FROM information_schema.tables "
+                "WHERE table_schema = %s AND table_type = 'BASE TABLE' "
+                "ORDER BY table_name",
+                (self.schema,),
+            )
+            return [row[0] for row in cursor.fetchall()]
+
+    def mart_columns(self, conn, mart):
+        """(column_name, data_type) pairs of a mart in column order."""
+        with conn.cursor() as cursor:
+            cursor.execute(
+                "SELECT column_name, data_type FROM information_schema.columns "
+                "WHERE table_schema = %s AND table_name = %s ORDER BY ordinal_position",
+                (self.schema, mart),
+            )
+            return [tuple(row) for row in cursor.fetchall()]
+
+    def partition_fingerprints(self, conn, mart, partition_column):
+        """
+        Row count and checksum of every month of a mart.
+
+        The checksum sums a 64-bit hash of each row's text representation, so
+        it does not depend on row order and is computed without moving any
+        data out of Postgres.
+
+        Returns:
+            dict: Partition ("YYYY-MM", or None for NULL) -> {"rows", "checksum"}
+        """
+        relation = f"{_quote_ident(self.schema)}.{_quote_ident(mart)}"
+        if partition_column is None:
+            month = "NULL::text"
+        else:
+            month = f"to_char({_quote_ident(partition_column)}, 'YYYY-MM')"
+        with conn.cursor() as cursor:
+            cursor.execute(
+                f"SELECT {month} AS month, count(*), "
+                f"coalesce(sum(hashtextextended(t::text, 0)), 0)::text "
+                f"FROM {relation} t GROUP BY 1"
+            )
+            return {
+                partition: {"rows": rows, "checksum": checksum}
+                for partition, rows, checksum in cursor.fetchall()
+            }
+
+    def _write_partition(self, conn, mart, columns, partition_column, partition):
+        """Stream one partition of a mart into its Parquet file."""
+        schema = arrow_schema(columns)
+        relation = f"{_quote_ident(self.schema)}.{_quote_ident(mart)}"
+        query = f"SELECT {select_list(columns)} FROM {relation}"
+        params = ()
+        if partition_column is not None:
+            where, params = partition_filter(partition_column, partition)
+            query += f" WHERE {where}"
+
+        path = self.partition_path(mart, partition_column, partition)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = path.with_suffix(".parquet.tmp")
+        rows = 0
+        # A named cursor fetches from the server in batches instead of
+        # materializing the whole partition client side
+        with conn.cursor(name=f"export_{mart}") as cursor:
+            cursor.itersize = self.batch_size
+            cursor.execute(query, params)
+            with pq.ParquetWriter(
+                tmp_path, schema, compression=self.compression
+            ) as writer:
+                while True:
+                    batch = cursor.fetchmany(self.batch_size)
+                    if not batch:
+                        break
+                    values = list(zip(*batch))
+                    writer.write_batch(
+                        pa.record_batch(
+                            [
+                                pa.array(values[i], type=field.type)
+                                for i, field in enumerate(schema)
+                            ],
+                            schema=schema,
+                        )
+                    )
+                    rows += len(batch)
+                if rows == 0:
+                    writer.write_table(schema.empty_table())
+        os.replace(tmp_path, path)
+        return rows
+
+    def _remove_partition(self, mart, partition_column, partition):
+        if partition_column is None:
+            path = self.partition_path(mart, None, None)
+            if path.exists():
+                path.unlink()
+        else:
+            shutil.rmtree(self.partition_dir(mart, partition), ignore_errors=True)
+
+    def export_mart(self, conn, mart, force=False):
+        """
+        Export the changed partitions of one mart.
+
+        Args:
+            conn: psycopg2 connection
+            mart: Mart table name
+            force: Rewrite every partition
+
+        Returns:
+            dict: Counts of written, unchanged and removed partitions and rows written
+        """
+        columns = self.mart_columns(conn, mart)
+        column_names = [name for name, _ in columns]
+        partition_column = self.partition_columns.get(mart)
+        if partition_column not in column_names:
+            if partition_column is not None:
+                logger.warning(
+                    f"{mart} has no column {partition_column}, exporting unpartitioned"
+                )
+            partition_column = None
+        schema_entry = [
+            [name, str(field.type)]
+            for name, field in zip(column_names, arrow_schema(columns))
+        ]
+
+        previous = self.state.get(mart, {})
+        layout_changed = (
+            previous.get("schema") != schema_entry
+            or previous.get("partition_column") != partition_column
+        )
+        if layout_changed and previous:
+            logger.info(f"Schema of {mart} changed, rewriting all partitions")
+            shutil.rmtree(self.export_dir / mart, ignore_errors=True)
+        old_partitions = {} if layout_changed else previous.get("partitions", {})
+
+        fingerprints = {
+            NULL_PARTITION if partition is None else partition: fingerprint
+            for partition, fingerprint in self.partition_fingerprints(
+                conn, mart, partition_column
+            ).items()
+        }
+        if partition_column is None and not fingerprints:
+            fingerprints = {NULL_PARTITION: {"rows": 0, "checksum": "0"}}
+
+        stats = {"written": 0, "unchanged": 0, "removed": 0, "rows": 0}
+        for key, fingerprint in sorted(fingerprints.items()):
+            partition = None if key == NULL_PARTITION else key
+            path = self.partition_path(mart, partition_column, partition)
+            if not force and old_partitions.get(key) == fingerprint and path.exists():
+                stats["unchanged"] += 1
+                continue
+            stats["rows"] += self._write_partition(
+                conn, mart, columns, partition_column, partition
+            )
+            stats["written"] += 1
+
+        for key in set(old_partitions) - set(fingerprints):
+            self._remove_partition(
+                mart, partition_column, None if key == NULL_PARTITION else key
+            )
+            stats["removed"] += 1
+
+        self.state[mart] = {
+            "schema": schema_entry,
+            "partition_column": partition_column,
+            "partitions": fingerprints,
+            "exported_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        }
+        self._save_state()
+        return stats
+
+    def run(self, marts=None, force=False):
+        """
+        Export the marts.
+
+        Args:
+            marts: Mart names to export (all tables in the schema if omitted)
+            force: Rewrite every partition
+
+        Returns:
+            dict: Mart -> export_mart() counts
+        """
+        results = {}
+        conn = psycopg2.connect(**self.db_params)
+        try:
+            # Fingerprints and data must come from the same snapshot
+            conn.set_session(
+                isolation_level=psycopg2.extensions.ISOLATION_LEVEL_REPEATABLE_READ,
+                readonly=True,
+            )
+            for mart in marts or self.list_marts(conn):
+                start = time.perf_counter()
+                results[mart] = self.export_mart(conn, mart, force=force)
+                logger.info(
+                    f"Exported {mart}: {results[mart]} "
+                    f"in {time.perf_counter() - start:.2f}s"
+                )
+        finally:
+            conn.close()
+        return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Export the dbt marts to month-partitioned Parquet"
+    )
+    parser.add_argument("--export-dir", type=Path, default=MART_EXPORT_DIR)
+    parser.add_argument(
+        "--schema", default=None, help="Marts schema (default: <DB_SCHEMA>_marts)"
+    )
+    parser.add_argument("--marts", nargs="+", default=None)
+    parser.add_argument("--force", action="store_true", help="Rewrite every partition")
+    args = parser.parse_args(argv)
+
+    exporter = MartExporter(args.export_dir, schema=args.schema)
+    print(f"\n=== Exporting {exporter.schema} to {args.export_dir} ===")
+    results = exporter.run(marts=args.marts, force=args.force)
+    if not results:
+        print(f"  ◦ No marts found in {exporter.schema}")
+    for mart, stats in results.items():
+        print(
+            f"✓ {mart}: {stats['written']} partitions written ({stats['rows']} rows), "
+            f"{stats['unchanged']} unchanged, {stats['removed']} removed"
+        )
+    return 0
+
+
+if __name__ == "__main__":
+    logging.basicConfig(
+        level=logging.INFO,
+        format="%(asctime)s - %(name)s - %(levelname)s - %(message)s",
+    )
+    sys.exit(main())
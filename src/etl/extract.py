@@ -0,0 +1,434 @@
+"""
+Concurrent extraction of the source tables into the raw schema.
+
+Each table is copied by a producer/consumer pair: a reader streams the source
+table through a server-side cursor in batches, and a writer COPYs each batch
+into raw.olist_<table> while the next one is being read. A bounded queue
+between the two caps the memory held per table. Several tables are in flight
+at once, up to a concurrency cap, and each one checks a source and a target
+connection out of the shared pools (src/etl/pool.py), which are sized to that
+cap. A table that fails is rolled back and reported without stopping the
+others.
+
+Copies are written under the bulk-load profile (src/etl/bulk_load.py): into
+UNLOGGED tables with synchronous commit off, with any indexes rebuilt and an
+ANALYZE at the end. The raw copies can be rebuilt from the source at any time,
+so they stay unlogged.
+
+psycopg2 releases the GIL while it waits on the network, so the readers and
+writers run in threads.
+
+Given a run id (the Airflow run_id of the DAG run), every table's copy
+commits together with a row in the etl_extract_runs control table of the
+target schema. Running the same run id again, e.g. as an Airflow retry after
+some tables failed, skips the tables already copied in that run.
+
+Usage:
+    python -m src.etl.extract --concurrency 3 --queue-size 4 --batch-size 5000
+    python -m src.etl.extract --no-bulk-load
+    python -m src.etl.extract --run-id manual__2025-03-18
+"""
+
+import argparse
+import io
+import logging
+import os
+import queue
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from src.etl.bulk_load import (
+    BULK_LOAD_PROFILE,
+    BulkLoad,
+    format_bytes,
+    wal_bytes_since,
+    wal_lsn,
+)
+from src.etl.pool import describe, get_pool
+
+logger = logging.getLogger(__name__)
+
+# Source tables copied by the extraction and the relations they are read from
+SOURCE_TABLES = [
+    {"name": "orders", "endpoint": "olist.orders"},
+    {"name": "order_items", "endpoint": "olist.order_items"},
+    {"name": "products", "endpoint": "olist.products"},
+    {"name": "customers", "endpoint": "olist.customers"},
+    {"name": "sellers", "endpoint": "olist.sellers"},
+    {"name": "order_reviews", "endpoint": "olist.order_reviews"},
+]
+
+# Tables extracted at the same time
+DEFAULT_CONCURRENCY = 3
+
+# Batches buffered between the reader and the writer of a table
+DEFAULT_QUEUE_SIZE = 4
+
+# Rows per batch
+DEFAULT_BATCH_SIZE = 5000
+
+# Control table (in the target schema) of the tables copied per run
+RUNS_TABLE = "etl_extract_runs"
+
+# Seconds between checks for a cancelled table while the queue is full or empty
+_POLL_SECONDS = 0.5
+
+# Marks the end of a table's rows in its queue
+_DONE = object()
+
+
+def _put(batches, item, cancelled):
+    """Put an item on a bounded queue unless the table was cancelled."""
+    while not cancelled.is_set():
+        try:
+            batches.put(item, timeout=_POLL_SECONDS)
+            return True
+        except queue.Full:
+            continue
+    return False
+
+
+def _csv_value(value):
+    """A text value (or None) as a CSV field; COPY reads unquoted empty as NULL."""
+    if value is None:
+        return ""
+    return '"' + value.replace('"', '""') + '"'
+
+
+def _csv_batch(rows):
+    """Rows of text values (or None) as a CSV buffer for COPY."""
+    return io.StringIO("".join(",".join(map(_csv_value, row)) + "\n" for row in rows))
+
+
+class ExtractionEngine:
+    """Copies the source tables into the raw schema, several at a time."""
+
+    def __init__(
+        self,
+        source_params,
+        target_params=None,
+        tables=None,
+        target_schema="raw",
+        concurrency=DEFAULT_CONCURRENCY,
+        queue_size=DEFAULT_QUEUE_SIZE,
+        batch_size=DEFAULT_BATCH_SIZE,
+        bulk_load=BULK_LOAD_PROFILE,
+        run_id=None,
+    ):
+        """
+        Initialize the engine.
+
+        Args:
+            source_params: psycopg2 connection parameters of the source database
+            target_params: psycopg2 connection parameters of the target database
+                (the source database if omitted)
+            tables: Tables to extract, as dicts with "name" and "endpoint"
+            target_schema: Schema the raw.olist_<table> copies are written to
+            concurrency: Maximum number of tables in flight
+            queue_size: Maximum batches buffered between a reader and its writer
+            batch_size: Rows per batch
+            bulk_load: Write the copies under the bulk-load profile
+            run_id: Identifier of the pipeline run; tables already copied in
+                this run are skipped
+        """
+        self.source_params = source_params
+        self.target_params = target_params or source_params
+        self.tables = tables or SOURCE_TABLES
+        self.target_schema = target_schema
+        self.concurrency = max(1, concurrency)
+        self.queue_size = max(1, queue_size)
+        self.batch_size = batch_size
+        self.bulk_load = bulk_load
+        self.run_id = run_id
+        self.source_pool = None
+        self.target_pool = None
+
+    def open(self):
+        # Separate pools for the two sides, so a table holding a source
+        # connection never waits on another table for a target one
+        self.source_pool = get_pool(
+            self.source_params, name="extract-source", max_size=self.concurrency
+        )
+        self.target_pool = get_pool(
+            self.target_params, name="extract-target", max_size=self.concurrency
+        )
+
+    def _read(self, conn, table, columns, batches, cancelled):
+        """Producer: stream the source table into the queue in batches."""
+        select_list = ", ".join(f'"{column}"::text' for column in columns)
+        try:
+            with conn.cursor(name=f"extract_{table['name']}") as cursor:
+                cursor.itersize = self.batch_size
+                cursor.execute(f"SELECT {select_list} FROM {table['endpoint']}")
+                while True:
+                    rows = cursor.fetchmany(self.batch_size)
+                    if not rows:
+                        break
+                    if not _put(batches, rows, cancelled):
+                        return
+            _put(batches, _DONE, cancelled)
+        except Exception as e:
+            _put(batches, e, cancelled)
+
+    def extract_table(self, table):
+        """
+        Copy one table, overlapping its read and its write.
+
+        The target table is replaced in a single transaction, so a failure
+        leaves the previous copy in place.
+
+        Returns:
+            int: Rows copied
+        """
+        start = time.perf_counter()
+        target_table = f"{self.target_schema}.olist_{table['name']}"
+        bulk = None
+        source_conn = self.source_pool.getconn()
+        target_conn = None
+        cancelled = threading.Event()
+        reader = None
+        try:
+            with source_conn.cursor() as cursor:
+                cursor.execute(f"SELECT * FROM {table['endpoint']} LIMIT 0")
+                columns = [desc[0] for desc in cursor.description]
+
+            batches = queue.Queue(maxsize=self.queue_size)
+            reader = threading.Thread(
+                target=self._read,
+                args=(source_conn, table, columns, batches, cancelled),
+                name=f"extract-{table['name']}-reader",
+                daemon=True,
+            )
+            reader.start()
+
+            target_conn = self.target_pool.getconn()
+            columns_sql = ", ".join(f'"{column}"' for column in columns)
+            rows = 0
+            with target_conn.cursor() as cursor:
+                while True:
+                    batch = batches.get()
+                    if batch is _DONE:
+                        break
+                    if isinstance(batch, Exception):
+                        raise batch
+                    if rows == 0:
+                        bulk = BulkLoad(
+                            target_conn,
+                            self.target_schema,
+                            f"olist_{table['name']}",
+                            enabled=self.bulk_load,
+                            durable=False,
+                        )
+                        bulk.start()
+                        cursor.execute(f"DROP TABLE IF EXISTS {target_table}")
+                        cursor.execute(
+                            f"CREATE {bulk.unlogged}TABLE {target_table} ("
+                            + ", ".join(f'"{column}" TEXT' for column in columns)
+                            + ")"
+                        )
+                    cursor.copy_expert(
+                        f"COPY {target_table} ({columns_sql}) FROM STDIN WITH (FORMAT csv)",
+                        _csv_batch(batch),
+                    )
+                    rows += len(batch)
+            if bulk is not None:
+                bulk.finish(rows)
+            if self.run_id is not None:
+                # Committed with the copy, so a retry never copies it twice
+                with target_conn.cursor() as cursor:
+                    cursor.execute(
+                        f"""
+                        INSERT INTO {self.target_schema}.{RUNS_TABLE}
+                            (run_id, table_name, rows, seconds)
+                        VALUES (%s, %s, %s, %s)
+                        ON CONFLICT (run_id, table_name) DO UPDATE SET
+                            rows = EXCLUDED.rows,
+                            seconds = EXCLUDED.seconds,
+                            completed_at = now()
+                        """,
+                        (self.run_id, table["name"], rows, time.perf_counter() - start),
+                    )
+            target_conn.commit()
+            return rows
+        finally:
+            cancelled.set()
+            if reader is not None:
+                reader.join()
+            self.source_pool.putconn(source_conn)
+            if bulk is not None:
+                bulk.close()
+            if target_conn is not None:
+                self.target_pool.putconn(target_conn)
+
+    def _extract(self, table):
+        """Extract a table and record its outcome instead of raising."""
+        logger.info(f"Extracting data from {table['name']} table")
+        result = {"status": "ok", "rows": 0}
+        start = time.perf_counter()
+        try:
+            result["rows"] = self.extract_table(table)
+            if result["rows"]:
+                logger.info(
+                    f"Successfully extracted {result['rows']} rows from {table['name']} "
+                    f"to {self.target_schema}.olist_{table['name']}"
+                )
+            else:
+                logger.info(f"No data found in {table['name']}")
+        except Exception as e:
+            logger.error(f"Error extracting data from {table['name']}: {e}")
+            result["status"] = "error"
+            result["error"] = str(e).strip().splitlines()[0] if str(e) else repr(e)
+        result["seconds"] = round(time.perf_counter() - start, 3)
+        return result
+
+    def _completed_tables(self, cursor):
+        """Create the run control table and read the tables done in this run."""
+        cursor.execute(
+            f"""
+            CREATE TABLE IF NOT EXISTS {self.target_schema}.{RUNS_TABLE} (
+                run_id TEXT NOT NULL,
+                table_name TEXT NOT NULL,
+                rows BIGINT NOT NULL,
+                seconds DOUBLE PRECISION NOT NULL,
+                completed_at TIMESTAMPTZ NOT NULL DEFAULT now(),
+                PRIMARY KEY (run_id, table_name)
+            )
+            """
+        )
+        cursor.execute(
+            f"SELECT table_name, rows FROM {self.target_schema}.{RUNS_TABLE} "
+            f"WHERE run_id = %s",
+            (self.run_id,),
+        )
+        return dict(cursor.fetchall())
+
+    def run(self):
+        """
+        Extract every table, except the ones already copied in this run.
+
+        Returns:
+            dict: Per-table results under "tables" (status "ok", "error" or
+                "skipped"), plus "tables_processed", "tables_failed",
+                "tables_skipped", "rows_processed", "seconds",
+                "rows_per_second", the WAL bytes the target server wrote
+                during the run, whether the bulk-load profile was on and the
+                statistics of the connection pools under "pools"
+        """
+        start = time.perf_counter()
+        self.open()
+        completed = {}
+        with self.target_pool.connection() as conn, conn.cursor() as cursor:
+            cursor.execute(f"CREATE SCHEMA IF NOT EXISTS {self.target_schema}")
+            if self.run_id is not None:
+                completed = self._completed_tables(cursor)
+            start_lsn = wal_lsn(cursor)
+
+        for name in completed:
+            logger.info(f"Skipping {name}: already extracted in run {self.run_id}")
+        pending = [table for table in self.tables if table["name"] not in completed]
+        with ThreadPoolExecutor(
+            max_workers=self.concurrency, thread_name_prefix="extract"
+        ) as executor:
+            extracted = dict(
+                zip(
+                    [table["name"] for table in pending],
+                    executor.map(self._extract, pending),
+                )
+            )
+        results = {
+            table["name"]: extracted.get(table["name"])
+            or {"status": "skipped", "rows": completed[table["name"]], "seconds": 0.0}
+            for table in self.tables
+        }
+
+        with self.target_pool.connection() as conn, conn.cursor() as cursor:
+            wal_bytes = wal_bytes_since(cursor, start_lsn)
+        seconds = time.perf_counter() - start
+        rows = sum(r["rows"] for r in extracted.values())
+        return {
+            "tables": results,
+            "tables_processed": sum(r["status"] == "ok" for r in results.values()),
+            "tables_failed": sum(r["status"] == "error" for r in results.values()),
+            "tables_skipped": len(completed),
+            "rows_processed": rows,
+            "seconds": round(seconds, 3),
+            "rows_per_second": round(rows / seconds, 1) if seconds else 0.0,
+            "wal_bytes": wal_bytes,
+            "bulk_load": self.bulk_load,
+            "pools": [self.source_pool.stats(), self.target_pool.stats()],
+        }
+
+
+def summarize(report):
+    """One-line summary of an extraction report."""
+    skipped = report.get("tables_skipped")
+    return (
+        f"Data extraction complete: {report['tables_processed']} tables succeeded, "
+        f"{report['tables_failed']} tables failed, "
+        + (f"{skipped} tables already extracted, " if skipped else "")
+        + f"{report['rows_processed']} total rows processed"
+    )
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Copy the source tables into the raw schema"
+    )
+    parser.add_argument("--concurrency", type=int, default=DEFAULT_CONCURRENCY)
+    parser.add_argument("--queue-size", type=int, default=DEFAULT_QUEUE_SIZE)
+    parser.add_argument("--batch-size", type=int, default=DEFAULT_BATCH_SIZE)
+    parser.add_argument("--target-schema", default="raw")
+    parser.add_argument(
+        "--no-bulk-load",
+        action="store_true",
+        help="Write logged tables with synchronous commit",
+    )
+    parser.add_argument(
+        "--run-id",
+        help="Skip the tables already extracted under this run id",
+    )
+    args = parser.parse_args(argv)
+
+    db_params = {
+        "host": os.getenv("DB_HOST", "localhost"),
+        "port": int(os.getenv("DB_PORT", 5432)),
+        "user": os.getenv("DB_USER", "postgres"),
+        "password": os.getenv("DB_PASSWORD", "postgres"),
+        "database": os.getenv("DB_NAME", "postgres"),
+    }
+    report = ExtractionEngine(
+        db_params,
+        target_schema=args.target_schema,
+        concurrency=args.concurrency,
+        queue_size=args.queue_size,
+        batch_size=args.batch_size,
+        bulk_load=BULK_LOAD_PROFILE and not args.no_bulk_load,
+        run_id=args.run_id,
+    ).run()
+
+    for name, result in report["tables"].items():
+        if result["status"] == "ok":
+            print(f"✓ {name}: {result['rows']} rows in {result['seconds']}s")
+        elif result["status"] == "skipped":
+            print(f"◦ {name}: already extracted in run {args.run_id}")
+        else:
+            print(f"❌ {name}: {result['error']}")
+    for stats in report["pools"]:
+        print(f"◦ {describe(stats)}")
+    print(
+        f"◦ {report['rows_per_second']:,.0f} rows/s, "
+        f"{format_bytes(report['wal_bytes'])} WAL, "
+        f"bulk-load profile {'on' if report['bulk_load'] else 'off'}"
+    )
+    print(f"{summarize(report)} in {report['seconds']}s")
+    return 1 if report["tables_failed"] else 0
+
+
+if __name__ == "__main__":
+    logging.basicConfig(
+        level=logging.INFO,
+        format="%(asctime)s - %(name)s - %(levelname)s - %(message)s",
+    )
+    sys.exit(main())
@@ -0,0 +1,765 @@
+"""
+Synthetic Olist data generator.
+
+Produces all nine Olist CSV files with realistic distributions and full
+referential integrity at any scale factor (1x matches the size of the Kaggle
+release, 10x and 100x are used for load testing). Orders and their children
+are generated in fixed-size chunks and appended to disk, so memory use stays
+flat regardless of the scale factor.
+
+Ids are derived from a bijective hash of each entity's index, which lets any
+chunk reference a customer, product or seller without keeping the full id
+lists in memory.
+
+Usage:
+    python -m src.etl.generator --scale 10 --output-dir src/data/synthetic/sf10
+"""
+
+import argparse
+import csv
+import logging
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from src.etl.config import RAW_DATA_DIR, SYNTHETIC_DATA_DIR, get_dataset
+
+logger = logging.getLogger(__name__)
+
+# Row counts of the Kaggle release, i.e. scale factor 1
+BASE_ROW_COUNTS = {
+    "orders": 99441,
+    "products": 32951,
+    "sellers": 3095,
+    "geolocation": 1000163,
+    "zip_prefixes": 19015,
+}
+
+# Share of customers that placed more than one order (customer_unique_id repeats)
+REPEAT_CUSTOMER_RATE = 0.0345
+
+ORDER_STATUSES = {
+    "delivered": 0.9702,
+    "shipped": 0.0111,
+    "canceled": 0.0063,
+    "unavailable": 0.0061,
+    "invoiced": 0.0032,
+    "processing": 0.0030,
+    "created": 0.0001,
+}
+
+PAYMENT_TYPES = {
+    "credit_card": 0.739,
+    "boleto": 0.190,
+    "voucher": 0.0563,
+    "debit_card": 0.0147,
+}
+
+# Items per order (1..6)
+ITEMS_PER_ORDER = [0.901, 0.076, 0.013, 0.005, 0.002, 0.003]
+
+# Credit card installments (1..10)
+CREDIT_CARD_INSTALLMENTS = [0.34, 0.16, 0.13, 0.09, 0.07, 0.05, 0.02, 0.06, 0.01, 0.07]
+
+REVIEW_SCORES = [0.115, 0.032, 0.082, 0.193, 0.578]
+LATE_REVIEW_SCORES = [0.45, 0.10, 0.12, 0.13, 0.20]
+
+REVIEW_TITLES = ["recomendo", "otimo", "bom", "produto bom", "nao recebi", "ruim"]
+REVIEW_MESSAGES = {
+    1: ["nao recebi o produto", "produto com defeito", "pessimo atendimento"],
+    2: ["produto diferente do anunciado", "entrega demorada"],
+    3: ["produto ok", "razoavel, poderia ser melhor"],
+    4: ["bom produto", "chegou antes do prazo"],
+    5: ["otimo produto, recomendo", "entrega rapida e produto excelente"],
+}
+
+# Messages indexed by [score - 1, variant]
+_REVIEW_MESSAGE_TABLE = np.array(
+    [
+        [messages[i % len(messages)] for i in range(3)]
+        for messages in REVIEW_MESSAGES.values()
+    ],
+    dtype=object,
+)
+
+PURCHASE_START = np.datetime64("2016-09-04T00:00:00", "s")
+PURCHASE_END = np.datetime64("2018-10-17T00:00:00", "s")
+
+# First zip code prefix of each state's range (prefix = first five CEP digits)
+STATE_ZIP_RANGES = [
+    (1000, "SP"),
+    (20000, "RJ"),
+    (29000, "ES"),
+    (30000, "MG"),
+    (40000, "BA"),
+    (49000, "SE"),
+    (50000, "PE"),
+    (57000, "AL"),
+    (58000, "PB"),
+    (59000, "RN"),
+    (60000, "CE"),
+    (64000, "PI"),
+    (65000, "MA"),
+    (66000, "PA"),
+    (68900, "AP"),
+    (69000, "AM"),
+    (69300, "RR"),
+    (69400, "AM"),
+    (69900, "AC"),
+    (70000, "DF"),
+    (72800, "GO"),
+    (76800, "RO"),
+    (77000, "TO"),
+    (78000, "MT"),
+    (79000, "MS"),
+    (80000, "PR"),
+    (88000, "SC"),
+    (90000, "RS"),
+]
+
+# Share of customers, approximate centroid and main cities per state
+STATES = {
+    "SP": (0.4200, -23.0, -47.5, ["sao paulo", "campinas", "guarulhos", "santos"]),
+    "RJ": (0.1290, -22.6, -43.2, ["rio de janeiro", "niteroi", "nova iguacu"]),
+    "MG": (0.1170, -19.3, -44.4, ["belo horizonte", "uberlandia", "juiz de fora"]),
+    "RS": (0.0550, -30.0, -52.0, ["porto alegre", "caxias do sul", "pelotas"]),
+    "PR": (0.0510, -24.9, -51.3, ["curitiba", "londrina", "maringa"]),
+    "SC": (0.0370, -27.2, -49.8, ["florianopolis", "joinville", "blumenau"]),
+    "BA": (0.0340, -12.9, -40.5, ["salvador", "feira de santana"]),
+    "DF": (0.0215, -15.8, -47.9, ["brasilia"]),
+    "ES": (0.0205, -19.9, -40.6, ["vitoria", "vila velha", "serra"]),
+    "GO": (0.0205, -16.3, -49.5, ["goiania", "anapolis"]),
+    "PE": (0.0166, -8.3, -36.0, ["recife", "olinda"]),
+    "CE": (0.0134, -4.4, -39.3, ["fortaleza"]),
+    "PA": (0.0098, -3.4, -49.7, ["belem"]),
+    "MT": (0.0091, -14.0, -55.4, ["cuiaba"]),
+    "MA": (0.0075, -3.6, -44.7, ["sao luis"]),
+    "MS": (0.0072, -20.8, -54.6, ["campo grande"]),
+    "PB": (0.0054, -7.2, -36.0, ["joao pessoa", "campina grande"]),
+    "PI": (0.0050, -6.0, -42.6, ["teresina"]),
+    "RN": (0.0049, -5.8, -36.4, ["natal"]),
+    "AL": (0.0041, -9.6, -36.3, ["maceio"]),
+    "SE": (0.0034, -10.7, -37.3, ["aracaju"]),
+    "TO": (0.0028, -10.2, -48.3, ["palmas"]),
+    "RO": (0.0025, -10.8, -62.8, ["porto velho"]),
+    "AM": (0.0015, -3.3, -60.0, ["manaus"]),
+    "AC": (0.0008, -9.9, -68.6, ["rio branco"]),
+    "AP": (0.0007, 0.4, -51.5, ["macapa"]),
+    "RR": (0.0005, 2.4, -60.8, ["boa vista"]),
+}
+
+# Distinct salt per id kind so ids never collide across entities
+_ID_SALTS = {
+    "customer": 1,
+    "customer_unique": 2,
+    "order": 3,
+    "product": 4,
+    "seller": 5,
+    "review": 6,
+    "product_seller": 7,
+    "product_price": 8,
+}
+
+# Distinct stream per table so chunks can be regenerated independently
+_RNG_STREAMS = {
+    "zip_prefixes": 1,
+    "geolocation": 2,
+    "sellers": 3,
+    "products": 4,
+    "orders": 5,
+}
+
+
+def _splitmix64(values):
+    """Bijective 64-bit mixer (SplitMix64 finalizer) applied element-wise."""
+    with np.errstate(over="ignore"):
+        z = values + np.uint64(0x9E3779B97F4A7C15)
+        z = (z ^ (z >> np.uint64(30))) * np.uint64(0xBF58476D1CE4E5B9)
+        z = (z ^ (z >> np.uint64(27))) * np.uint64(0x94D049BB133111EB)
+    return z ^ (z >> np.uint64(31))
+
+
+def _zip_to_state(prefixes):
+    """Map zip code prefixes to their state."""
+    range_starts = np.array([start for start, _ in STATE_ZIP_RANGES])
+    range_states = np.array([state for _, state in STATE_ZIP_RANGES])
+    return range_states[np.searchsorted(range_starts, prefixes, side="right") - 1]
+
+
+def _int_column(values, lower, upper, missing=None):
+    """Round and clip to a nullable integer column, blanking missing rows."""
+    values = np.clip(np.round(values), lower, upper).astype(np.int64)
+    column = pd.array(values, dtype="Int64")
+    if missing is not None:
+        column[missing] = pd.NA
+    return column
+
+
+def _hash_uniform(kind, indices, seed):
+    """Deterministic uniform [0, 1) value per index."""
+    salted = indices.astype(np.uint64) ^ np.uint64(_ID_SALTS[kind] << 48)
+    with np.errstate(over="ignore"):
+        mixed = _splitmix64(salted + np.uint64(seed))
+    return (mixed >> np.uint64(11)).astype(np.float64) / float(1 << 53)
+
+
+class OlistDataGenerator:
+    """Generates a synthetic Olist dataset at a configurable scale."""
+
+    def __init__(
+        self,
+        scale=1.0,
+        output_dir=SYNTHETIC_DATA_DIR,
+        seed=42,
+        chunk_size=50000,
+        categories_path=None,
+    ):
+        """
+        Initialize the generator.
+
+        Args:
+            scale: Scale factor relative to the Kaggle release (1 = ~100k orders)
+            output_dir: Directory the CSV files are written to
+            seed: Random seed; the same seed and scale produce identical files
+            chunk_size: Number of orders generated and written per chunk
+            categories_path: Category translation CSV used as the category list
+        """
+        if scale <= 0:
+            raise ValueError("scale must be greater than 0")
+
+        self.scale = scale
+        self.output_dir = Path(output_dir)
+        self.seed = seed
+        self.chunk_size = chunk_size
+        self.categories_path = Path(
+            categories_path or RAW_DATA_DIR / get_dataset("product_categories")["file"]
+        )
+
+        self.n_orders = max(1, round(BASE_ROW_COUNTS["orders"] * scale))
+        self.n_products = max(1, round(BASE_ROW_COUNTS["products"] * scale))
+        self.n_sellers = max(1, round(BASE_ROW_COUNTS["sellers"] * scale))
+        self.n_geolocation = max(1, round(BASE_ROW_COUNTS["geolocation"] * scale))
+        # Zip prefixes are a finite space, so they only shrink for small scales
+        self.n_zip_prefixes = max(
+            len(STATES),
+            min(
+                BASE_ROW_COUNTS["zip_prefixes"],
+                round(BASE_ROW_COUNTS["zip_prefixes"] * scale),
+            ),
+        )
+        self.n_unique_customers = max(
+            1, round(self.n_orders * (1 - REPEAT_CUSTOMER_RATE))
+        )
+
+        self._zip_prefixes = None
+        self._zip_states = None
+        self._zip_cities = None
+        self._zip_lat = None
+        self._zip_lng = None
+        self._zip_cdf = None
+        self._categories = None
+
+    def _rng(self, table, chunk=0):
+        """Independent random stream for a table chunk."""
+        return np.random.default_rng([self.seed, _RNG_STREAMS[table], chunk])
+
+    def _ids(self, kind, indices):
+        """Deterministic 32-character hex ids for entity indices."""
+        salted = indices.astype(np.uint64) ^ np.uint64(_ID_SALTS[kind] << 48)
+        with np.errstate(over="ignore"):
+            high = _splitmix64(salted + np.uint64(self.seed))
+        low = _splitmix64(high)
+        raw = np.stack([high, low], axis=1).astype(">u8").tobytes().hex()
+        return [raw[i : i + 32] for i in range(0, len(raw), 32)]
+
+    def _path(self, table):
+        return self.output_dir / get_dataset(table)["file"]
+
+    def _write(self, table, df, first_chunk):
+        """Append a chunk to the table's CSV file, writing the header once."""
+        df = df[get_dataset(table)["columns"]]
+        df.to_csv(
+            self._path(table),
+            mode="w" if first_chunk else "a",
+            header=first_chunk,
+            index=False,
+            date_format="%Y-%m-%d %H:%M:%S",
+        )
+        return len(df)
+
+    # ------------------------------------------------------------------
+    # Geography
+    # ------------------------------------------------------------------
+
+    def _build_zip_universe(self):
+        """Pick the zip prefixes used by geolocation, customers and sellers."""
+        rng = self._rng("zip_prefixes")
+        prefixes = rng.choice(
+            np.arange(1000, 100000), size=self.n_zip_prefixes, replace=False
+        )
+
+        # Make sure every state has at least one prefix
+        range_starts = [start for start, _ in STATE_ZIP_RANGES]
+        range_ends = range_starts[1:] + [100000]
+        extra = [
+            rng.integers(range_starts[i], range_ends[i])
+            for state in STATES
+            for i in [[s for _, s in STATE_ZIP_RANGES].index(state)]
+        ]
+        prefixes = np.unique(np.concatenate([prefixes, extra]))
+
+        # Sort by state so each state's prefixes form a contiguous block
+        states = _zip_to_state(prefixes)
+        order = np.lexsort((prefixes, states))
+        self._zip_prefixes = prefixes[order]
+        self._zip_states = states[order]
+
+        # Each prefix has a fixed city and a location scattered around its state
+        self._zip_cities = np.array(
+            [
+                STATES[s][3][p % len(STATES[s][3])]
+                for s, p in zip(self._zip_states, self._zip_prefixes)
+            ],
+            dtype=object,
+        )
+        self._zip_lat = np.array([STATES[s][1] for s in self._zip_states])
+        self._zip_lat += rng.normal(0, 1.5, len(prefixes))
+        self._zip_lng = np.array([STATES[s][2] for s in self._zip_states])
+        self._zip_lng += rng.normal(0, 1.5, len(prefixes))
+
+        # Sampling weights: each state's customer share spread over its prefixes
+        shares = np.array([STATES[s][0] for s in self._zip_states])
+        per_state = {s: (self._zip_states == s).sum() for s in STATES}
+        weights = shares / np.array([per_state[s] for s in self._zip_states])
+        self._zip_cdf = np.cumsum(weights / weights.sum())
+
+    def _sample_zips(self, rng, size):
+        """Sample zip prefix positions weighted by each state's share of customers."""
+        positions = np.searchsorted(self._zip_cdf, rng.random(size), side="right")
+        return np.minimum(positions, len(self._zip_cdf) - 1)
+
+    # ------------------------------------------------------------------
+    # Dimension tables
+    # ------------------------------------------------------------------
+
+    def _load_categories(self):
+        with open(self.categories_path, newline="", encoding="utf-8-sig") as f:
+            self._categories = [tuple(row) for row in csv.reader(f)][1:]
+        return self._categories
+
+    def generate_product_categories(self):
+        """Write the category translation table (not scaled)."""
+        categories = self._load_categories()
+        df = pd.DataFrame(
+            categories,
+            columns=get_dataset("product_categories")["columns"],
+        )
+        return self._write("product_categories", df, True)
+
+    def generate_geolocation(self):
+        """Write geolocation rows; every zip prefix appears at least once."""
+        rows = 0
+        for chunk, start in enumerate(
+            range(0, self.n_geolocation, self.chunk_size * 10)
+        ):
+            stop = min(start + self.chunk_size * 10, self.n_geolocation)
+            rng = self._rng("geolocation", chunk)
+            positions = np.arange(start, stop)
+            # The first rows cover the whole universe, the rest are repeats
+            n_zips = len(self._zip_prefixes)
+            zips = np.where(
+                positions < n_zips,
+                np.minimum(positions, n_zips - 1),
+                self._sample_zips(rng, len(positions)),
+            )
+            df = pd.DataFrame(
+                {
+                    "geolocation_zip_code_prefix": self._zip_prefixes[zips],
+                    "geolocation_lat": self._zip_lat[zips]
+                    + rng.normal(0, 0.02, len(zips)),
+                    "geolocation_lng": self._zip_lng[zips]
+                    + rng.normal(0, 0.02, len(zips)),
+                    "geolocation_city": self._zip_cities[zips],
+                    "geolocation_state": self._zip_states[zips],
+                }
+            )
+            rows += self._write("geolocation", df, chunk == 0)
+        return rows
+
+    def generate_sellers(self):
+        """Write sellers; sellers are concentrated in the south-east."""
+        rng = self._rng("sellers")
+        zips = self._sample_zips(rng, self.n_sellers)
+        df = pd.DataFrame(
+            {
+                "seller_id": self._ids("seller", np.arange(self.n_sellers)),
+                "seller_zip_code_prefix": self._zip_prefixes[zips],
+                "seller_city": self._zip_cities[zips],
+                "seller_state": self._zip_states[zips],
+            }
+        )
+        return self._write("sellers", df, True)
+
+    def generate_products(self):
+        """Write products with Zipf-distributed categories."""
+        categories = self._categories or self._load_categories()
+        category_names = np.array([c[0] for c in categories], dtype=object)
+        weights = 1.0 / np.arange(1, len(category_names) + 1) ** 1.1
+        weights = weights / weights.sum()
+
+        rows = 0
+        for chunk, start in enumerate(range(0, self.n_products, self.chunk_size)):
+            stop = min(start + self.chunk_size, self.n_products)
+            size = stop - start
+            rng = self._rng("products", chunk)
+
+            category = category_names[rng.choice(len(category_names), size, p=weights)]
+            missing = rng.random(size) < 0.0185
+            df = pd.DataFrame(
+                {
+                    "product_id": self._ids("product", np.arange(start, stop)),
+                    "product_category_name": np.where(missing, None, category),
+                    "product_name_lenght": _int_column(
+                        rng.normal(48, 10, size), 5, 76, missing
+                    ),
+                    "product_description_lenght": _int_column(
+                        rng.lognormal(6.4, 0.7, size), 4, 3992, missing
+                    ),
+                    "product_photos_qty": _int_column(
+                        1 + rng.poisson(1.2, size), 1, 20, missing
+                    ),
+                    "product_weight_g": _int_column(
+                        rng.lognormal(6.6, 1.2, size), 0, 40425
+                    ),
+                    "product_length_cm": _int_column(rng.normal(30, 16, size), 7, 105),
+                    "product_height_cm": _int_column(
+                        rng.lognormal(2.6, 0.6, size), 2, 105
+                    ),
+                    "product_width_cm": _int_column(rng.normal(23, 12, size), 6, 118),
+                }
+            )
+            rows += self._write("products", df, chunk == 0)
+        return rows
+
+    # ------------------------------------------------------------------
+    # Orders and their children
+    # ------------------------------------------------------------------
+
+    def _product_sellers(self, product_idx):
+        """Each product is sold by one seller, fixed by the product index."""
+        u = _hash_uniform("product_seller", product_idx, self.seed)
+        return (u * self.n_sellers).astype(np.int64)
+
+    def _product_prices(self, product_idx):
+        """Log-normal list price per product (Box-Muller over hashed uniforms)."""
+        u1 = _hash_uniform("product_price", product_idx, self.seed)
+        u2 = _hash_uniform("product_price", product_idx, self.seed + 1)
+        z = np.sqrt(-2.0 * np.log(np.maximum(u1, 1e-12))) * np.cos(2 * np.pi * u2)
+        return np.exp(4.3 + 0.9 * z)
+
+    def _generate_order_chunk(self, chunk, start, stop):
+        rng = self._rng("orders", chunk)
+        size = stop - start
+        order_idx = np.arange(start, stop)
+        order_ids = np.array(self._ids("order", order_idx), dtype=object)
+
+        # Customers (one per order, some sharing a customer_unique_id)
+        unique_idx = np.where(
+            order_idx < self.n_unique_customers,
+            order_idx,
+            rng.integers(0, self.n_unique_customers, size),
+        )
+        zips = self._sample_zips(rng, size)
+        customer_ids = self._ids("customer", order_idx)
+        customers = pd.DataFrame(
+            {
+                "customer_id": customer_ids,
+                "customer_unique_id": self._ids("customer_unique", unique_idx),
+                "customer_zip_code_prefix": self._zip_prefixes[zips],
+                "customer_city": self._zip_cities[zips],
+                "customer_state": self._zip_states[zips],
+            }
+        )
+
+        # Order lifecycle timestamps
+        statuses = np.array(list(ORDER_STATUSES), dtype=object)
+        status = statuses[
+            rng.choice(len(statuses), size, p=list(ORDER_STATUSES.values()))
+        ]
+        span = (PURCHASE_END - PURCHASE_START).astype(np.int64)
+        # Order volume grows over time, so skew purchases towards the end
+        purchased = PURCHASE_START + (span * rng.random(size) ** 0.6).astype(
+            "timedelta64[s]"
+        )
+        approved = purchased + rng.exponential(10 * 3600, size).astype("timedelta64[s]")
+        shipped = approved + rng.exponential(2.8 * 86400, size).astype("timedelta64[s]")
+        delivered = shipped + rng.gamma(2.0, 4.5 * 86400, size).astype("timedelta64[s]")
+        estimated = (
+            (
+                purchased
+                + np.clip(rng.normal(23.5, 8.8, size), 3, 155).astype("timedelta64[D]")
+            )
+            .astype("datetime64[D]")
+            .astype("datetime64[s]")
+        )
+
+        nat = np.datetime64("NaT", "s")
+        approved = np.where(status == "created", nat, approved)
+        shipped = np.where(np.isin(status, ["delivered", "shipped"]), shipped, nat)
+        delivered = np.where(status == "delivered", delivered, nat)
+
+        orders = pd.DataFrame(
+            {
+                "order_id": order_ids,
+                "customer_id": customer_ids,
+                "order_status": status,
+                "order_purchase_timestamp": purchased,
+                "order_approved_at": approved,
+                "order_delivered_carrier_date": shipped,
+                "order_delivered_customer_date": delivered,
+                "order_estimated_delivery_date": estimated,
+            }
+        )
+
+        # Order items (unavailable orders have none, as in the Kaggle release)
+        has_items = status != "unavailable"
+        n_items = np.where(
+            has_items, rng.choice(len(ITEMS_PER_ORDER), size, p=ITEMS_PER_ORDER) + 1, 0
+        )
+        item_order_pos = np.repeat(np.arange(size), n_items)
+        first_item = np.concatenate([[0], np.cumsum(n_items)[:-1]])
+        item_number = (
+            np.arange(len(item_order_pos)) - np.repeat(first_item, n_items) + 1
+        )
+
+        # Popular products sell far more often than the long tail
+        product_idx = (self.n_products * rng.random(len(item_order_pos)) ** 2.5).astype(
+            np.int64
+        )
+        repeat_first = (item_number > 1) & (rng.random(len(item_order_pos)) < 0.5)
+        first_product = product_idx[np.repeat(first_item, n_items)]
+        product_idx = np.where(repeat_first, first_product, product_idx)
+
+        price = np.round(
+            np.clip(
+                self._product_prices(product_idx)
+                * rng.uniform(0.95, 1.05, len(product_idx)),
+                0.85,
+                6735.0,
+            ),
+            2,
+        )
+        freight = np.round(
+            np.where(
+                rng.random(len(product_idx)) < 0.003,
+                0.0,
+                np.clip(rng.lognormal(2.8, 0.5, len(product_idx)), 0, 409.68),
+            ),
+            2,
+        )
+        shipping_limit = purchased[item_order_pos] + (
+            6 * 86400 + rng.integers(0, 86400, len(item_order_pos))
+        ).astype("timedelta64[s]")
+
+        items = pd.DataFrame(
+            {
+                "order_id": order_ids[item_order_pos],
+                "order_item_id": item_number,
+                "product_id": self._ids("product", product_idx),
+                "seller_id": self._ids("seller", self._product_sellers(product_idx)),
+                "shipping_limit_date": shipping_limit,
+                "price": price,
+                "freight_value": freight,
+            }
+        )
+
+        # Payments cover items plus freight; extra payments are voucher splits
+        order_total = np.bincount(
+            item_order_pos, weights=price + freight, minlength=size
+        )
+        order_total = np.where(
+            has_items, order_total, np.round(rng.lognormal(4.7, 0.8, size), 2)
+        )
+        n_payments = np.where(rng.random(size) < 0.03, rng.integers(2, 4, size), 1)
+        pay_order_pos = np.repeat(np.arange(size), n_payments)
+        first_payment = np.concatenate([[0], np.cumsum(n_payments)[:-1]])
+        sequential = (
+            np.arange(len(pay_order_pos)) - np.repeat(first_payment, n_payments) + 1
+        )
+
+        payment_types = np.array(list(PAYMENT_TYPES), dtype=object)
+        primary_type = payment_types[
+            rng.choice(len(payment_types), size, p=list(PAYMENT_TYPES.values()))
+        ]
+        is_primary = sequential == 1
+        pay_type = np.where(is_primary, primary_type[pay_order_pos], "voucher")
+
+        voucher_value = np.round(
+            order_total[pay_order_pos] * rng.uniform(0.05, 0.3, len(pay_order_pos)), 2
+        )
+        voucher_value = np.where(is_primary, 0.0, voucher_value)
+        voucher_total = np.bincount(
+            pay_order_pos, weights=voucher_value, minlength=size
+        )
+        payment_value = np.where(
+            is_primary,
+            np.round(order_total - voucher_total, 2)[pay_order_pos],
+            voucher_value,
+        )
+        installments = np.where(
+            pay_type == "credit_card",
+            rng.choice(
+                len(CREDIT_CARD_INSTALLMENTS),
+                len(pay_order_pos),
+                p=CREDIT_CARD_INSTALLMENTS,
+            )
+            + 1,
+            1,
+        )
+
+        payments = pd.DataFrame(
+            {
+                "order_id": order_ids[pay_order_pos],
+                "payment_sequential": sequential,
+                "payment_type": pay_type,
+                "payment_installments": installments,
+                "payment_value": payment_value,
+            }
+        )
+
+        # Reviews: nearly every order gets one, late or missing deliveries score lower
+        reviewed = rng.random(size) < 0.992
+        late = np.isnat(delivered) | (delivered > estimated)
+        score = (
+            np.where(
+                late,
+                rng.choice(5, size, p=LATE_REVIEW_SCORES),
+                rng.choice(5, size, p=REVIEW_SCORES),
+            )
+            + 1
+        )
+        has_title = rng.random(size) < 0.117
+        has_message = rng.random(size) < 0.41
+        title = np.where(
+            has_title,
+            np.array(REVIEW_TITLES, dtype=object)[
+                rng.integers(0, len(REVIEW_TITLES), size)
+            ],
+            None,
+        )
+        message = np.where(
+            has_message,
+            _REVIEW_MESSAGE_TABLE[score - 1, rng.integers(0, 3, size)],
+            None,
+        )
+        created = (
+            np.where(np.isnat(delivered), estimated, delivered).astype("datetime64[D]")
+            + np.timedelta64(1, "D")
+        ).astype("datetime64[s]")
+        answered = created + rng.exponential(2.5 * 86400, size).astype("timedelta64[s]")
+
+        reviews = pd.DataFrame(
+            {
+                "review_id": self._ids("review", order_idx),
+                "order_id": order_ids,
+                "review_score": score,
+                "review_comment_title": title,
+                "review_comment_message": message,
+                "review_creation_date": created,
+                "review_answer_timestamp": answered,
+            }
+        )[reviewed]
+
+        return {
+            "customers": customers,
+            "orders": orders,
+            "order_items": items,
+            "order_payments": payments,
+            "order_reviews": reviews,
+        }
+
+    def generate_orders(self):
+        """Write orders, customers, order items, payments and reviews in chunks."""
+        rows = {
+            table: 0
+            for table in [
+                "customers",
+                "orders",
+                "order_items",
+                "order_payments",
+                "order_reviews",
+            ]
+        }
+        for chunk, start in enumerate(range(0, self.n_orders, self.chunk_size)):
+            stop = min(start + self.chunk_size, self.n_orders)
+            frames = self._generate_order_chunk(chunk, start, stop)
+            for table, df in frames.items():
+                rows[table] += self._write(table, df, chunk == 0)
+            logger.info(f"Generated orders {start:,}-{stop:,} of {self.n_orders:,}")
+        return rows
+
+    def generate(self):
+        """
+        Generate all nine Olist files.
+
+        Returns:
+            dict: Number of rows written per table
+        """
+        print(f"\n=== Generating synthetic Olist data (scale {self.scale}x) ===")
+        self.output_dir.mkdir(parents=True, exist_ok=True)
+        self._build_zip_universe()
+
+        rows = {}
+        steps = [
+            ("product_categories", self.generate_product_categories),
+            ("geolocation", self.generate_geolocation),
+            ("sellers", self.generate_sellers),
+            ("products", self.generate_products),
+        ]
+        for table, step in steps:
+            print(f"  ◦ Generating {table}...", end="", flush=True)
+            rows[table] = step()
+            print(f" ✓ {rows[table]:,} rows")
+
+        print("  ◦ Generating orders, customers, items, payments and reviews...")
+        rows.update(self.generate_orders())
+
+        print(f"✓ Files written to: {self.output_dir}")
+        logger.info(f"Synthetic dataset generated in {self.output_dir}: {rows}")
+        return rows
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Generate synthetic Olist data")
+    parser.add_argument(
+        "--scale", type=float, default=1.0, help="Scale factor (1 = Kaggle size)"
+    )
+    parser.add_argument("--output-dir", type=Path, default=None)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--chunk-size", type=int, default=50000)
+    args = parser.parse_args(argv)
+
+    output_dir = args.output_dir or SYNTHETIC_DATA_DIR / f"sf{args.scale:g}"
+    start_time = time.time()
+    rows = OlistDataGenerator(
+        scale=args.scale,
+        output_dir=output_dir,
+        seed=args.seed,
+        chunk_size=args.chunk_size,
+    ).generate()
+    duration = time.time() - start_time
+
+    print("\n=== Generation Complete ===")
+    for table, count in rows.items():
+        print(f"  - {table}: {count:,} rows")
+    print(f"✓ Total time: {duration:.2f} seconds")
+
+
+if __name__ == "__main__":
+    logging.basicConfig(
+        level=logging.INFO,
+        format="%(asctime)s - %(name)s - %(levelname)s - %(message)s",
+    )
+    main()
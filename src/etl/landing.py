@@ -0,0 +1,231 @@
+"""
+Parquet landing stage for the raw Olist CSV files.
+
+Each CSV is converted once into a typed, zstd-compressed Parquet file. The
+Arrow schema inferred on the first conversion is cached in _schema.json next
+to the Parquet files and reused for later conversions, so column types stay
+stable between runs. A file is only reconverted when the SHA-256 of its source
+CSV changes; loads read the Parquet file through a memory map. CSV files can
+be members of the Kaggle zip archive, which are parsed straight out of the
+archive (see src/etl/archive.py).
+
+Usage:
+    python -m src.etl.landing --data-dir src/data/raw
+"""
+
+import argparse
+import json
+import logging
+import os
+import sys
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+
+import pyarrow as pa
+import pyarrow.csv as pa_csv
+import pyarrow.parquet as pq
+
+from src.etl.archive import ArchiveMember, as_source, raw_source
+from src.etl.config import LANDING_DATA_DIR, OLIST_DATASETS, RAW_DATA_DIR
+from src.etl.utils import file_sha256
+
+logger = logging.getLogger(__name__)
+
+SCHEMA_CACHE_FILE = "_schema.json"
+
+
+class ParquetLanding:
+    """Converts raw CSV files to Parquet and serves memory-mapped reads."""
+
+    def __init__(self, landing_dir=LANDING_DATA_DIR, compression="zstd"):
+        """
+        Initialize the landing stage.
+
+        Args:
+            landing_dir: Directory for the Parquet files and the schema cache
+            compression: Parquet compression codec
+        """
+        self.landing_dir = Path(landing_dir)
+        self.compression = compression
+        self.cache_path = self.landing_dir / SCHEMA_CACHE_FILE
+        self.cache = self._load_cache()
+
+    def _load_cache(self):
+        if self.cache_path.exists():
+            try:
+                return json.loads(self.cache_path.read_text())
+            except ValueError as e:
+                logger.warning(
+                    f"Ignoring unreadable schema cache {self.cache_path}: {e}"
+                )
+        return {}
+
+    def _save_cache(self):
+        self.landing_dir.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.cache_path.with_suffix(".tmp")
+        tmp_path.write_text(json.dumps(self.cache, indent=2, sort_keys=True) + "\n")
+        os.replace(tmp_path, self.cache_path)
+
+    def parquet_path(self, table_name):
+        """Path of the landed Parquet file for a table."""
+        return self.landing_dir / f"{table_name}.parquet"
+
+    def cached_schema(self, table_name):
+        """
+        Return the cached Arrow schema of a table.
+
+        Returns:
+            pyarrow.Schema or None: Schema from the last conversion, if any
+        """
+        entry = self.cache.get(table_name)
+        if not entry:
+            return None
+        return pa.schema(
+            [
+                (name, pa.type_for_alias(type_name))
+                for name, type_name in entry["schema"]
+            ]
+        )
+
+    def is_current(self, csv_path, table_name):
+        """
+        Check whether the landed file still matches its source CSV.
+
+        The size and modification time are compared first; the file is only
+        hashed when they differ, and a matching hash refreshes the cached
+        modification time instead of triggering a reconversion.
+        """
+        entry = self.cache.get(table_name)
+        if not entry or not self.parquet_path(table_name).exists():
+            return False
+
+        stat = as_source(csv_path).stat()
+        if (
+            entry["source_size"] == stat.st_size
+            and entry["source_mtime_ns"] == stat.st_mtime_ns
+        ):
+            return True
+        if entry["source_size"] != stat.st_size:
+            return False
+        if file_sha256(csv_path) != entry["source_sha256"]:
+            return False
+
+        entry["source_mtime_ns"] = stat.st_mtime_ns
+        self._save_cache()
+        return True
+
+    @staticmethod
+    def _parse_csv(csv_path, **kwargs):
+        if isinstance(csv_path, ArchiveMember):
+            with csv_path.open("rb") as f:
+                return pa_csv.read_csv(f, **kwargs)
+        return pa_csv.read_csv(csv_path, **kwargs)
+
+    def _read_csv(self, csv_path, table_name):
+        """Parse a CSV with the cached column types, inferring them if absent."""
+        schema = self.cached_schema(table_name)
+        if schema is not None:
+            try:
+                return self._parse_csv(
+                    csv_path,
+                    convert_options=pa_csv.ConvertOptions(
+                        column_types={field.name: field.type for field in schema}
+                    ),
+                )
+            except (pa.ArrowInvalid, pa.ArrowNotImplementedError) as e:
+                logger.warning(
+                    f"Cached schema no longer fits {csv_path}, re-inferring types: {e}"
+                )
+        return self._parse_csv(csv_path)
+
+    def land(self, csv_path, table_name, force=False):
+        """
+        Convert a CSV file to Parquet unless the landed copy is current.
+
+        Args:
+            csv_path: Source CSV file, or a member of the archive
+            table_name: Table the file is loaded into
+            force: Reconvert even if the source is unchanged
+
+        Returns:
+            bool: True if the file was (re)converted
+        """
+        csv_path = as_source(csv_path)
+        if not force and self.is_current(csv_path, table_name):
+            logger.info(f"Landed {table_name} is current, skipping conversion")
+            return False
+
+        start = time.perf_counter()
+        stat = csv_path.stat()
+        source_sha256 = file_sha256(csv_path)
+        table = self._read_csv(csv_path, table_name)
+
+        self.landing_dir.mkdir(parents=True, exist_ok=True)
+        parquet_path = self.parquet_path(table_name)
+        tmp_path = parquet_path.with_suffix(".parquet.tmp")
+        pq.write_table(table, tmp_path, compression=self.compression)
+        os.replace(tmp_path, parquet_path)
+
+        self.cache[table_name] = {
+            "source": csv_path.name,
+            "source_sha256": source_sha256,
+            "source_size": stat.st_size,
+            "source_mtime_ns": stat.st_mtime_ns,
+            "rows": table.num_rows,
+            "schema": [[field.name, str(field.type)] for field in table.schema],
+            "landed_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        }
+        self._save_cache()
+        logger.info(
+            f"Landed {csv_path} as {parquet_path} ({table.num_rows} rows) "
+            f"in {time.perf_counter() - start:.2f}s"
+        )
+        return True
+
+    def read(self, csv_path, table_name):
+        """
+        Return the contents of a CSV file via its landed Parquet copy.
+
+        Args:
+            csv_path: Source CSV file, or a member of the archive
+            table_name: Table the file is loaded into
+
+        Returns:
+            pyarrow.Table: Memory-mapped table
+        """
+        self.land(csv_path, table_name)
+        return pq.read_table(self.parquet_path(table_name), memory_map=True)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Land raw Olist CSV files as Parquet")
+    parser.add_argument("--data-dir", type=Path, default=RAW_DATA_DIR)
+    parser.add_argument(
+        "--archive",
+        type=Path,
+        help="Zip archive of the raw files (default: the Kaggle archive in --data-dir)",
+    )
+    parser.add_argument("--landing-dir", type=Path, default=LANDING_DATA_DIR)
+    parser.add_argument("--force", action="store_true", help="Reconvert every file")
+    args = parser.parse_args(argv)
+
+    landing = ParquetLanding(args.landing_dir)
+    print(f"\n=== Landing raw files from {args.data_dir} ===")
+    for dataset in OLIST_DATASETS:
+        csv_path = raw_source(args.data_dir, dataset["file"], args.archive)
+        if not csv_path.exists():
+            print(f"  ◦ {dataset['file']} not found, skipping")
+            continue
+        converted = landing.land(csv_path, dataset["table"], force=args.force)
+        status = "converted" if converted else "unchanged"
+        print(f"✓ {dataset['table']}: {status}")
+    return 0
+
+
+if __name__ == "__main__":
+    logging.basicConfig(
+        level=logging.INFO,
+        format="%(asctime)s - %(name)s - %(levelname)s - %(message)s",
+    )
+    sys.exit(main())
@@ -1,16 +1,45 @@
+import argparse
+import csv
 import os
 import subprocess
 import logging
 from pathlib import Path
-import pandas as pd
 import sqlalchemy
-from sqlalchemy import create_engine
 from dotenv import load_dotenv
 from tqdm import tqdm
 import time
+from collections import Counter
 import numpy as np
 
+from src.etl.archive import ARCHIVE_FILE, archive_members
+from src.etl.bulk_load import BULK_LOAD_PROFILE, BulkLoad, describe as describe_load
+from src.etl.checkpoint import (
+    clear_checkpoint,
+    ensure_checkpoint_table,
+    get_checkpoints,
+    record_chunk,
+    resume_offset,
+)
+from src.etl.config import OLIST_DATASETS, RAW_DATA_DIR
+from src.etl.landing import ParquetLanding
+from src.etl.manifest import (
+    SourceManifest,
+    ensure_manifest_table,
+    get_loaded_manifest,
+    record_load,
+)
+from src.etl.pool import create_pooled_engine, describe, get_pool
+from src.etl.profiling import profile
+from src.etl.validation import (
+    clear_quarantine,
+    describe as describe_validation,
+    ensure_quarantine_table,
+    quarantine_rows,
+    validate_rows,
+)
+
 # Configure logging
+os.makedirs("logs", exist_ok=True)
 logging.basicConfig(
     level=logging.INFO,
     format="%(asctime)s - %(name)s - %(levelname)s - %(message)s",
@@ -64,19 +93,81 @@ class OlistDataLoader:
         self.schema = required_env_vars["DB_SCHEMA"]
         self.supabase_url = required_env_vars["SUPABASE_URL"]
         self.supabase_key = required_env_vars["SUPABASE_SERVICE_KEY"]
+        self.pool = None
         self.engine = None
         self.conn = None
+        # Replaced tables are loaded under the bulk-load profile
+        # (src/etl/bulk_load.py); load statistics are kept per table
+        self.bulk_load = BULK_LOAD_PROFILE
+        self.load_stats = {}
         print("✓ Supabase configuration initialized")
 
         # Dataset configuration
-        self.dataset_path = Path("src/data/raw")
+        self.dataset_path = RAW_DATA_DIR
+        # The raw files are read straight out of the zip archive (see
+        # src/etl/archive.py): the Kaggle download, or a local copy if set
+        self.archive_path = None
         self.kaggle_dataset = "olistbr/brazilian-ecommerce"
+        self.landing = ParquetLanding()
         print("✓ Dataset configuration initialized")
         print("\nReady to start ETL process...")
 
-    def download_dataset(self):
-        """Download the Olist dataset from Kaggle."""
+    def remote_release(self):
+        """
+        Return when the dataset was last updated on Kaggle.
+
+        Returns:
+            str: The dataset's lastUpdated timestamp, or None if Kaggle could
+                not be reached
+        """
+        owner, slug = self.kaggle_dataset.split("/", 1)
         try:
+            result = subprocess.run(
+                ["kaggle", "datasets", "list", "--user", owner, "--search", slug]
+                + ["--csv"],
+                check=True,
+                capture_output=True,
+                text=True,
+                timeout=60,
+            )
+        except (OSError, subprocess.SubprocessError) as e:
+            logger.warning(f"Could not look up the Kaggle release: {e}")
+            return None
+
+        # The CLI may print warnings before the CSV header
+        lines = result.stdout.splitlines()
+        header = next(
+            (i for i, line in enumerate(lines) if line.startswith("ref,")), None
+        )
+        if header is not None:
+            for row in csv.DictReader(lines[header:]):
+                if row["ref"] == self.kaggle_dataset and row.get("lastUpdated"):
+                    return row["lastUpdated"]
+        logger.warning(f"Dataset {self.kaggle_dataset} not listed on Kaggle.")
+        return None
+
+    def download_dataset(self, force=False):
+        """
+        Download the Olist dataset from Kaggle.
+
+        The zip archive is kept as downloaded; nothing is extracted. Nothing is
+        downloaded when a local archive is set (self.archive_path).
+
+        Args:
+            force: Download even if the local files are up to date with the
+                latest release on Kaggle
+        """
+        try:
+            if self.archive_path:
+                print("\n=== Using Local Olist Archive ===")
+                if not self.archive_path.exists():
+                    print(f"❌ Archive not found: {self.archive_path}")
+                    logger.error(f"Archive {self.archive_path} not found.")
+                    return False
+                print(f"✓ Reading files from {self.archive_path}")
+                logger.info(f"Using local archive {self.archive_path}")
+                return True
+
             print("\n=== Downloading Olist Dataset ===")
             logger.info(f"Starting download of dataset: {self.kaggle_dataset}")
 
@@ -84,6 +175,32 @@ class OlistDataLoader:
             os.makedirs(self.dataset_path, exist_ok=True)
             print(f"✓ Created directory: {self.dataset_path}")
 
+            # Skip the download when every file is intact and was downloaded
+            # from the latest release on Kaggle
+            manifest = SourceManifest(self.dataset_path, self.archive_path)
+            release = self.remote_release()
+            if not force and release is not None:
+                if all(
+                    manifest.is_unchanged(dataset["file"], release)
+                    for dataset in OLIST_DATASETS
+                ):
+                    print(
+                        f"✓ All files match the latest release ({release}), "
+                        f"skipping download"
+                    )
+                    logger.info(f"Source files are up to date with release {release}.")
+                    return True
+                print(f"◦ Local files are not from the latest release ({release})")
+            elif not force and all(
+                manifest.is_unchanged(dataset["file"]) for dataset in OLIST_DATASETS
+            ):
+                # Kaggle cannot be reached, e.g. offline: keep the intact files
+                print("◦ Could not check Kaggle for a new release, using local files")
+                logger.warning(
+                    "Kaggle release unknown, using the unchanged local source files."
+                )
+                return True
+
             # Check if Kaggle credentials exist in environment variables
             kaggle_username = os.getenv("KAGGLE_USERNAME")
             kaggle_key = os.getenv("KAGGLE_KEY")
@@ -108,7 +225,7 @@ class OlistDataLoader:
             print("✓ Kaggle credentials verified")
             print("\nDownloading dataset (this may take a few minutes)...")
 
-            # Download the dataset using the Kaggle API
+            # Download the dataset archive using the Kaggle API
             result = subprocess.run(
                 [
                     "kaggle",
@@ -117,23 +234,41 @@ class OlistDataLoader:
                     self.kaggle_dataset,
                     "--path",
                     str(self.dataset_path),
-                    "--unzip",
+                    # Already decided above; the CLI's own check only looks at
+                    # the archive's modification time
+                    "--force",
                 ],
                 check=True,
                 capture_output=True,
                 text=True,
             )
 
-            print("✓ Dataset downloaded and extracted successfully")
-            print(f"✓ Files saved to: {self.dataset_path}")
+            archive = self.dataset_path / ARCHIVE_FILE
+            print("✓ Dataset downloaded successfully")
+            print(f"✓ Archive saved to: {archive}")
 
-            # List downloaded files
-            files = list(self.dataset_path.glob("*.csv"))
+            # List the archived files and record them in the manifest
             print("\nDownloaded files:")
-            for file in files:
-                print(f"  - {file.name}")
+            for name in archive_members(archive):
+                print(f"  - {name}")
+            for dataset in OLIST_DATASETS:
+                if manifest.source(dataset["file"]).exists():
+                    previous = manifest.entries.get(dataset["file"], {})
+                    fingerprint = manifest.fingerprint(dataset["file"])
+                    row_count = (
+                        previous.get("row_count")
+                        if previous.get("sha256") == fingerprint["sha256"]
+                        else None
+                    )
+                    manifest.record(
+                        dataset["file"],
+                        dataset["table"],
+                        row_count,
+                        fingerprint,
+                        release=release,
+                    )
 
-            logger.info("Dataset downloaded and extracted successfully.")
+            logger.info("Dataset downloaded successfully.")
             return True
 
         except subprocess.CalledProcessError as e:
@@ -157,13 +292,9 @@ class OlistDataLoader:
             print(f"  User: {self.db_config['user']}")
             print(f"  Schema: {self.schema}")
 
-            # Create connection string with database credentials
-            connection_string = (
-                f"postgresql://{self.db_config['user']}:{self.db_config['password']}"
-                f"@{self.db_config['host']}:{self.db_config['port']}/{self.db_config['database']}"
-            )
-
-            self.engine = create_engine(connection_string)
+            # Connections come from the shared pool for this database
+            self.pool = get_pool(self.db_config)
+            self.engine = create_pooled_engine(self.pool)
 
             # Test the connection
             print("Testing connection...", end="", flush=True)
@@ -195,14 +326,26 @@ class OlistDataLoader:
             logger.error(f"Error connecting to Supabase: {e}")
             return False
 
-    def load_csv_to_table(self, csv_path, table_name, if_exists="replace"):
+    def load_csv_to_table(
+        self, csv_path, table_name, if_exists="replace", source_sha256=None
+    ):
         """
         Load CSV data into a Supabase table.
 
         Args:
-            csv_path: Path to the CSV file
+            csv_path: Path to the CSV file, or a member of the archive
             table_name: Name of the target table
             if_exists: Strategy if table exists ('replace', 'append')
+            source_sha256: Hash of the source file; if given, a replacing load
+                commits chunk by chunk with checkpoints and resumes an
+                interrupted load of the same file (see src/etl/checkpoint.py)
+
+        Replaced tables are loaded as UNLOGGED tables with synchronous commit
+        off, then indexed, set LOGGED and analyzed (see src/etl/bulk_load.py)
+        unless self.bulk_load is False.
+
+        Rows are validated before they are written; rows that break a rule go
+        to the quarantine table instead (see src/etl/validation.py).
         """
         try:
             print(f"\nLoading {table_name} table:")
@@ -210,9 +353,9 @@ class OlistDataLoader:
                 f"Loading data from {csv_path} to table {self.schema}.{table_name}"
             )
 
-            # Read CSV file
-            print("  ◦ Reading CSV file...", end="", flush=True)
-            df = pd.read_csv(csv_path)
+            # Read the landed Parquet copy (converted only when the CSV changed)
+            print("  ◦ Reading landed Parquet file...", end="", flush=True)
+            df = self.landing.read(csv_path, table_name).to_pandas()
             print(" ✓")
 
             # Clean column names
@@ -220,19 +363,90 @@ class OlistDataLoader:
             df.columns = [col.lower().replace(" ", "_") for col in df.columns]
             print(" ✓")
 
-            # Load data with progress bar
+            # Validate every row in one vectorized pass
+            print("  ◦ Validating rows...", end="", flush=True)
+            started = time.perf_counter()
+            df, rejected = validate_rows(df, table_name)
+            validation_seconds = time.perf_counter() - started
+            quarantined = Counter(rejected["reason_code"])
+            print(f" ✓ {describe_validation(quarantined)}")
+
+            # Load data with progress bar, through one session so the
+            # bulk-load profile's settings apply to every chunk
             print(f"  ◦ Loading {len(df):,} rows into database...")
             chunks = np.array_split(df, max(1, len(df) // 1000))
-            with tqdm(total=len(chunks), desc="    Progress", ncols=80) as pbar:
-                for chunk in chunks:
-                    chunk.to_sql(
-                        name=table_name,
-                        con=self.engine,
-                        schema=self.schema,
-                        if_exists="append" if chunk.index[0] > 0 else if_exists,
-                        index=False,
-                    )
-                    pbar.update(1)
+            checkpointed = source_sha256 is not None and if_exists == "replace"
+            with self.engine.connect() as connection:
+                conn = connection.connection
+                bulk = BulkLoad(
+                    conn,
+                    self.schema,
+                    table_name,
+                    enabled=self.bulk_load and if_exists == "replace",
+                )
+                try:
+                    start = 0
+                    if checkpointed:
+                        ensure_checkpoint_table(conn, self.schema)
+                        start = resume_offset(
+                            conn, self.schema, table_name, source_sha256, chunks
+                        )
+                        conn.commit()
+                    rows_committed = sum(len(chunk) for chunk in chunks[:start])
+                    if start:
+                        print(
+                            f"  ◦ Resuming at chunk {start + 1}/{len(chunks)} "
+                            f"({rows_committed:,} rows already committed)"
+                        )
+                    bulk.start()
+                    if start == 0:
+                        ensure_quarantine_table(conn, self.schema)
+                        if if_exists == "replace":
+                            clear_quarantine(conn, self.schema, table_name)
+                        quarantine_rows(conn, self.schema, table_name, rejected)
+                    with tqdm(
+                        total=len(chunks), initial=start, desc="    Progress", ncols=80
+                    ) as pbar:
+                        for i, chunk in enumerate(chunks[start:], start):
+                            # One transaction per chunk (pandas joins it
+                            # instead of committing on its own), holding the
+                            # chunk's checkpoint
+                            with connection.begin():
+                                chunk.to_sql(
+                                    name=table_name,
+                                    con=connection,
+                                    schema=self.schema,
+                                    if_exists="append" if i > 0 else if_exists,
+                                    index=False,
+                                )
+                                if i == 0:
+                                    # pandas created the table with the first chunk
+                                    bulk.prepare()
+                                rows_committed += len(chunk)
+                                if checkpointed:
+                                    record_chunk(
+                                        conn,
+                                        self.schema,
+                                        table_name,
+                                        source_sha256,
+                                        i + 1,
+                                        rows_committed,
+                                    )
+                            pbar.update(1)
+                    stats = bulk.finish(len(df))
+                    if checkpointed:
+                        clear_checkpoint(conn, self.schema, table_name)
+                    conn.commit()
+                finally:
+                    bulk.close()
+            stats["quarantined"] = dict(quarantined)
+            stats["validation_seconds"] = round(validation_seconds, 3)
+            self.load_stats[table_name] = stats
+            print(f"  ◦ {describe_load(stats)}")
+            logger.info(
+                f"Validated {self.schema}.{table_name} in {validation_seconds:.3f}s: "
+                f"{describe_validation(quarantined)}"
+            )
 
             # Enable basic table security
             print("  ◦ Setting up table permissions...", end="", flush=True)
@@ -262,42 +476,85 @@ class OlistDataLoader:
             logger.error(f"Error loading data: {e}")
             return False
 
-    def load_all_datasets(self):
-        """Load all Olist datasets into the database."""
+    def load_all_datasets(self, force=False):
+        """
+        Load all Olist datasets into the database.
+
+        Tables whose source file hash matches the manifest control table are
+        skipped unless force is set. A table whose last load was interrupted
+        resumes at its first uncommitted chunk.
+
+        Args:
+            force: Reload every table even if its source file is unchanged
+        """
         try:
             print("\n=== Loading Datasets into Database ===")
 
             # List of CSV files and their corresponding table names
-            datasets = [
-                {"file": "olist_customers_dataset.csv", "table": "customers"},
-                {"file": "olist_geolocation_dataset.csv", "table": "geolocation"},
-                {"file": "olist_order_items_dataset.csv", "table": "order_items"},
-                {"file": "olist_order_payments_dataset.csv", "table": "order_payments"},
-                {"file": "olist_order_reviews_dataset.csv", "table": "order_reviews"},
-                {"file": "olist_orders_dataset.csv", "table": "orders"},
-                {"file": "olist_products_dataset.csv", "table": "products"},
-                {"file": "olist_sellers_dataset.csv", "table": "sellers"},
-                {
-                    "file": "product_category_name_translation.csv",
-                    "table": "product_categories",
-                },
-            ]
+            datasets = OLIST_DATASETS
 
             total_datasets = len(datasets)
             print(f"Found {total_datasets} datasets to load")
 
+            manifest = SourceManifest(self.dataset_path, self.archive_path)
+            ensure_manifest_table(self.engine, self.schema)
+            loaded = get_loaded_manifest(self.engine, self.schema)
+            with self.engine.begin() as connection:
+                ensure_checkpoint_table(connection.connection, self.schema)
+                unfinished = get_checkpoints(connection.connection, self.schema)
+            inspector = sqlalchemy.inspect(self.engine)
+            skipped = 0
+
             for i, dataset in enumerate(datasets, 1):
                 print(f"\n[{i}/{total_datasets}] Processing {dataset['table']}")
-                csv_path = self.dataset_path / dataset["file"]
+                csv_path = manifest.source(dataset["file"])
                 if csv_path.exists():
-                    if not self.load_csv_to_table(csv_path, dataset["table"]):
+                    fingerprint = manifest.fingerprint(dataset["file"])
+                    previous = loaded.get(dataset["table"])
+                    if (
+                        not force
+                        and previous
+                        and previous["sha256"] == fingerprint["sha256"]
+                        and inspector.has_table(dataset["table"], schema=self.schema)
+                        and dataset["table"] not in unfinished
+                    ):
+                        print(
+                            f"✓ {dataset['file']} unchanged since last load, skipping"
+                        )
+                        logger.info(
+                            f"Skipping {self.schema}.{dataset['table']}: "
+                            f"source unchanged ({fingerprint['sha256'][:12]})"
+                        )
+                        skipped += 1
+                        continue
+
+                    if not self.load_csv_to_table(
+                        csv_path,
+                        dataset["table"],
+                        source_sha256=fingerprint["sha256"],
+                    ):
                         return False
+                    row_count = self.landing.cache[dataset["table"]]["rows"]
+                    record_load(
+                        self.engine,
+                        self.schema,
+                        dataset["table"],
+                        dataset["file"],
+                        fingerprint["sha256"],
+                        fingerprint["size_bytes"],
+                        row_count,
+                    )
+                    manifest.record(
+                        dataset["file"], dataset["table"], row_count, fingerprint
+                    )
                 else:
                     print(f"❌ File not found: {dataset['file']}")
                     logger.warning(
                         f"File {csv_path} not found. Skipping table {dataset['table']}."
                     )
 
+            if skipped:
+                print(f"\n✓ {skipped} unchanged table(s) skipped")
             print("\n✓ All datasets loaded successfully")
             logger.info("All datasets loaded successfully.")
             return True
@@ -314,9 +571,18 @@ class OlistDataLoader:
             self.engine.dispose()
         print("\n✓ Database connection closed")
         logger.info("Database connection closed")
+        if self.pool:
+            stats = self.pool.stats()
+            print(f"  ◦ {describe(stats)}")
+            logger.info(f"Connection {describe(stats)}")
+
+    def run_etl(self, force=False):
+        """
+        Run the complete ETL process.
 
-    def run_etl(self):
-        """Run the complete ETL process."""
+        Args:
+            force: Download and reload every file even if it is unchanged
+        """
         try:
             print("\n=== Starting ETL Process ===")
 
@@ -324,16 +590,20 @@ class OlistDataLoader:
             os.makedirs("logs", exist_ok=True)
             print("✓ Log directory created")
 
-            # Download the dataset
-            if not self.download_dataset():
-                return False
+            # Download the dataset (each stage is profiled when ETL_PROFILE is
+            # set, see src/etl/profiling.py)
+            with profile("run_etl.download"):
+                if not self.download_dataset(force=force):
+                    return False
 
             # Connect to the database
-            if not self.connect_to_db():
-                return False
+            with profile("run_etl.connect"):
+                if not self.connect_to_db():
+                    return False
 
             # Load all datasets
-            success = self.load_all_datasets()
+            with profile("run_etl.load"):
+                success = self.load_all_datasets(force=force)
 
             # Close connection
             self.close_connection()
@@ -346,9 +616,32 @@ class OlistDataLoader:
 
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Load the Olist dataset")
+    parser.add_argument(
+        "--force",
+        action="store_true",
+        help="Download and reload every file, even if unchanged",
+    )
+    parser.add_argument(
+        "--archive",
+        type=Path,
+        help="Read the files from this local copy of the Kaggle zip archive "
+        "instead of downloading it",
+    )
+    parser.add_argument(
+        "--no-bulk-load",
+        action="store_true",
+        help="Load into logged tables with synchronous commit, as plain inserts",
+    )
+    args = parser.parse_args()
+
     start_time = time.time()
     loader = OlistDataLoader()
-    success = loader.run_etl()
+    if args.no_bulk_load:
+        loader.bulk_load = False
+    if args.archive:
+        loader.archive_path = args.archive
+    success = loader.run_etl(force=args.force)
     end_time = time.time()
 
     if success:
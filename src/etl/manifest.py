@@ -0,0 +1,198 @@
+"""
+Manifest of the raw source files.
+
+Records the SHA-256, size and row count of every raw file, both in a JSON file
+next to the files themselves and in a control table in the database. The
+loader compares a file's current hash against both to skip reloading sources
+that have not changed since the last run, and the Kaggle release a file was
+downloaded from against the latest one to skip downloading. Files are read
+from the Kaggle zip archive when it has them (see src/etl/archive.py).
+"""
+
+import json
+import logging
+import os
+from datetime import datetime, timezone
+from pathlib import Path
+
+import sqlalchemy
+
+from src.etl.archive import raw_source
+from src.etl.utils import file_sha256
+
+logger = logging.getLogger(__name__)
+
+MANIFEST_FILE = "_manifest.json"
+
+# Control table (in the loader's schema) recording what was loaded
+MANIFEST_TABLE = "etl_source_manifest"
+
+
+class SourceManifest:
+    """Tracks content hashes of the raw files in a data directory."""
+
+    def __init__(self, data_dir, archive=None):
+        """
+        Initialize the manifest.
+
+        Args:
+            data_dir: Directory holding the raw files and the manifest
+            archive: Zip archive of the raw files; defaults to the Kaggle
+                archive in data_dir
+        """
+        self.data_dir = Path(data_dir)
+        self.archive = archive
+        self.path = self.data_dir / MANIFEST_FILE
+        self.entries = {}
+        if self.path.exists():
+            try:
+                self.entries = json.loads(self.path.read_text())
+            except ValueError as e:
+                logger.warning(f"Ignoring unreadable manifest {self.path}: {e}")
+
+    def save(self):
+        """Write the manifest atomically."""
+        self.data_dir.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.path.with_suffix(".tmp")
+        tmp_path.write_text(json.dumps(self.entries, indent=2, sort_keys=True) + "\n")
+        os.replace(tmp_path, self.path)
+
+    def source(self, file_name):
+        """
+        Return the raw file, as an archive member or a path in the directory.
+
+        Args:
+            file_name: File name within the data directory or the archive
+        """
+        return raw_source(self.data_dir, file_name, self.archive)
+
+    def fingerprint(self, file_name):
+        """
+        Return the hash and size of a raw file.
+
+        The recorded hash is reused when the size and modification time are
+        unchanged, so unchanged files are not re-read.
+
+        Args:
+            file_name: File name within the data directory or the archive
+
+        Returns:
+            dict: "sha256", "size_bytes" and "mtime_ns" of the file
+        """
+        source = self.source(file_name)
+        stat = source.stat()
+        entry = self.entries.get(file_name, {})
+        if (
+            entry.get("size_bytes") == stat.st_size
+            and entry.get("mtime_ns") == stat.st_mtime_ns
+        ):
+            sha256 = entry["sha256"]
+        else:
+            sha256 = file_sha256(source)
+        return {
+            "sha256": sha256,
+            "size_bytes": stat.st_size,
+            "mtime_ns": stat.st_mtime_ns,
+        }
+
+    def is_unchanged(self, file_name, release=None):
+        """
+        Whether a file exists and matches its recorded hash.
+
+        Args:
+            file_name: File name within the data directory or the archive
+            release: If given, the file must also have been recorded from this
+                release of the source dataset
+        """
+        entry = self.entries.get(file_name)
+        if not entry or not self.source(file_name).exists():
+            return False
+        if release is not None and entry.get("release") != release:
+            return False
+        return self.fingerprint(file_name)["sha256"] == entry["sha256"]
+
+    def record(self, file_name, table_name, row_count, fingerprint=None, release=None):
+        """
+        Record a file after it was downloaded or loaded.
+
+        Args:
+            file_name: File name within the data directory or the archive
+            table_name: Table the file is loaded into
+            row_count: Number of data rows in the file
+            fingerprint: Result of fingerprint(), computed if omitted
+            release: Release of the source dataset the file came from; the
+                recorded release is kept if omitted
+        """
+        fingerprint = fingerprint or self.fingerprint(file_name)
+        release = release or self.entries.get(file_name, {}).get("release")
+        self.entries[file_name] = {
+            **fingerprint,
+            "table": table_name,
+            "row_count": row_count,
+            "release": release,
+            "recorded_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        }
+        self.save()
+
+
+def ensure_manifest_table(engine, schema):
+    """Create the manifest control table if it does not exist."""
+    with engine.begin() as connection:
+        connection.execute(
+            sqlalchemy.text(
+                f"""
+                CREATE TABLE IF NOT EXISTS {schema}.{MANIFEST_TABLE} (
+                    table_name TEXT PRIMARY KEY,
+                    file_name TEXT NOT NULL,
+                    sha256 TEXT NOT NULL,
+                    size_bytes BIGINT NOT NULL,
+                    row_count BIGINT NOT NULL,
+                    loaded_at TIMESTAMPTZ NOT NULL DEFAULT now()
+                )
+                """
+            )
+        )
+
+
+def get_loaded_manifest(engine, schema):
+    """
+    Read the manifest control table.
+
+    Returns:
+        dict: table_name -> {"file_name", "sha256", "size_bytes", "row_count"}
+    """
+    with engine.connect() as connection:
+        rows = connection.execute(
+            sqlalchemy.text(
+                f"SELECT table_name, file_name, sha256, size_bytes, row_count "
+                f"FROM {schema}.{MANIFEST_TABLE}"
+            )
+        ).mappings()
+        return {row["table_name"]: dict(row) for row in rows}
+
+
+def record_load(engine, schema, table_name, file_name, sha256, size_bytes, row_count):
+    """Upsert the manifest row of a table after a successful load."""
+    with engine.begin() as connection:
+        connection.execute(
+            sqlalchemy.text(
+                f"""
+                INSERT INTO {schema}.{MANIFEST_TABLE}
+                    (table_name, file_name, sha256, size_bytes, row_count, loaded_at)
+                VALUES (:table_name, :file_name, :sha256, :size_bytes, :row_count, now())
+                ON CONFLICT (table_name) DO UPDATE SET
+                    file_name = EXCLUDED.file_name,
+                    sha256 = EXCLUDED.sha256,
+                    size_bytes = EXCLUDED.size_bytes,
+                    row_count = EXCLUDED.row_count,
+                    loaded_at = EXCLUDED.loaded_at
+                """
+            ),
+            {
+                "table_name": table_name,
+                "file_name": file_name,
+                "sha256": sha256,
+                "size_bytes": size_bytes,
+                "row_count": row_count,
+            },
+        )
@@ -0,0 +1,732 @@
+"""
+Metabase query cache warming for the dashboards.
+
+After the marts are rebuilt, every card of a dashboard is executed once so
+that Metabase's query cache holds the new results before anyone opens it.
+Two things keep this cheap:
+
+- Only cards whose data changed since they were last warmed are executed.
+  Each card is mapped to the dbt models it reads by matching the relations
+  in its SQL (or its GUI query's tables) against the dbt manifest. Each of
+  those models gets a fingerprint from Postgres' statistics: the table's
+  identity and its inserted, updated and deleted row counters, or for a view
+  its definition and the fingerprints of what it reads. No model is scanned.
+  A card is warmed when the fingerprints of its models differ from the ones
+  it was last warmed with, so incremental marts that took no rows and no
+  updates are skipped, while tables dbt rebuilt are always warmed. Models the
+  dbt runs did not change (from their run_results.json) keep their stored
+  fingerprint. Cards whose models cannot be resolved are always warmed.
+- Metabase has no endpoint that runs a saved question without returning its
+  rows. The result stream is therefore read in fixed-size chunks and thrown
+  away as it arrives. It is never decoded or held in memory, and only its
+  first and last bytes are kept to detect a failed query.
+
+The plan command writes the card to model mapping and the cards to refresh
+per dashboard, so the refresh itself can run as one task per dashboard. The
+fingerprints are kept in control tables in the DB_SCHEMA schema: the latest
+one of each model, and the one each card was last warmed with, recorded only
+when the warm succeeds. Without a database connection every card is warmed.
+
+Usage:
+    python -m src.etl.metabase_warm plan --dashboard-id 1 2 3 \\
+        --manifest target/manifest.json \\
+        --run-results target/run_results_staging.json \\
+            target/run_results_intermediate.json target/run_results_marts.json \\
+        --out target/dashboard_refresh_plan.json
+    python -m src.etl.metabase_warm warm --dashboard-id 1 \\
+        --plan target/dashboard_refresh_plan.json
+"""
+
+import argparse
+import hashlib
+import json
+import logging
+import os
+import re
+import sys
+import time
+from pathlib import Path
+
+import psycopg2
+from psycopg2 import sql as pgsql
+import requests
+
+from src.etl.profiling import profiled
+from src.etl.utils import statistics_fingerprint
+
+logger = logging.getLogger(__name__)
+
+# Bytes read per chunk of a streamed card result
+CHUNK_SIZE = 64 * 1024
+
+# Bytes kept from the start and end of a result to check its status
+STATUS_WINDOW = 2048
+
+# schema.table (or database.schema.table) references in card SQL
+_IDENTIFIER = r'"?[A-Za-z_][\w$]*"?'
+_RELATION = re.compile(rf"{_IDENTIFIER}(?:\s*\.\s*{_IDENTIFIER}){{1,2}}")
+
+# Post-hooks that only (re)create indexes and never change a model's rows
+_INDEX_HOOK = re.compile(r"^\s*create\s+(unique\s+)?index\b", re.IGNORECASE)
+
+# Control tables (in the loader's schema) holding the latest fingerprint of
+# each model and the fingerprint each card was last warmed with
+MODEL_FINGERPRINT_TABLE = "etl_model_fingerprints"
+CARD_FINGERPRINT_TABLE = "etl_card_fingerprints"
+
+
+def relation_key(schema, name):
+    """Case-insensitive key of a schema-qualified relation."""
+    return f"{schema}.{name}".lower()
+
+
+def model_relations(manifest):
+    """
+    Relations of the models and seeds in a dbt manifest.
+
+    Returns:
+        dict: relation_key -> unique_id
+    """
+    relations = {}
+    for unique_id, node in manifest["nodes"].items():
+        if node["resource_type"] in ("model", "seed", "snapshot"):
+            relations[
+                relation_key(node["schema"], node.get("alias") or node["name"])
+            ] = unique_id
+    return relations
+
+
+def _has_data_hooks(node):
+    """Whether a model has post-hooks that may change its rows."""
+    hooks = node.get("config", {}).get("post-hook", [])
+    return any(
+        not _INDEX_HOOK.match(hook["sql"] if isinstance(hook, dict) else hook)
+        for hook in hooks
+    )
+
+
+def changed_models(manifest, *run_results):
+    """
+    Models whose data changed in the given dbt runs.
+
+    A table or incremental model counts as changed when one of the runs
+    built it successfully, except for incremental models that inserted no
+    rows and have no post-hooks besides index creation; their contents are
+    the same as before the run. Views and ephemeral models are not stored,
+    so they change when anything they read changes. Sources are reloaded on
+    every pipeline run and always count as changed.
+
+    Args:
+        manifest: Parsed manifest.json
+        *run_results: Parsed run_results.json of each run (later runs win)
+
+    Returns:
+        set: unique_ids of the changed models
+    """
+    results = {}
+    for run in run_results:
+        for result in run["results"]:
+            results[result["unique_id"]] = result
+
+    memo = {}
+
+    def is_changed(unique_id):
+        if unique_id in memo:
+            return memo[unique_id]
+        memo[unique_id] = False
+        node = manifest["nodes"].get(unique_id)
+        if node is None:
+            changed = unique_id.startswith("source.")
+        elif node.get("config", {}).get("materialized") in ("view", "ephemeral"):
+            changed = any(is_changed(parent) for parent in node["depends_on"]["nodes"])
+        else:
+            result = results.get(unique_id)
+            rows_affected = ((result or {}).get("adapter_response") or {}).get(
+                "rows_affected"
+            )
+            changed = (
+                result is not None
+                and result["status"] == "success"
+                and not (
+                    node.get("config", {}).get("materialized") == "incremental"
+                    and rows_affected == 0
+                    and not _has_data_hooks(node)
+                )
+            )
+        memo[unique_id] = changed
+        return changed
+
+    return {
+        unique_id
+        for unique_id, node in manifest["nodes"].items()
+        if node["resource_type"] in ("model", "seed", "snapshot")
+        and is_changed(unique_id)
+    }
+
+
+def sql_relations(sql, known_relations):
+    """
+    Known relations referenced by a SQL query.
+
+    Args:
+        sql: Query text
+        known_relations: Collection of relation keys
+
+    Returns:
+        set: relation keys found in the query
+    """
+    found = set()
+    for reference in _RELATION.findall(sql):
+        parts = [part.strip().strip('"') for part in reference.split(".")]
+        # database.schema.table or schema.table.column
+        for schema, name in (parts[-2:], parts[:2]):
+            key = relation_key(schema, name)
+            if key in known_relations:
+                found.add(key)
+                break
+    return found
+
+
+def card_fingerprint(models, fingerprints):
+    """
+    Fingerprint of the data a card reads.
+
+    Args:
+        models: unique_ids of the card's models
+        fingerprints: unique_id -> model fingerprint
+
+    Returns:
+        str or None: Digest of the models' fingerprints, or None if one of
+            them is unknown
+    """
+    parts = [(unique_id, fingerprints.get(unique_id)) for unique_id in sorted(models)]
+    if any(fingerprint is None for _, fingerprint in parts):
+        return None
+    return hashlib.sha256(json.dumps(parts).encode("utf-8")).hexdigest()
+
+
+class FingerprintStore:
+    """Model and card fingerprints, kept in control tables."""
+
+    def __init__(self, conn, schema):
+        """
+        Initialize the store, creating its tables if needed.
+
+        Args:
+            conn: psycopg2 connection to the database holding the models
+            schema: Schema of the control tables
+        """
+        self.conn = conn
+        self.schema = schema
+        with conn.cursor() as cursor:
+            cursor.execute(
+                f"""
+                CREATE SCHEMA IF NOT EXISTS {schema};
+                CREATE TABLE IF NOT EXISTS {schema}.{MODEL_FINGERPRINT_TABLE} (
+                    unique_id TEXT PRIMARY KEY,
+                    fingerprint TEXT NOT NULL,
+                    computed_at TIMESTAMPTZ NOT NULL DEFAULT now()
+                );
+                CREATE TABLE IF NOT EXISTS {schema}.{CARD_FINGERPRINT_TABLE} (
+                    card_id INTEGER PRIMARY KEY,
+                    fingerprint TEXT NOT NULL,
+                    warmed_at TIMESTAMPTZ NOT NULL DEFAULT now()
+                );
+                """
+            )
+        conn.commit()
+
+    def relation_fingerprint(self, schema, name):
+        """
+        Statistics fingerprint of a relation (see statistics_fingerprint()).
+
+        Returns:
+            str or None: The fingerprint, or None if the relation is missing
+                or is of a kind without statistics
+        """
+        relation = pgsql.Identifier(schema, name)
+        with self.conn.cursor() as cursor:
+            cursor.execute(
+                "SELECT to_regclass(%s)::oid", (relation.as_string(self.conn),)
+            )
+            oid = cursor.fetchone()[0]
+            return None if oid is None else statistics_fingerprint(cursor, oid)
+
+    def model_fingerprints(self, manifest, unique_ids, unchanged=()):
+        """
+        Fingerprint models and store the fingerprints.
+
+        Args:
+            manifest: Parsed manifest.json
+            unique_ids: Models to fingerprint
+            unchanged: Models the dbt runs did not change; their stored
+                fingerprint is reused
+
+        Returns:
+            tuple: unique_id -> fingerprint, and the set of models whose
+                fingerprint differs from the stored one
+        """
+        unique_ids = sorted(set(unique_ids))
+        with self.conn.cursor() as cursor:
+            cursor.execute(
+                f"SELECT unique_id, fingerprint "
+                f"FROM {self.schema}.{MODEL_FINGERPRINT_TABLE} "
+                f"WHERE unique_id = ANY(%s)",
+                (unique_ids,),
+            )
+            stored = dict(cursor.fetchall())
+
+        fingerprints = {}
+        changed = set()
+        for unique_id in unique_ids:
+            if unique_id in unchanged and unique_id in stored:
+                fingerprints[unique_id] = stored[unique_id]
+                continue
+            node = manifest["nodes"][unique_id]
+            start = time.perf_counter()
+            fingerprint = self.relation_fingerprint(
+                node["schema"], node.get("alias") or node["name"]
+            )
+            logger.info(
+                f"Fingerprinted {unique_id} in {time.perf_counter() - start:.2f}s"
+            )
+            fingerprints[unique_id] = fingerprint
+            if fingerprint != stored.get(unique_id):
+                changed.add(unique_id)
+            if fingerprint is not None:
+                with self.conn.cursor() as cursor:
+                    cursor.execute(
+                        f"""
+                        INSERT INTO {self.schema}.{MODEL_FINGERPRINT_TABLE}
+                            (unique_id, fingerprint)
+                        VALUES (%s, %s)
+                        ON CONFLICT (unique_id) DO UPDATE SET
+                            fingerprint = EXCLUDED.fingerprint,
+                            computed_at = now()
+                        """,
+                        (unique_id, fingerprint),
+                    )
+        self.conn.commit()
+        return fingerprints, changed
+
+    def warmed_fingerprints(self, card_ids):
+        """Fingerprints the cards were last warmed with: card_id -> fingerprint."""
+        with self.conn.cursor() as cursor:
+            cursor.execute(
+                f"SELECT card_id, fingerprint "
+                f"FROM {self.schema}.{CARD_FINGERPRINT_TABLE} "
+                f"WHERE card_id = ANY(%s)",
+                ([int(card_id) for card_id in card_ids],),
+            )
+            warmed = dict(cursor.fetchall())
+        self.conn.rollback()
+        return warmed
+
+    def record_warmed(self, card_id, fingerprint):
+        """Record the fingerprint a card was warmed with."""
+        with self.conn.cursor() as cursor:
+            cursor.execute(
+                f"""
+                INSERT INTO {self.schema}.{CARD_FINGERPRINT_TABLE}
+                    (card_id, fingerprint)
+                VALUES (%s, %s)
+                ON CONFLICT (card_id) DO UPDATE SET
+                    fingerprint = EXCLUDED.fingerprint,
+                    warmed_at = now()
+                """,
+                (int(card_id), fingerprint),
+            )
+        self.conn.commit()
+
+
+class MetabaseClient:
+    """Minimal Metabase API client using a session token."""
+
+    def __init__(self, url, username, password, timeout=600):
+        """
+        Initialize the client.
+
+        Args:
+            url: Base URL of the Metabase instance
+            username: Metabase user
+            password: Metabase password
+            timeout: Seconds to wait for a response
+        """
+        self.url = url.rstrip("/")
+        self.username = username
+        self.password = password
+        self.timeout = timeout
+        self.session = requests.Session()
+        self._tables = {}
+
+    def login(self):
+        response = self.session.post(
+            f"{self.url}/api/session",
+            json={"username": self.username, "password": self.password},
+            timeout=self.timeout,
+        )
+        response.raise_for_status()
+        self.session.headers["X-Metabase-Session"] = response.json()["id"]
+
+    def get(self, path):
+        response = self.session.get(f"{self.url}{path}", timeout=self.timeout)
+        response.raise_for_status()
+        return response.json()
+
+    def dashboard_cards(self, dashboard_id):
+        """Cards of a dashboard (text and heading cards are left out)."""
+        dashboard = self.get(f"/api/dashboard/{dashboard_id}")
+        # "ordered_cards" was renamed to "dashcards" in Metabase 0.47
+        dashcards = dashboard.get("dashcards") or dashboard.get("ordered_cards") or []
+        cards = {}
+        for dashcard in dashcards:
+            card = dashcard.get("card") or {}
+            if card.get("id") is not None:
+                cards[card["id"]] = card
+        return list(cards.values())
+
+    def table_relation(self, table_id):
+        """relation_key of a Metabase table id."""
+        if table_id not in self._tables:
+            table = self.get(f"/api/table/{table_id}")
+            self._tables[table_id] = relation_key(table["schema"], table["name"])
+        return self._tables[table_id]
+
+    def card_relations(self, card, known_relations, _seen=None):
+        """
+        Known relations a card reads.
+
+        Native cards are matched on the relations in their SQL. GUI cards are
+        resolved through their source and joined tables, following cards
+        used as sources.
+
+        Returns:
+            set or None: relation keys, or None if they could not be determined
+        """
+        seen = _seen if _seen is not None else set()
+        seen.add(card["id"])
+        dataset_query = card.get("dataset_query") or {}
+        if dataset_query.get("type") == "native":
+            relations = sql_relations(
+                dataset_query.get("native", {}).get("query", ""), known_relations
+            )
+            return relations or None
+
+        query = dataset_query.get("query") or {}
+        sources = [query.get("source-table")]
+        sources += [join.get("source-table") for join in query.get("joins", [])]
+        relations = set()
+        for source in sources:
+            if isinstance(source, int):
+                relations.add(self.table_relation(source))
+            elif isinstance(source, str) and source.startswith("card__"):
+                source_id = int(source.split("__", 1)[1])
+                if source_id in seen:
+                    continue
+                nested = self.card_relations(
+                    self.get(f"/api/card/{source_id}"), known_relations, seen
+                )
+                if nested is None:
+                    return None
+                relations |= nested
+            else:
+                return None
+        return relations or None
+
+    def warm_card(self, card_id):
+        """
+        Execute a card so Metabase caches its result.
+
+        The response is streamed and discarded chunk by chunk.
+
+        Returns:
+            int: Bytes received
+        """
+        with self.session.post(
+            f"{self.url}/api/card/{card_id}/query",
+            json={"ignore_cache": False},
+            stream=True,
+            timeout=self.timeout,
+        ) as response:
+            response.raise_for_status()
+            head = b""
+            tail = b""
+            received = 0
+            for chunk in response.iter_content(chunk_size=CHUNK_SIZE):
+                if len(head) < STATUS_WINDOW:
+                    head += chunk[: STATUS_WINDOW - len(head)]
+                tail = (tail + chunk)[-STATUS_WINDOW:]
+                received += len(chunk)
+        # Query errors are reported in the body of a 202 response
+        if b'"status":"failed"' in head or b'"status":"failed"' in tail:
+            match = re.search(rb'"error":"((?:[^"\\]|\\.)*)"', head + tail)
+            message = match.group(1).decode("utf-8", "replace") if match else "failed"
+            raise RuntimeError(message)
+        return received
+
+
+def card_models(client, card, relations):
+    """
+    dbt models a card reads.
+
+    Args:
+        client: Logged-in MetabaseClient
+        card: Card as returned by the Metabase API
+        relations: relation_key -> unique_id of the dbt models
+
+    Returns:
+        list or None: sorted unique_ids, or None if they could not be determined
+    """
+    try:
+        card_relations = client.card_relations(card, relations)
+    except requests.exceptions.RequestException as e:
+        logger.warning(f"Could not resolve the tables of card {card['id']}: {e}")
+        return None
+    if card_relations is None:
+        return None
+    return sorted(relations[key] for key in card_relations if key in relations)
+
+
+def build_plan(client, dashboard_ids, manifest, run_results=(), store=None):
+    """
+    Map each dashboard card to the dbt models it reads and decide whether it
+    needs a refresh.
+
+    A card is refreshed when the fingerprints of its models differ from the
+    ones it was last warmed with, or when its models could not be
+    determined. Without a fingerprint store every card is refreshed.
+
+    Args:
+        client: Logged-in MetabaseClient
+        dashboard_ids: Metabase dashboard ids
+        manifest: Parsed manifest.json
+        run_results: Parsed run_results.json of each dbt run of the pipeline;
+            models they did not change are not fingerprinted again
+        store: FingerprintStore, or None
+
+    Returns:
+        dict: "changed_models" (whose fingerprint changed, or None without a
+            store) and, per dashboard id, each card's "name", "models",
+            "fingerprint" and "refresh" flag
+    """
+    relations = model_relations(manifest)
+    cards_by_dashboard = {}
+    for dashboard_id in dashboard_ids:
+        cards_by_dashboard[str(dashboard_id)] = [
+            (card, card_models(client, card, relations))
+            for card in client.dashboard_cards(dashboard_id)
+        ]
+
+    fingerprints, changed, warmed = {}, None, {}
+    if store is not None:
+        models = {
+            unique_id
+            for cards in cards_by_dashboard.values()
+            for _, card_model_ids in cards
+            for unique_id in card_model_ids or ()
+        }
+        unchanged = (
+            models - changed_models(manifest, *run_results) if run_results else ()
+        )
+        fingerprints, changed = store.model_fingerprints(manifest, models, unchanged)
+        warmed = store.warmed_fingerprints(
+            card["id"] for cards in cards_by_dashboard.values() for card, _ in cards
+        )
+
+    plan = {
+        "changed_models": None if changed is None else sorted(changed),
+        "dashboards": {},
+    }
+    for dashboard_id, cards in cards_by_dashboard.items():
+        plan["dashboards"][dashboard_id] = {}
+        for card, models in cards:
+            fingerprint = (
+                None if models is None else card_fingerprint(models, fingerprints)
+            )
+            plan["dashboards"][dashboard_id][str(card["id"])] = {
+                "name": card.get("name"),
+                "models": models,
+                "fingerprint": fingerprint,
+                "refresh": fingerprint is None or warmed.get(card["id"]) != fingerprint,
+            }
+    return plan
+
+
+def warm_cards(client, card_ids, on_warmed=None):
+    """
+    Warm the given cards.
+
+    Args:
+        client: Logged-in MetabaseClient
+        card_ids: Cards to warm
+        on_warmed: Called with the id of each card warmed successfully
+
+    Returns:
+        dict: "warmed" and "failed" card counts, "bytes" received and
+            "errors" (card id -> message)
+    """
+    report = {"warmed": 0, "failed": 0, "bytes": 0, "errors": {}}
+    for card_id in card_ids:
+        try:
+            start = time.perf_counter()
+            report["bytes"] += client.warm_card(card_id)
+            logger.info(f"Warmed card {card_id} in {time.perf_counter() - start:.2f}s")
+            report["warmed"] += 1
+            if on_warmed is not None:
+                on_warmed(card_id)
+        except (requests.exceptions.RequestException, RuntimeError) as e:
+            logger.warning(f"Failed to warm card {card_id}: {e}")
+            report["failed"] += 1
+            report["errors"][card_id] = str(e)
+    return report
+
+
+def _client_from_env():
+    client = MetabaseClient(
+        os.environ["METABASE_URL"],
+        os.environ["METABASE_USERNAME"],
+        os.environ["METABASE_PASSWORD"],
+    )
+    client.login()
+    return client
+
+
+def _store_from_env():
+    """FingerprintStore on the DB_* database, or None if it cannot be reached."""
+    try:
+        conn = psycopg2.connect(
+            host=os.getenv("DB_HOST", "localhost"),
+            port=int(os.getenv("DB_PORT", 5432)),
+            user=os.getenv("DB_USER", "postgres"),
+            password=os.getenv("DB_PASSWORD", "postgres"),
+            database=os.getenv("DB_NAME", "postgres"),
+            connect_timeout=10,
+        )
+        return FingerprintStore(conn, os.getenv("DB_SCHEMA", "olist"))
+    except psycopg2.Error as e:
+        logger.warning(f"No fingerprint store, every card is warmed: {e}")
+        return None
+
+
+def _write_json(path, data):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_suffix(path.suffix + ".tmp")
+    tmp_path.write_text(json.dumps(data, indent=2))
+    os.replace(tmp_path, path)
+
+
+@profiled("metabase_warm")
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Refresh Metabase dashboard cards whose dbt models changed"
+    )
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    for name, help_text in (
+        ("plan", "Map dashboard cards to dbt models and pick those to refresh"),
+        ("warm", "Warm the query cache of the cards that need a refresh"),
+    ):
+        command = subparsers.add_parser(name, help=help_text)
+        command.add_argument("--dashboard-id", nargs="+", required=True)
+        command.add_argument(
+            "--run-results",
+            type=Path,
+            nargs="*",
+            help="run_results.json of each dbt run of the pipeline",
+        )
+        command.add_argument(
+            "--manifest", type=Path, default=Path("target/manifest.json")
+        )
+
+    subparsers.choices["plan"].add_argument("--out", type=Path, default=None)
+    subparsers.choices["warm"].add_argument(
+        "--plan", type=Path, default=None, help="Plan written by the plan command"
+    )
+    subparsers.choices["warm"].add_argument(
+        "--all", action="store_true", help="Warm every card, changed or not"
+    )
+    args = parser.parse_args(argv)
+
+    client = _client_from_env()
+    store = None if args.command == "warm" and args.all else _store_from_env()
+    try:
+        return _run(args, client, store)
+    finally:
+        if store is not None:
+            store.conn.close()
+
+
+def _run(args, client, store):
+    if args.command == "plan":
+        plan = build_plan(
+            client,
+            args.dashboard_id,
+            json.loads(args.manifest.read_text()),
+            [json.loads(path.read_text()) for path in args.run_results or []],
+            store,
+        )
+        if plan["changed_models"] is not None:
+            print(f"✓ {len(plan['changed_models'])} models changed")
+        for dashboard_id, cards in plan["dashboards"].items():
+            refresh = sum(card["refresh"] for card in cards.values())
+            unresolved = sum(card["models"] is None for card in cards.values())
+            print(
+                f"✓ Dashboard {dashboard_id}: {refresh} of {len(cards)} cards "
+                f"to refresh ({unresolved} unresolved)"
+            )
+        if args.out:
+            _write_json(args.out, plan)
+            print(f"✓ Plan written to {args.out}")
+        else:
+            print(json.dumps(plan, indent=2))
+        return 0
+
+    if args.all:
+        plan = None
+    elif args.plan:
+        plan = json.loads(args.plan.read_text())
+    elif args.run_results:
+        plan = build_plan(
+            client,
+            args.dashboard_id,
+            json.loads(args.manifest.read_text()),
+            [json.loads(path.read_text()) for path in args.run_results],
+            store,
+        )
+    else:
+        plan = None
+    failed = False
+    for dashboard_id in args.dashboard_id:
+        if plan is None:
+            cards = {}
+            card_ids = [card["id"] for card in client.dashboard_cards(dashboard_id)]
+            skipped = 0
+        else:
+            cards = plan["dashboards"].get(str(dashboard_id), {})
+            card_ids = [int(cid) for cid, card in cards.items() if card["refresh"]]
+            skipped = len(cards) - len(card_ids)
+
+        def on_warmed(card_id, cards=cards):
+            # Only a successful warm moves the card to its new fingerprint
+            fingerprint = cards.get(str(card_id), {}).get("fingerprint")
+            if store is not None and fingerprint is not None:
+                store.record_warmed(card_id, fingerprint)
+
+        report = warm_cards(client, card_ids, on_warmed)
+        for card_id, error in report["errors"].items():
+            print(f"  ◦ card {card_id}: {error}")
+        print(
+            f"✓ Dashboard {dashboard_id}: {report['warmed']} warmed, "
+            f"{skipped} skipped, {report['failed']} failed "
+            f"({report['bytes'] / 1024:.0f} KiB discarded)"
+        )
+        failed = failed or bool(report["failed"])
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    logging.basicConfig(
+        level=logging.INFO,
+        format="%(asctime)s - %(name)s - %(levelname)s - %(message)s",
+    )
+    sys.exit(main())
@@ -0,0 +1,391 @@
+"""
+Shared, bounded Postgres connection pools.
+
+Callers check connections out of a process-wide pool per database instead of
+opening their own. Pools are created on first use by get_pool() and shared by
+everything that asks for the same connection parameters (and pool name).
+
+Each pool:
+
+- never opens more than max_size connections; checkouts beyond that wait
+  for a connection to be returned, up to a timeout
+- checks a connection before handing it out: connections that were closed,
+  are older than max_age_s, or fail a SELECT 1 after sitting idle for more
+  than health_check_after_s are discarded and replaced
+- keeps statistics (checkouts, waits and time spent waiting, timeouts,
+  connections created, recycled and failed, and connection ages) through
+  stats()
+
+Connections are psycopg2 connections whose close() returns them to their
+pool, so a SQLAlchemy engine built with create_pooled_engine() draws from the
+same pool.
+
+Usage:
+    from src.etl.pool import get_pool
+
+    with get_pool(db_params).connection() as conn, conn.cursor() as cursor:
+        cursor.execute("SELECT 1")
+"""
+
+import contextlib
+import logging
+import os
+import threading
+import time
+
+import psycopg2
+import psycopg2.extensions
+from psycopg2.pool import PoolError
+
+logger = logging.getLogger(__name__)
+
+# Maximum connections per pool
+DEFAULT_MAX_SIZE = int(os.getenv("DB_POOL_MAX_SIZE", 10))
+
+# Seconds a checkout waits for a free connection before failing
+DEFAULT_TIMEOUT_S = float(os.getenv("DB_POOL_TIMEOUT", 30))
+
+# Connections older than this are closed instead of reused
+DEFAULT_MAX_AGE_S = float(os.getenv("DB_POOL_MAX_AGE", 1800))
+
+# Connections idle for longer than this are pinged before reuse
+DEFAULT_HEALTH_CHECK_AFTER_S = float(os.getenv("DB_POOL_HEALTH_CHECK_AFTER", 30))
+
+
+class PoolTimeout(PoolError):
+    """No connection became free before the checkout timeout."""
+
+
+class PooledConnection(psycopg2.extensions.connection):
+    """psycopg2 connection that goes back to its pool when closed."""
+
+    def close(self):
+        pool = getattr(self, "pool", None)
+        if pool is not None and not self.closed:
+            pool.putconn(self)
+        else:
+            super().close()
+
+    def discard(self):
+        """Close the connection for good."""
+        super().close()
+
+
+class ConnectionPool:
+    """Thread-safe, bounded pool of connections to one database."""
+
+    def __init__(
+        self,
+        db_params,
+        max_size=DEFAULT_MAX_SIZE,
+        timeout_s=DEFAULT_TIMEOUT_S,
+        max_age_s=DEFAULT_MAX_AGE_S,
+        health_check_after_s=DEFAULT_HEALTH_CHECK_AFTER_S,
+        name="default",
+    ):
+        """
+        Initialize the pool. No connection is opened until the first checkout.
+
+        Args:
+            db_params: psycopg2 connection parameters
+            max_size: Maximum number of open connections
+            timeout_s: Seconds a checkout waits for a free connection
+            max_age_s: Age after which a connection is replaced
+            health_check_after_s: Idle time after which a connection is pinged
+                before it is handed out
+            name: Name used in logs and statistics
+        """
+        self.db_params = db_params
+        self.max_size = max(1, max_size)
+        self.timeout_s = timeout_s
+        self.max_age_s = max_age_s
+        self.health_check_after_s = health_check_after_s
+        self.name = name
+        self.closed = False
+
+        self._condition = threading.Condition()
+        self._idle = []
+        self._in_use = set()
+        self._size = 0
+        self._counters = {
+            "checkouts": 0,
+            "waits": 0,
+            "wait_seconds": 0.0,
+            "timeouts": 0,
+            "created": 0,
+            "recycled": 0,
+            "health_check_failures": 0,
+        }
+
+    # ------------------------------------------------------------------
+    # Checkout and return
+    # ------------------------------------------------------------------
+
+    def _reserve(self, deadline):
+        """
+        Take an idle connection, or a slot to open a new one.
+
+        Returns:
+            PooledConnection or None: an idle connection, or None if a slot
+                was reserved for a new connection
+        """
+        with self._condition:
+            start = time.monotonic()
+            waited = False
+            try:
+                while True:
+                    if self.closed:
+                        raise PoolError(f"connection pool {self.name} is closed")
+                    if self._idle:
+                        return self._idle.pop()
+                    if self._size < self.max_size:
+                        self._size += 1
+                        return None
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        self._counters["timeouts"] += 1
+                        raise PoolTimeout(
+                            f"no connection free in pool {self.name} "
+                            f"({self.max_size} in use)"
+                        )
+                    waited = True
+                    self._condition.wait(remaining)
+            finally:
+                if waited:
+                    self._counters["waits"] += 1
+                    self._counters["wait_seconds"] += time.monotonic() - start
+
+    def _connect(self):
+        try:
+            conn = psycopg2.connect(
+                **self.db_params, connection_factory=PooledConnection
+            )
+        except Exception:
+            with self._condition:
+                self._size -= 1
+                self._condition.notify()
+            raise
+        conn.pool = self
+        conn.created_at = conn.last_used_at = time.monotonic()
+        with self._condition:
+            self._counters["created"] += 1
+        return conn
+
+    def _healthy(self, conn):
+        """Whether an idle connection can be handed out again."""
+        if conn.closed:
+            return False
+        now = time.monotonic()
+        if now - conn.created_at > self.max_age_s:
+            with self._condition:
+                self._counters["recycled"] += 1
+            return False
+        if now - conn.last_used_at > self.health_check_after_s:
+            try:
+                with conn.cursor() as cursor:
+                    cursor.execute("SELECT 1")
+                conn.rollback()
+            except psycopg2.Error as e:
+                logger.warning(
+                    f"Discarding broken connection from pool {self.name}: {e}"
+                )
+                with self._condition:
+                    self._counters["health_check_failures"] += 1
+                return False
+        return True
+
+    def _discard(self, conn):
+        """Close a connection for good and free its slot."""
+        try:
+            conn.discard()
+        except psycopg2.Error:
+            pass
+        with self._condition:
+            self._in_use.discard(conn)
+            self._size -= 1
+            self._condition.notify()
+
+    def getconn(self, timeout=None):
+        """
+        Check out a healthy connection, waiting if the pool is at max_size.
+
+        Args:
+            timeout: Seconds to wait for a free connection (pool default if None)
+
+        Returns:
+            PooledConnection: A connection to return with putconn() or close()
+
+        Raises:
+            PoolTimeout: If no connection became free in time
+        """
+        deadline = time.monotonic() + (self.timeout_s if timeout is None else timeout)
+        while True:
+            conn = self._reserve(deadline)
+            if conn is None:
+                conn = self._connect()
+            elif not self._healthy(conn):
+                self._discard(conn)
+                continue
+            with self._condition:
+                self._in_use.add(conn)
+                self._counters["checkouts"] += 1
+            return conn
+
+    def putconn(self, conn, close=False):
+        """
+        Return a connection to the pool.
+
+        An open transaction is rolled back. Connections that are broken, old
+        or returned with close=True are closed instead of kept.
+        """
+        if conn not in self._in_use:
+            raise PoolError(f"connection was not checked out from pool {self.name}")
+        if not close and not conn.closed:
+            try:
+                if (
+                    conn.info.transaction_status
+                    != psycopg2.extensions.TRANSACTION_STATUS_IDLE
+                ):
+                    conn.rollback()
+            except psycopg2.Error:
+                close = True
+        if close or conn.closed or self.closed:
+            self._discard(conn)
+            return
+        conn.last_used_at = time.monotonic()
+        with self._condition:
+            self._in_use.discard(conn)
+            self._idle.append(conn)
+            self._condition.notify()
+
+    @contextlib.contextmanager
+    def connection(self, timeout=None):
+        """
+        Check out a connection for a block; commit on success, roll back on error.
+        """
+        conn = self.getconn(timeout)
+        try:
+            yield conn
+            conn.commit()
+        except BaseException:
+            if not conn.closed:
+                conn.rollback()
+            raise
+        finally:
+            self.putconn(conn)
+
+    def closeall(self):
+        """Close idle connections; checked out ones are closed when returned."""
+        with self._condition:
+            self.closed = True
+            idle, self._idle = self._idle, []
+            self._condition.notify_all()
+        for conn in idle:
+            self._discard(conn)
+
+    # ------------------------------------------------------------------
+    # Statistics
+    # ------------------------------------------------------------------
+
+    def stats(self):
+        """
+        Pool statistics.
+
+        Returns:
+            dict: Pool size and limits, checkout counters, and the ages in
+                seconds of the open connections
+        """
+        now = time.monotonic()
+        with self._condition:
+            ages = [now - conn.created_at for conn in self._idle + list(self._in_use)]
+            return {
+                "name": self.name,
+                "max_size": self.max_size,
+                "open": self._size,
+                "idle": len(self._idle),
+                "in_use": len(self._in_use),
+                **self._counters,
+                "wait_seconds": round(self._counters["wait_seconds"], 4),
+                "oldest_connection_age_s": round(max(ages), 1) if ages else None,
+                "mean_connection_age_s": (
+                    round(sum(ages) / len(ages), 1) if ages else None
+                ),
+            }
+
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+def get_pool(db_params, name="default", max_size=None, **kwargs):
+    """
+    The shared pool for a database, created on first use.
+
+    Args:
+        db_params: psycopg2 connection parameters
+        name: Separate pools for the same database (e.g. the two sides of a
+            copy, which must not wait on each other)
+        max_size: Maximum open connections; an existing pool grows to it
+        **kwargs: Other ConnectionPool settings, used when the pool is created
+
+    Returns:
+        ConnectionPool
+    """
+    key = (name, tuple(sorted((k, str(v)) for k, v in db_params.items())))
+    with _pools_lock:
+        pool = _pools.get(key)
+        if pool is None or pool.closed:
+            pool = ConnectionPool(
+                db_params,
+                max_size=max_size or DEFAULT_MAX_SIZE,
+                name=name,
+                **kwargs,
+            )
+            _pools[key] = pool
+        elif max_size and max_size > pool.max_size:
+            with pool._condition:
+                pool.max_size = max_size
+                pool._condition.notify_all()
+        return pool
+
+
+def pool_stats():
+    """Statistics of every shared pool."""
+    with _pools_lock:
+        pools = list(_pools.values())
+    return [pool.stats() for pool in pools]
+
+
+def describe(stats):
+    """One-line summary of a pool's statistics."""
+    return (
+        f"pool {stats['name']}: {stats['open']}/{stats['max_size']} open, "
+        f"{stats['checkouts']} checkouts, {stats['waits']} waits "
+        f"({stats['wait_seconds']}s), {stats['timeouts']} timeouts, "
+        f"{stats['recycled']} recycled, "
+        f"{stats['health_check_failures']} failed health checks"
+    )
+
+
+def close_pools():
+    """Close every shared pool."""
+    with _pools_lock:
+        pools = list(_pools.values())
+        _pools.clear()
+    for pool in pools:
+        pool.closeall()
+
+
+def create_pooled_engine(pool):
+    """
+    SQLAlchemy engine whose connections are checked out of a pool.
+
+    SQLAlchemy's own pooling is disabled; closing a connection returns it to
+    the shared pool.
+    """
+    import sqlalchemy
+    from sqlalchemy.pool import NullPool
+
+    return sqlalchemy.create_engine(
+        "postgresql+psycopg2://", creator=pool.getconn, poolclass=NullPool
+    )
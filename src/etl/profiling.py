@@ -0,0 +1,232 @@
+"""
+Opt-in profiling of pipeline stages.
+
+A profiled stage runs under cProfile and tracemalloc, and a sampler thread
+records the stacks of every thread in the process (the extraction's readers
+and writers run in threads cProfile does not see). When the stage ends,
+three files are written to the profile directory:
+
+- <stage>-<time>-<pid>.pstats: cProfile statistics, for pstats or snakeviz
+- <stage>-<time>-<pid>.collapsed: sampled stacks, one "frame;frame;... count"
+  line per stack, for flamegraph.pl or speedscope
+- <stage>-<time>-<pid>.json: duration, peak traced memory and sample count
+
+Profiling is off unless ETL_PROFILE is set to 1/true, or to "cpu" to leave
+out tracemalloc (the DAG also turns it on through the etl_profile Airflow
+Variable). tracemalloc records every allocation and can slow pandas-heavy
+stages down two- to three-fold; cProfile and the sampler cost far less. The
+directory is ETL_PROFILE_DIR, logs/profiles by default. When profiling is off,
+a profiled call costs one environment lookup:
+
+    @profiled("extract_data_from_supabase")
+    def extract_data_from_supabase(**kwargs):
+        ...
+
+    with profile("run_etl.load"):
+        ...
+
+Only one stage is profiled at a time per process; a stage started while
+another one is profiled runs as part of the outer profile.
+"""
+
+import cProfile
+import functools
+import json
+import logging
+import os
+import sys
+import threading
+import time
+import tracemalloc
+from collections import Counter
+from contextlib import contextmanager
+from datetime import datetime
+from pathlib import Path
+
+logger = logging.getLogger(__name__)
+
+# Environment flag turning profiling on, and the directory profiles go to
+PROFILE_ENV = "ETL_PROFILE"
+PROFILE_DIR_ENV = "ETL_PROFILE_DIR"
+DEFAULT_PROFILE_DIR = "logs/profiles"
+
+# Seconds between stack samples
+DEFAULT_SAMPLE_INTERVAL = 0.005
+
+_active = threading.Lock()
+
+
+def profiling_mode(flag=None):
+    """
+    How stages are profiled.
+
+    Args:
+        flag: Explicit setting (e.g. an Airflow Variable); ETL_PROFILE if None
+
+    Returns:
+        str: "full", "cpu" (without tracemalloc) or None if profiling is off
+    """
+    if flag is None:
+        flag = os.getenv(PROFILE_ENV)
+    if isinstance(flag, bool):
+        return "full" if flag else None
+    flag = str(flag or "").lower()
+    if flag == "cpu":
+        return "cpu"
+    return "full" if flag in ("1", "true", "yes", "on", "full") else None
+
+
+def profiling_enabled(flag=None):
+    """Whether stages are profiled (see profiling_mode())."""
+    return profiling_mode(flag) is not None
+
+
+def _frame_label(code):
+    return f"{code.co_name} ({Path(code.co_filename).name}:{code.co_firstlineno})"
+
+
+class StackSampler:
+    """Samples the stacks of every other thread into collapsed-stack counts."""
+
+    def __init__(self, interval=DEFAULT_SAMPLE_INTERVAL):
+        self.interval = interval
+        self.stacks = Counter()
+        self.samples = 0
+        self._stop = threading.Event()
+        self._thread = None
+
+    def _sample(self):
+        own = threading.get_ident()
+        while not self._stop.wait(self.interval):
+            names = {thread.ident: thread.name for thread in threading.enumerate()}
+            for ident, frame in sys._current_frames().items():
+                if ident == own:
+                    continue
+                labels = []
+                while frame is not None:
+                    labels.append(_frame_label(frame.f_code))
+                    frame = frame.f_back
+                labels.append(names.get(ident, f"thread-{ident}"))
+                self.stacks[";".join(reversed(labels))] += 1
+            self.samples += 1
+
+    def start(self):
+        self._thread = threading.Thread(
+            target=self._sample, name="profile-sampler", daemon=True
+        )
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+    def write_collapsed(self, path):
+        """Write the stacks in the collapsed format flame graph tools read."""
+        with open(path, "w") as f:
+            for stack, count in sorted(self.stacks.items()):
+                f.write(f"{stack} {count}\n")
+
+
+@contextmanager
+def profile(name, enabled=None, output_dir=None, interval=DEFAULT_SAMPLE_INTERVAL):
+    """
+    Profile the block if profiling is enabled.
+
+    Args:
+        name: Stage name, used in the file names
+        enabled: Explicit setting (True/False, "1", "cpu", ...); ETL_PROFILE
+            if None
+        output_dir: Directory for the files; ETL_PROFILE_DIR if None
+        interval: Seconds between stack samples
+
+    Yields:
+        dict: The stage's summary, filled in when the block ends, or None if
+            the block is not profiled
+    """
+    mode = profiling_mode(enabled)
+    if mode is None or not _active.acquire(blocking=False):
+        yield None
+        return
+
+    try:
+        output_dir = Path(
+            output_dir or os.getenv(PROFILE_DIR_ENV) or DEFAULT_PROFILE_DIR
+        )
+        output_dir.mkdir(parents=True, exist_ok=True)
+        stem = output_dir / (
+            f"{name}-{datetime.now().strftime('%Y%m%dT%H%M%S')}-{os.getpid()}"
+        )
+        summary = {"stage": name, "mode": mode}
+
+        trace_memory = mode == "full"
+        started_tracing = trace_memory and not tracemalloc.is_tracing()
+        if started_tracing:
+            tracemalloc.start()
+        elif trace_memory:
+            tracemalloc.reset_peak()
+        sampler = StackSampler(interval)
+        profiler = cProfile.Profile()
+        start = time.perf_counter()
+        sampler.start()
+        profiler.enable()
+        try:
+            yield summary
+        finally:
+            profiler.disable()
+            seconds = time.perf_counter() - start
+            sampler.stop()
+            peak = tracemalloc.get_traced_memory()[1] if trace_memory else None
+            if started_tracing:
+                tracemalloc.stop()
+
+            profiler.dump_stats(f"{stem}.pstats")
+            sampler.write_collapsed(f"{stem}.collapsed")
+            summary.update(
+                {
+                    "seconds": round(seconds, 3),
+                    "peak_memory_bytes": peak,
+                    "samples": sampler.samples,
+                    "pstats": f"{stem}.pstats",
+                    "collapsed": f"{stem}.collapsed",
+                }
+            )
+            with open(f"{stem}.json", "w") as f:
+                json.dump(summary, f, indent=2)
+            memory = (
+                f", peak traced memory {peak / 2**20:.1f} MiB"
+                if peak is not None
+                else ""
+            )
+            logger.info(
+                f"Profiled {name}: {seconds:.2f}s{memory}, "
+                f"{sampler.samples} samples -> {stem}.*"
+            )
+    finally:
+        _active.release()
+
+
+def profiled(name=None, enabled=None, output_dir=None):
+    """
+    Decorator profiling every call of a function (see profile()).
+
+    Args:
+        name: Stage name; the function's name if None
+        enabled: Explicit setting (see profile()); ETL_PROFILE, read at call
+            time, if None
+        output_dir: Directory for the files; ETL_PROFILE_DIR if None
+    """
+
+    def decorator(func):
+        stage = name or func.__name__
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            mode = profiling_mode(enabled)
+            if mode is None:
+                return func(*args, **kwargs)
+            with profile(stage, enabled=mode, output_dir=output_dir):
+                return func(*args, **kwargs)
+
+        return wrapper
+
+    return decorator
@@ -0,0 +1,445 @@
+"""
+Result cache for the dashboard queries.
+
+The marts only change when the pipeline rebuilds them, so a dashboard query
+returns the same rows until the next run. Results are cached under a key made
+of the query text, its parameters and the version of the data it reads. The
+version is derived from the relations themselves: the query is planned (not
+run) to find the tables it scans, views included, and their statistics
+fingerprints (src/etl/utils.py) are combined. Any write to one of those
+tables, or a rebuild of it, moves the version and makes the older entries
+unreachable, so nothing has to be published or invalidated explicitly.
+
+The cache serves callers that run dashboard queries through
+CachedQueryRunner, such as the run command for ad-hoc reports. Metabase does
+not read it.
+
+Entries live in two tiers, both evicted least-recently-used first once they
+exceed their entry count or byte size:
+
+- an in-process OrderedDict, for repeat loads within a process
+- a directory of Parquet files, so results warmed by one process are served
+  to others; recency is tracked through the file mtimes. Parquet keeps the
+  column types (numeric, dates, timestamps) and, unlike pickle, reading a
+  file from the shared directory cannot execute code
+
+Usage:
+    python -m src.etl.query_cache warm
+    python -m src.etl.query_cache run --queries customer_analytics_dashboard_queries:1.1
+"""
+
+import argparse
+import hashlib
+import json
+import logging
+import os
+import re
+import sys
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from pathlib import Path
+
+import psycopg2
+from psycopg2 import sql as pgsql
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from src.etl.config import QUERY_CACHE_DIR
+from src.etl.utils import (
+    ANALYTICS_DIR,
+    load_dashboard_queries,
+    statistics_fingerprint,
+)
+
+logger = logging.getLogger(__name__)
+
+ENTRY_SUFFIX = ".parquet"
+
+
+def _digest(text):
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def serialize_result(result):
+    """
+    Encode a query result as Parquet.
+
+    Columns are stored by position, with their names in the schema metadata,
+    since a query may return the same column name twice.
+
+    Args:
+        result: dict with "columns" (names) and "rows" (tuples)
+
+    Returns:
+        bytes: The Parquet file
+    """
+    columns = result["columns"]
+    table = pa.Table.from_arrays(
+        [pa.array([row[i] for row in result["rows"]]) for i in range(len(columns))],
+        names=[str(i) for i in range(len(columns))],
+    ).replace_schema_metadata({"columns": json.dumps(columns)})
+    sink = pa.BufferOutputStream()
+    pq.write_table(table, sink)
+    return sink.getvalue().to_pybytes()
+
+
+def deserialize_result(payload):
+    """Decode a result written by serialize_result()."""
+    table = pq.read_table(pa.BufferReader(payload))
+    return {
+        "columns": json.loads(table.schema.metadata[b"columns"]),
+        "rows": list(zip(*(column.to_pylist() for column in table.columns))),
+    }
+
+
+def normalize_sql(sql):
+    """Collapse whitespace and drop a trailing semicolon."""
+    return re.sub(r"\s+", " ", sql).strip().rstrip(";").strip()
+
+
+def cache_key(sql, params, version):
+    """
+    Key of a query result.
+
+    Args:
+        sql: Query text; whitespace differences do not change the key
+        params: Query parameters (anything JSON serializable) or None
+        version: Version of the data the result was computed from
+
+    Returns:
+        str: "<version digest>-<query digest>"
+    """
+    query = json.dumps(
+        [normalize_sql(sql), params], sort_keys=True, default=str, separators=(",", ":")
+    )
+    return f"{_digest(str(version))[:12]}-{_digest(query)}"
+
+
+class QueryResultCache:
+    """Size-bounded two-tier LRU cache of query results."""
+
+    def __init__(
+        self,
+        cache_dir=QUERY_CACHE_DIR,
+        max_bytes=64 * 1024 * 1024,
+        max_entries=512,
+        max_disk_bytes=512 * 1024 * 1024,
+    ):
+        """
+        Initialize the cache.
+
+        Args:
+            cache_dir: Directory of the on-disk tier (None for memory only)
+            max_bytes: Size bound of the in-memory tier (Parquet size)
+            max_entries: Entry bound of the in-memory tier
+            max_disk_bytes: Size bound of the on-disk tier
+        """
+        self.cache_dir = Path(cache_dir) if cache_dir is not None else None
+        self.max_bytes = max_bytes
+        self.max_entries = max_entries
+        self.max_disk_bytes = max_disk_bytes
+        self._memory = OrderedDict()
+        self._memory_bytes = 0
+        self._lock = threading.Lock()
+        self.stats = {"hits": 0, "disk_hits": 0, "misses": 0, "evictions": 0}
+
+    def _path(self, key):
+        return self.cache_dir / f"{key}{ENTRY_SUFFIX}"
+
+    def _remember(self, key, result, size):
+        """Insert into the memory tier and evict down to its bounds."""
+        if size > self.max_bytes:
+            return
+        if key in self._memory:
+            self._memory_bytes -= self._memory.pop(key)[1]
+        self._memory[key] = (result, size)
+        self._memory_bytes += size
+        while self._memory and (
+            self._memory_bytes > self.max_bytes or len(self._memory) > self.max_entries
+        ):
+            _, (_, evicted_size) = self._memory.popitem(last=False)
+            self._memory_bytes -= evicted_size
+            self.stats["evictions"] += 1
+
+    def get(self, key):
+        """
+        Look up a result.
+
+        Returns:
+            The cached result, or None on a miss
+        """
+        with self._lock:
+            if key in self._memory:
+                self._memory.move_to_end(key)
+                self.stats["hits"] += 1
+                return self._memory[key][0]
+
+        if self.cache_dir is not None:
+            path = self._path(key)
+            try:
+                payload = path.read_bytes()
+                os.utime(path)
+            except FileNotFoundError:
+                payload = None
+            if payload is not None:
+                try:
+                    result = deserialize_result(payload)
+                except (pa.ArrowException, KeyError, ValueError) as e:
+                    logger.warning(f"Dropping unreadable cache entry {path}: {e}")
+                    path.unlink(missing_ok=True)
+                else:
+                    with self._lock:
+                        self._remember(key, result, len(payload))
+                        self.stats["disk_hits"] += 1
+                    return result
+
+        with self._lock:
+            self.stats["misses"] += 1
+        return None
+
+    def put(self, key, result):
+        """
+        Store a result in both tiers.
+
+        A result whose values Parquet cannot hold (e.g. a column mixing
+        types) is not cached.
+        """
+        try:
+            payload = serialize_result(result)
+        except pa.ArrowException as e:
+            logger.warning(f"Not caching result {key}: {e}")
+            return
+        with self._lock:
+            self._remember(key, result, len(payload))
+        if self.cache_dir is not None and len(payload) <= self.max_disk_bytes:
+            self.cache_dir.mkdir(parents=True, exist_ok=True)
+            path = self._path(key)
+            tmp_path = path.with_suffix(f".{uuid.uuid4().hex}.tmp")
+            tmp_path.write_bytes(payload)
+            os.replace(tmp_path, path)
+            self._evict_disk()
+
+    def _disk_entries(self):
+        entries = []
+        for path in self.cache_dir.glob(f"*{ENTRY_SUFFIX}"):
+            try:
+                stat = path.stat()
+            except FileNotFoundError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, path))
+        return entries
+
+    def _evict_disk(self):
+        """Delete the least recently used files beyond the disk bound."""
+        entries = sorted(self._disk_entries())
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in entries:
+            if total <= self.max_disk_bytes:
+                break
+            path.unlink(missing_ok=True)
+            total -= size
+            self.stats["evictions"] += 1
+
+
+def _plan_relations(node):
+    """(schema, name) of every relation scanned in an EXPLAIN JSON plan node."""
+    relations = set()
+    if "Relation Name" in node:
+        relations.add((node["Schema"], node["Relation Name"]))
+    for child in node.get("Plans", []):
+        relations |= _plan_relations(child)
+    return relations
+
+
+def data_version(conn, sql, params=None):
+    """
+    Version of the data a query reads.
+
+    The query is planned with EXPLAIN, which expands views, to find the
+    relations it scans. The version combines their statistics fingerprints.
+
+    Args:
+        conn: psycopg2 connection
+        sql: Query text
+        params: Query parameters or None
+
+    Returns:
+        str or None: The version, or None if the query cannot be planned or
+            reads a relation without statistics; its result is not cached
+    """
+    with conn.cursor() as cursor:
+        try:
+            cursor.execute(f"EXPLAIN (VERBOSE, FORMAT JSON) {sql}", params)
+        except psycopg2.Error as e:
+            logger.debug(f"Query cannot be planned, not caching it: {e}")
+            conn.rollback()
+            return None
+        (plan,) = cursor.fetchone()[0]
+        parts = []
+        for schema, name in sorted(_plan_relations(plan["Plan"])):
+            relation = pgsql.Identifier(schema, name).as_string(conn)
+            cursor.execute("SELECT to_regclass(%s)::oid", (relation,))
+            oid = cursor.fetchone()[0]
+            fingerprint = None if oid is None else statistics_fingerprint(cursor, oid)
+            if fingerprint is None:
+                return None
+            parts.append([schema, name, fingerprint])
+    return _digest(json.dumps(parts))
+
+
+class CachedQueryRunner:
+    """Runs dashboard queries on Postgres through a QueryResultCache."""
+
+    def __init__(self, cache=None, db_params=None):
+        """
+        Initialize the runner.
+
+        Args:
+            cache: QueryResultCache (a default one if omitted)
+            db_params: psycopg2 connection parameters (DB_* env vars if omitted)
+        """
+        self.cache = cache if cache is not None else QueryResultCache()
+        self.db_params = db_params or {
+            "host": os.getenv("DB_HOST", "localhost"),
+            "port": int(os.getenv("DB_PORT", 5432)),
+            "user": os.getenv("DB_USER", "postgres"),
+            "password": os.getenv("DB_PASSWORD", "postgres"),
+            "database": os.getenv("DB_NAME", "postgres"),
+        }
+        self.conn = None
+
+    def _connection(self):
+        if self.conn is None or self.conn.closed:
+            self.conn = psycopg2.connect(**self.db_params)
+        return self.conn
+
+    def run(self, sql, params=None):
+        """
+        Return the result of a query, from the cache when possible.
+
+        Only the version of the data is read from the database on a hit.
+        Results of queries without a version are never cached.
+
+        Returns:
+            dict: "columns", "rows" and "cached" (whether it was a cache hit)
+        """
+        conn = self._connection()
+        try:
+            version = data_version(conn, sql, params)
+            key = cache_key(sql, params, version) if version is not None else None
+            if key is not None:
+                result = self.cache.get(key)
+                if result is not None:
+                    return {**result, "cached": True}
+
+            with conn.cursor() as cursor:
+                cursor.execute(sql, params)
+                result = {
+                    "columns": [column[0] for column in cursor.description],
+                    "rows": cursor.fetchall(),
+                }
+        finally:
+            conn.rollback()
+        if key is not None:
+            self.cache.put(key, result)
+        return {**result, "cached": False}
+
+    def warm(self, queries):
+        """
+        Execute every query not cached for its current data version.
+
+        Args:
+            queries: Entries from load_dashboard_queries()
+
+        Returns:
+            dict: "warmed", "cached" and "failed" counts plus "errors"
+                (key -> message)
+        """
+        report = {"warmed": 0, "cached": 0, "failed": 0, "errors": {}}
+        for query in queries:
+            try:
+                result = self.run(query["sql"])
+            except psycopg2.Error as e:
+                report["failed"] += 1
+                report["errors"][query["key"]] = str(e).strip().splitlines()[0]
+                continue
+            report["cached" if result["cached"] else "warmed"] += 1
+        return report
+
+    def close(self):
+        if self.conn is not None:
+            self.conn.close()
+            self.conn = None
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Dashboard query result cache")
+    parser.add_argument("--cache-dir", type=Path, default=QUERY_CACHE_DIR)
+    parser.add_argument(
+        "--max-disk-mb", type=int, default=512, help="Size bound of the cache directory"
+    )
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    for name, help_text in (
+        ("warm", "Cache every dashboard query for its current data"),
+        ("run", "Run queries through the cache"),
+    ):
+        sub = subparsers.add_parser(name, help=help_text)
+        sub.add_argument("--analytics-dir", type=Path, default=ANALYTICS_DIR)
+        sub.add_argument(
+            "--queries",
+            nargs="+",
+            default=None,
+            help="Query keys (file_stem:number) or file names; all if omitted",
+        )
+    args = parser.parse_args(argv)
+
+    cache = QueryResultCache(
+        args.cache_dir, max_disk_bytes=args.max_disk_mb * 1024 * 1024
+    )
+    runner = CachedQueryRunner(cache)
+    try:
+        queries = load_dashboard_queries(args.analytics_dir)
+        if args.queries:
+            queries = [
+                q
+                for q in queries
+                if q["key"] in args.queries or q["file"] in args.queries
+            ]
+
+        if args.command == "warm":
+            print(f"\n=== Warming {len(queries)} dashboard queries ===")
+            report = runner.warm(queries)
+            for key, error in report["errors"].items():
+                print(f"  ◦ {key}: {error}")
+            print(
+                f"✓ {report['warmed']} warmed, "
+                f"{report['cached']} already cached, {report['failed']} failed"
+            )
+            return 0
+
+        for query in queries:
+            start = time.perf_counter()
+            try:
+                result = runner.run(query["sql"])
+            except psycopg2.Error as e:
+                print(f"❌ {query['key']}: {str(e).strip().splitlines()[0]}")
+                continue
+            source = "cache" if result["cached"] else "database"
+            print(
+                f"✓ {query['key']}: {len(result['rows'])} rows from {source} "
+                f"in {time.perf_counter() - start:.3f}s"
+            )
+        return 0
+    finally:
+        runner.close()
+
+
+if __name__ == "__main__":
+    logging.basicConfig(
+        level=logging.INFO,
+        format="%(asctime)s - %(name)s - %(levelname)s - %(message)s",
+    )
+    sys.exit(main())
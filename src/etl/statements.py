@@ -0,0 +1,439 @@
+"""
+Per-stage SQL statistics from pg_stat_statements.
+
+pg_stat_statements keeps cumulative counters per normalized statement. A
+pipeline stage is measured by snapshotting the counters when it starts and
+storing the difference when it ends, per statement, in a metrics table:
+
+    python -m src.etl.statements begin --run-id RUN --stage run_dbt_marts
+    ...  # the stage
+    python -m src.etl.statements end --run-id RUN --stage run_dbt_marts
+
+    python -m src.etl.statements report --run-id RUN --top 20
+    python -m src.etl.statements report --run-id RUN --compare OTHER_RUN
+
+The snapshot and the difference are computed in the database, so no
+statistics are transferred. Each stored row holds a statement's calls, total
+execution time, rows and shared blocks read and hit during the stage. A stage
+that is retried adds a row set per try.
+
+The counters are server-wide: statements other clients run in the current
+database while a stage runs are attributed to the stage. Counters that went
+down (after pg_stat_statements_reset() or an eviction) count from zero.
+
+The extension must be loaded (shared_preload_libraries) and created in the
+database. Capture is best effort. If the view is missing, or the capture
+fails, capture() logs a warning and the stage runs unmeasured.
+"""
+
+import argparse
+import logging
+import os
+import sys
+
+import psycopg2
+
+logger = logging.getLogger(__name__)
+
+# Schema holding the capture's tables, next to the extraction's control table
+DEFAULT_SCHEMA = "raw"
+
+STAGES_TABLE = "etl_statement_stages"
+SNAPSHOTS_TABLE = "etl_statement_snapshots"
+METRICS_TABLE = "etl_statement_metrics"
+
+# Characters of a statement's text kept in the metrics table
+QUERY_TEXT_LENGTH = 2000
+
+DEFAULT_TOP = 20
+
+# Counters taken from pg_stat_statements, as stored in the tables
+_COUNTERS = ("calls", "total_exec_time", "rows", "shared_blks_read", "shared_blks_hit")
+
+# pg_stat_statements of the current database, summed over the toplevel flag
+# (PostgreSQL 14+ keeps nested and top-level executions apart). The capture's
+# and the reports' own statements are left out.
+_CURRENT_STATEMENTS = f"""
+    SELECT userid, queryid, min(query) AS query,
+           {", ".join(f"sum({c}) AS {c}" for c in _COUNTERS)}
+    FROM pg_stat_statements
+    WHERE dbid = (SELECT oid FROM pg_database WHERE datname = current_database())
+      AND queryid IS NOT NULL
+      AND query NOT LIKE '%%pg_stat_statements%%'
+      AND query NOT LIKE '%%etl_statement_%%'
+    GROUP BY userid, queryid
+"""
+
+
+def ensure_tables(conn, schema=DEFAULT_SCHEMA):
+    """Create the capture's tables if they do not exist."""
+    counters = ",\n".join(
+        f"{c} {'DOUBLE PRECISION' if c == 'total_exec_time' else 'BIGINT'} NOT NULL"
+        for c in _COUNTERS
+    )
+    with conn.cursor() as cursor:
+        cursor.execute(
+            f"""
+            CREATE SCHEMA IF NOT EXISTS {schema};
+            CREATE TABLE IF NOT EXISTS {schema}.{STAGES_TABLE} (
+                run_id TEXT NOT NULL,
+                stage TEXT NOT NULL,
+                started_at TIMESTAMPTZ NOT NULL DEFAULT now(),
+                finished_at TIMESTAMPTZ,
+                PRIMARY KEY (run_id, stage)
+            );
+            CREATE TABLE IF NOT EXISTS {schema}.{SNAPSHOTS_TABLE} (
+                run_id TEXT NOT NULL,
+                stage TEXT NOT NULL,
+                userid OID NOT NULL,
+                queryid BIGINT NOT NULL,
+                {counters},
+                PRIMARY KEY (run_id, stage, userid, queryid)
+            );
+            CREATE TABLE IF NOT EXISTS {schema}.{METRICS_TABLE} (
+                run_id TEXT NOT NULL,
+                stage TEXT NOT NULL,
+                userid OID NOT NULL,
+                queryid BIGINT NOT NULL,
+                query TEXT NOT NULL,
+                {counters},
+                captured_at TIMESTAMPTZ NOT NULL DEFAULT now()
+            );
+            CREATE INDEX IF NOT EXISTS {METRICS_TABLE}_run_idx
+                ON {schema}.{METRICS_TABLE} (run_id, stage);
+            """
+        )
+
+
+def statements_available(conn):
+    """Whether the pg_stat_statements view is on the search path."""
+    with conn.cursor() as cursor:
+        cursor.execute("SELECT to_regclass('pg_stat_statements') IS NOT NULL")
+        return cursor.fetchone()[0]
+
+
+def begin_stage(conn, run_id, stage, schema=DEFAULT_SCHEMA):
+    """
+    Snapshot the counters at the start of a stage. The caller commits.
+
+    Starting a stage again (e.g. a retry) replaces its snapshot.
+    """
+    with conn.cursor() as cursor:
+        cursor.execute(
+            f"""
+            DELETE FROM {schema}.{SNAPSHOTS_TABLE} WHERE run_id = %(run_id)s
+                AND stage = %(stage)s;
+            INSERT INTO {schema}.{STAGES_TABLE} (run_id, stage)
+            VALUES (%(run_id)s, %(stage)s)
+            ON CONFLICT (run_id, stage) DO UPDATE SET
+                started_at = now(), finished_at = NULL;
+            INSERT INTO {schema}.{SNAPSHOTS_TABLE}
+                (run_id, stage, userid, queryid, {", ".join(_COUNTERS)})
+            SELECT %(run_id)s, %(stage)s, userid, queryid, {", ".join(_COUNTERS)}
+            FROM ({_CURRENT_STATEMENTS}) AS current_statements
+            """,
+            {"run_id": run_id, "stage": stage},
+        )
+
+
+def end_stage(conn, run_id, stage, schema=DEFAULT_SCHEMA):
+    """
+    Store the change in the counters since begin_stage(). The caller commits.
+
+    Returns:
+        int: Statements that ran during the stage, or None if the stage was
+            not started
+    """
+    with conn.cursor() as cursor:
+        cursor.execute(
+            f"SELECT 1 FROM {schema}.{STAGES_TABLE} "
+            f"WHERE run_id = %s AND stage = %s AND finished_at IS NULL",
+            (run_id, stage),
+        )
+        if cursor.fetchone() is None:
+            logger.warning(f"Stage {stage} of run {run_id} was not started")
+            return None
+
+        # A statement missing from the snapshot, or whose counters went down,
+        # is counted from zero
+        cursor.execute(
+            f"""
+            INSERT INTO {schema}.{METRICS_TABLE}
+                (run_id, stage, userid, queryid, query, {", ".join(_COUNTERS)})
+            SELECT %(run_id)s, %(stage)s, c.userid, c.queryid,
+                   left(c.query, {QUERY_TEXT_LENGTH}),
+                   {", ".join(f"c.{c} - coalesce(s.{c}, 0)" for c in _COUNTERS)}
+            FROM ({_CURRENT_STATEMENTS}) AS c
+            LEFT JOIN {schema}.{SNAPSHOTS_TABLE} AS s
+                ON s.run_id = %(run_id)s
+               AND s.stage = %(stage)s
+               AND s.userid = c.userid
+               AND s.queryid = c.queryid
+               AND s.calls <= c.calls
+            WHERE c.calls > coalesce(s.calls, 0)
+            """,
+            {"run_id": run_id, "stage": stage},
+        )
+        statements = cursor.rowcount
+        cursor.execute(
+            f"""
+            DELETE FROM {schema}.{SNAPSHOTS_TABLE} WHERE run_id = %(run_id)s
+                AND stage = %(stage)s;
+            UPDATE {schema}.{STAGES_TABLE} SET finished_at = now()
+            WHERE run_id = %(run_id)s AND stage = %(stage)s
+            """,
+            {"run_id": run_id, "stage": stage},
+        )
+    return statements
+
+
+def capture(action, db_params, run_id, stage, schema=DEFAULT_SCHEMA):
+    """
+    Begin or end a stage on its own connection, without ever raising.
+
+    Args:
+        action: "begin" or "end"
+        db_params: psycopg2 connection parameters of the measured database
+        run_id: Pipeline run, e.g. the Airflow run_id
+        stage: Stage name, e.g. the Airflow task_id
+
+    Returns:
+        bool: Whether the stage was captured
+    """
+    try:
+        conn = psycopg2.connect(**db_params)
+    except psycopg2.Error as e:
+        logger.warning(f"Statement capture for {stage} skipped: {e}")
+        return False
+    try:
+        if not statements_available(conn):
+            logger.warning(
+                f"Statement capture for {stage} skipped: "
+                f"pg_stat_statements is not installed"
+            )
+            return False
+        ensure_tables(conn, schema)
+        if action == "begin":
+            begin_stage(conn, run_id, stage, schema)
+        else:
+            statements = end_stage(conn, run_id, stage, schema)
+            if statements is None:
+                conn.rollback()
+                return False
+            logger.info(f"Captured {statements} statements of {stage} ({run_id})")
+        conn.commit()
+        return True
+    except psycopg2.Error as e:
+        logger.warning(f"Statement capture for {stage} failed: {e}")
+        conn.rollback()
+        return False
+    finally:
+        conn.close()
+
+
+def _fetch(conn, sql, params):
+    with conn.cursor() as cursor:
+        cursor.execute(sql, params)
+        columns = [desc[0] for desc in cursor.description]
+        return [dict(zip(columns, row)) for row in cursor.fetchall()]
+
+
+def _run_totals(schema, run_param):
+    """Per-statement totals of a run, over its stages and tries."""
+    return f"""
+        SELECT userid, queryid, min(query) AS query,
+               string_agg(DISTINCT stage, ',' ORDER BY stage) AS stages,
+               {", ".join(f"sum({c}) AS {c}" for c in _COUNTERS)}
+        FROM {schema}.{METRICS_TABLE}
+        WHERE run_id = %({run_param})s
+        GROUP BY userid, queryid
+    """
+
+
+def stage_totals(conn, run_id, schema=DEFAULT_SCHEMA):
+    """
+    Total calls, time, rows and blocks of each stage of a run.
+
+    Returns:
+        list: One dict per stage, by decreasing total time
+    """
+    return _fetch(
+        conn,
+        f"""
+        SELECT stage, count(DISTINCT (userid, queryid)) AS statements,
+               {", ".join(f"sum({c}) AS {c}" for c in _COUNTERS)}
+        FROM {schema}.{METRICS_TABLE}
+        WHERE run_id = %(run_id)s
+        GROUP BY stage
+        ORDER BY total_exec_time DESC
+        """,
+        {"run_id": run_id},
+    )
+
+
+def top_statements(conn, run_id, limit=DEFAULT_TOP, schema=DEFAULT_SCHEMA):
+    """
+    The statements of a run that took the most execution time.
+
+    Returns:
+        list: Dicts with the statement, its stages and its counters
+    """
+    return _fetch(
+        conn,
+        f"""
+        SELECT * FROM ({_run_totals(schema, "run_id")}) AS totals
+        ORDER BY total_exec_time DESC
+        LIMIT %(limit)s
+        """,
+        {"run_id": run_id, "limit": limit},
+    )
+
+
+def compare_runs(conn, run_id, other_run_id, limit=DEFAULT_TOP, schema=DEFAULT_SCHEMA):
+    """
+    The statements whose execution time changed most between two runs.
+
+    Returns:
+        list: Dicts with the statement, its time and calls in both runs
+            (None where it did not run) and the change in time
+    """
+    return _fetch(
+        conn,
+        f"""
+        SELECT coalesce(a.queryid, b.queryid) AS queryid,
+               coalesce(a.query, b.query) AS query,
+               coalesce(a.stages, b.stages) AS stages,
+               a.total_exec_time AS time, b.total_exec_time AS other_time,
+               a.calls AS calls, b.calls AS other_calls,
+               coalesce(a.total_exec_time, 0) - coalesce(b.total_exec_time, 0)
+                   AS time_change
+        FROM ({_run_totals(schema, "run_id")}) AS a
+        FULL JOIN ({_run_totals(schema, "other_run_id")}) AS b
+            ON a.userid = b.userid AND a.queryid = b.queryid
+        ORDER BY abs(
+            coalesce(a.total_exec_time, 0) - coalesce(b.total_exec_time, 0)
+        ) DESC
+        LIMIT %(limit)s
+        """,
+        {"run_id": run_id, "other_run_id": other_run_id, "limit": limit},
+    )
+
+
+def _short(query, width=70):
+    """A statement's text on one line, cut to width."""
+    text = " ".join(query.split())
+    return text if len(text) <= width else text[: width - 1] + "…"
+
+
+def _ms(value):
+    return "-" if value is None else f"{value:,.1f}"
+
+
+def _print_report(conn, run_id, top, schema):
+    stages = stage_totals(conn, run_id, schema)
+    if not stages:
+        print(f"❌ No statements captured for run {run_id}")
+        return False
+    print(f"Stages of run {run_id}:")
+    for stage in stages:
+        print(
+            f"  ◦ {stage['stage']}: {_ms(stage['total_exec_time'])} ms, "
+            f"{stage['calls']:,} calls, {stage['statements']:,} statements, "
+            f"{stage['rows']:,} rows, {stage['shared_blks_read']:,} blocks read"
+        )
+    print(f"\nTop {top} statements by time:")
+    print(f"  {'ms':>12} {'calls':>9} {'rows':>11} {'blks read':>10}  stage  query")
+    for row in top_statements(conn, run_id, top, schema):
+        print(
+            f"  {_ms(row['total_exec_time']):>12} {row['calls']:>9,} "
+            f"{row['rows']:>11,} {row['shared_blks_read']:>10,}  "
+            f"{row['stages']}  {_short(row['query'])}"
+        )
+    return True
+
+
+def _print_comparison(conn, run_id, other_run_id, top, schema):
+    rows = compare_runs(conn, run_id, other_run_id, top, schema)
+    if not rows:
+        print(f"❌ No statements captured for runs {run_id} and {other_run_id}")
+        return False
+    totals = {
+        run: {s["stage"]: s["total_exec_time"] for s in stage_totals(conn, run, schema)}
+        for run in (run_id, other_run_id)
+    }
+    print(f"Stage time, {run_id} vs {other_run_id} (ms):")
+    for stage in sorted(set(totals[run_id]) | set(totals[other_run_id])):
+        print(
+            f"  ◦ {stage}: {_ms(totals[run_id].get(stage))} vs "
+            f"{_ms(totals[other_run_id].get(stage))}"
+        )
+    print(f"\nTop {top} statements by change in time:")
+    print(f"  {'ms':>12} {'other ms':>12} {'change':>12}  stage  query")
+    for row in rows:
+        print(
+            f"  {_ms(row['time']):>12} {_ms(row['other_time']):>12} "
+            f"{row['time_change']:>+12,.1f}  {row['stages']}  {_short(row['query'])}"
+        )
+    return True
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Capture and report pg_stat_statements per pipeline stage"
+    )
+    parser.add_argument("--schema", default=DEFAULT_SCHEMA)
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    for name, help_text in (
+        ("begin", "Snapshot the counters at the start of a stage"),
+        ("end", "Store the statements a stage ran"),
+    ):
+        command = subparsers.add_parser(name, help=help_text)
+        command.add_argument("--run-id", required=True)
+        command.add_argument("--stage", required=True)
+    report = subparsers.add_parser(
+        "report", help="Top statements of a run, or two runs compared"
+    )
+    report.add_argument("--run-id", required=True)
+    report.add_argument("--compare", metavar="OTHER_RUN_ID")
+    report.add_argument("--top", type=int, default=DEFAULT_TOP)
+    args = parser.parse_args(argv)
+
+    db_params = {
+        "host": os.getenv("DB_HOST", "localhost"),
+        "port": int(os.getenv("DB_PORT", 5432)),
+        "user": os.getenv("DB_USER", "postgres"),
+        "password": os.getenv("DB_PASSWORD", "postgres"),
+        "database": os.getenv("DB_NAME", "postgres"),
+    }
+
+    if args.command in ("begin", "end"):
+        captured = capture(
+            args.command, db_params, args.run_id, args.stage, args.schema
+        )
+        print(
+            f"✓ {args.command} {args.stage}"
+            if captured
+            else f"◦ {args.stage} not captured (see log)"
+        )
+        # Never fail the stage being measured
+        return 0
+
+    conn = psycopg2.connect(**db_params)
+    try:
+        if args.compare:
+            ok = _print_comparison(
+                conn, args.run_id, args.compare, args.top, args.schema
+            )
+        else:
+            ok = _print_report(conn, args.run_id, args.top, args.schema)
+    finally:
+        conn.close()
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    logging.basicConfig(
+        level=logging.INFO,
+        format="%(asctime)s - %(name)s - %(levelname)s - %(message)s",
+    )
+    sys.exit(main())
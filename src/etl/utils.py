@@ -0,0 +1,165 @@
+"""
+Helper functions shared by the ETL and tooling modules.
+"""
+
+import hashlib
+import json
+import re
+from pathlib import Path
+
+# Directory holding the Metabase dashboard query files
+ANALYTICS_DIR = Path("src/analytics")
+
+# Section banners such as "-- =====" or "-- -----" carry no title
+_DECORATION = re.compile(r"^[-=\s]*$")
+
+
+def split_sql_statements(sql_text):
+    """
+    Split a SQL file into statements, pairing each with its title comment.
+
+    The title is the closest non-decorative "--" comment line above the
+    statement, e.g. "1.2 Seller growth over time".
+
+    Args:
+        sql_text: Contents of a SQL file
+
+    Returns:
+        list[tuple[str, str]]: (title, statement) pairs without the trailing ";"
+    """
+    statements = []
+    title = None
+    buffer = []
+    in_string = False
+
+    for line in sql_text.splitlines():
+        stripped = line.strip()
+        if not buffer and stripped.startswith("--"):
+            comment = stripped[2:].strip()
+            if comment and not _DECORATION.match(comment):
+                title = comment
+            continue
+        if not buffer and not stripped:
+            continue
+
+        buffer.append(line)
+        # Track quotes so a ";" inside a string literal does not end a statement
+        code = line.split("--", 1)[0] if not in_string else line
+        if code.count("'") % 2 == 1:
+            in_string = not in_string
+        if not in_string and code.rstrip().endswith(";"):
+            statement = "\n".join(buffer).strip().rstrip(";").strip()
+            statements.append((title or f"statement {len(statements) + 1}", statement))
+            buffer = []
+            title = None
+
+    remainder = "\n".join(buffer).strip()
+    if remainder:
+        statements.append((title or f"statement {len(statements) + 1}", remainder))
+    return statements
+
+
+def load_dashboard_queries(analytics_dir=ANALYTICS_DIR):
+    """
+    Load every query from the SQL files in the analytics directory.
+
+    Args:
+        analytics_dir: Directory containing the *.sql dashboard query files
+
+    Returns:
+        list[dict]: One entry per query with "file", "title", "key" and "sql"
+    """
+    queries = []
+    for path in sorted(Path(analytics_dir).glob("*.sql")):
+        for position, (title, sql) in enumerate(
+            split_sql_statements(path.read_text()), 1
+        ):
+            number = title.split(" ", 1)[0]
+            if not re.match(r"^\d+(\.\d+)*$", number):
+                number = str(position)
+            queries.append(
+                {
+                    "file": path.name,
+                    "title": title,
+                    "key": f"{path.stem}:{number}",
+                    "sql": sql,
+                }
+            )
+    return queries
+
+
+def file_sha256(path, block_size=1 << 20):
+    """
+    Compute the SHA-256 hex digest of a file without reading it into memory.
+
+    Args:
+        path: File to hash, or an archive member (src/etl/archive.py)
+        block_size: Bytes read per iteration
+
+    Returns:
+        str: Hex digest of the file contents
+    """
+    digest = hashlib.sha256()
+    source = path if hasattr(path, "open") else Path(path)
+    with source.open("rb") as f:
+        for block in iter(lambda: f.read(block_size), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def statistics_fingerprint(cursor, oid):
+    """
+    Fingerprint of a relation from Postgres' statistics, without reading it.
+
+    A table is fingerprinted by its oid, its file node and the rows inserted,
+    updated and deleted in it (pg_stat_all_tables), so any write moves the
+    fingerprint, and so does rebuilding or truncating the table. The counters
+    are those of sessions that already ended or went idle; a session still
+    writing publishes them within seconds. A view combines its definition
+    with the fingerprints of the relations it reads.
+
+    Args:
+        cursor: psycopg2 cursor
+        oid: oid of the relation
+
+    Returns:
+        str or None: The fingerprint, or None for a kind of relation
+            without statistics
+    """
+    cursor.execute(
+        """
+        SELECT c.relkind, pg_relation_filenode(c.oid),
+               s.n_tup_ins, s.n_tup_upd, s.n_tup_del, pg_get_viewdef(c.oid)
+        FROM pg_class c
+        LEFT JOIN pg_stat_all_tables s ON s.relid = c.oid
+        WHERE c.oid = %s
+        """,
+        (oid,),
+    )
+    kind, filenode, inserted, updated, deleted, definition = cursor.fetchone()
+    if kind in ("r", "m") and inserted is not None:
+        return f"{oid}:{filenode}:{inserted}:{updated}:{deleted}"
+    if kind != "v":
+        return None
+
+    # Relations the view's rewrite rule depends on, other than itself
+    cursor.execute(
+        """
+        SELECT DISTINCT d.refobjid
+        FROM pg_rewrite r
+        JOIN pg_depend d
+          ON d.classid = 'pg_rewrite'::regclass AND d.objid = r.oid
+        WHERE r.ev_class = %s
+          AND d.refclassid = 'pg_class'::regclass
+          AND d.refobjid <> r.ev_class
+        ORDER BY 1
+        """,
+        (oid,),
+    )
+    parts = [definition]
+    for (parent,) in cursor.fetchall():
+        fingerprint = statistics_fingerprint(cursor, parent)
+        if fingerprint is None:
+            return None
+        parts.append(fingerprint)
+    return hashlib.sha256(json.dumps(parts).encode("utf-8")).hexdigest()
@@ -0,0 +1,180 @@
+"""
+Pre-load validation of the raw Olist rows.
+
+The loader checks the rows of a table with vectorized column operations
+before writing them. Rows that break a rule are not loaded. They are written
+to a quarantine control table instead, with the code of the first rule they
+break and the row itself as JSON:
+
+    valid, rejected = validate_rows(df, "orders")
+    quarantine_rows(conn, schema, "orders", rejected)
+
+The rules are the per-row checks of the dbt singular tests order_data_quality
+(impossible timestamps) and revenue_data_integrity (negative amounts). Tables
+loaded by the loader therefore only need those full-table scans in incremental
+mode (test_mode: incremental). The payment discrepancy check compares an
+order's items with its payments across tables and stays in dbt.
+"""
+
+import logging
+
+import numpy as np
+import pandas as pd
+from psycopg2.extras import execute_values
+
+logger = logging.getLogger(__name__)
+
+# Control table (in the loader's schema) holding the rejected rows
+QUARANTINE_TABLE = "etl_quarantine"
+
+REASON_COLUMN = "reason_code"
+
+
+def _timestamps(df, column):
+    values = df[column]
+    if not pd.api.types.is_datetime64_any_dtype(values):
+        values = pd.to_datetime(values, errors="coerce")
+    return values
+
+
+def _numbers(df, column):
+    values = df[column]
+    if not pd.api.types.is_numeric_dtype(values):
+        values = pd.to_numeric(values, errors="coerce")
+    return values
+
+
+def _before(column, reference):
+    """Rows whose column is earlier than the reference column."""
+    return lambda df: _timestamps(df, column) < _timestamps(df, reference)
+
+
+def _in_future(column):
+    """Rows whose timestamp is later than the time of the check."""
+    return lambda df: _timestamps(df, column) > pd.Timestamp.now()
+
+
+def _negative(column):
+    return lambda df: _numbers(df, column) < 0
+
+
+# Rules per table, as (reason code, check returning a boolean Series), in the
+# order their codes are reported. Missing values never break a rule.
+RULES = {
+    "orders": [
+        (
+            "delivered_before_purchase",
+            _before("order_delivered_customer_date", "order_purchase_timestamp"),
+        ),
+        (
+            "approved_before_purchase",
+            _before("order_approved_at", "order_purchase_timestamp"),
+        ),
+        ("purchased_in_future", _in_future("order_purchase_timestamp")),
+    ],
+    "order_items": [
+        ("negative_price", _negative("price")),
+        ("negative_freight", _negative("freight_value")),
+    ],
+    "order_payments": [
+        ("negative_payment", _negative("payment_value")),
+    ],
+}
+
+
+def validate_rows(df, table_name):
+    """
+    Split raw rows into the rows to load and the rejected rows.
+
+    Each rule is one column operation over the whole frame, so validating a
+    table in one call is much cheaper than validating it chunk by chunk.
+
+    Args:
+        df: Rows with the source's (lower-cased) column names
+        table_name: Table the rows are loaded into
+
+    Returns:
+        tuple: (valid rows, rejected rows with a reason_code column)
+    """
+    rules = RULES.get(table_name, [])
+    broken = [check(df).fillna(False).to_numpy(dtype=bool) for _, check in rules]
+    rejected = np.logical_or.reduce(broken) if broken else None
+    if rejected is None or not rejected.any():
+        # The common case: every row is loaded
+        return df, df.iloc[:0].assign(**{REASON_COLUMN: ""})
+
+    reasons = np.select(broken, [code for code, _ in rules])
+    return (
+        df[~rejected],
+        df[rejected].assign(**{REASON_COLUMN: reasons[rejected]}),
+    )
+
+
+def ensure_quarantine_table(conn, schema):
+    """Create the quarantine control table if it does not exist."""
+    with conn.cursor() as cursor:
+        cursor.execute(
+            f"""
+            CREATE TABLE IF NOT EXISTS {schema}.{QUARANTINE_TABLE} (
+                table_name TEXT NOT NULL,
+                reason_code TEXT NOT NULL,
+                row_data JSONB NOT NULL,
+                quarantined_at TIMESTAMPTZ NOT NULL DEFAULT now()
+            );
+            CREATE INDEX IF NOT EXISTS {QUARANTINE_TABLE}_table_name_idx
+                ON {schema}.{QUARANTINE_TABLE} (table_name, reason_code);
+            """
+        )
+
+
+def clear_quarantine(conn, schema, table_name):
+    """Delete a table's quarantined rows, e.g. before the table is replaced."""
+    with conn.cursor() as cursor:
+        cursor.execute(
+            f"DELETE FROM {schema}.{QUARANTINE_TABLE} WHERE table_name = %s",
+            (table_name,),
+        )
+
+
+def quarantine_rows(conn, schema, table_name, rejected):
+    """
+    Write rejected rows to the quarantine table. The caller commits.
+
+    Args:
+        conn: psycopg2 (DB-API) connection
+        schema: Schema of the quarantine table
+        table_name: Table the rows were meant for
+        rejected: Rows returned as rejected by validate_rows()
+
+    Returns:
+        int: Rows quarantined
+    """
+    if rejected.empty:
+        return 0
+    # One JSON document per line; newlines inside values are escaped
+    documents = (
+        rejected.drop(columns=REASON_COLUMN)
+        .to_json(orient="records", lines=True, date_format="iso")
+        .splitlines()
+    )
+    with conn.cursor() as cursor:
+        execute_values(
+            cursor,
+            f"INSERT INTO {schema}.{QUARANTINE_TABLE} "
+            f"(table_name, reason_code, row_data) VALUES %s",
+            [
+                (table_name, reason, document)
+                for reason, document in zip(rejected[REASON_COLUMN], documents)
+            ],
+            template="(%s, %s, %s::jsonb)",
+        )
+    logger.warning(f"Quarantined {len(rejected)} rows of {schema}.{table_name}")
+    return len(rejected)
+
+
+def describe(counts):
+    """One-line summary of quarantined rows per reason code."""
+    if not counts:
+        return "all rows passed validation"
+    reasons = ", ".join(f"{code}: {n:,}" for code, n in sorted(counts.items()))
+    return f"quarantined {sum(counts.values()):,} rows ({reasons})"
@@ -0,0 +1,101 @@
+import unittest
+import hashlib
+import sys
+import tempfile
+import zipfile
+from pathlib import Path
+
+# Add the src directory to the Python path
+sys.path.append(str(Path(__file__).parent.parent))
+
+from src.etl.archive import ARCHIVE_FILE, ArchiveMember, raw_source
+from src.etl.landing import ParquetLanding
+from src.etl.manifest import SourceManifest
+from src.etl.utils import file_sha256
+
+ORDERS_CSV = (
+    "order_id,order_purchase_timestamp,items\n"
+    "o1,2017-11-24 10:00:00,2\n"
+    "o2,2017-11-25 11:30:00,1\n"
+)
+
+
+class TestArchiveSources(unittest.TestCase):
+    """Unit tests for reading raw files out of the Kaggle archive."""
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.data_dir = Path(self.tmp_dir.name)
+        self.archive_path = self.data_dir / ARCHIVE_FILE
+        with zipfile.ZipFile(self.archive_path, "w", zipfile.ZIP_DEFLATED) as archive:
+            archive.writestr("olist_orders_dataset.csv", ORDERS_CSV)
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def test_archive_is_preferred_over_loose_files(self):
+        """Files in the archive are read from it; others from the directory."""
+        (self.data_dir / "olist_orders_dataset.csv").write_text("stale\n")
+
+        source = raw_source(self.data_dir, "olist_orders_dataset.csv")
+        self.assertIsInstance(source, ArchiveMember)
+        self.assertEqual(source.name, "olist_orders_dataset.csv")
+        self.assertEqual(source.stat().st_size, len(ORDERS_CSV))
+        with source.open("rb") as f:
+            self.assertEqual(f.read().decode(), ORDERS_CSV)
+
+        self.assertEqual(
+            raw_source(self.data_dir, "generated.csv"), self.data_dir / "generated.csv"
+        )
+
+    def test_explicit_archive(self):
+        """An archive outside the data directory can be named explicitly."""
+        other_dir = self.data_dir / "other"
+        other_dir.mkdir()
+        source = raw_source(other_dir, "olist_orders_dataset.csv", self.archive_path)
+        self.assertIsInstance(source, ArchiveMember)
+
+        self.archive_path.unlink()
+        self.assertEqual(
+            raw_source(self.data_dir, "olist_orders_dataset.csv"),
+            self.data_dir / "olist_orders_dataset.csv",
+        )
+
+    def test_member_cannot_be_opened_for_writing(self):
+        source = raw_source(self.data_dir, "olist_orders_dataset.csv")
+        with self.assertRaises(ValueError):
+            with source.open("wb"):
+                pass
+
+    def test_hash_of_member(self):
+        source = raw_source(self.data_dir, "olist_orders_dataset.csv")
+        self.assertEqual(
+            file_sha256(source), hashlib.sha256(ORDERS_CSV.encode()).hexdigest()
+        )
+
+    def test_landing_reads_member_without_extracting(self):
+        """Members are parsed from the archive stream into Parquet."""
+        landing = ParquetLanding(self.data_dir / "landing")
+        source = raw_source(self.data_dir, "olist_orders_dataset.csv")
+
+        table = landing.read(source, "orders")
+        self.assertEqual(table.column("order_id").to_pylist(), ["o1", "o2"])
+        self.assertFalse((self.data_dir / "olist_orders_dataset.csv").exists())
+
+        # An unchanged member is not converted again
+        self.assertFalse(landing.land(source, "orders"))
+
+    def test_manifest_fingerprints_member(self):
+        manifest = SourceManifest(self.data_dir)
+        manifest.record("olist_orders_dataset.csv", "orders", 2)
+        self.assertEqual(
+            manifest.entries["olist_orders_dataset.csv"]["sha256"],
+            hashlib.sha256(ORDERS_CSV.encode()).hexdigest(),
+        )
+        self.assertTrue(
+            SourceManifest(self.data_dir).is_unchanged("olist_orders_dataset.csv")
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
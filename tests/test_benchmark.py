@@ -0,0 +1,107 @@
+import unittest
+import sys
+from pathlib import Path
+
+# Add the src directory to the Python path
+sys.path.append(str(Path(__file__).parent.parent))
+
+from src.etl.benchmark import compare_results
+from src.etl.utils import load_dashboard_queries, split_sql_statements
+
+
+def _report(**results):
+    return {"results": results}
+
+
+class TestCompareResults(unittest.TestCase):
+    """Unit tests for the benchmark comparison."""
+
+    def _verdicts(self, baseline, current, **kwargs):
+        rows = compare_results(baseline, current, **kwargs)
+        return {row["key"]: row["verdict"] for row in rows}
+
+    def test_slowdown_beyond_tolerance_is_regression(self):
+        """A step slower by more than the tolerance is flagged."""
+        verdicts = self._verdicts(
+            _report(a={"status": "ok", "seconds": 1.0}),
+            _report(a={"status": "ok", "seconds": 1.2}),
+            tolerance=0.10,
+        )
+        self.assertEqual(verdicts["a"], "regression")
+
+    def test_slowdown_within_tolerance_is_ok(self):
+        """A slowdown inside the tolerance is not flagged."""
+        verdicts = self._verdicts(
+            _report(a={"status": "ok", "seconds": 1.0}),
+            _report(a={"status": "ok", "seconds": 1.05}),
+            tolerance=0.10,
+        )
+        self.assertEqual(verdicts["a"], "ok")
+
+    def test_small_absolute_changes_are_ignored(self):
+        """Relative noise on very fast steps is not flagged."""
+        verdicts = self._verdicts(
+            _report(a={"status": "ok", "seconds": 0.001}),
+            _report(a={"status": "ok", "seconds": 0.004}),
+            min_seconds=0.05,
+        )
+        self.assertEqual(verdicts["a"], "ok")
+
+    def test_improvement_new_missing_and_failures(self):
+        """Speedups, added/removed steps and new failures are classified."""
+        verdicts = self._verdicts(
+            _report(
+                fast={"status": "ok", "seconds": 2.0},
+                gone={"status": "ok", "seconds": 1.0},
+                broken={"status": "ok", "seconds": 1.0},
+            ),
+            _report(
+                fast={"status": "ok", "seconds": 1.0},
+                added={"status": "ok", "seconds": 1.0},
+                broken={"status": "error", "seconds": 0.0},
+            ),
+        )
+        self.assertEqual(
+            verdicts,
+            {
+                "fast": "improvement",
+                "gone": "missing",
+                "added": "new",
+                "broken": "regression",
+            },
+        )
+
+
+class TestDashboardQueries(unittest.TestCase):
+    """Unit tests for the dashboard query parser."""
+
+    def test_split_sql_statements(self):
+        """Statements are split on ";" and titled by their comment."""
+        statements = split_sql_statements(
+            "-- =====\n"
+            "-- 1.1 First query\n"
+            "SELECT 'a;b' AS x;\n"
+            "\n"
+            "-- 1.2 Second query\n"
+            "SELECT 2 -- trailing comment\n"
+            "FROM t;\n"
+        )
+        self.assertEqual(
+            statements,
+            [
+                ("1.1 First query", "SELECT 'a;b' AS x"),
+                ("1.2 Second query", "SELECT 2 -- trailing comment\nFROM t"),
+            ],
+        )
+
+    def test_analytics_queries_have_unique_keys(self):
+        """Every query in src/analytics gets a distinct result key."""
+        analytics_dir = Path(__file__).parent.parent / "src" / "analytics"
+        queries = load_dashboard_queries(analytics_dir)
+        self.assertTrue(queries)
+        keys = [query["key"] for query in queries]
+        self.assertEqual(len(keys), len(set(keys)))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,137 @@
+import unittest
+import os
+import sys
+from pathlib import Path
+
+# Add the src directory to the Python path
+sys.path.append(str(Path(__file__).parent.parent))
+
+from src.etl.bulk_load import BulkLoad, format_bytes
+
+SCHEMA = "bulk_load_test"
+
+
+class TestFormatBytes(unittest.TestCase):
+    def test_units(self):
+        self.assertEqual(format_bytes(512), "512 B")
+        self.assertEqual(format_bytes(3 * 1024 * 1024), "3.0 MB")
+
+
+def _db_params():
+    return {
+        "host": os.getenv("DB_HOST"),
+        "port": int(os.getenv("DB_PORT", 5432)),
+        "user": os.getenv("DB_USER", "postgres"),
+        "password": os.getenv("DB_PASSWORD", "postgres"),
+        "database": os.getenv("DB_NAME", "postgres"),
+    }
+
+
+def _postgres_connection():
+    if not os.getenv("DB_HOST"):
+        return None
+    try:
+        import psycopg2
+
+        return psycopg2.connect(**_db_params(), connect_timeout=3)
+    except Exception:
+        return None
+
+
+class TestBulkLoad(unittest.TestCase):
+    """The bulk-load profile against a Postgres database."""
+
+    @classmethod
+    def setUpClass(cls):
+        cls.conn = _postgres_connection()
+        if cls.conn is None:
+            raise unittest.SkipTest("no Postgres database configured (DB_* env vars)")
+
+    def setUp(self):
+        with self.conn.cursor() as cursor:
+            cursor.execute(
+                f"""
+                DROP SCHEMA IF EXISTS {SCHEMA} CASCADE;
+                CREATE SCHEMA {SCHEMA};
+                CREATE TABLE {SCHEMA}.orders (order_id text PRIMARY KEY, status text);
+                CREATE INDEX orders_status_idx ON {SCHEMA}.orders (status);
+                """
+            )
+        self.conn.commit()
+
+    def tearDown(self):
+        self.conn.rollback()
+        with self.conn.cursor() as cursor:
+            cursor.execute(f"DROP SCHEMA IF EXISTS {SCHEMA} CASCADE")
+        self.conn.commit()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.conn.close()
+
+    def _load(self, rows=20000, **kwargs):
+        bulk = BulkLoad(self.conn, SCHEMA, "orders", **kwargs)
+        try:
+            bulk.start()
+            bulk.prepare()
+            with self.conn.cursor() as cursor:
+                cursor.execute(
+                    f"""
+                    INSERT INTO {SCHEMA}.orders
+                    SELECT md5(i::text), (ARRAY['delivered', 'shipped'])[i %% 2 + 1]
+                    FROM generate_series(1, %s) AS i
+                    """,
+                    (rows,),
+                )
+            stats = bulk.finish(rows)
+            self.conn.commit()
+        finally:
+            bulk.close()
+        return stats
+
+    def _table_state(self):
+        with self.conn.cursor() as cursor:
+            cursor.execute(
+                """
+                SELECT c.relpersistence, c.reltuples,
+                       (SELECT array_agg(indexname::text ORDER BY indexname)
+                        FROM pg_indexes
+                        WHERE schemaname = %s AND tablename = 'orders'),
+                       current_setting('synchronous_commit')
+                FROM pg_class c
+                WHERE c.oid = to_regclass(%s)
+                """,
+                (SCHEMA, f"{SCHEMA}.orders"),
+            )
+            return cursor.fetchone()
+
+    def test_profile_rebuilds_indexes_and_analyzes(self):
+        """Indexes come back, the table is logged again and has statistics."""
+        stats = self._load()
+
+        persistence, reltuples, indexes, synchronous_commit = self._table_state()
+        self.assertEqual(persistence, "p")
+        self.assertEqual(reltuples, 20000)
+        self.assertEqual(indexes, ["orders_pkey", "orders_status_idx"])
+        self.assertEqual(synchronous_commit, "on")
+        self.assertEqual(stats["indexes_rebuilt"], 1)
+        self.assertTrue(stats["bulk_load"])
+        self.assertGreater(stats["rows_per_second"], 0)
+
+    def test_tables_that_need_no_durability_stay_unlogged(self):
+        self._load(durable=False)
+        self.assertEqual(self._table_state()[0], "u")
+
+    def test_unlogged_loads_write_less_wal(self):
+        """Without the profile every row and index entry is WAL-logged."""
+        plain = self._load(enabled=False)
+        self.setUp()
+        profiled = self._load(durable=False)
+
+        self.assertFalse(plain["bulk_load"])
+        self.assertEqual(self._table_state()[0], "u")
+        self.assertLess(profiled["wal_bytes"] * 5, plain["wal_bytes"])
+
+
+if __name__ == "__main__":
+    unittest.main()
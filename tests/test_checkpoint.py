@@ -0,0 +1,186 @@
+import unittest
+from unittest.mock import patch
+import multiprocessing
+import os
+import signal
+import sys
+import tempfile
+from pathlib import Path
+
+import pandas as pd
+
+# Add the src directory to the Python path
+sys.path.append(str(Path(__file__).parent.parent))
+
+from src.etl.checkpoint import CHECKPOINT_TABLE, get_checkpoints, record_chunk
+from src.etl.landing import ParquetLanding
+from src.etl.loader import OlistDataLoader
+
+SCHEMA = "checkpoint_test"
+TABLE = "geolocation"
+ROWS = 5000  # five chunks of 1,000 rows
+SHA256 = "a" * 64
+
+
+def _loader_env():
+    return {
+        "SUPABASE_URL": "http://localhost:8000",
+        "SUPABASE_SERVICE_KEY": "test_key",
+        "DB_SCHEMA": SCHEMA,
+        "DB_HOST": os.getenv("DB_HOST", ""),
+        "DB_PORT": os.getenv("DB_PORT", "5432"),
+        "DB_NAME": os.getenv("DB_NAME", "postgres"),
+        "DB_USER": os.getenv("DB_USER", "postgres"),
+        "DB_PASSWORD": os.getenv("DB_PASSWORD", "postgres"),
+    }
+
+
+def _connected_loader(landing_dir):
+    with patch.dict(os.environ, _loader_env()):
+        loader = OlistDataLoader()
+    loader.landing = ParquetLanding(landing_dir)
+    if not loader.connect_to_db():
+        return None
+    return loader
+
+
+def _load_and_die(csv_path, landing_dir, committed_chunks):
+    """
+    Load the table in a worker that is SIGKILLed right after it has written
+    the chunk following the first committed_chunks, before that chunk commits.
+    """
+    loader = _connected_loader(landing_dir)
+    to_sql = pd.DataFrame.to_sql
+    calls = []
+
+    def to_sql_then_die(df, *args, **kwargs):
+        to_sql(df, *args, **kwargs)
+        calls.append(len(df))
+        if len(calls) > committed_chunks:
+            os.kill(os.getpid(), signal.SIGKILL)
+
+    with patch("pandas.DataFrame.to_sql", to_sql_then_die):
+        loader.load_csv_to_table(csv_path, TABLE, source_sha256=SHA256)
+
+
+class TestCheckpointedLoad(unittest.TestCase):
+    """Interrupted loads against a Postgres database."""
+
+    @classmethod
+    def setUpClass(cls):
+        if not os.getenv("DB_HOST"):
+            raise unittest.SkipTest("no Postgres database configured (DB_* env vars)")
+        cls.tmp_dir = tempfile.TemporaryDirectory()
+        cls.landing_dir = Path(cls.tmp_dir.name) / "landing"
+        cls.csv_path = Path(cls.tmp_dir.name) / "olist_geolocation_dataset.csv"
+        pd.DataFrame(
+            {
+                "geolocation_id": range(ROWS),
+                "geolocation_lat": [i / 100 for i in range(ROWS)],
+            }
+        ).to_csv(cls.csv_path, index=False)
+        try:
+            cls.loader = _connected_loader(cls.landing_dir)
+        except Exception:
+            cls.loader = None
+        if cls.loader is None:
+            cls.tmp_dir.cleanup()
+            raise unittest.SkipTest("Postgres database not reachable")
+
+    @classmethod
+    def tearDownClass(cls):
+        cls._execute(f"DROP SCHEMA IF EXISTS {SCHEMA} CASCADE")
+        cls.loader.close_connection()
+        cls.tmp_dir.cleanup()
+
+    def setUp(self):
+        self._execute(f"DROP SCHEMA IF EXISTS {SCHEMA} CASCADE; CREATE SCHEMA {SCHEMA}")
+
+    @classmethod
+    def _execute(cls, sql):
+        with cls.loader.engine.connect() as connection:
+            with connection.connection.cursor() as cursor:
+                cursor.execute(sql)
+                rows = cursor.fetchall() if cursor.description else None
+            connection.connection.commit()
+        return rows
+
+    def _checkpoints(self):
+        with self.loader.engine.connect() as connection:
+            return get_checkpoints(connection.connection, SCHEMA)
+
+    def _kill_load(self, committed_chunks):
+        process = multiprocessing.get_context("spawn").Process(
+            target=_load_and_die,
+            args=(self.csv_path, self.landing_dir, committed_chunks),
+        )
+        process.start()
+        process.join(timeout=120)
+        self.assertEqual(process.exitcode, -signal.SIGKILL)
+
+    def _load(self):
+        """Load in this process, returning the chunk sizes written."""
+        with patch(
+            "pandas.DataFrame.to_sql", autospec=True, side_effect=pd.DataFrame.to_sql
+        ) as mock_to_sql:
+            self.assertTrue(
+                self.loader.load_csv_to_table(
+                    self.csv_path, TABLE, source_sha256=SHA256
+                )
+            )
+        return [len(call.args[0]) for call in mock_to_sql.call_args_list]
+
+    def _assert_loaded_once(self):
+        (count, distinct, persistence) = self._execute(
+            f"SELECT count(*), count(DISTINCT geolocation_id), "
+            f"(SELECT relpersistence FROM pg_class "
+            f"WHERE oid = '{SCHEMA}.{TABLE}'::regclass) "
+            f"FROM {SCHEMA}.{TABLE}"
+        )[0]
+        self.assertEqual((count, distinct), (ROWS, ROWS))
+        self.assertEqual(persistence, "p")  # LOGGED again
+        self.assertEqual(self._checkpoints(), {})
+
+    def test_killed_load_resumes_at_first_uncommitted_chunk(self):
+        """A worker killed mid-table leaves only its committed chunks."""
+        self._kill_load(committed_chunks=2)
+
+        # The third chunk was written but never committed
+        self.assertEqual(
+            self._checkpoints(),
+            {TABLE: {"sha256": SHA256, "chunk_offset": 2, "rows_committed": 2000}},
+        )
+        self.assertEqual(
+            self._execute(f"SELECT count(*) FROM {SCHEMA}.{TABLE}"), [(2000,)]
+        )
+
+        self.assertEqual(self._load(), [1000, 1000, 1000])
+        self._assert_loaded_once()
+
+    def test_changed_source_starts_over(self):
+        self._kill_load(committed_chunks=2)
+        with self.loader.engine.connect() as connection:
+            record_chunk(connection.connection, SCHEMA, TABLE, "b" * 64, 2, 2000)
+            connection.connection.commit()
+
+        self.assertEqual(len(self._load()), 5)
+        self._assert_loaded_once()
+
+    def test_checkpoint_not_matching_table_starts_over(self):
+        """An unlogged table emptied by a crash does not match its checkpoint."""
+        self._kill_load(committed_chunks=3)
+        self._execute(f"TRUNCATE {SCHEMA}.{TABLE}")
+
+        self.assertEqual(len(self._load()), 5)
+        self._assert_loaded_once()
+
+    def test_completed_load_clears_checkpoint(self):
+        self.assertEqual(len(self._load()), 5)
+        self._assert_loaded_once()
+        self.assertEqual(
+            self._execute(f"SELECT count(*) FROM {SCHEMA}.{CHECKPOINT_TABLE}"), [(0,)]
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,144 @@
+import unittest
+import sys
+from pathlib import Path
+
+# Add the src directory to the Python path
+sys.path.append(str(Path(__file__).parent.parent))
+
+from src.etl.dbt_tests import (
+    ConsolidatedTestRunner,
+    build_check,
+    build_model_query,
+    collect_tests,
+)
+
+ORDERS = "model.ecommerce_analytics.stg_olist__orders"
+CUSTOMERS = "model.ecommerce_analytics.stg_olist__customers"
+
+
+def _test_node(name, column=None, namespace=None, config=None, depends_on=(), **kwargs):
+    if column:
+        kwargs["column_name"] = column
+    return {
+        "unique_id": f"test.ecommerce_analytics.{name}_{column}",
+        "resource_type": "test",
+        "attached_node": ORDERS,
+        "column_name": column,
+        "test_metadata": {"name": name, "namespace": namespace, "kwargs": kwargs},
+        "config": {"enabled": True, "severity": "ERROR", **(config or {})},
+        "depends_on": {"nodes": [ORDERS, *depends_on]},
+    }
+
+
+MANIFEST = {
+    "nodes": {
+        ORDERS: {"resource_type": "model", "relation_name": '"db"."stg"."orders"'},
+        CUSTOMERS: {
+            "resource_type": "model",
+            "relation_name": '"db"."stg"."customers"',
+        },
+    },
+    "sources": {},
+}
+
+
+class TestConsolidatedTests(unittest.TestCase):
+    """Unit tests for the consolidated dbt test runner."""
+
+    def test_collect_groups_supported_tests_by_model(self):
+        """Only the consolidated generic tests are picked up."""
+        manifest = {
+            **MANIFEST,
+            "nodes": {
+                **MANIFEST["nodes"],
+                "a": _test_node("not_null", "order_id"),
+                "b": _test_node("equal_rowcount", namespace="dbt_utils"),
+                "c": _test_node("unique", "order_id", config={"enabled": False}),
+            },
+        }
+        grouped = collect_tests(manifest)
+        self.assertEqual(list(grouped), [ORDERS])
+        self.assertEqual(
+            [t["test_metadata"]["name"] for t in grouped[ORDERS]], ["not_null"]
+        )
+
+    def test_build_checks(self):
+        """Each test becomes an aggregate failure expression."""
+        not_null, _ = build_check(_test_node("not_null", "order_id"), MANIFEST, 0)
+        self.assertEqual(not_null, "count(*) FILTER (WHERE (order_id) IS NULL)")
+
+        accepted, _ = build_check(
+            _test_node("accepted_values", "order_status", values=["delivered", "it's"]),
+            MANIFEST,
+            1,
+        )
+        self.assertIn("NOT IN ('delivered', 'it''s')", accepted)
+
+        relationship, join = build_check(
+            _test_node(
+                "relationships",
+                "customer_id",
+                depends_on=[CUSTOMERS],
+                to="ref('stg_olist__customers')",
+                field="customer_id",
+            ),
+            MANIFEST,
+            2,
+        )
+        self.assertIn('FROM "db"."stg"."customers"', join)
+        self.assertIn("dbt_parent_2.parent_key IS NULL", relationship)
+
+        aggregate, _ = build_check(
+            _test_node(
+                "expression_is_true", namespace="dbt_utils", expression="count(*) > 0"
+            ),
+            MANIFEST,
+            3,
+        )
+        self.assertEqual(aggregate, "CASE WHEN (count(*) > 0) THEN 0 ELSE 1 END")
+
+    def test_where_config_scopes_the_check(self):
+        """A test's where config is applied inside its FILTER clause."""
+        check, _ = build_check(
+            _test_node("not_null", "approved_at", config={"where": "status = 'paid'"}),
+            MANIFEST,
+            0,
+        )
+        self.assertIn("WHERE (status = 'paid') AND (approved_at) IS NULL", check)
+
+    def test_model_query_scans_once(self):
+        """All checks of a model share one SELECT over the model."""
+        checks = [
+            build_check(_test_node("not_null", "order_id"), MANIFEST, 0),
+            build_check(_test_node("unique", "order_id"), MANIFEST, 1),
+        ]
+        query = build_model_query('"db"."stg"."orders"', checks)
+        self.assertEqual(query.count("FROM"), 1)
+        self.assertIn('AS "test_1"', query)
+
+    def test_results_follow_severity_and_thresholds(self):
+        """Failure counts are turned into dbt statuses and messages."""
+        runner = ConsolidatedTestRunner.__new__(ConsolidatedTestRunner)
+        failing = runner._evaluate(_test_node("not_null", "order_id"), 3, 0.1)
+        self.assertEqual(failing["status"], "fail")
+        self.assertEqual(failing["failures"], 3)
+        self.assertEqual(
+            failing["message"], "Got 3 results, configured to fail if != 0"
+        )
+
+        warning = runner._evaluate(
+            _test_node("not_null", "order_id", config={"severity": "warn"}), 3, 0.1
+        )
+        self.assertEqual(warning["status"], "warn")
+
+        tolerated = runner._evaluate(
+            _test_node("not_null", "order_id", config={"error_if": ">10"}), 3, 0.1
+        )
+        self.assertEqual(tolerated["status"], "warn")
+
+        passing = runner._evaluate(_test_node("not_null", "order_id"), 0, 0.1)
+        self.assertEqual(passing["status"], "pass")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,157 @@
+import unittest
+import importlib.util
+import os
+import sys
+import tempfile
+from decimal import Decimal
+from pathlib import Path
+
+# Add the src directory to the Python path
+sys.path.append(str(Path(__file__).parent.parent))
+
+from src.etl.duckdb_engine import (
+    DuckDBQueryEngine,
+    compare_with_postgres,
+    results_match,
+    translate,
+)
+from src.etl.export import MartExporter
+
+HAS_DUCKDB = importlib.util.find_spec("duckdb") is not None
+
+TEST_SCHEMA = "duckdb_equivalence_marts"
+
+# Representative uses of the Postgres constructs found in src/analytics/
+EQUIVALENCE_QUERIES = [
+    f"""
+    SELECT category, count(*)::decimal / sum(count(*)) OVER () * 100 AS pct,
+           round(avg(price)::numeric, 2) AS avg_price
+    FROM {TEST_SCHEMA}.products GROUP BY 1 ORDER BY 1
+    """,
+    f"""
+    SELECT to_char(first_ordered_at, 'YYYY-MM-DD') AS day,
+           to_char(first_ordered_at, 'Month') AS month_name,
+           date_part('month', first_ordered_at) AS month_number,
+           date_trunc('month', first_ordered_at) AS month
+    FROM {TEST_SCHEMA}.products ORDER BY product_id
+    """,
+    f"""
+    SELECT product_id, price FROM {TEST_SCHEMA}.products
+    ORDER BY price DESC, product_id LIMIT 3
+    """,
+    f"""
+    SELECT category, round(sum(price) / nullif(count(price), 0), 2) AS per_product,
+           row_number() OVER (ORDER BY sum(price) DESC NULLS LAST) AS rank
+    FROM {TEST_SCHEMA}.products GROUP BY 1 ORDER BY 3
+    """,
+]
+
+
+class TestDialectShim(unittest.TestCase):
+    """Unit tests for the Postgres to DuckDB rewrites."""
+
+    def test_unsized_decimal_casts_become_double(self):
+        """Only casts without a precision are rewritten."""
+        sql = translate("SELECT round(a::numeric, 2), b::decimal, c::numeric(10, 2)")
+        self.assertEqual(
+            sql, "SELECT round(a::DOUBLE, 2), b::DOUBLE, c::numeric(10, 2)"
+        )
+
+    def test_to_char_becomes_strftime(self):
+        """Format tokens are translated and Month keeps its blank padding."""
+        self.assertEqual(
+            translate("to_char(first_ordered_at, 'YYYY-MM-DD')"),
+            "strftime(first_ordered_at, '%Y-%m-%d')",
+        )
+        self.assertEqual(
+            translate("to_char(o.purchased_at, 'Month')"),
+            "rpad(strftime(o.purchased_at, '%B'), 9, ' ')",
+        )
+
+    def test_results_match_tolerates_numeric_types(self):
+        """Decimal and float results within rounding are equivalent."""
+        self.assertTrue(results_match([("a", Decimal("2.68"))], [("a", 2.67)]))
+        self.assertTrue(results_match([(1, "x"), (1, "y")], [(1, "y"), (1, "x")]))
+        self.assertFalse(results_match([("a", Decimal("2.50"))], [("a", 2.4)]))
+        self.assertFalse(results_match([("a", None)], [("a", 0.0)]))
+
+
+def _db_params():
+    return {
+        "host": os.getenv("DB_HOST"),
+        "port": int(os.getenv("DB_PORT", 5432)),
+        "user": os.getenv("DB_USER", "postgres"),
+        "password": os.getenv("DB_PASSWORD", "postgres"),
+        "database": os.getenv("DB_NAME", "postgres"),
+    }
+
+
+def _postgres_connection():
+    if not os.getenv("DB_HOST"):
+        return None
+    try:
+        import psycopg2
+
+        return psycopg2.connect(**_db_params(), connect_timeout=3)
+    except Exception:
+        return None
+
+
+@unittest.skipUnless(HAS_DUCKDB, "duckdb is not installed")
+class TestPostgresEquivalence(unittest.TestCase):
+    """DuckDB over the Parquet export returns what Postgres returns."""
+
+    @classmethod
+    def setUpClass(cls):
+        cls.conn = _postgres_connection()
+        if cls.conn is None:
+            raise unittest.SkipTest("no Postgres database configured (DB_* env vars)")
+        with cls.conn.cursor() as cursor:
+            cursor.execute(
+                f"""
+                DROP SCHEMA IF EXISTS {TEST_SCHEMA} CASCADE;
+                CREATE SCHEMA {TEST_SCHEMA};
+                CREATE TABLE {TEST_SCHEMA}.products (
+                    product_id text, category text, price numeric,
+                    first_ordered_at timestamp
+                );
+                INSERT INTO {TEST_SCHEMA}.products VALUES
+                    ('p1', 'toys', 10.125, '2017-11-03 10:00'),
+                    ('p2', 'toys', 20.5, '2017-11-24 23:59'),
+                    ('p3', 'auto', NULL, '2018-01-15 08:30'),
+                    ('p4', 'auto', 99.99, NULL),
+                    ('p5', NULL, 5, '2018-02-01 00:00');
+                """
+            )
+        cls.conn.commit()
+        cls.tmp_dir = tempfile.TemporaryDirectory()
+        MartExporter(
+            cls.tmp_dir.name,
+            schema=TEST_SCHEMA,
+            db_params=_db_params(),
+            partition_columns={"products": "first_ordered_at"},
+        ).run()
+
+    @classmethod
+    def tearDownClass(cls):
+        with cls.conn.cursor() as cursor:
+            cursor.execute(f"DROP SCHEMA IF EXISTS {TEST_SCHEMA} CASCADE")
+        cls.conn.commit()
+        cls.conn.close()
+        cls.tmp_dir.cleanup()
+
+    def test_queries_match_postgres(self):
+        """Every representative query returns equivalent rows on both engines."""
+        engine = DuckDBQueryEngine(self.tmp_dir.name, schema=TEST_SCHEMA)
+        queries = [
+            {"key": f"q{i}", "title": f"query {i}", "sql": sql}
+            for i, sql in enumerate(EQUIVALENCE_QUERIES, 1)
+        ]
+        report = compare_with_postgres(engine, self.conn, queries)
+        engine.close()
+        for entry in report:
+            self.assertEqual(entry["status"], "match", entry)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,129 @@
+import unittest
+from unittest.mock import patch
+import sys
+import tempfile
+from pathlib import Path
+
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+# Add the src directory to the Python path
+sys.path.append(str(Path(__file__).parent.parent))
+
+from src.etl.export import (
+    NULL_PARTITION,
+    MartExporter,
+    arrow_schema,
+    partition_filter,
+    select_list,
+)
+
+COLUMNS = [
+    ("order_id", "text"),
+    ("purchased_at", "timestamp without time zone"),
+    ("total_amount", "numeric"),
+    ("delivery_window", "interval"),
+]
+
+
+class TestMartExport(unittest.TestCase):
+    """Unit tests for the Parquet export of the marts."""
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.export_dir = Path(self.tmp_dir.name)
+        self.fingerprints = {
+            "2018-01": {"rows": 2, "checksum": "10"},
+            "2018-02": {"rows": 1, "checksum": "20"},
+            None: {"rows": 1, "checksum": "30"},
+        }
+        self.columns = list(COLUMNS)
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def _export(self, force=False):
+        """Export the orders mart with the database calls replaced."""
+        exporter = MartExporter(
+            self.export_dir,
+            schema="olist_marts",
+            partition_columns={"orders": "purchased_at"},
+        )
+        written = []
+
+        def write_partition(conn, mart, columns, partition_column, partition):
+            written.append(partition)
+            path = exporter.partition_path(mart, partition_column, partition)
+            path.parent.mkdir(parents=True, exist_ok=True)
+            pq.write_table(arrow_schema(columns).empty_table(), path)
+            return 1
+
+        with patch.object(
+            MartExporter, "mart_columns", return_value=self.columns
+        ), patch.object(
+            MartExporter, "partition_fingerprints", return_value=dict(self.fingerprints)
+        ), patch.object(
+            MartExporter, "_write_partition", side_effect=write_partition
+        ):
+            stats = exporter.export_mart(None, "orders", force=force)
+        return stats, written
+
+    def test_schema_comes_from_column_types(self):
+        """Column types map to a fixed Arrow schema; unknown types become text."""
+        schema = arrow_schema(COLUMNS)
+        self.assertEqual(schema.field("purchased_at").type, pa.timestamp("us"))
+        self.assertEqual(schema.field("total_amount").type, pa.float64())
+        self.assertEqual(schema.field("delivery_window").type, pa.string())
+
+        query = select_list(COLUMNS)
+        self.assertIn('"total_amount"::double precision AS "total_amount"', query)
+        self.assertIn('"delivery_window"::text AS "delivery_window"', query)
+
+    def test_partition_filter_uses_a_range(self):
+        """Months are selected with a sargable range, NULLs with IS NULL."""
+        where, params = partition_filter("purchased_at", "2018-02")
+        self.assertIn('"purchased_at" >= %s::date', where)
+        self.assertEqual(params, ("2018-02-01", "2018-02-01"))
+        self.assertEqual(
+            partition_filter("purchased_at", None)[0], '"purchased_at" IS NULL'
+        )
+
+    def test_first_export_writes_every_partition(self):
+        """Each month, and the NULL partition, gets its own Hive directory."""
+        stats, written = self._export()
+
+        self.assertEqual(stats["written"], 3)
+        self.assertTrue(
+            (self.export_dir / "orders" / "month=2018-01" / "data.parquet").exists()
+        )
+        self.assertTrue(
+            (
+                self.export_dir / "orders" / f"month={NULL_PARTITION}" / "data.parquet"
+            ).exists()
+        )
+
+    def test_only_changed_partitions_are_rewritten(self):
+        """Unchanged months are skipped and vanished months are removed."""
+        self._export()
+        self.fingerprints["2018-02"] = {"rows": 2, "checksum": "21"}
+        del self.fingerprints["2018-01"]
+
+        stats, written = self._export()
+
+        self.assertEqual(written, ["2018-02"])
+        self.assertEqual(stats["unchanged"], 1)
+        self.assertEqual(stats["removed"], 1)
+        self.assertFalse((self.export_dir / "orders" / "month=2018-01").exists())
+
+    def test_schema_change_rewrites_the_mart(self):
+        """A changed column list rewrites every partition."""
+        self._export()
+        self.columns.append(("segmented_as_of", "date"))
+
+        stats, _ = self._export()
+        self.assertEqual(stats["written"], 3)
+        self.assertEqual(stats["unchanged"], 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,241 @@
+import unittest
+from unittest.mock import patch
+import os
+import sys
+from pathlib import Path
+
+# Add the src directory to the Python path
+sys.path.append(str(Path(__file__).parent.parent))
+
+from src.etl import extract
+from src.etl.config import OLIST_DATASETS
+from src.etl.extract import SOURCE_TABLES, ExtractionEngine, _csv_batch
+
+SOURCE_SCHEMA = "extract_test_source"
+TARGET_SCHEMA = "extract_test_raw"
+
+
+class TestCsvBatch(unittest.TestCase):
+    """Unit tests for the COPY batch encoding."""
+
+    def test_null_and_empty_strings_are_distinct(self):
+        """None is an unquoted empty field; strings are always quoted."""
+        buffer = _csv_batch([("a", None, ""), ('say "hi"', "x,\ny", "1")])
+        self.assertEqual(buffer.read(), '"a",,""\n"say ""hi""","x,\ny","1"\n')
+
+
+def _db_params():
+    return {
+        "host": os.getenv("DB_HOST"),
+        "port": int(os.getenv("DB_PORT", 5432)),
+        "user": os.getenv("DB_USER", "postgres"),
+        "password": os.getenv("DB_PASSWORD", "postgres"),
+        "database": os.getenv("DB_NAME", "postgres"),
+    }
+
+
+def _postgres_connection():
+    if not os.getenv("DB_HOST"):
+        return None
+    try:
+        import psycopg2
+
+        return psycopg2.connect(**_db_params(), connect_timeout=3)
+    except Exception:
+        return None
+
+
+class TestExtractionEngine(unittest.TestCase):
+    """The concurrent extraction against a Postgres database."""
+
+    @classmethod
+    def setUpClass(cls):
+        cls.conn = _postgres_connection()
+        if cls.conn is None:
+            raise unittest.SkipTest("no Postgres database configured (DB_* env vars)")
+
+    def setUp(self):
+        with self.conn.cursor() as cursor:
+            cursor.execute(
+                f"""
+                DROP SCHEMA IF EXISTS {SOURCE_SCHEMA} CASCADE;
+                DROP SCHEMA IF EXISTS {TARGET_SCHEMA} CASCADE;
+                CREATE SCHEMA {SOURCE_SCHEMA};
+                CREATE TABLE {SOURCE_SCHEMA}.orders AS
+                SELECT md5(i::text) AS order_id,
+                       timestamp '2017-01-01' + i * interval '1 hour' AS purchased_at,
+                       CASE WHEN i % 7 = 0 THEN NULL ELSE i * 1.5 END AS amount,
+                       CASE WHEN i % 5 = 0 THEN '' ELSE 'note "' || i || '"' END AS note
+                FROM generate_series(1, 2500) AS i;
+                CREATE TABLE {SOURCE_SCHEMA}.sellers (seller_id text);
+                """
+            )
+        self.conn.commit()
+
+    def tearDown(self):
+        with self.conn.cursor() as cursor:
+            cursor.execute(
+                f"DROP SCHEMA IF EXISTS {SOURCE_SCHEMA} CASCADE;"
+                f"DROP SCHEMA IF EXISTS {TARGET_SCHEMA} CASCADE;"
+            )
+        self.conn.commit()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.conn.close()
+
+    def _engine(self, **kwargs):
+        tables = [
+            {"name": name, "endpoint": f"{SOURCE_SCHEMA}.{name}"}
+            for name in ("orders", "missing", "sellers")
+        ]
+        return ExtractionEngine(
+            _db_params(), tables=tables, target_schema=TARGET_SCHEMA, **kwargs
+        )
+
+    def test_copies_match_the_source_as_text(self):
+        """Every value, NULL and empty string arrives as Postgres renders it."""
+        report = self._engine(concurrency=2, queue_size=1, batch_size=100).run()
+
+        self.assertEqual(report["tables"]["orders"]["rows"], 2500)
+        with self.conn.cursor() as cursor:
+            cursor.execute(
+                f"""
+                SELECT count(*) FROM (
+                    SELECT order_id, purchased_at::text, amount::text, note
+                    FROM {SOURCE_SCHEMA}.orders
+                    EXCEPT ALL
+                    SELECT * FROM {TARGET_SCHEMA}.olist_orders
+                ) AS missing_rows
+                """
+            )
+            self.assertEqual(cursor.fetchone()[0], 0)
+
+    def test_source_tables_are_tables_the_loader_creates(self):
+        """Every default source table extracts from the loader's table set."""
+        with self.conn.cursor() as cursor:
+            cursor.execute(
+                f"DROP SCHEMA {SOURCE_SCHEMA} CASCADE; CREATE SCHEMA {SOURCE_SCHEMA};"
+            )
+            for dataset in OLIST_DATASETS:
+                columns = ", ".join(f"{column} text" for column in dataset["columns"])
+                cursor.execute(
+                    f"CREATE TABLE {SOURCE_SCHEMA}.{dataset['table']} ({columns});"
+                    f"INSERT INTO {SOURCE_SCHEMA}.{dataset['table']} DEFAULT VALUES"
+                )
+        self.conn.commit()
+
+        tables = [
+            {
+                "name": table["name"],
+                "endpoint": f"{SOURCE_SCHEMA}.{table['endpoint'].split('.')[-1]}",
+            }
+            for table in SOURCE_TABLES
+        ]
+        report = ExtractionEngine(
+            _db_params(), tables=tables, target_schema=TARGET_SCHEMA
+        ).run()
+
+        self.assertEqual(
+            {name: result["status"] for name, result in report["tables"].items()},
+            {table["name"]: "ok" for table in SOURCE_TABLES},
+        )
+        self.assertEqual(report["tables_failed"], 0)
+
+    def test_failed_tables_do_not_stop_the_others(self):
+        """A missing source table is reported; empty tables are not copied."""
+        report = self._engine(concurrency=1).run()
+
+        self.assertEqual(report["tables"]["missing"]["status"], "error")
+        self.assertEqual(report["tables"]["orders"]["status"], "ok")
+        self.assertEqual(report["tables"]["sellers"]["status"], "ok")
+        self.assertEqual(report["tables"]["sellers"]["rows"], 0)
+        self.assertEqual((report["tables_processed"], report["tables_failed"]), (2, 1))
+        with self.conn.cursor() as cursor:
+            cursor.execute(
+                "SELECT to_regclass(%s), to_regclass(%s)",
+                (f"{TARGET_SCHEMA}.olist_orders", f"{TARGET_SCHEMA}.olist_sellers"),
+            )
+            self.assertEqual(cursor.fetchone(), (f"{TARGET_SCHEMA}.olist_orders", None))
+
+    def test_bulk_load_profile_writes_unlogged_copies(self):
+        """Raw copies are unlogged under the profile and logged without it."""
+        persistence = {}
+        for bulk_load in (True, False):
+            report = self._engine(bulk_load=bulk_load).run()
+            self.assertEqual(report["bulk_load"], bulk_load)
+            self.assertGreater(report["wal_bytes"], 0)
+            with self.conn.cursor() as cursor:
+                cursor.execute(
+                    "SELECT relpersistence FROM pg_class WHERE oid = to_regclass(%s)",
+                    (f"{TARGET_SCHEMA}.olist_orders",),
+                )
+                persistence[bulk_load] = cursor.fetchone()[0]
+        self.assertEqual(persistence, {True: "u", False: "p"})
+
+    def test_failed_write_keeps_the_previous_copy(self):
+        """A write failing mid-table rolls back and stops the table's reader."""
+        self._engine().run()
+        batches = []
+
+        def failing_batch(rows):
+            batches.append(rows)
+            if len(batches) == 3:
+                raise RuntimeError("disk full")
+            return _csv_batch(rows)
+
+        with patch.object(extract, "_csv_batch", side_effect=failing_batch):
+            report = self._engine(queue_size=1, batch_size=100).run()
+
+        self.assertEqual(report["tables"]["orders"]["error"], "disk full")
+        self.assertEqual(len(batches), 3)
+        with self.conn.cursor() as cursor:
+            cursor.execute(f"SELECT count(*) FROM {TARGET_SCHEMA}.olist_orders")
+            self.assertEqual(cursor.fetchone()[0], 2500)
+
+    def test_retry_only_extracts_failed_tables(self):
+        """A second run with the same run id skips the tables it copied."""
+        report = self._engine(run_id="run-1").run()
+        self.assertEqual(report["tables"]["missing"]["status"], "error")
+
+        with self.conn.cursor() as cursor:
+            cursor.execute(
+                f"CREATE TABLE {SOURCE_SCHEMA}.missing AS SELECT 1 AS id; "
+                f"TRUNCATE {SOURCE_SCHEMA}.orders"
+            )
+        self.conn.commit()
+        with patch.object(
+            ExtractionEngine, "extract_table", autospec=True, return_value=1
+        ) as mock_extract:
+            retry = self._engine(run_id="run-1").run()
+
+        self.assertEqual(
+            [call.args[1]["name"] for call in mock_extract.call_args_list], ["missing"]
+        )
+        self.assertEqual(
+            {name: result["status"] for name, result in retry["tables"].items()},
+            {"orders": "skipped", "missing": "ok", "sellers": "skipped"},
+        )
+        self.assertEqual(retry["tables"]["orders"]["rows"], 2500)
+        self.assertEqual((retry["tables_skipped"], retry["rows_processed"]), (2, 1))
+        self.assertIn("2 tables already extracted", extract.summarize(retry))
+
+        # A new run copies every table again
+        report = self._engine(run_id="run-2").run()
+        self.assertEqual(report["tables_processed"], 3)
+        self.assertEqual(report["tables"]["orders"]["rows"], 0)
+
+    def test_failed_table_is_not_recorded(self):
+        """Only committed copies count as done for the run."""
+        with patch.object(extract, "_csv_batch", side_effect=RuntimeError("boom")):
+            self._engine(run_id="run-1").run()
+        with self.conn.cursor() as cursor:
+            cursor.execute(
+                f"SELECT table_name FROM {TARGET_SCHEMA}.{extract.RUNS_TABLE} "
+                f"ORDER BY table_name"
+            )
+            self.assertEqual(cursor.fetchall(), [("sellers",)])
+
+
+if __name__ == "__main__":
+    unittest.main()
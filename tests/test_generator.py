@@ -0,0 +1,111 @@
+import unittest
+import sys
+import tempfile
+from pathlib import Path
+
+import pandas as pd
+
+# Add the src directory to the Python path
+sys.path.append(str(Path(__file__).parent.parent))
+
+from src.etl.config import OLIST_DATASETS
+from src.etl.generator import OlistDataGenerator
+
+
+class TestOlistDataGenerator(unittest.TestCase):
+    """Unit tests for the synthetic Olist data generator."""
+
+    @classmethod
+    def setUpClass(cls):
+        """Generate a small dataset once for all tests."""
+        cls.tmp_dir = tempfile.TemporaryDirectory()
+        cls.output_dir = Path(cls.tmp_dir.name)
+        # Small chunk size so the chunked append path is exercised
+        cls.rows = OlistDataGenerator(
+            scale=0.02, output_dir=cls.output_dir, seed=7, chunk_size=500
+        ).generate()
+        cls.tables = {
+            dataset["table"]: pd.read_csv(
+                cls.output_dir / dataset["file"], dtype=str, keep_default_na=False
+            )
+            for dataset in OLIST_DATASETS
+        }
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.tmp_dir.cleanup()
+
+    def test_all_files_match_source_schema(self):
+        """Every Olist file is written with the expected header."""
+        for dataset in OLIST_DATASETS:
+            df = self.tables[dataset["table"]]
+            self.assertEqual(list(df.columns), dataset["columns"])
+            self.assertEqual(len(df), self.rows[dataset["table"]])
+
+    def test_primary_keys_are_unique(self):
+        """Ids used as primary keys in source.yml are unique."""
+        for table, key in [
+            ("customers", "customer_id"),
+            ("orders", "order_id"),
+            ("products", "product_id"),
+            ("sellers", "seller_id"),
+            ("order_reviews", "review_id"),
+        ]:
+            self.assertTrue(self.tables[table][key].is_unique, table)
+
+    def test_referential_integrity(self):
+        """Every foreign key points at an existing row."""
+        t = self.tables
+        order_ids = set(t["orders"]["order_id"])
+        checks = [
+            (t["orders"]["customer_id"], t["customers"]["customer_id"]),
+            (t["order_items"]["order_id"], order_ids),
+            (t["order_items"]["product_id"], t["products"]["product_id"]),
+            (t["order_items"]["seller_id"], t["sellers"]["seller_id"]),
+            (t["order_payments"]["order_id"], order_ids),
+            (t["order_reviews"]["order_id"], order_ids),
+            (
+                t["customers"]["customer_zip_code_prefix"],
+                t["geolocation"]["geolocation_zip_code_prefix"],
+            ),
+            (
+                t["sellers"]["seller_zip_code_prefix"],
+                t["geolocation"]["geolocation_zip_code_prefix"],
+            ),
+        ]
+        for child, parent in checks:
+            self.assertTrue(set(child) <= set(parent))
+
+        categories = set(t["products"]["product_category_name"]) - {""}
+        self.assertTrue(
+            categories <= set(t["product_categories"]["product_category_name"])
+        )
+
+    def test_payments_cover_order_totals(self):
+        """Payments add up to item price plus freight for each order."""
+        items = self.tables["order_items"].astype(
+            {"price": float, "freight_value": float}
+        )
+        payments = self.tables["order_payments"].astype({"payment_value": float})
+        item_totals = (
+            (items["price"] + items["freight_value"]).groupby(items["order_id"]).sum()
+        )
+        payment_totals = payments.groupby("order_id")["payment_value"].sum()
+        diff = (item_totals - payment_totals.reindex(item_totals.index)).abs()
+        self.assertLess(diff.max(), 0.02)
+
+    def test_same_seed_is_deterministic(self):
+        """The same seed and scale produce identical files."""
+        with tempfile.TemporaryDirectory() as other_dir:
+            OlistDataGenerator(
+                scale=0.02, output_dir=other_dir, seed=7, chunk_size=500
+            ).generate()
+            for dataset in OLIST_DATASETS:
+                self.assertEqual(
+                    (self.output_dir / dataset["file"]).read_bytes(),
+                    (Path(other_dir) / dataset["file"]).read_bytes(),
+                )
+
+
+if __name__ == "__main__":
+    unittest.main()
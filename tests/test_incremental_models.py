@@ -0,0 +1,373 @@
+import unittest
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+from pathlib import Path
+
+# Add the src directory to the Python path
+sys.path.append(str(Path(__file__).parent.parent))
+
+DBT_PROJECT = Path(__file__).parent.parent / "src" / "dbt_project"
+SCHEMA = "incremental_test"
+MODELS = [
+    "stg_olist__orders",
+    "stg_olist__order_items",
+    "stg_olist__order_payments",
+    "stg_olist__order_reviews",
+    "stg_olist__sellers",
+    "stg_olist__geolocation",
+    "int_orders_with_items",
+    "int_order_sellers",
+    "int_seller_monthly_sketches",
+    "int_product_monthly_sketches",
+    "int_seller_order_totals",
+    "int_product_order_totals",
+    "sellers",
+]
+FULL_REFRESH_TESTS = [
+    "seller_order_totals_match_full_refresh",
+    "product_order_totals_match_full_refresh",
+]
+
+# The raw tables the models read, typed as the loader creates them
+SOURCE_TABLES = """
+CREATE TABLE {schema}.orders (
+    order_id text, customer_id text, order_status text,
+    order_purchase_timestamp timestamp, order_approved_at timestamp,
+    order_delivered_carrier_date timestamp,
+    order_delivered_customer_date timestamp,
+    order_estimated_delivery_date timestamp
+);
+CREATE TABLE {schema}.order_items (
+    order_id text, order_item_id bigint, product_id text, seller_id text,
+    shipping_limit_date timestamp, price double precision,
+    freight_value double precision
+);
+CREATE TABLE {schema}.order_payments (
+    order_id text, payment_sequential bigint, payment_type text,
+    payment_installments bigint, payment_value double precision
+);
+CREATE TABLE {schema}.order_reviews (
+    review_id text, order_id text, review_score bigint,
+    review_comment_title text, review_comment_message text,
+    review_creation_date timestamp, review_answer_timestamp timestamp
+);
+CREATE TABLE {schema}.sellers (
+    seller_id text, seller_zip_code_prefix bigint, seller_city text,
+    seller_state text
+);
+CREATE TABLE {schema}.geolocation (
+    geolocation_zip_code_prefix bigint, geolocation_lat double precision,
+    geolocation_lng double precision, geolocation_city text,
+    geolocation_state text
+);
+INSERT INTO {schema}.sellers VALUES
+    ('s1', 1001, 'sao paulo', 'SP'),
+    ('s2', 1002, 'campinas', 'SP'),
+    ('s3', 1003, 'curitiba', 'PR');
+INSERT INTO {schema}.orders VALUES
+    ('o1', 'c1', 'shipped', '2018-01-02', '2018-01-02', '2018-01-03',
+     NULL, '2018-01-20'),
+    ('o2', 'c2', 'delivered', '2018-01-05', '2018-01-05', '2018-01-06',
+     '2018-01-15', '2018-01-20');
+INSERT INTO {schema}.order_items VALUES
+    ('o1', 1, 'p1', 's1', '2018-01-04', 10.0, 2.0),
+    ('o1', 2, 'p2', 's1', '2018-01-04', 20.0, 2.0),
+    ('o2', 1, 'p1', 's1', '2018-01-07', 10.0, 3.0),
+    ('o2', 2, 'p3', 's2', '2018-01-07', 30.0, 3.0);
+INSERT INTO {schema}.order_payments VALUES
+    ('o1', 1, 'credit_card', 1, 34.0),
+    ('o2', 1, 'boleto', 1, 46.0);
+INSERT INTO {schema}.order_reviews VALUES
+    ('r2', 'o2', 5, NULL, 'great', '2018-01-16', '2018-01-17');
+"""
+
+
+def _db_params():
+    return {
+        "host": os.getenv("DB_HOST"),
+        "port": int(os.getenv("DB_PORT", 5432)),
+        "user": os.getenv("DB_USER", "postgres"),
+        "password": os.getenv("DB_PASSWORD", "postgres"),
+        "database": os.getenv("DB_NAME", "postgres"),
+    }
+
+
+def _postgres_connection():
+    if not os.getenv("DB_HOST"):
+        return None
+    try:
+        import psycopg2
+
+        return psycopg2.connect(**_db_params(), connect_timeout=3)
+    except Exception:
+        return None
+
+
+class TestIncrementalModels(unittest.TestCase):
+    """Incremental dbt runs after an already-loaded order changes."""
+
+    @classmethod
+    def setUpClass(cls):
+        if shutil.which("dbt") is None:
+            raise unittest.SkipTest("dbt is not installed")
+        if not (DBT_PROJECT / "dbt_packages").is_dir():
+            raise unittest.SkipTest("dbt packages are not installed (dbt deps)")
+        cls.conn = _postgres_connection()
+        if cls.conn is None:
+            raise unittest.SkipTest("no Postgres database configured (DB_* env vars)")
+        cls.conn.autocommit = True
+        cls.build_dir = tempfile.mkdtemp()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls._drop_schemas()
+        cls.conn.close()
+        shutil.rmtree(cls.build_dir, ignore_errors=True)
+
+    @classmethod
+    def _drop_schemas(cls):
+        with cls.conn.cursor() as cursor:
+            for suffix in ("", "_staging", "_intermediate", "_marts"):
+                cursor.execute(f"DROP SCHEMA IF EXISTS {SCHEMA}{suffix} CASCADE")
+
+    def setUp(self):
+        self._drop_schemas()
+        self._execute(f"CREATE SCHEMA {SCHEMA};" + SOURCE_TABLES.format(schema=SCHEMA))
+        self._dbt_run()
+
+    def _execute(self, sql):
+        with self.conn.cursor() as cursor:
+            cursor.execute(sql)
+
+    def _fetch(self, sql):
+        with self.conn.cursor() as cursor:
+            cursor.execute(sql)
+            return cursor.fetchall()
+
+    def _dbt_run(self):
+        self._dbt("run", "--select", *MODELS)
+
+    def _dbt(self, *args):
+        env = {
+            **os.environ,
+            "DB_SCHEMA": SCHEMA,
+            "DBT_LOG_PATH": self.build_dir,
+        }
+        result = subprocess.run(
+            ["dbt", *args]
+            + ["--profiles-dir", str(DBT_PROJECT / "profiles")]
+            + ["--target-path", self.build_dir],
+            cwd=DBT_PROJECT,
+            env=env,
+            capture_output=True,
+            text=True,
+        )
+        self.assertEqual(result.returncode, 0, result.stdout[-2000:])
+
+    def _deliver_and_review_o1(self):
+        """o1 is delivered and reviewed after it was first loaded."""
+        self._execute(
+            f"""
+            UPDATE {SCHEMA}.orders
+            SET order_status = 'delivered',
+                order_delivered_customer_date = '2018-01-12'
+            WHERE order_id = 'o1';
+            INSERT INTO {SCHEMA}.order_reviews VALUES
+                ('r1', 'o1', 2, NULL, NULL, '2018-01-13', '2018-01-14');
+            """
+        )
+        self._dbt_run()
+
+    def test_changed_order_is_rebuilt_in_the_bridge(self):
+        """The bridge rows of an already-loaded order follow its changes."""
+        loaded_at = f"""
+            SELECT order_id, _loaded_at
+            FROM {SCHEMA}_intermediate.int_order_sellers
+            WHERE order_id = 'o2'
+        """
+        unchanged = self._fetch(loaded_at)
+        self._deliver_and_review_o1()
+
+        self.assertEqual(self._fetch(loaded_at), unchanged)
+        rows = self._fetch(
+            f"""
+            SELECT seller_id, order_status, is_delivered, delivery_time_days,
+                   review_score, is_negative_review
+            FROM {SCHEMA}_intermediate.int_order_sellers
+            WHERE order_id = 'o1'
+            """
+        )
+        self.assertEqual(rows, [("s1", "delivered", True, 10.0, 2, True)])
+
+    def test_changed_order_reaches_the_sellers_mart(self):
+        """Seller counts include orders delivered and reviewed after loading."""
+        self._deliver_and_review_o1()
+
+        rows = self._fetch(
+            f"""
+            SELECT total_orders, delivered_orders, orders_with_reviews,
+                   negative_reviews
+            FROM {SCHEMA}_marts.sellers
+            WHERE seller_id = 's1'
+            """
+        )
+        self.assertEqual(rows, [(2, 2, 2, 1)])
+
+    def test_seller_dropped_from_an_order_leaves_the_bridge(self):
+        """A changed order replaces all of its bridge rows."""
+        self._execute(
+            f"UPDATE {SCHEMA}.order_items SET seller_id = 's3' "
+            f"WHERE order_id = 'o2' AND order_item_id = 2"
+        )
+        self._dbt_run()
+
+        rows = self._fetch(
+            f"""
+            SELECT seller_id, item_count, review_score
+            FROM {SCHEMA}_intermediate.int_order_sellers
+            WHERE order_id = 'o2'
+            ORDER BY seller_id
+            """
+        )
+        self.assertEqual(rows, [("s1", 1, 5), ("s3", 1, 5)])
+
+    def test_seller_dropped_from_an_order_is_recounted_in_the_sellers_mart(self):
+        """The mart recounts sellers a changed order no longer has."""
+        self._execute(
+            f"UPDATE {SCHEMA}.order_items SET seller_id = 's3' "
+            f"WHERE order_id = 'o2' AND order_item_id = 2"
+        )
+        self._dbt_run()
+
+        rows = self._fetch(
+            f"""
+            SELECT seller_id, total_orders, total_items_sold
+            FROM {SCHEMA}_marts.sellers
+            ORDER BY seller_id
+            """
+        )
+        self.assertEqual(rows, [("s1", 2, 3), ("s2", 0, 0), ("s3", 1, 1)])
+
+    def test_delivered_order_reaches_the_delivery_time_sketch(self):
+        """Delivery percentiles include orders delivered after loading."""
+        self._execute(
+            f"""
+            UPDATE {SCHEMA}.orders
+            SET order_status = 'delivered',
+                order_delivered_customer_date = '2018-01-30'
+            WHERE order_id = 'o1'
+            """
+        )
+        self._dbt_run()
+
+        (row,) = self._fetch(
+            f"""
+            SELECT delivery_time_p50_days, delivery_time_p90_days
+            FROM {SCHEMA}_marts.sellers
+            WHERE seller_id = 's1'
+            """
+        )
+        self.assertAlmostEqual(row[0], 10, delta=0.1)
+        self.assertAlmostEqual(row[1], 28, delta=0.3)
+
+    def test_month_an_order_left_is_sketched_again(self):
+        """A seller's month drops the customers of orders it no longer has."""
+        self._execute(
+            f"UPDATE {SCHEMA}.order_items SET seller_id = 's3' "
+            f"WHERE order_id = 'o2' AND order_item_id = 2"
+        )
+        self._dbt_run()
+
+        sellers = self._fetch(
+            f"""
+            SELECT seller_id, order_count
+            FROM {SCHEMA}_intermediate.int_seller_monthly_sketches
+            ORDER BY seller_id
+            """
+        )
+        self.assertEqual(sellers, [("s1", 2), ("s3", 1)])
+        products = self._fetch(
+            f"""
+            SELECT product_id, item_count
+            FROM {SCHEMA}_intermediate.int_product_monthly_sketches
+            ORDER BY product_id
+            """
+        )
+        self.assertEqual(products, [("p1", 2), ("p2", 1), ("p3", 1)])
+
+    def test_changed_order_updates_the_seller_totals(self):
+        """The totals subtract what a changed order counted for before."""
+        self._deliver_and_review_o1()
+
+        rows = self._fetch(
+            f"""
+            SELECT total_orders, delivered_orders, delivery_time_days_count,
+                   delivery_time_days_sum, review_count, negative_reviews
+            FROM {SCHEMA}_intermediate.int_seller_order_totals
+            WHERE seller_id = 's1'
+            """
+        )
+        self.assertEqual(rows, [(2, 2, 2, 20, 2, 1)])
+
+    def test_changed_order_updates_the_product_totals(self):
+        """Product totals follow a delivery and review after loading."""
+        self._deliver_and_review_o1()
+
+        rows = self._fetch(
+            f"""
+            SELECT product_id, total_orders, delivery_time_days_count,
+                   review_count, negative_reviews
+            FROM {SCHEMA}_intermediate.int_product_order_totals
+            WHERE product_id IN ('p1', 'p2')
+            ORDER BY product_id
+            """
+        )
+        self.assertEqual(rows, [("p1", 2, 2, 2, 1), ("p2", 1, 1, 1, 1)])
+
+    def test_moved_items_leave_the_totals_they_were_merged_into(self):
+        """Counts and bounds drop the orders and prices that changed."""
+        self._execute(
+            f"""
+            UPDATE {SCHEMA}.order_items SET seller_id = 's3' WHERE order_id = 'o1';
+            UPDATE {SCHEMA}.order_items SET seller_id = 's1', price = 15.0
+            WHERE order_id = 'o2' AND product_id = 'p3';
+            """
+        )
+        self._dbt_run()
+
+        sellers = self._fetch(
+            f"""
+            SELECT seller_id, total_orders, items_sold, first_order_at::date::text
+            FROM {SCHEMA}_intermediate.int_seller_order_totals
+            ORDER BY seller_id
+            """
+        )
+        self.assertEqual(
+            sellers, [("s1", 1, 2, "2018-01-05"), ("s3", 1, 2, "2018-01-02")]
+        )
+        products = self._fetch(
+            f"""
+            SELECT min_price, max_price
+            FROM {SCHEMA}_intermediate.int_product_order_totals
+            WHERE product_id = 'p3'
+            """
+        )
+        self.assertEqual(products, [(15.0, 15.0)])
+
+    def test_totals_match_a_full_refresh_after_changes(self):
+        """The full refresh equivalence tests pass after incremental runs."""
+        self._deliver_and_review_o1()
+        self._execute(
+            f"UPDATE {SCHEMA}.order_items SET seller_id = 's3', price = 5.0 "
+            f"WHERE order_id = 'o2' AND order_item_id = 1"
+        )
+        self._dbt_run()
+
+        self._dbt("test", "--select", *FULL_REFRESH_TESTS)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,83 @@
+import unittest
+from unittest.mock import patch
+import os
+import sys
+import tempfile
+from pathlib import Path
+
+import pyarrow as pa
+
+# Add the src directory to the Python path
+sys.path.append(str(Path(__file__).parent.parent))
+
+from src.etl.landing import ParquetLanding
+
+RAW_DIR = Path(__file__).parent.parent / "src" / "data" / "raw"
+
+
+class TestParquetLanding(unittest.TestCase):
+    """Unit tests for the Parquet landing stage."""
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.landing_dir = Path(self.tmp_dir.name) / "landing"
+        self.csv_path = Path(self.tmp_dir.name) / "orders.csv"
+        self.csv_path.write_text(
+            "order_id,order_purchase_timestamp,items\n"
+            '"o1",2017-11-24 10:00:00,2\n'
+            "o2,2017-11-25 11:30:00,1\n"
+        )
+        self.landing = ParquetLanding(self.landing_dir)
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def test_land_converts_with_typed_schema(self):
+        """The first read converts the CSV to a typed Parquet file."""
+        table = self.landing.read(self.csv_path, "orders")
+
+        self.assertTrue(self.landing.parquet_path("orders").exists())
+        self.assertEqual(table.column("order_id").to_pylist(), ["o1", "o2"])
+        self.assertEqual(table.schema.field("items").type, pa.int64())
+        self.assertTrue(
+            pa.types.is_timestamp(table.schema.field("order_purchase_timestamp").type)
+        )
+        self.assertEqual(self.landing.cache["orders"]["rows"], 2)
+
+    def test_unchanged_source_is_not_reconverted(self):
+        """Touching the CSV without changing it keeps the landed file."""
+        self.assertTrue(self.landing.land(self.csv_path, "orders"))
+        os.utime(self.csv_path, ns=(0, 0))
+
+        # A fresh instance reads the schema cache from disk
+        landing = ParquetLanding(self.landing_dir)
+        with patch("src.etl.landing.pa_csv.read_csv") as mock_read_csv:
+            self.assertFalse(landing.land(self.csv_path, "orders"))
+            mock_read_csv.assert_not_called()
+
+    def test_changed_source_is_reconverted_with_cached_schema(self):
+        """A changed CSV is reconverted using the cached column types."""
+        self.landing.land(self.csv_path, "orders")
+        # "items" would now infer as string without the cached schema
+        with open(self.csv_path, "a") as f:
+            f.write("o3,2017-11-26 09:15:00,\n")
+
+        self.assertTrue(self.landing.land(self.csv_path, "orders"))
+        table = self.landing.read(self.csv_path, "orders")
+        self.assertEqual(table.num_rows, 3)
+        self.assertEqual(table.schema.field("items").type, pa.int64())
+
+    def test_raw_file_quirks(self):
+        """The BOM and mixed quoting in the shipped raw files are handled."""
+        categories = self.landing.read(
+            RAW_DIR / "product_category_name_translation.csv", "product_categories"
+        )
+        self.assertEqual(categories.column_names[0], "product_category_name")
+
+        sellers = self.landing.read(RAW_DIR / "olist_sellers_dataset.csv", "sellers")
+        seller_ids = sellers.column("seller_id").to_pylist()
+        self.assertTrue(all(len(seller_id) == 32 for seller_id in seller_ids))
+
+
+if __name__ == "__main__":
+    unittest.main()
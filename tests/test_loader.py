@@ -1,66 +1,188 @@
 import unittest
 from unittest.mock import patch, MagicMock
 import os
+import subprocess
 import sys
-import logging
+import tempfile
+import zipfile
 from pathlib import Path
 
+import pyarrow as pa
+
 # Add the src directory to the Python path
 sys.path.append(str(Path(__file__).parent.parent))
 
-from src.etl.loader import SupabaseDataLoader
+from src.etl.archive import ARCHIVE_FILE
+from src.etl.config import OLIST_DATASETS
+from src.etl.loader import OlistDataLoader
+from src.etl.manifest import SourceManifest
+
+TEST_ENV = {
+    "SUPABASE_URL": "http://localhost:8000",
+    "SUPABASE_SERVICE_KEY": "test_key",
+    "DB_SCHEMA": "olist",
+    "DB_HOST": "localhost",
+    "DB_PORT": "5432",
+    "DB_NAME": "test_db",
+    "DB_USER": "test_user",
+    "DB_PASSWORD": "test_password",
+}
 
 
-class TestSupabaseDataLoader(unittest.TestCase):
-    """Unit tests for the SupabaseDataLoader class."""
+class TestOlistDataLoader(unittest.TestCase):
+    """Unit tests for the OlistDataLoader class."""
 
-    @patch("src.etl.loader.create_engine")
+    @patch.dict(os.environ, TEST_ENV)
+    @patch("src.etl.loader.create_pooled_engine")
     def setUp(self, mock_create_engine):
         """Set up test environment."""
+        self.mock_create_engine = mock_create_engine
         self.mock_engine = MagicMock()
         self.mock_conn = MagicMock()
         mock_create_engine.return_value = self.mock_engine
         self.mock_engine.connect.return_value = self.mock_conn
 
-        self.test_config = {
-            "host": "localhost",
-            "port": 5432,
-            "user": "test_user",
-            "password": "test_password",
-            "database": "test_db",
-        }
-
-        self.loader = SupabaseDataLoader(self.test_config)
+        self.loader = OlistDataLoader()
         self.loader.connect_to_db()
 
     def test_connect_to_db(self):
-        """Test database connection is established correctly."""
-        from sqlalchemy.engine import create_engine
-        from src.etl.loader import create_engine as loader_create_engine
-
-        # Verify connection was established with correct parameters
+        """Test the engine draws from the shared pool for the database."""
+        self.mock_create_engine.assert_called_once_with(self.loader.pool)
+        self.assertEqual(
+            self.loader.pool.db_params,
+            {
+                "host": "localhost",
+                "port": 5432,
+                "database": "test_db",
+                "user": "test_user",
+                "password": "test_password",
+            },
+        )
         self.assertEqual(self.loader.engine, self.mock_engine)
         self.assertEqual(self.loader.conn, self.mock_conn)
+        self.assertEqual(self.loader.schema, "olist")
+
+    @patch.dict(os.environ, {"DB_PASSWORD": ""})
+    def test_missing_environment_variables(self):
+        """Test a missing variable is reported at initialization."""
+        with self.assertRaises(EnvironmentError):
+            OlistDataLoader()
 
-    @patch("pandas.read_csv")
-    def test_load_csv_data(self, mock_read_csv):
+    @patch("pandas.DataFrame.to_sql")
+    def test_load_csv_to_table(self, mock_to_sql):
         """Test loading data from CSV file."""
-        # Mock the pandas DataFrame
-        mock_df = MagicMock()
-        mock_read_csv.return_value = mock_df
-        mock_df.to_sql = MagicMock()
+        self.loader.landing = MagicMock()
+        self.loader.landing.read.return_value = pa.table(
+            {"Order ID": [f"o{i}" for i in range(2500)]}
+        )
 
-        # Call the method
-        self.loader.load_csv_data("test.csv", "test_table")
+        self.assertTrue(self.loader.load_csv_to_table("test.csv", "test_table"))
 
-        # Verify the method was called with correct parameters
-        mock_read_csv.assert_called_once_with("test.csv")
-        mock_df.to_sql.assert_called_once()
+        self.loader.landing.read.assert_called_once_with("test.csv", "test_table")
+        # One call per chunk, the first one replacing the table
+        self.assertEqual(mock_to_sql.call_count, 2)
+        self.assertEqual(mock_to_sql.call_args_list[0].kwargs["if_exists"], "replace")
+        self.assertEqual(mock_to_sql.call_args_list[1].kwargs["if_exists"], "append")
+
+    @patch("src.etl.loader.quarantine_rows")
+    @patch("pandas.DataFrame.to_sql", autospec=True)
+    def test_load_csv_to_table_quarantines_invalid_rows(
+        self, mock_to_sql, mock_quarantine
+    ):
+        """Rows that fail validation are quarantined instead of loaded."""
+        self.loader.landing = MagicMock()
+        self.loader.landing.read.return_value = pa.table(
+            {
+                "order_id": ["a", "b", "c"],
+                "price": [10.0, -5.0, 20.0],
+                "freight_value": [1.0, 1.0, 1.0],
+            }
+        )
+
+        self.assertTrue(self.loader.load_csv_to_table("items.csv", "order_items"))
+
+        loaded = mock_to_sql.call_args.args[0]
+        self.assertEqual(list(loaded["order_id"]), ["a", "c"])
+        rejected = mock_quarantine.call_args.args[3]
+        self.assertEqual(list(rejected["order_id"]), ["b"])
+        self.assertEqual(
+            self.loader.load_stats["order_items"]["quarantined"], {"negative_price": 1}
+        )
+
+    def test_load_csv_to_table_failure(self):
+        """Test a failed load returns False instead of raising."""
+        self.loader.landing = MagicMock()
+        self.loader.landing.read.side_effect = FileNotFoundError("test.csv")
+        self.assertFalse(self.loader.load_csv_to_table("test.csv", "test_table"))
 
     def test_close_connection(self):
         """Test closing the database connection."""
         self.loader.close_connection()
         self.mock_conn.close.assert_called_once()
+        self.mock_engine.dispose.assert_called_once()
+
+
+def _kaggle_listing(last_updated):
+    """Output of `kaggle datasets list --csv`, after a CLI warning."""
+    return subprocess.CompletedProcess(
+        [],
+        0,
+        stdout="Warning: Looks like you're using an outdated API Version\n"
+        "ref,title,size,lastUpdated,downloadCount\n"
+        "olistbr/marketing-funnel-olist,Marketing Funnel,2MB,2018-11-13 15:00:00,1\n"
+        f"olistbr/brazilian-ecommerce,Brazilian E-Commerce,42MB,{last_updated},9\n",
+    )
+
+
+class TestDownloadDataset(unittest.TestCase):
+    """The download is skipped only when the files are from the latest release."""
+
+    @patch.dict(os.environ, TEST_ENV)
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.data_dir = Path(self.tmp_dir.name)
+        with zipfile.ZipFile(self.data_dir / ARCHIVE_FILE, "w") as archive:
+            for dataset in OLIST_DATASETS:
+                archive.writestr(dataset["file"], "id\n1\n")
+        manifest = SourceManifest(self.data_dir)
+        for dataset in OLIST_DATASETS:
+            manifest.record(dataset["file"], dataset["table"], 1, release="2018-11-29")
+
+        self.loader = OlistDataLoader()
+        self.loader.dataset_path = self.data_dir
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def _download(self, listing):
+        env = {"KAGGLE_USERNAME": "user", "KAGGLE_KEY": "key"}
+        with patch.dict(os.environ, env), patch(
+            "src.etl.loader.subprocess.run",
+            side_effect=[listing, subprocess.CompletedProcess([], 0)],
+        ) as mock_run:
+            self.assertTrue(self.loader.download_dataset())
+        return [call.args[0][:3] for call in mock_run.call_args_list]
+
+    def test_latest_release_is_not_downloaded(self):
+        self.assertEqual(
+            self._download(_kaggle_listing("2018-11-29")),
+            [["kaggle", "datasets", "list"]],
+        )
+
+    def test_new_release_is_downloaded(self):
+        """Intact local files are downloaded again for a newer release."""
+        self.assertEqual(
+            self._download(_kaggle_listing("2024-01-15")),
+            [["kaggle", "datasets", "list"], ["kaggle", "datasets", "download"]],
+        )
+        entry = SourceManifest(self.data_dir).entries[OLIST_DATASETS[0]["file"]]
+        self.assertEqual(entry["release"], "2024-01-15")
+
+    def test_unreachable_kaggle_keeps_intact_files(self):
+        self.assertEqual(
+            self._download(FileNotFoundError("kaggle")),
+            [["kaggle", "datasets", "list"]],
+        )
 
 
 if __name__ == "__main__":
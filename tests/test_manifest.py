@@ -0,0 +1,60 @@
+import unittest
+from unittest.mock import patch
+import os
+import sys
+import tempfile
+from pathlib import Path
+
+# Add the src directory to the Python path
+sys.path.append(str(Path(__file__).parent.parent))
+
+from src.etl.manifest import MANIFEST_FILE, SourceManifest
+from src.etl.utils import file_sha256
+
+
+class TestSourceManifest(unittest.TestCase):
+    """Unit tests for the raw file manifest."""
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.data_dir = Path(self.tmp_dir.name)
+        self.csv_path = self.data_dir / "olist_sellers_dataset.csv"
+        self.csv_path.write_text("seller_id,seller_state\ns1,SP\n")
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def test_record_persists_next_to_files(self):
+        """Recorded entries are written to the data directory and reloaded."""
+        SourceManifest(self.data_dir).record(self.csv_path.name, "sellers", 1)
+
+        self.assertTrue((self.data_dir / MANIFEST_FILE).exists())
+        entry = SourceManifest(self.data_dir).entries[self.csv_path.name]
+        self.assertEqual(entry["sha256"], file_sha256(self.csv_path))
+        self.assertEqual(entry["row_count"], 1)
+        self.assertEqual(entry["table"], "sellers")
+
+    def test_unchanged_file_is_not_rehashed(self):
+        """Matching size and mtime reuse the recorded hash."""
+        manifest = SourceManifest(self.data_dir)
+        manifest.record(self.csv_path.name, "sellers", 1)
+
+        with patch("src.etl.manifest.file_sha256") as mock_sha256:
+            self.assertTrue(manifest.is_unchanged(self.csv_path.name))
+            mock_sha256.assert_not_called()
+
+    def test_touched_and_modified_files(self):
+        """A touched file is unchanged; a modified or missing file is not."""
+        manifest = SourceManifest(self.data_dir)
+        manifest.record(self.csv_path.name, "sellers", 1)
+
+        os.utime(self.csv_path, ns=(0, 0))
+        self.assertTrue(manifest.is_unchanged(self.csv_path.name))
+
+        self.csv_path.write_text("seller_id,seller_state\ns2,RJ\n")
+        self.assertFalse(manifest.is_unchanged(self.csv_path.name))
+        self.assertFalse(manifest.is_unchanged("missing.csv"))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,392 @@
+import unittest
+from unittest.mock import MagicMock, patch
+import copy
+import os
+import sys
+from pathlib import Path
+
+# Add the src directory to the Python path
+sys.path.append(str(Path(__file__).parent.parent))
+
+from src.etl.metabase_warm import (
+    FingerprintStore,
+    MetabaseClient,
+    build_plan,
+    changed_models,
+    model_relations,
+    sql_relations,
+    warm_cards,
+)
+
+MANIFEST = {
+    "nodes": {
+        "model.olist.customers": {
+            "resource_type": "model",
+            "name": "customers",
+            "alias": "customers",
+            "schema": "olist_marts",
+            "config": {
+                "materialized": "incremental",
+                "post-hook": [{"sql": "update {{ this }} set recency_segment = 'x'"}],
+            },
+            "depends_on": {"nodes": []},
+        },
+        "model.olist.products": {
+            "resource_type": "model",
+            "name": "products",
+            "alias": "products",
+            "schema": "olist_marts",
+            "config": {
+                "materialized": "incremental",
+                "post-hook": [
+                    {"sql": "CREATE INDEX IF NOT EXISTS ix ON products (id)"}
+                ],
+            },
+            "depends_on": {"nodes": []},
+        },
+        "model.olist.product_summary": {
+            "resource_type": "model",
+            "name": "product_summary",
+            "alias": "product_summary",
+            "schema": "olist_marts",
+            "config": {"materialized": "view"},
+            "depends_on": {"nodes": ["model.olist.products"]},
+        },
+        "model.olist.sellers": {
+            "resource_type": "model",
+            "name": "sellers",
+            "alias": "sellers",
+            "schema": "olist_marts",
+            "config": {"materialized": "table", "post-hook": []},
+            "depends_on": {"nodes": ["source.olist.olist.sellers"]},
+        },
+        "test.olist.not_null_sellers_seller_id": {
+            "resource_type": "test",
+            "name": "not_null_sellers_seller_id",
+            "schema": "olist_marts",
+            "config": {},
+        },
+    }
+}
+
+
+def _result(unique_id, rows_affected, status="success"):
+    return {
+        "unique_id": unique_id,
+        "status": status,
+        "adapter_response": {"rows_affected": rows_affected},
+    }
+
+
+class TestChangeDetection(unittest.TestCase):
+    """Unit tests for finding the marts a dbt run changed."""
+
+    def test_empty_incremental_runs_are_unchanged(self):
+        """Incremental models without new rows or data hooks did not change."""
+        run_results = {
+            "results": [
+                _result("model.olist.customers", 0),
+                _result("model.olist.products", 0),
+                _result("model.olist.sellers", 3095),
+            ]
+        }
+        self.assertEqual(
+            changed_models(MANIFEST, run_results),
+            {"model.olist.customers", "model.olist.sellers"},
+        )
+
+    def test_failed_models_are_unchanged(self):
+        run_results = {"results": [_result("model.olist.sellers", None, "error")]}
+        self.assertEqual(changed_models(MANIFEST, run_results), set())
+
+    def test_views_change_with_their_parents(self):
+        """A view is changed by any run that changes what it reads."""
+        staging = {"results": [_result("model.olist.products", 0)]}
+        marts = {"results": [_result("model.olist.products", 120)]}
+        self.assertNotIn(
+            "model.olist.product_summary", changed_models(MANIFEST, staging)
+        )
+        self.assertIn(
+            "model.olist.product_summary", changed_models(MANIFEST, staging, marts)
+        )
+
+    def test_sql_relations_match_known_models(self):
+        """Quoted, database-qualified and unknown references are handled."""
+        relations = model_relations(MANIFEST)
+        sql = """
+            SELECT * FROM "olist_marts"."Customers" c
+            JOIN analytics.olist_marts.sellers s ON s.seller_id = c.customer_id
+            JOIN olist_staging.stg_orders o ON o.customer_id = c.customer_id
+        """
+        self.assertEqual(
+            sql_relations(sql, relations),
+            {"olist_marts.customers", "olist_marts.sellers"},
+        )
+
+
+class TestWarmDashboard(unittest.TestCase):
+    """Unit tests for warming a dashboard's cards."""
+
+    def setUp(self):
+        self.client = MetabaseClient("http://metabase:3000", "user", "secret")
+        self.client.session = MagicMock()
+        self.client.session.get.return_value.json.return_value = {
+            "dashcards": [
+                {"card": self._native(1, "SELECT * FROM olist_marts.customers")},
+                {"card": self._native(2, "SELECT * FROM olist_marts.products")},
+                {"card": self._native(1, "SELECT * FROM olist_marts.customers")},
+                {"card": {"id": None}},
+                {"card": self._native(3, "SELECT 1")},
+            ]
+        }
+        self.response = self.client.session.post.return_value.__enter__.return_value
+        self.response.iter_content.return_value = [b'{"data":{"rows":[', b"[1]]}}"]
+
+    @staticmethod
+    def _native(card_id, sql):
+        return {
+            "id": card_id,
+            "dataset_query": {"type": "native", "native": {"query": sql}},
+        }
+
+    def test_plan_maps_cards_to_models(self):
+        """Cards refresh when their models' fingerprints moved or are unknown."""
+        store = MagicMock()
+        store.model_fingerprints.return_value = (
+            {"model.olist.customers": "12:7", "model.olist.products": "3:1"},
+            {"model.olist.customers"},
+        )
+        warmed = build_plan(self.client, [7], MANIFEST, store=store)["dashboards"]
+        store.warmed_fingerprints.return_value = {
+            int(cid): card["fingerprint"] for cid, card in warmed["7"].items()
+        }
+        store.model_fingerprints.return_value = (
+            {"model.olist.customers": "13:9", "model.olist.products": "3:1"},
+            {"model.olist.customers"},
+        )
+        plan = build_plan(self.client, [7], MANIFEST, store=store)
+
+        self.assertEqual(plan["changed_models"], ["model.olist.customers"])
+        cards = plan["dashboards"]["7"]
+        self.assertEqual(sorted(cards), ["1", "2", "3"])
+        self.assertEqual(cards["1"]["models"], ["model.olist.customers"])
+        self.assertEqual(cards["2"]["models"], ["model.olist.products"])
+        self.assertIsNone(cards["3"]["models"])
+        self.assertEqual(
+            [cid for cid, card in cards.items() if card["refresh"]], ["1", "3"]
+        )
+
+    def test_plan_without_store_refreshes_everything(self):
+        plan = build_plan(self.client, [7], MANIFEST)
+        self.assertIsNone(plan["changed_models"])
+        self.assertTrue(all(c["refresh"] for c in plan["dashboards"]["7"].values()))
+
+    def test_results_are_streamed_and_discarded(self):
+        report = warm_cards(self.client, [1, 3])
+
+        self.assertEqual((report["warmed"], report["failed"]), (2, 0))
+        warmed = [c.args[0] for c in self.client.session.post.call_args_list]
+        self.assertEqual(
+            warmed,
+            [
+                "http://metabase:3000/api/card/1/query",
+                "http://metabase:3000/api/card/3/query",
+            ],
+        )
+        self.assertTrue(self.client.session.post.call_args.kwargs["stream"])
+        self.assertEqual(report["bytes"], 2 * 23)
+
+    def test_failed_queries_are_counted(self):
+        """Query errors reported in a 202 body count as failures."""
+        self.response.iter_content.return_value = [
+            b'{"status":"failed","error":"relation does not exist"}'
+        ]
+        report = warm_cards(self.client, [1, 2, 3])
+
+        self.assertEqual((report["warmed"], report["failed"]), (0, 3))
+        self.assertEqual(report["errors"][1], "relation does not exist")
+
+    def test_gui_cards_resolve_through_their_tables(self):
+        """Source tables and cards used as sources are looked up."""
+        tables = {
+            "/api/table/10": {"schema": "olist_marts", "name": "sellers"},
+            "/api/card/5": {
+                "id": 5,
+                "dataset_query": {"type": "query", "query": {"source-table": 10}},
+            },
+        }
+        self.client.get = MagicMock(side_effect=lambda path: tables[path])
+        card = {
+            "id": 6,
+            "dataset_query": {"type": "query", "query": {"source-table": "card__5"}},
+        }
+        self.assertEqual(
+            self.client.card_relations(card, set()), {"olist_marts.sellers"}
+        )
+
+
+SCHEMA = "metabase_warm_test"
+
+
+def _postgres_connection():
+    if not os.getenv("DB_HOST"):
+        return None
+    try:
+        import psycopg2
+
+        return psycopg2.connect(
+            host=os.getenv("DB_HOST"),
+            port=int(os.getenv("DB_PORT", 5432)),
+            user=os.getenv("DB_USER", "postgres"),
+            password=os.getenv("DB_PASSWORD", "postgres"),
+            database=os.getenv("DB_NAME", "postgres"),
+            connect_timeout=3,
+        )
+    except Exception:
+        return None
+
+
+class TestFingerprintStore(unittest.TestCase):
+    """Statistics fingerprints of the marts against a Postgres database."""
+
+    @classmethod
+    def setUpClass(cls):
+        cls.conn = _postgres_connection()
+        if cls.conn is None:
+            raise unittest.SkipTest("no Postgres database configured (DB_* env vars)")
+        cls.manifest = copy.deepcopy(MANIFEST)
+        for node in cls.manifest["nodes"].values():
+            node["schema"] = SCHEMA
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.conn.close()
+
+    def setUp(self):
+        self._execute(
+            f"""
+            DROP SCHEMA IF EXISTS {SCHEMA} CASCADE;
+            CREATE SCHEMA {SCHEMA};
+            CREATE TABLE {SCHEMA}.customers AS
+                SELECT i AS customer_id, 'SP' AS state FROM generate_series(1, 100) i;
+            CREATE TABLE {SCHEMA}.products AS SELECT 1 AS product_id;
+            CREATE VIEW {SCHEMA}.product_summary AS
+                SELECT count(*) AS products FROM {SCHEMA}.products;
+            """
+        )
+        self.store = FingerprintStore(self.conn, SCHEMA)
+        self.client = MagicMock()
+        self.client.dashboard_cards.return_value = [
+            {"id": 1, "dataset_query": {"type": "native"}},
+            {"id": 2, "dataset_query": {"type": "native"}},
+            {"id": 3, "dataset_query": {"type": "native"}},
+        ]
+        self.card_models = {
+            1: ["model.olist.customers"],
+            2: ["model.olist.products"],
+            3: ["model.olist.product_summary"],
+        }
+
+    def tearDown(self):
+        self.conn.rollback()
+        self._execute(f"DROP SCHEMA IF EXISTS {SCHEMA} CASCADE")
+
+    def _execute(self, sql):
+        with self.conn.cursor() as cursor:
+            cursor.execute(sql)
+        self.conn.commit()
+        self._flush_stats()
+
+    def _flush_stats(self):
+        # Publish this session's counters, as a finished dbt run would
+        with self.conn.cursor() as cursor:
+            cursor.execute("SELECT pg_stat_force_next_flush()")
+        self.conn.commit()
+
+    def _plan_and_warm(self, *run_results):
+        """Plan, then record every card to refresh as warmed."""
+        with patch(
+            "src.etl.metabase_warm.card_models",
+            side_effect=lambda client, card, relations: self.card_models[card["id"]],
+        ):
+            plan = build_plan(self.client, [7], self.manifest, run_results, self.store)
+        refreshed = []
+        for card_id, card in plan["dashboards"]["7"].items():
+            if card["refresh"]:
+                refreshed.append(card_id)
+                self.store.record_warmed(card_id, card["fingerprint"])
+        return refreshed
+
+    def test_written_tables_are_refreshed(self):
+        """Cards refresh after a write to their tables or a rebuild of them."""
+        self.assertEqual(self._plan_and_warm(), ["1", "2", "3"])
+        self.assertEqual(self._plan_and_warm(), [])
+
+        self._execute(
+            f"UPDATE {SCHEMA}.customers SET state = 'RJ' WHERE customer_id = 5"
+        )
+        self.assertEqual(self._plan_and_warm(), ["1"])
+
+        self._execute(
+            f"CREATE TABLE {SCHEMA}.rebuilt AS SELECT * FROM {SCHEMA}.customers;"
+            f"DROP TABLE {SCHEMA}.customers;"
+            f"ALTER TABLE {SCHEMA}.rebuilt RENAME TO customers"
+        )
+        self.assertEqual(self._plan_and_warm(), ["1"])
+
+        # Fingerprinting reads statistics only, never the tables themselves
+        self._flush_stats()
+        with self.conn.cursor() as cursor:
+            cursor.execute(
+                "SELECT seq_scan FROM pg_stat_user_tables "
+                "WHERE relid = %s::regclass",
+                (f"{SCHEMA}.customers",),
+            )
+            self.assertEqual(cursor.fetchone(), (0,))
+
+    def test_views_follow_the_tables_they_read(self):
+        self._plan_and_warm()
+
+        # dbt replaces views on every run; the same definition is not a change
+        self._execute(
+            f"DROP VIEW {SCHEMA}.product_summary;"
+            f"CREATE VIEW {SCHEMA}.product_summary AS "
+            f"SELECT count(*) AS products FROM {SCHEMA}.products"
+        )
+        self.assertEqual(self._plan_and_warm(), [])
+
+        self._execute(f"INSERT INTO {SCHEMA}.products VALUES (2)")
+        self.assertEqual(self._plan_and_warm(), ["2", "3"])
+
+    def test_models_dbt_did_not_change_are_not_fingerprinted(self):
+        self._plan_and_warm()
+        unchanged = {
+            "results": [
+                _result("model.olist.customers", 0),
+                _result("model.olist.products", 0),
+            ]
+        }
+        with patch.object(
+            FingerprintStore,
+            "relation_fingerprint",
+            autospec=True,
+            side_effect=FingerprintStore.relation_fingerprint,
+        ) as mock_fingerprint:
+            self.assertEqual(self._plan_and_warm(unchanged), [])
+        # customers has a data post-hook, so it counts as changed by dbt
+        self.assertEqual(
+            [call.args[2] for call in mock_fingerprint.call_args_list], ["customers"]
+        )
+
+    def test_failed_warm_is_refreshed_again(self):
+        """A card's fingerprint only moves when its warm is recorded."""
+        with patch(
+            "src.etl.metabase_warm.card_models",
+            side_effect=lambda client, card, relations: self.card_models[card["id"]],
+        ):
+            build_plan(self.client, [7], self.manifest, (), self.store)
+        self.assertEqual(self._plan_and_warm(), ["1", "2", "3"])
+
+
+if __name__ == "__main__":
+    unittest.main()
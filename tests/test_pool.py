@@ -0,0 +1,125 @@
+import unittest
+from unittest.mock import MagicMock, patch
+import os
+import sys
+import threading
+import time
+from pathlib import Path
+
+import psycopg2.extensions
+
+# Add the src directory to the Python path
+sys.path.append(str(Path(__file__).parent.parent))
+
+from src.etl.pool import ConnectionPool, PoolTimeout, create_pooled_engine
+
+
+def _fake_connect(**kwargs):
+    conn = MagicMock(closed=0)
+    conn.info.transaction_status = psycopg2.extensions.TRANSACTION_STATUS_IDLE
+    return conn
+
+
+@patch("src.etl.pool.psycopg2.connect", side_effect=_fake_connect)
+class TestConnectionPool(unittest.TestCase):
+    """Unit tests for the pool's limits and statistics."""
+
+    def test_connections_are_reused(self, mock_connect):
+        pool = ConnectionPool({}, max_size=2)
+        for _ in range(5):
+            with pool.connection():
+                pass
+
+        self.assertEqual(mock_connect.call_count, 1)
+        stats = pool.stats()
+        self.assertEqual((stats["checkouts"], stats["created"]), (5, 1))
+        self.assertEqual((stats["open"], stats["idle"], stats["in_use"]), (1, 1, 0))
+
+    def test_checkouts_wait_at_max_size(self, mock_connect):
+        """A checkout beyond max_size waits for a return, then times out."""
+        pool = ConnectionPool({}, max_size=1)
+        conn = pool.getconn()
+        threading.Timer(0.1, pool.putconn, args=(conn,)).start()
+
+        self.assertIs(pool.getconn(timeout=2), conn)
+        with self.assertRaises(PoolTimeout):
+            pool.getconn(timeout=0.05)
+
+        stats = pool.stats()
+        self.assertEqual((stats["waits"], stats["timeouts"]), (2, 1))
+        self.assertGreater(stats["wait_seconds"], 0.05)
+        self.assertEqual(mock_connect.call_count, 1)
+
+    def test_old_and_broken_connections_are_replaced(self, mock_connect):
+        pool = ConnectionPool({}, max_size=1, max_age_s=60)
+        conn = pool.getconn()
+        pool.putconn(conn)
+        conn.created_at -= 120
+        self.assertIsNot(pool.getconn(), conn)
+
+        broken = pool._in_use.copy().pop()
+        broken.closed = 2
+        pool.putconn(broken)
+        self.assertEqual(pool.stats()["open"], 0)
+        self.assertEqual(pool.stats()["recycled"], 1)
+
+    def test_open_transactions_are_rolled_back_on_return(self, mock_connect):
+        pool = ConnectionPool({})
+        conn = pool.getconn()
+        conn.info.transaction_status = psycopg2.extensions.TRANSACTION_STATUS_INTRANS
+        pool.putconn(conn)
+        conn.rollback.assert_called_once()
+
+
+def _db_params():
+    return {
+        "host": os.getenv("DB_HOST"),
+        "port": int(os.getenv("DB_PORT", 5432)),
+        "user": os.getenv("DB_USER", "postgres"),
+        "password": os.getenv("DB_PASSWORD", "postgres"),
+        "database": os.getenv("DB_NAME", "postgres"),
+    }
+
+
+@unittest.skipUnless(os.getenv("DB_HOST"), "no Postgres database configured")
+class TestConnectionPoolPostgres(unittest.TestCase):
+    """The pool against a Postgres database."""
+
+    def setUp(self):
+        self.pool = ConnectionPool(_db_params(), max_size=2, health_check_after_s=0)
+
+    def tearDown(self):
+        self.pool.closeall()
+
+    def test_terminated_connections_fail_the_health_check(self):
+        with self.pool.connection() as conn, conn.cursor() as cursor:
+            cursor.execute("SELECT pg_backend_pid()")
+            pid = cursor.fetchone()[0]
+        killer = psycopg2.connect(**_db_params())
+        killer.autocommit = True
+        with killer.cursor() as cursor:
+            cursor.execute("SELECT pg_terminate_backend(%s)", (pid,))
+        killer.close()
+        time.sleep(0.1)
+
+        with self.pool.connection() as conn, conn.cursor() as cursor:
+            cursor.execute("SELECT pg_backend_pid()")
+            self.assertNotEqual(cursor.fetchone()[0], pid)
+        self.assertEqual(self.pool.stats()["health_check_failures"], 1)
+
+    def test_sqlalchemy_engine_returns_connections(self):
+        """Closing a SQLAlchemy connection returns it to the pool."""
+        import sqlalchemy
+
+        engine = create_pooled_engine(self.pool)
+        for _ in range(3):
+            with engine.begin() as conn:
+                conn.execute(sqlalchemy.text("SELECT 1"))
+
+        stats = self.pool.stats()
+        self.assertEqual((stats["created"], stats["checkouts"]), (1, 3))
+        self.assertEqual(stats["in_use"], 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
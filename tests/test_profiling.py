@@ -0,0 +1,126 @@
+import unittest
+from unittest.mock import patch
+import json
+import os
+import pstats
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+# Add the src directory to the Python path
+sys.path.append(str(Path(__file__).parent.parent))
+
+from src.etl.profiling import PROFILE_ENV, profile, profiled, profiling_enabled
+
+
+def _busy_worker(seconds):
+    end = time.perf_counter() + seconds
+    while time.perf_counter() < end:
+        pass
+
+
+def _allocate():
+    blocks = [bytearray(1024) for _ in range(4096)]  # 4 MiB
+    worker = threading.Thread(target=_busy_worker, args=(0.1,), name="busy")
+    worker.start()
+    worker.join()
+    return len(blocks)
+
+
+class TestProfiling(unittest.TestCase):
+    """Unit tests for the opt-in profiler."""
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.output_dir = Path(self.tmp_dir.name) / "profiles"
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def test_enabled_flag(self):
+        for flag, expected in (
+            ("1", True),
+            ("true", True),
+            ("cpu", True),
+            ("0", False),
+            ("", False),
+        ):
+            with self.subTest(flag=flag):
+                self.assertEqual(profiling_enabled(flag), expected)
+        with patch.dict(os.environ, {PROFILE_ENV: "yes"}):
+            self.assertTrue(profiling_enabled())
+            self.assertFalse(profiling_enabled(False))
+        with patch.dict(os.environ, {PROFILE_ENV: ""}):
+            self.assertFalse(profiling_enabled())
+
+    def test_cpu_mode_leaves_out_tracemalloc(self):
+        with profile("stage", enabled="cpu", output_dir=self.output_dir) as summary:
+            _allocate()
+        self.assertEqual(summary["mode"], "cpu")
+        self.assertIsNone(summary["peak_memory_bytes"])
+        self.assertTrue(Path(summary["pstats"]).exists())
+
+    def test_disabled_writes_nothing(self):
+        with patch.dict(os.environ, {PROFILE_ENV: ""}):
+            with profile("stage", output_dir=self.output_dir) as summary:
+                self.assertIsNone(summary)
+            self.assertEqual(
+                profiled("stage", output_dir=self.output_dir)(_allocate)(), 4096
+            )
+        self.assertFalse(self.output_dir.exists())
+
+    def test_profile_writes_artifacts(self):
+        """pstats, collapsed stacks of every thread and peak memory are kept."""
+        with profile("stage", enabled=True, output_dir=self.output_dir) as summary:
+            _allocate()
+
+        self.assertGreaterEqual(summary["peak_memory_bytes"], 4 * 2**20)
+        self.assertGreater(summary["samples"], 0)
+
+        stats = pstats.Stats(summary["pstats"])
+        self.assertTrue(any(func[2] == "_allocate" for func in stats.stats))
+
+        lines = Path(summary["collapsed"]).read_text().splitlines()
+        stacks = dict(line.rsplit(" ", 1) for line in lines)
+        self.assertTrue(all(count.isdigit() for count in stacks.values()))
+        self.assertTrue(
+            any(
+                stack.startswith("busy;") and "_busy_worker (test_profiling.py" in stack
+                for stack in stacks
+            )
+        )
+
+        (summary_file,) = self.output_dir.glob("stage-*.json")
+        self.assertEqual(json.loads(summary_file.read_text()), summary)
+
+    def test_decorator_keeps_result_and_errors(self):
+        with patch.dict(os.environ, {PROFILE_ENV: "1"}):
+            self.assertEqual(
+                profiled("stage", output_dir=self.output_dir)(_allocate)(), 4096
+            )
+
+            @profiled(output_dir=self.output_dir)
+            def failing():
+                raise ValueError("boom")
+
+            with self.assertRaises(ValueError):
+                failing()
+
+        self.assertEqual(len(list(self.output_dir.glob("stage-*.pstats"))), 1)
+        # Profiles are still written when the stage fails
+        self.assertEqual(len(list(self.output_dir.glob("failing-*.pstats"))), 1)
+
+    def test_nested_stage_is_part_of_the_outer_profile(self):
+        with profile("outer", enabled=True, output_dir=self.output_dir):
+            with profile("inner", enabled=True, output_dir=self.output_dir) as inner:
+                self.assertIsNone(inner)
+        self.assertEqual(
+            sorted(path.suffix for path in self.output_dir.iterdir()),
+            [".collapsed", ".json", ".pstats"],
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
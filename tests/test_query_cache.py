@@ -0,0 +1,228 @@
+import unittest
+from unittest.mock import MagicMock, patch
+import os
+import sys
+import tempfile
+from datetime import date, datetime, timezone
+from decimal import Decimal
+from pathlib import Path
+
+# Add the src directory to the Python path
+sys.path.append(str(Path(__file__).parent.parent))
+
+from src.etl.query_cache import (
+    ENTRY_SUFFIX,
+    CachedQueryRunner,
+    QueryResultCache,
+    cache_key,
+    data_version,
+)
+
+
+def _result(*rows):
+    return {"columns": ["value"], "rows": [(row,) for row in rows]}
+
+
+class TestQueryResultCache(unittest.TestCase):
+    """Unit tests for the dashboard query result cache."""
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.cache_dir = Path(self.tmp_dir.name)
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def test_key_depends_on_query_params_and_version(self):
+        """Whitespace is ignored; parameters and the version are not."""
+        key = cache_key("SELECT 1;", None, "v1")
+        self.assertEqual(key, cache_key("SELECT\n    1", None, "v1"))
+        self.assertNotEqual(key, cache_key("SELECT 1", {"state": "SP"}, "v1"))
+        self.assertNotEqual(key, cache_key("SELECT 1", None, "v2"))
+
+    def test_memory_tier_evicts_least_recently_used(self):
+        """The entry bound evicts the entry that was used longest ago."""
+        cache = QueryResultCache(cache_dir=None, max_entries=2)
+        cache.put("a", _result(1))
+        cache.put("b", _result(2))
+        cache.get("a")
+        cache.put("c", _result(3))
+
+        self.assertIsNotNone(cache.get("a"))
+        self.assertIsNone(cache.get("b"))
+        self.assertEqual(cache.stats["evictions"], 1)
+
+    def test_memory_tier_is_size_bounded(self):
+        """Entries are evicted until the encoded sizes fit the byte bound."""
+        cache = QueryResultCache(cache_dir=None, max_bytes=12000)
+        for key in "abc":
+            cache.put(key, _result(key * 800))
+
+        self.assertIsNone(cache.get("a"))
+        self.assertIsNotNone(cache.get("c"))
+        self.assertLessEqual(cache._memory_bytes, 12000)
+
+    def test_disk_tier_is_shared(self):
+        """A warmed entry is served to another process."""
+        key = cache_key("SELECT 1", None, "v1")
+        QueryResultCache(self.cache_dir).put(key, _result(1))
+
+        reader = QueryResultCache(self.cache_dir)
+        self.assertEqual(reader.get(key), _result(1))
+        self.assertEqual(reader.stats["disk_hits"], 1)
+        self.assertIsNone(reader.get(cache_key("SELECT 1", None, "v2")))
+
+    def test_disk_tier_keeps_column_types(self):
+        """Results round-trip through Parquet, duplicate column names included."""
+        result = {
+            "columns": ["state", "revenue", "day", "at", "total", "state"],
+            "rows": [
+                ("SP", Decimal("10.50"), date(2018, 1, 2), None, 3, "SP"),
+                (
+                    None,
+                    None,
+                    None,
+                    datetime(2018, 1, 2, 3, tzinfo=timezone.utc),
+                    4,
+                    "RJ",
+                ),
+            ],
+        }
+        QueryResultCache(self.cache_dir).put("k", result)
+        self.assertEqual(QueryResultCache(self.cache_dir).get("k"), result)
+
+    def test_unreadable_entry_is_a_miss(self):
+        """Files in the shared directory are parsed as Parquet, never executed."""
+        path = self.cache_dir / f"k{ENTRY_SUFFIX}"
+        path.write_bytes(b"\x80\x04not parquet")
+
+        cache = QueryResultCache(self.cache_dir)
+        self.assertIsNone(cache.get("k"))
+        self.assertEqual(cache.stats["misses"], 1)
+        self.assertFalse(path.exists())
+
+    def test_runner_serves_repeat_loads_until_the_data_changes(self):
+        """The database is only queried again once the data version moves."""
+        runner = CachedQueryRunner(QueryResultCache(cache_dir=None), db_params={})
+        runner.conn = MagicMock(closed=False)
+        cursor = runner.conn.cursor.return_value.__enter__.return_value
+        cursor.description = [("seller_state",)]
+        cursor.fetchall.return_value = [("SP",)]
+
+        with patch(
+            "src.etl.query_cache.data_version", side_effect=["v1", "v1", "v2", None]
+        ):
+            first = runner.run("SELECT seller_state FROM sellers")
+            second = runner.run("SELECT seller_state FROM sellers")
+            third = runner.run("SELECT seller_state FROM sellers")
+            unversioned = runner.run("SELECT seller_state FROM sellers")
+
+        self.assertFalse(first["cached"])
+        self.assertTrue(second["cached"])
+        self.assertEqual(second["rows"], [("SP",)])
+        self.assertFalse(third["cached"])
+        self.assertFalse(unversioned["cached"])
+        self.assertEqual(cursor.execute.call_count, 3)
+
+
+SCHEMA = "query_cache_test"
+
+
+def _db_params():
+    return {
+        "host": os.getenv("DB_HOST"),
+        "port": int(os.getenv("DB_PORT", 5432)),
+        "user": os.getenv("DB_USER", "postgres"),
+        "password": os.getenv("DB_PASSWORD", "postgres"),
+        "database": os.getenv("DB_NAME", "postgres"),
+    }
+
+
+def _postgres_connection():
+    if not os.getenv("DB_HOST"):
+        return None
+    try:
+        import psycopg2
+
+        return psycopg2.connect(**_db_params(), connect_timeout=3)
+    except Exception:
+        return None
+
+
+class TestDataVersion(unittest.TestCase):
+    """Data versions derived from the marts against a Postgres database."""
+
+    @classmethod
+    def setUpClass(cls):
+        cls.conn = _postgres_connection()
+        if cls.conn is None:
+            raise unittest.SkipTest("no Postgres database configured (DB_* env vars)")
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.conn.close()
+
+    def setUp(self):
+        self._execute(
+            f"""
+            DROP SCHEMA IF EXISTS {SCHEMA} CASCADE;
+            CREATE SCHEMA {SCHEMA};
+            CREATE TABLE {SCHEMA}.sellers AS SELECT 'SP' AS seller_state;
+            CREATE TABLE {SCHEMA}.orders AS SELECT 1 AS order_id;
+            CREATE VIEW {SCHEMA}.seller_states AS
+                SELECT seller_state, count(*) AS sellers
+                FROM {SCHEMA}.sellers GROUP BY seller_state;
+            """
+        )
+        self.runner = CachedQueryRunner(
+            QueryResultCache(cache_dir=None), db_params=_db_params()
+        )
+        self.sql = f"SELECT * FROM {SCHEMA}.seller_states ORDER BY seller_state"
+
+    def tearDown(self):
+        self.runner.close()
+        self._execute(f"DROP SCHEMA IF EXISTS {SCHEMA} CASCADE")
+
+    def _execute(self, sql):
+        with self.conn.cursor() as cursor:
+            cursor.execute(sql)
+        self.conn.commit()
+        # Publish this session's write counters, as a finished dbt run would
+        with self.conn.cursor() as cursor:
+            cursor.execute("SELECT pg_stat_force_next_flush()")
+        self.conn.commit()
+
+    def test_writes_to_the_relations_read_move_the_version(self):
+        self.assertFalse(self.runner.run(self.sql)["cached"])
+        self.assertTrue(self.runner.run(self.sql)["cached"])
+
+        # A table the query does not read leaves its entry valid
+        self._execute(f"INSERT INTO {SCHEMA}.orders VALUES (2)")
+        self.assertTrue(self.runner.run(self.sql)["cached"])
+
+        self._execute(f"INSERT INTO {SCHEMA}.sellers VALUES ('RJ')")
+        result = self.runner.run(self.sql)
+        self.assertFalse(result["cached"])
+        self.assertEqual(result["rows"], [("RJ", 1), ("SP", 1)])
+
+        # dbt rebuilding the table and view with the same rows
+        self._execute(
+            f"CREATE TABLE {SCHEMA}.rebuilt AS SELECT * FROM {SCHEMA}.sellers;"
+            f"DROP TABLE {SCHEMA}.sellers CASCADE;"
+            f"ALTER TABLE {SCHEMA}.rebuilt RENAME TO sellers;"
+            f"CREATE VIEW {SCHEMA}.seller_states AS "
+            f"SELECT seller_state, count(*) AS sellers "
+            f"FROM {SCHEMA}.sellers GROUP BY seller_state"
+        )
+        self.assertFalse(self.runner.run(self.sql)["cached"])
+        self.assertTrue(self.runner.run(self.sql)["cached"])
+
+    def test_queries_that_cannot_be_planned_are_not_cached(self):
+        self.assertIsNone(data_version(self.conn, "SHOW search_path"))
+        self.conn.rollback()
+        self.assertIsNotNone(data_version(self.conn, f"SELECT * FROM {SCHEMA}.orders"))
+        self.conn.rollback()
+
+
+if __name__ == "__main__":
+    unittest.main()
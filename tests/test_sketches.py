@@ -0,0 +1,208 @@
+import unittest
+import os
+import re
+import sys
+from pathlib import Path
+
+# Add the src directory to the Python path
+sys.path.append(str(Path(__file__).parent.parent))
+
+SKETCH_MACROS = (
+    Path(__file__).parent.parent / "src" / "dbt_project" / "macros" / "sketches.sql"
+)
+SCHEMA = "sketch_test"
+
+# Documented bounds (see macros/sketches.sql)
+HLL_STANDARD_ERROR = 1.04 / 2**7
+QUANTILE_RELATIVE_ACCURACY = 0.01
+
+
+def _sketch_functions_sql(schema):
+    """The DDL of the create_sketch_functions macro, for the given schema."""
+    macros = SKETCH_MACROS.read_text()
+    body = re.search(
+        r"{% macro create_sketch_functions\(.*?\) %}(.*?){% endmacro %}",
+        macros,
+        re.DOTALL,
+    ).group(1)
+    return body.replace("{{ schema }}", schema)
+
+
+def _db_params():
+    return {
+        "host": os.getenv("DB_HOST"),
+        "port": int(os.getenv("DB_PORT", 5432)),
+        "user": os.getenv("DB_USER", "postgres"),
+        "password": os.getenv("DB_PASSWORD", "postgres"),
+        "database": os.getenv("DB_NAME", "postgres"),
+    }
+
+
+def _postgres_connection():
+    if not os.getenv("DB_HOST"):
+        return None
+    try:
+        import psycopg2
+
+        return psycopg2.connect(**_db_params(), connect_timeout=3)
+    except Exception:
+        return None
+
+
+class TestSketchMacros(unittest.TestCase):
+    def test_functions_are_schema_qualified(self):
+        """Function bodies run with the caller's search_path."""
+        sql = _sketch_functions_sql("analytics")
+        self.assertNotIn("{{", sql)
+        for name in re.findall(
+            r"create or replace (?:function|aggregate) (\S+)\(", sql
+        ):
+            self.assertTrue(name.startswith("analytics."), name)
+
+
+class TestSketchFunctions(unittest.TestCase):
+    """The sketch functions against a Postgres database."""
+
+    @classmethod
+    def setUpClass(cls):
+        cls.conn = _postgres_connection()
+        if cls.conn is None:
+            raise unittest.SkipTest("no Postgres database configured (DB_* env vars)")
+        with cls.conn.cursor() as cursor:
+            cursor.execute(f"DROP SCHEMA IF EXISTS {SCHEMA} CASCADE")
+            cursor.execute(_sketch_functions_sql(SCHEMA))
+            cursor.execute(f"SET search_path TO {SCHEMA}")
+        cls.conn.commit()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.conn.rollback()
+        with cls.conn.cursor() as cursor:
+            cursor.execute(f"DROP SCHEMA IF EXISTS {SCHEMA} CASCADE")
+        cls.conn.commit()
+        cls.conn.close()
+
+    def tearDown(self):
+        self.conn.rollback()
+
+    def _fetch(self, sql, params=None):
+        with self.conn.cursor() as cursor:
+            cursor.execute(sql, params)
+            return cursor.fetchall()
+
+    def test_distinct_counts_within_error_bound(self):
+        """Small counts are exact; large ones stay within 3 standard errors."""
+        counts = dict(
+            self._fetch(
+                """
+                SELECT n, hll_cardinality(
+                    (SELECT hll_sketch(array_agg('customer-' || i))
+                     FROM generate_series(1, n) AS i))
+                FROM unnest(ARRAY[0, 1, 3, 100, 5000, 20000, 250000]) AS n
+                """
+            )
+        )
+        for n in (0, 1, 3, 100, 5000):
+            self.assertEqual(counts[n], n)
+        for n in (20000, 250000):
+            self.assertLess(abs(counts[n] - n) / n, 3 * HLL_STANDARD_ERROR)
+
+    def test_merged_daily_sketches_equal_one_sketch(self):
+        """Merging is exact, from sparse through dense sketches."""
+        for customers in (500, 50000):
+            rows = self._fetch(
+                """
+                WITH orders AS (
+                    SELECT i %% 30 AS day, 'customer-' || (i %% %(customers)s) AS customer_id
+                    FROM generate_series(1, %(customers)s * 2) AS i
+                ),
+                days AS (
+                    SELECT day, hll_sketch(array_agg(customer_id)) AS sketch
+                    FROM orders
+                    GROUP BY day
+                ),
+                running AS (
+                    SELECT hll_union(hll_union(
+                        (SELECT hll_union_agg(sketch) FROM days WHERE day < 10),
+                        (SELECT hll_union_agg(sketch) FROM days WHERE day BETWEEN 10 AND 19)),
+                        (SELECT hll_union_agg(sketch) FROM days WHERE day >= 20)) AS sketch
+                )
+                SELECT
+                    (SELECT hll_sketch(array_agg(customer_id)) FROM orders),
+                    (SELECT hll_union_agg(sketch) FROM days),
+                    (SELECT sketch FROM running)
+                """,
+                {"customers": customers},
+            )
+            whole, merged, running = rows[0]
+            self.assertEqual(merged, whole)
+            self.assertEqual(running, whole)
+
+    def test_quantiles_within_relative_accuracy(self):
+        """quantile_value is within 1% of percentile_disc."""
+        rows = self._fetch(
+            """
+            WITH deliveries AS (
+                SELECT exp(sin(i) * 3 + 2) AS days FROM generate_series(1, 20000) AS i
+                UNION ALL
+                SELECT 0 FROM generate_series(1, 100)
+            ),
+            sketch AS (
+                SELECT quantile_sketch(array_agg(days)) AS sketch FROM deliveries
+            )
+            SELECT
+                q,
+                (SELECT percentile_disc(q) WITHIN GROUP (ORDER BY days) FROM deliveries),
+                quantile_value(sketch, q)
+            FROM sketch, unnest(ARRAY[0, 0.001, 0.01, 0.25, 0.5, 0.9, 0.99, 1]) AS q
+            """
+        )
+        for q, exact, approx in rows:
+            with self.subTest(q=q):
+                self.assertLessEqual(
+                    abs(approx - exact), QUANTILE_RELATIVE_ACCURACY * exact + 1e-9
+                )
+
+    def test_merged_quantile_sketches_equal_one_sketch(self):
+        rows = self._fetch(
+            """
+            WITH deliveries AS (
+                SELECT i % 7 AS day, (i % 997) / 10.0 AS days
+                FROM generate_series(1, 10000) AS i
+            ),
+            days AS (
+                SELECT day, quantile_sketch(array_agg(days)) AS sketch
+                FROM deliveries
+                GROUP BY day
+            )
+            SELECT
+                (SELECT quantile_sketch(array_agg(days)) FROM deliveries),
+                (SELECT quantile_union_agg(sketch) FROM days),
+                (SELECT quantile_union(
+                    (SELECT quantile_union_agg(sketch) FROM days WHERE day < 3),
+                    (SELECT quantile_union_agg(sketch) FROM days WHERE day >= 3)))
+            """
+        )
+        whole, merged, pairwise = rows[0]
+        self.assertEqual(merged, whole)
+        self.assertEqual(pairwise, whole)
+
+    def test_empty_and_null_inputs(self):
+        rows = self._fetch(
+            """
+            SELECT
+                hll_cardinality(hll_sketch(ARRAY[NULL, 'a', 'a']::text[])),
+                hll_cardinality(hll_union(NULL, '{}')),
+                quantile_value(quantile_sketch(ARRAY[NULL]::float8[]), 0.5),
+                quantile_value(quantile_union(NULL, quantile_sketch(ARRAY[2.0])), 0.5)
+            """
+        )
+        hll_single, hll_empty, quantile_empty, quantile_single = rows[0]
+        self.assertEqual(hll_single, 1)
+        self.assertEqual(hll_empty, 0)
+        self.assertIsNone(quantile_empty)
+        self.assertAlmostEqual(quantile_single, 2.0, delta=0.02)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,274 @@
+import unittest
+from unittest.mock import patch
+import io
+import os
+import sys
+from contextlib import redirect_stdout
+from pathlib import Path
+
+# Add the src directory to the Python path
+sys.path.append(str(Path(__file__).parent.parent))
+
+from src.etl import statements
+from src.etl.statements import (
+    METRICS_TABLE,
+    STAGES_TABLE,
+    begin_stage,
+    capture,
+    compare_runs,
+    end_stage,
+    ensure_tables,
+    stage_totals,
+    top_statements,
+)
+
+# Schema standing in for the extension: a pg_stat_statements table with the
+# view's columns, first on the search path
+STATS_SCHEMA = "statements_test_stats"
+SCHEMA = "statements_test"
+
+
+def _db_params(**extra):
+    return {
+        "host": os.getenv("DB_HOST"),
+        "port": int(os.getenv("DB_PORT", 5432)),
+        "user": os.getenv("DB_USER", "postgres"),
+        "password": os.getenv("DB_PASSWORD", "postgres"),
+        "database": os.getenv("DB_NAME", "postgres"),
+        **extra,
+    }
+
+
+def _postgres_connection(**extra):
+    if not os.getenv("DB_HOST"):
+        return None
+    try:
+        import psycopg2
+
+        return psycopg2.connect(**_db_params(**extra), connect_timeout=3)
+    except Exception:
+        return None
+
+
+STATS_PATH = {"options": f"-c search_path={STATS_SCHEMA},public"}
+
+
+class TestStatementCapture(unittest.TestCase):
+    """Stage capture and reports against a Postgres database."""
+
+    @classmethod
+    def setUpClass(cls):
+        cls.conn = _postgres_connection(**STATS_PATH)
+        if cls.conn is None:
+            raise unittest.SkipTest("no Postgres database configured (DB_* env vars)")
+        with cls.conn.cursor() as cursor:
+            cursor.execute(
+                "SELECT oid FROM pg_database WHERE datname = current_database()"
+            )
+            cls.dbid = cursor.fetchone()[0]
+        cls.conn.commit()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.conn.close()
+
+    def setUp(self):
+        self._execute(
+            f"""
+            DROP SCHEMA IF EXISTS {STATS_SCHEMA} CASCADE;
+            DROP SCHEMA IF EXISTS {SCHEMA} CASCADE;
+            CREATE SCHEMA {STATS_SCHEMA};
+            CREATE TABLE {STATS_SCHEMA}.pg_stat_statements (
+                userid OID, dbid OID, toplevel BOOLEAN, queryid BIGINT,
+                query TEXT, calls BIGINT, total_exec_time DOUBLE PRECISION,
+                rows BIGINT, shared_blks_read BIGINT, shared_blks_hit BIGINT
+            );
+            """
+        )
+        ensure_tables(self.conn, SCHEMA)
+        self.conn.commit()
+
+    def tearDown(self):
+        self.conn.rollback()
+        self._execute(
+            f"DROP SCHEMA IF EXISTS {STATS_SCHEMA} CASCADE;"
+            f"DROP SCHEMA IF EXISTS {SCHEMA} CASCADE;"
+        )
+
+    def _execute(self, sql, params=None):
+        with self.conn.cursor() as cursor:
+            cursor.execute(sql, params)
+            rows = cursor.fetchall() if cursor.description else None
+        self.conn.commit()
+        return rows
+
+    def _set_statement(self, queryid, calls, ms, query=None, dbid=None, top=True):
+        """Upsert a statement's counters in the stand-in view."""
+        self._execute(
+            f"""
+            DELETE FROM {STATS_SCHEMA}.pg_stat_statements
+            WHERE queryid = %(queryid)s AND dbid = %(dbid)s AND toplevel = %(top)s;
+            INSERT INTO {STATS_SCHEMA}.pg_stat_statements VALUES (
+                10, %(dbid)s, %(top)s, %(queryid)s, %(query)s, %(calls)s, %(ms)s,
+                %(calls)s * 2, %(calls)s * 3, %(calls)s * 4
+            );
+            """,
+            {
+                "queryid": queryid,
+                "dbid": dbid or self.dbid,
+                "top": top,
+                "query": query or f"SELECT {queryid}",
+                "calls": calls,
+                "ms": ms,
+            },
+        )
+
+    def _capture(self, action, run_id, stage):
+        self.assertTrue(
+            capture(action, _db_params(**STATS_PATH), run_id, stage, SCHEMA)
+        )
+
+    def _metrics(self, run_id):
+        return {
+            row[0]: row[1:]
+            for row in self._execute(
+                f"SELECT queryid, calls, total_exec_time, rows, shared_blks_read "
+                f"FROM {SCHEMA}.{METRICS_TABLE} WHERE run_id = %s",
+                (run_id,),
+            )
+        }
+
+    def test_stage_stores_counter_deltas(self):
+        """Only what ran during the stage is stored, per statement."""
+        self._set_statement(1, calls=10, ms=100.0)
+        self._set_statement(2, calls=5, ms=50.0)
+        self._set_statement(4, calls=50, ms=500.0)
+        self._capture("begin", "run-1", "extract")
+
+        self._set_statement(1, calls=15, ms=160.0)  # ran 5 more times
+        self._set_statement(3, calls=2, ms=20.0)  # new
+        self._set_statement(4, calls=3, ms=30.0)  # reset, then ran 3 times
+        self._set_statement(3, calls=1, ms=5.0, top=False)  # nested calls
+        self._set_statement(9, calls=7, ms=70.0, dbid=1)  # another database
+        self._capture("end", "run-1", "extract")
+
+        self.assertEqual(
+            self._metrics("run-1"),
+            {
+                1: (5, 60.0, 10, 15),
+                3: (3, 25.0, 6, 9),
+                4: (3, 30.0, 6, 9),
+            },
+        )
+        (finished,) = self._execute(
+            f"SELECT finished_at IS NOT NULL FROM {SCHEMA}.{STAGES_TABLE}"
+        )
+        self.assertEqual(finished, (True,))
+        self.assertEqual(
+            self._execute(
+                f"SELECT count(*) FROM {SCHEMA}.{statements.SNAPSHOTS_TABLE}"
+            ),
+            [(0,)],
+        )
+
+    def test_end_without_begin_is_not_captured(self):
+        self._set_statement(1, calls=10, ms=100.0)
+        self.assertIsNone(end_stage(self.conn, "run-1", "extract", SCHEMA))
+        self.conn.rollback()
+        self.assertFalse(
+            capture("end", _db_params(**STATS_PATH), "run-1", "extract", SCHEMA)
+        )
+        self.assertEqual(self._metrics("run-1"), {})
+
+    def test_missing_extension_never_raises(self):
+        """Without the view on the search path, capture is skipped."""
+        conn = _postgres_connection()
+        with conn.cursor() as cursor:
+            cursor.execute("SELECT to_regclass('pg_stat_statements') IS NULL")
+            if not cursor.fetchone()[0]:
+                self.skipTest("pg_stat_statements is installed")
+        conn.close()
+        self.assertFalse(capture("begin", _db_params(), "run-1", "extract", SCHEMA))
+        self.assertFalse(
+            capture("begin", _db_params(port=1), "run-1", "extract", SCHEMA)
+        )
+
+    def _two_runs(self):
+        for run_id, scale in (("run-1", 1), ("run-2", 3)):
+            self._execute(f"TRUNCATE {STATS_SCHEMA}.pg_stat_statements")
+            for stage, queryid, ms in (
+                ("extract", 1, 10.0),
+                ("run_dbt_marts", 2, 100.0 * scale),
+                ("run_dbt_marts", 3, 40.0),
+            ):
+                begin_stage(self.conn, run_id, stage, SCHEMA)
+                self._set_statement(
+                    queryid, calls=1, ms=ms, query=f"SELECT\n  {queryid}  FROM t"
+                )
+                end_stage(self.conn, run_id, stage, SCHEMA)
+                self.conn.commit()
+
+    def test_reports(self):
+        self._two_runs()
+
+        self.assertEqual(
+            [row["queryid"] for row in top_statements(self.conn, "run-2", 2, SCHEMA)],
+            [2, 3],
+        )
+        self.assertEqual(
+            [
+                (row["stage"], row["total_exec_time"])
+                for row in stage_totals(self.conn, "run-2", SCHEMA)
+            ],
+            [("run_dbt_marts", 340.0), ("extract", 10.0)],
+        )
+        (change,) = compare_runs(self.conn, "run-2", "run-1", 1, SCHEMA)
+        self.assertEqual(
+            (change["queryid"], change["time"], change["other_time"]),
+            (2, 300.0, 100.0),
+        )
+        self.assertEqual(change["time_change"], 200.0)
+
+        params = _db_params()
+        env = {
+            "DB_HOST": params["host"],
+            "DB_PORT": str(params["port"]),
+            "DB_USER": params["user"],
+            "DB_PASSWORD": params["password"],
+            "DB_NAME": params["database"],
+        }
+        with patch.dict(os.environ, env):
+            output = io.StringIO()
+            with redirect_stdout(output):
+                code = statements.main(
+                    ["--schema", SCHEMA, "report", "--run-id", "run-2", "--top", "2"]
+                )
+            self.assertEqual(code, 0)
+            self.assertIn("run_dbt_marts  SELECT 2 FROM t", output.getvalue())
+
+            output = io.StringIO()
+            with redirect_stdout(output):
+                code = statements.main(
+                    [
+                        "--schema",
+                        SCHEMA,
+                        "report",
+                        "--run-id",
+                        "run-2",
+                        "--compare",
+                        "run-1",
+                    ]
+                )
+            self.assertEqual(code, 0)
+            self.assertIn("+200.0", output.getvalue())
+            self.assertIn("run_dbt_marts: 340.0 vs 140.0", output.getvalue())
+
+            with redirect_stdout(io.StringIO()):
+                code = statements.main(
+                    ["--schema", SCHEMA, "report", "--run-id", "run-9"]
+                )
+            self.assertEqual(code, 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,179 @@
+import unittest
+import os
+import sys
+from pathlib import Path
+
+import pandas as pd
+
+# Add the src directory to the Python path
+sys.path.append(str(Path(__file__).parent.parent))
+
+from src.etl.validation import (
+    QUARANTINE_TABLE,
+    clear_quarantine,
+    describe,
+    ensure_quarantine_table,
+    quarantine_rows,
+    validate_rows,
+)
+
+SCHEMA = "validation_test"
+
+
+def _orders():
+    return pd.DataFrame(
+        {
+            "order_id": ["ok", "late_approval", "time_travel", "future", "no_dates"],
+            "order_purchase_timestamp": pd.to_datetime(
+                [
+                    "2018-01-02 10:00",
+                    "2018-01-02 10:00",
+                    "2018-01-02 10:00",
+                    "2099-01-01 00:00",
+                    None,
+                ]
+            ),
+            "order_approved_at": pd.to_datetime(
+                ["2018-01-02 11:00", "2018-01-01 09:00", None, None, None]
+            ),
+            "order_delivered_customer_date": pd.to_datetime(
+                ["2018-01-10", "2017-12-30", "2017-12-30", None, "2018-01-10"]
+            ),
+        }
+    )
+
+
+class TestValidateRows(unittest.TestCase):
+    def test_orders(self):
+        """Each rejected row carries the code of the first rule it breaks."""
+        valid, rejected = validate_rows(_orders(), "orders")
+        self.assertEqual(list(valid["order_id"]), ["ok", "no_dates"])
+        self.assertEqual(
+            dict(zip(rejected["order_id"], rejected["reason_code"])),
+            {
+                "late_approval": "delivered_before_purchase",
+                "time_travel": "delivered_before_purchase",
+                "future": "purchased_in_future",
+            },
+        )
+
+    def test_text_timestamps(self):
+        """Timestamps read as text are parsed; unparseable ones pass."""
+        orders = _orders().astype(str).replace("NaT", "not a date")
+        valid, rejected = validate_rows(orders, "orders")
+        self.assertEqual(list(valid["order_id"]), ["ok", "no_dates"])
+        self.assertEqual(len(rejected), 3)
+
+    def test_negative_amounts(self):
+        items = pd.DataFrame(
+            {
+                "order_id": ["a", "b", "c", "d"],
+                "price": [10.0, -1.0, None, -2.0],
+                "freight_value": [1.0, 1.0, -0.5, -0.5],
+            }
+        )
+        valid, rejected = validate_rows(items, "order_items")
+        self.assertEqual(list(valid["order_id"]), ["a"])
+        self.assertEqual(
+            list(rejected["reason_code"]),
+            ["negative_price", "negative_freight", "negative_price"],
+        )
+
+    def test_tables_without_rules(self):
+        customers = pd.DataFrame({"customer_id": ["a", "b"]})
+        valid, rejected = validate_rows(customers, "customers")
+        self.assertIs(valid, customers)
+        self.assertTrue(rejected.empty)
+        self.assertIn("reason_code", rejected.columns)
+
+    def test_describe(self):
+        self.assertEqual(describe({}), "all rows passed validation")
+        self.assertEqual(
+            describe({"negative_price": 2, "negative_freight": 1}),
+            "quarantined 3 rows (negative_freight: 1, negative_price: 2)",
+        )
+
+
+def _db_params():
+    return {
+        "host": os.getenv("DB_HOST"),
+        "port": int(os.getenv("DB_PORT", 5432)),
+        "user": os.getenv("DB_USER", "postgres"),
+        "password": os.getenv("DB_PASSWORD", "postgres"),
+        "database": os.getenv("DB_NAME", "postgres"),
+    }
+
+
+def _postgres_connection():
+    if not os.getenv("DB_HOST"):
+        return None
+    try:
+        import psycopg2
+
+        return psycopg2.connect(**_db_params(), connect_timeout=3)
+    except Exception:
+        return None
+
+
+class TestQuarantine(unittest.TestCase):
+    """The quarantine table against a Postgres database."""
+
+    @classmethod
+    def setUpClass(cls):
+        cls.conn = _postgres_connection()
+        if cls.conn is None:
+            raise unittest.SkipTest("no Postgres database configured (DB_* env vars)")
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.conn.close()
+
+    def setUp(self):
+        with self.conn.cursor() as cursor:
+            cursor.execute(
+                f"DROP SCHEMA IF EXISTS {SCHEMA} CASCADE; CREATE SCHEMA {SCHEMA}"
+            )
+        ensure_quarantine_table(self.conn, SCHEMA)
+        self.conn.commit()
+
+    def tearDown(self):
+        self.conn.rollback()
+        with self.conn.cursor() as cursor:
+            cursor.execute(f"DROP SCHEMA IF EXISTS {SCHEMA} CASCADE")
+        self.conn.commit()
+
+    def _quarantined(self):
+        with self.conn.cursor() as cursor:
+            cursor.execute(
+                f"SELECT table_name, reason_code, row_data "
+                f"FROM {SCHEMA}.{QUARANTINE_TABLE} ORDER BY row_data->>'order_id'"
+            )
+            return cursor.fetchall()
+
+    def test_rejected_rows_round_trip(self):
+        """Rejected rows are stored as JSON with their reason code."""
+        _, rejected = validate_rows(_orders(), "orders")
+        rejected.loc[rejected["order_id"] == "future", "order_id"] = 'fu"ture\n'
+        self.assertEqual(quarantine_rows(self.conn, SCHEMA, "orders", rejected), 3)
+        self.conn.commit()
+
+        rows = self._quarantined()
+        self.assertEqual(len(rows), 3)
+        table_name, reason, row = rows[0]
+        self.assertEqual((table_name, reason), ("orders", "purchased_in_future"))
+        self.assertEqual(row["order_id"], 'fu"ture\n')
+        self.assertEqual(row["order_purchase_timestamp"], "2099-01-01T00:00:00.000")
+        self.assertIsNone(row["order_approved_at"])
+
+        clear_quarantine(self.conn, SCHEMA, "order_items")
+        self.assertEqual(len(self._quarantined()), 3)
+        clear_quarantine(self.conn, SCHEMA, "orders")
+        self.assertEqual(self._quarantined(), [])
+
+    def test_nothing_rejected(self):
+        _, rejected = validate_rows(_orders().iloc[:1], "orders")
+        self.assertEqual(quarantine_rows(self.conn, SCHEMA, "orders", rejected), 0)
+
+
+if __name__ == "__main__":
+    unittest.main()